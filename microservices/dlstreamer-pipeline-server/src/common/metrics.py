@@ -0,0 +1,110 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""In-process OpenTelemetry metrics of pipelines and publishers.
+
+Instruments are created on first use from the global meter provider, which
+only exports once OpenTelemetry is enabled (see src/opentelemetry). Without
+the opentelemetry package, instruments are no-op.
+"""
+import threading as th
+import weakref
+
+try:
+    from opentelemetry import metrics as otel_metrics
+except ImportError:
+    otel_metrics = None
+
+METER_NAME = "dlstreamer-pipeline-server"
+
+_lock = th.Lock()
+_meter_provider = None
+_instruments = None
+_queues = weakref.WeakSet()
+
+
+class _NoOpInstrument():
+
+    def add(self, amount, attributes=None):
+        pass
+
+    def record(self, amount, attributes=None):
+        pass
+
+
+class Instruments():
+    """Instruments shared by all pipelines, distinguished by attributes.
+
+    frames - Counter of frames output by a pipeline. Attributes: pipeline, pipeline_id
+    latency - Histogram of source to appsink latency in ms. Attributes: pipeline, pipeline_id
+    encode_time - Histogram of publisher frame encode time in ms. Attributes: encoding_type
+    dropped - Counter of frames dropped by full publisher queues. Attributes: queue
+    publisher_queue_depth - Observable gauge of frames waiting in publisher queues. Attributes: queue
+    """
+
+    def __init__(self, meter=None):
+        if meter is None:
+            self.frames = self.latency = self.encode_time = self.dropped = _NoOpInstrument()
+            return
+        self.frames = meter.create_counter(
+            "pipeline_frames", unit="{frame}",
+            description="Frames output by pipeline instances")
+        self.latency = meter.create_histogram(
+            "pipeline_latency", unit="ms",
+            description="Latency of frames from pipeline source to appsink")
+        self.encode_time = meter.create_histogram(
+            "publisher_encode_time", unit="ms",
+            description="Time to encode frames for publishing")
+        self.dropped = meter.create_counter(
+            "publisher_dropped_frames", unit="{frame}",
+            description="Frames dropped by full publisher queues")
+        meter.create_observable_gauge(
+            "publisher_queue_depth", callbacks=[_observe_queue_depth], unit="{frame}",
+            description="Frames waiting in publisher queues")
+
+
+def configure(meter_provider=None):
+    """Set the meter provider instruments are created from, e.g. in tests.
+    Instruments are recreated on next use.
+
+    :param meter_provider: Meter provider, global meter provider if None
+    """
+    global _meter_provider, _instruments
+    with _lock:
+        _meter_provider = meter_provider
+        _instruments = None
+
+
+def instruments():
+    """Get instruments, created on first use
+
+    :rtype: Instruments
+    """
+    global _instruments
+    if _instruments is None:
+        with _lock:
+            if _instruments is None:
+                meter = None
+                if otel_metrics is not None:
+                    provider = _meter_provider or otel_metrics.get_meter_provider()
+                    meter = provider.get_meter(METER_NAME)
+                _instruments = Instruments(meter)
+    return _instruments
+
+
+def register_queue(queue):
+    """Report the depth of a publisher queue until it is garbage collected
+
+    :param queue: Queue with name attribute and __len__
+    """
+    # queue depth gauge is created along with the instruments
+    instruments()
+    _queues.add(queue)
+
+
+def _observe_queue_depth(options):
+    return [otel_metrics.Observation(len(queue), {"queue": queue.name})
+            for queue in list(_queues)]
@@ -5,12 +5,15 @@
 #
 
 import base64
+import concurrent.futures
 import copy
 import json
 import os
 import queue
 import time
 import re
+import uuid
+import threading as th
 
 from collections import defaultdict
 from distutils.util import strtobool
@@ -20,12 +23,16 @@ from src.server.pipeline_server import PipelineServer
 from src.server.pipeline import Pipeline as PipelineServer_Pipeline # avoid shadowing
 
 from src.publisher.publisher import Publisher
+from src.publisher.common.frame import frame_data, release_frame
 from src.subscriber.cam_ingestor import XirisCamIngestor
 from src.subscriber.image_ingestor import ImageIngestor
 from src.publisher.image_publisher import ImagePublisher
 from src.config import PipelineServerConfig
 from src.common.log import get_logger, LOG_LEVEL
 
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8  # image requests in flight per pipeline instance
+RESPONSE_TIMEOUT = 5
+
 
 class PipelineInstance:
     _SUPPORTED_PUBLISHERS = ["S3_write"]
@@ -69,6 +76,9 @@ class PipelineInstance:
         self.is_running = False
         self.subscriber = None
         self.ingestor = None
+        self.max_concurrent_requests = config.get("max_concurrent_requests",
+                                                  DEFAULT_MAX_CONCURRENT_REQUESTS)
+        self._request_slots = None
 
     def _mutable_deepcopy(self, obj):
         """creates a deepcopy of mutable objects"""
@@ -118,8 +128,13 @@ class PipelineInstance:
             self.ingestor.start()
 
         elif self.source_type == "image_ingestor":
+            if not isinstance(self.max_concurrent_requests, int) or self.max_concurrent_requests < 1:
+                raise ValueError(f'Invalid max_concurrent_requests: {self.max_concurrent_requests}')
+            self._request_slots = th.BoundedSemaphore(self.max_concurrent_requests)
+            image_publisher = ImagePublisher(qsize=self.max_concurrent_requests)
             self.input_queue = queue.Queue()    # maxsize =1 ?
-            self.ingestor = ImageIngestor(self.input_queue, self.config)
+            self.ingestor = ImageIngestor(self.input_queue, self.config,
+                                          on_request_error=image_publisher.fail)
             self.ingestor.start()   # start thread and wait for inbound image request
         
         elif self.source_type != "gstreamer":
@@ -130,7 +145,6 @@ class PipelineInstance:
 
         # add imagepublisher for source= "image_ingestor"
         if self.source_type == "image_ingestor":
-            image_publisher = ImagePublisher()
             self.publisher.image_publisher = image_publisher    # to track image publisher
             self.publisher.publishers.append(image_publisher)   # add to list of publishers, if exists
 
@@ -246,7 +260,8 @@ class PipelineInstance:
 
         self.log.info("Pipeline instance started: {}".format(self.instance_id))
         self.publisher.set_pipeline_info(self.name, self.version,
-                                         self.instance_id, self.get_status)
+                                         self.instance_id, self.get_status,
+                                         self.get_state_version)
 
     def execute_request(self,
                         instance_id: str,
@@ -256,6 +271,10 @@ class PipelineInstance:
         pipeline is running and user would like to call inference on demand for 
         user supplied image path.
 
+        Synchronous requests are tagged with a request id and wait for the
+        pipeline output carrying it, so up to max_concurrent_requests (pipeline
+        config) of them can be in flight.
+
         Args:
             instance_id (str): pipeline instance id
             request (Dict[str, Any]): request carrying image path to execute pipeline on
@@ -271,51 +290,67 @@ class PipelineInstance:
         if not self.is_async and not self.is_appdest:
             return None, "Pipeline destination must be appsink for synchronous request"
 
-        try:
-            # clear response queue to remove any stale data
-            while not self.publisher.image_publisher.response_queue.empty():
-                self.log.info("{} Clearing stale data from response queue".format(MSG_PREFIX))
-                try:
-                    self.publisher.image_publisher.response_queue.get_nowait()
-                except queue.Empty:
-                    break
-
-            self.ingestor.request_queue.put(request, timeout=REQUEST_PUT_TIMEOUT)
+        if self.is_async:
+            try:
+                self.ingestor.request_queue.put(request, timeout=REQUEST_PUT_TIMEOUT)
+            except queue.Full:
+                ERR = "Could not execute requeust due to timeout."
+                self.log.error("{} {}".format(MSG_PREFIX, ERR))
+                return DATA, ERR
             self.log.info("{} Request submitted: {}".format(MSG_PREFIX, request))
             DATA="Request submitted. Check destination for response."
-            ERR = None
-        except queue.Full:
-            ERR = "Could not execute requeust due to timeout."
-            self.log.error(MSG_PREFIX, ERR)
             return DATA, ERR
-        
-        if not self.is_async:
-        # wait for response
-            if not isinstance(self.publisher.image_publisher,ImagePublisher):
-                ERR = "Invalid publisher type for image ingestor"
-                DATA=None
-                self.log.error(MSG_PREFIX, ERR)
+
+        image_publisher = self.publisher.image_publisher
+        if not isinstance(image_publisher, ImagePublisher):
+            ERR = "Invalid publisher type for image ingestor"
+            self.log.error("{} {}".format(MSG_PREFIX, ERR))
+            return DATA, ERR
+
+        # limit requests in flight, each waiting for its own output
+        if not self._request_slots.acquire(timeout=REQUEST_PUT_TIMEOUT):
+            ERR = "Could not execute request, too many requests in flight."
+            self.log.error("{} {}".format(MSG_PREFIX, ERR))
+            return DATA, ERR
+        try:
+            request_id = uuid.uuid4().hex
+            response = image_publisher.register(request_id)
+            try:
+                self.ingestor.request_queue.put(dict(request, request_id=request_id),
+                                                timeout=REQUEST_PUT_TIMEOUT)
+            except queue.Full:
+                image_publisher.discard(request_id, response)
+                ERR = "Could not execute requeust due to timeout."
+                self.log.error("{} {}".format(MSG_PREFIX, ERR))
+                return DATA, ERR
+            self.log.info("{} Request {} submitted: {}".format(MSG_PREFIX, request_id, request))
+
+            timeout = request.get("timeout", RESPONSE_TIMEOUT)
+            try:
+                frame, metadata = response.result(timeout=timeout)     # frame-bytes, metadata
+            except concurrent.futures.TimeoutError:
+                image_publisher.discard(request_id, response)
+                ERR = "Request execution timed out"
+                self.log.error("{} {}".format(MSG_PREFIX, ERR))
+                return DATA, ERR
+            except Exception as e:
+                ERR = "Request execution failed: {}".format(e)
+                self.log.error("{} {}".format(MSG_PREFIX, ERR))
+                return DATA, ERR
+        finally:
+            self._request_slots.release()
+
+        try:
+            publish_frame = request.get("publish_frame", False)
+            if not publish_frame:
+                enc_frame = ""
             else:
-                try:
-                    RESPONSE_TIMEOUT = 5
-                    timeout = request.get("timeout", RESPONSE_TIMEOUT)
-                    response = self.publisher.image_publisher.response_queue.get(timeout=timeout)    # only one publisher for image_ingestor
-                    # self.log.info("Request executed. Response: {}".format(response))
-                    frame, metadata = response     # frame-bytes, metadata
-
-                    publish_frame = request.get("publish_frame", False)
-                    if not publish_frame:
-                        enc_frame = ""
-                    else:
-                        enc_frame = base64.b64encode(frame).decode("utf-8")
-
-                    resp_data = {"metadata":metadata, "blob":enc_frame} 
-                    DATA= json.dumps(resp_data) 
-                    ERR= None
-                except queue.Empty:
-                    DATA= None
-                    ERR= "Request execution timed out"
-                    self.log.error(MSG_PREFIX, ERR)
+                enc_frame = base64.b64encode(frame_data(frame)).decode("utf-8")
+        finally:
+            release_frame(frame)
+
+        resp_data = {"metadata":metadata, "blob":enc_frame}
+        DATA= json.dumps(resp_data)
         return DATA, ERR
 
     def get_status(self):
@@ -323,6 +358,11 @@ class PipelineInstance:
         if self.instance_id is not None:
             return self.pipeline.status()
 
+    def get_state_version(self):
+        """Return counter changing on each state change of pipeline instance"""
+        if self.instance_id is not None:
+            return self.pipeline.state_version()
+
     def stop(self):
         """Stop the Pipeline instance and its thread."""
         self.publisher.stop()
@@ -392,6 +432,9 @@ class Pipeline:
             "description": "DL Streamer Pipeline Server pipeline",
             "parameters": parameters
         }
+        for key in ("max_running_instances", "scheduling_weight"):
+            if key in self.pipeline_config:
+                pipeline_template[key] = self.pipeline_config[key]
         os.makedirs(self.pipeline_dir, exist_ok=True)
         with open(self.pipeline_json_path, "w") as f:
             f.write(json.dumps(pipeline_template, sort_keys=False,
@@ -440,6 +483,23 @@ class Pipeline:
         else:
             self.log.error("Pipeline instance not found")
 
+    @classmethod
+    def forget(cls,
+               instance_id)->None:
+        """Drop the book entry of an instance evicted by the pipeline server,
+        stopping its publishers, ingestor and subscriber if still running.
+
+        Args:
+            instance_id (str): id of the evicted pipeline instance
+        """
+        inst_book = cls._INSTANCES.pop(instance_id, None)
+        if not inst_book:
+            return
+        try:
+            inst_book["obj"].stop()
+        except Exception as e:
+            get_logger(__name__).exception("Failed to stop evicted pipeline instance {}: {}".format(instance_id, e))
+
 
 class PipelineServerManager:
     """Manager class for Pipeline Server."""
@@ -527,6 +587,9 @@ class PipelineServerManager:
         except Exception as e:
             self.log.exception("Pipeline Server failed to start. {}".format(e))
             raise
+        if self.pserv.pipeline_manager:
+            # keep the book of instances in sync with the pipeline server retention
+            self.pserv.pipeline_manager.pipeline_instances.add_evict_listener(Pipeline.forget)
 
         # start pipelines with autostart enabled
         for ver, pipeline in self._PIPELINES.items():
@@ -547,9 +610,12 @@ class PipelineServerManager:
         Returns:
             Tuple: A tuple of pipeline instance and its parameter dict
         """
-        for p in self._PIPELINES.values():
-            inst_book = p._INSTANCES[instance_id]
-            return inst_book["obj"], inst_book["params"]
+        # instances of all pipelines are booked in the shared Pipeline._INSTANCES,
+        # use get() to not add empty entries to the defaultdict on lookup
+        inst_book = Pipeline._INSTANCES.get(instance_id)
+        if not inst_book:
+            raise KeyError(instance_id)
+        return inst_book["obj"], inst_book["params"]
 
     def get_loaded_pipelines(self)->List[Dict[str,Any]]:
         """GET /pipelines"""
@@ -560,22 +626,27 @@ class PipelineServerManager:
         """GET /pipelines/{instance_id}"""
         psummary = self.pserv.pipeline_manager.get_instance_summary(instance_id)
         try:
+            if psummary is None:
+                raise KeyError(instance_id)
             _, pparams = self._get_pinstance_data(instance_id)
             psummary["params"] = pparams
-            pserv_p_instances = self.get_all_instance_status()
-            for pserv_p_instance in pserv_p_instances:
-                if pserv_p_instance.get("id") == psummary.get("id"):
-                    psummary["state"] = pserv_p_instance['state'].name
-                    break
+            pserv_p_instance = self.get_instance_status(instance_id)
+            if pserv_p_instance:
+                psummary["state"] = pserv_p_instance['state'].name
             return psummary, None
         except KeyError:
             errmsg= "Pipeline instance not found"
             self.log.error(errmsg)
             return None, errmsg
 
-    def get_all_instance_status(self)-> List[Dict]:
+    def get_all_instance_status(self,
+                                state: Optional[PipelineServer_Pipeline.State]=None,
+                                offset: int=0,
+                                limit: Optional[int]=None)-> List[Dict]:
         """GET /pipelines/status"""
-        return self.pserv.pipeline_manager.get_all_instance_status()
+        return self.pserv.pipeline_manager.get_all_instance_status(state=state,
+                                                                   offset=offset,
+                                                                   limit=limit)
 
     def get_instance_status(self, instance_id: str) -> List[Dict]:
         """GET /pipelines/{instance_id}/status"""
@@ -86,8 +86,8 @@ class OpenTelemetryExporter:
 
     def get_container_stats(self):
         """Get CPU and memory usage stats of the current process."""
-        # Get CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # Get CPU usage since the previous call, without blocking
+        cpu_percent = psutil.cpu_percent(interval=None)
 
         # Get memory usage
         memory_usage = psutil.Process(os.getpid()).memory_info().rss  # Memory in bytes
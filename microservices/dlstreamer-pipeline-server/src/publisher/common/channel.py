@@ -0,0 +1,136 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+""" Bounded channel handing frames/metadata to publisher threads.
+"""
+import queue
+import threading as th
+import time
+from collections import deque
+
+from src.common import metrics
+from src.common.log import get_logger
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+QUEUE_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class BoundedChannel():
+    """Bounded FIFO with blocking get(), waking consumers as soon as data arrives.
+
+    When full, append() applies the drop policy:
+        drop_oldest - discard the oldest queued item (default, behaves like deque(maxlen))
+        drop_newest - discard the item being appended
+        block - wait for space up to timeout seconds (forever if None), then drop the new item
+    Dropped items are passed to on_drop, e.g. to release frame references.
+    """
+
+    def __init__(self, maxsize, policy=DROP_OLDEST, timeout=None, on_drop=None, name=None):
+        """Constructor
+
+        :param int maxsize: Max number of queued items
+        :param str policy: Policy when full, one of QUEUE_POLICIES
+        :param float timeout: Max time in seconds append() blocks with the block policy
+        :param on_drop: Callable invoked with each dropped item
+        :param str name: Name used in logs
+        """
+        if maxsize <= 0:
+            raise ValueError("Invalid queue size: {}".format(maxsize))
+        if policy not in QUEUE_POLICIES:
+            raise ValueError("Invalid queue policy: {}. Supported policies: {}".format(
+                policy, ", ".join(QUEUE_POLICIES)))
+        if timeout is not None and timeout < 0:
+            raise ValueError("Invalid queue timeout: {}".format(timeout))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.timeout = timeout
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.name = name or "publisher"
+        self.log = get_logger(f'{__name__} ({name})' if name else __name__)
+        self._items = deque()
+        self._closed = False
+        self._lock = th.Lock()
+        self._not_empty = th.Condition(self._lock)
+        self._not_full = th.Condition(self._lock)
+        self._metric_attributes = {"queue": self.name}
+        metrics.register_queue(self)
+
+    @classmethod
+    def from_config(cls, config, maxsize, on_drop=None, name=None):
+        """Create channel from publisher config keys queue_maxsize, queue_policy and queue_timeout
+
+        :param dict config: Publisher config
+        :param int maxsize: Queue size if not configured
+        """
+        return cls(config.get("queue_maxsize", maxsize),
+                   policy=config.get("queue_policy", DROP_OLDEST),
+                   timeout=config.get("queue_timeout", None),
+                   on_drop=on_drop, name=name)
+
+    def append(self, item):
+        """Queue an item, applying the drop policy if the channel is full
+
+        :return: False if the item was dropped
+        :rtype: bool
+        """
+        dropped = None
+        with self._lock:
+            if len(self._items) >= self.maxsize and self.policy == BLOCK:
+                if self.timeout is None:
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._not_full.wait()
+                else:
+                    deadline = time.monotonic() + self.timeout
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._not_full.wait(remaining)
+            if len(self._items) >= self.maxsize:
+                self.dropped += 1
+                if self.policy == DROP_OLDEST:
+                    dropped = self._items.popleft()
+                else:
+                    dropped = item
+            if dropped is not item:
+                self._items.append(item)
+                self._not_empty.notify()
+
+        if dropped is not None:
+            metrics.instruments().dropped.add(1, self._metric_attributes)
+            self.log.debug("Queue full, dropped {} item. Total dropped: {}".format(
+                "oldest" if dropped is not item else "new", self.dropped))
+            if self.on_drop:
+                self.on_drop(dropped)
+        return dropped is not item
+
+    def get(self, timeout=None):
+        """Remove and return the oldest item, waiting for one up to timeout seconds
+
+        :raises queue.Empty: No item became available or the channel was closed
+        """
+        with self._not_empty:
+            if not self._items and not self._closed:
+                self._not_empty.wait_for(lambda: self._items or self._closed, timeout)
+            if not self._items:
+                raise queue.Empty
+            item = self._items.popleft()
+            self._not_full.notify()
+            return item
+
+    def close(self):
+        """Wake up all waiting producers and consumers
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def __len__(self):
+        return len(self._items)
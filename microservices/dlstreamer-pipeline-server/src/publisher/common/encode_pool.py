@@ -0,0 +1,138 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+""" Shared worker pool for frame encoding.
+"""
+import os
+import threading as th
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.common.log import get_logger
+
+# Threads are sufficient, cv2 color conversion and imencode release the GIL
+DEFAULT_ENCODE_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = th.Lock()
+
+
+class EncodePool():
+    """Bounded thread pool running frame encodes for all pipelines
+    """
+
+    def __init__(self, workers=DEFAULT_ENCODE_WORKERS, name="publisher-encode"):
+        """Constructor
+
+        :param int workers: Number of encode worker threads
+        :param str name: Name prefix of the worker threads
+        """
+        if workers <= 0:
+            raise ValueError("Invalid number of encode workers: {}".format(workers))
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix=name)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs) on the pool
+
+        :return: Future of the call
+        :rtype: concurrent.futures.Future
+        """
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def get_encode_pool():
+    """Get the process wide encode pool, created on first use.
+    Number of workers is read from PUBLISHER_ENCODE_WORKERS.
+
+    :return: Shared encode pool
+    :rtype: EncodePool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = DEFAULT_ENCODE_WORKERS
+            env_workers = os.getenv("PUBLISHER_ENCODE_WORKERS")
+            if env_workers:
+                try:
+                    workers = int(env_workers)
+                except ValueError:
+                    get_logger(__name__).error(
+                        "Invalid PUBLISHER_ENCODE_WORKERS: {}, using {}".format(
+                            env_workers, workers))
+            _pool = EncodePool(workers)
+        return _pool
+
+
+class OrderedEncoder():
+    """Window of in-flight encodes of one pipeline.
+
+    Work is submitted to the shared pool and handed back in submission order,
+    so the frame sequence seen by publishers stays monotonic regardless of
+    which worker finishes first. Items that need no encoding are queued too,
+    to keep their position in the sequence.
+    """
+
+    def __init__(self, pool=None, max_inflight=None):
+        """Constructor
+
+        :param EncodePool pool: Pool to run encodes on, shared pool by default
+        :param int max_inflight: Max queued items before completed() blocks on the
+            oldest one. Defaults to twice the pool workers.
+        """
+        self.pool = pool if pool is not None else get_encode_pool()
+        self.max_inflight = max_inflight or 2 * self.pool.workers
+        self._pending = deque()
+
+    def submit(self, context, fn, *args, **kwargs):
+        """Encode in the pool
+
+        :param context: Caller data returned along with the encode future
+        """
+        self._pending.append((self.pool.submit(fn, *args, **kwargs), context, []))
+
+    def append(self, context):
+        """Queue an item which needs no encoding
+        """
+        self._pending.append((None, context, []))
+
+    def attach(self, fn, *args, **kwargs):
+        """Run an additional encode in the pool for the most recently queued item.
+        The item is held back until it completes too.
+
+        :return: Future of the encode
+        :rtype: concurrent.futures.Future
+        """
+        future = self.pool.submit(fn, *args, **kwargs)
+        self._pending[-1][2].append(future)
+        return future
+
+    def completed(self, wait=False):
+        """Pop items in submission order, as long as the oldest one is done.
+        Blocks on the oldest item while the window is over max_inflight, or
+        until everything completed if wait is set.
+
+        :param bool wait: Wait for all queued items
+        :return: Generator of (future or None, context)
+        """
+        while self._pending:
+            future, context, attached = self._pending[0]
+            futures = attached if future is None else [future] + attached
+            if (not all(f.done() for f in futures) and
+                    not wait and len(self._pending) <= self.max_inflight):
+                return
+            for f in futures:
+                # result() is left to the caller, wait here to keep the order
+                f.exception()
+            self._pending.popleft()
+            yield future, context
+
+    def __len__(self):
+        return len(self._pending)
@@ -6,14 +6,33 @@
 
 """ Filter frames/metadata to be published.
 """
+import heapq
+import numbers
+import time
+
 from src.common.log import get_logger
 
+# label_score and rate_limit_ms key applying to labels not listed
+ANY_LABEL = "*"
+
+
 class Filter():
     """Filter
+
+    Config is parsed once, into per label thresholds and publish intervals.
+    Detections smaller than min_area, and beyond the top_k highest scores of
+    their label, are ignored. Frames pass if all remaining detections (or
+    classes) meet their label threshold, and at least one of their labels was
+    not published within its rate limit.
     """
 
-    def __init__(self, filter):
+    def __init__(self, filter, clock=time.monotonic):
         """Constructor
+
+        :param dict filter: Filter config
+        :param clock: Time source of the rate limit
+        :raises KeyError: Filter type missing
+        :raises ValueError: Invalid filter config
         """
 
         self.log = get_logger(f'{__name__})')
@@ -24,57 +43,154 @@ class Filter():
         except:
             raise KeyError("Type for filter not specified")
 
-    def _check_detection_filter(self, meta_data):
-        """Check detection filter criteria
+        if not isinstance(self.labels, dict):
+            raise ValueError("Filter label_score must be a dict of label thresholds")
+        for threshold in self.labels.values():
+            if not _is_number(threshold):
+                raise ValueError("Filter label_score thresholds must be numbers")
+        self.min_area = filter.get('min_area', 0)
+        self.top_k = filter.get('top_k', None)
+        rate_limit = filter.get('rate_limit_ms', None)
+        if not _is_number(self.min_area) or self.min_area < 0:
+            raise ValueError("Filter min_area must be a non-negative number")
+        if self.top_k is not None and (not isinstance(self.top_k, int) or
+                                       isinstance(self.top_k, bool) or self.top_k < 1):
+            raise ValueError("Filter top_k must be a positive integer")
+
+        self._default_threshold = self.labels.get(ANY_LABEL, None)
+        # seconds between publishes by label
+        if rate_limit is None:
+            rate_limit = {}
+        elif not isinstance(rate_limit, dict):
+            rate_limit = {ANY_LABEL: rate_limit}
+        for interval in rate_limit.values():
+            if not _is_number(interval) or interval < 0:
+                raise ValueError("Filter rate_limit_ms must be non-negative numbers")
+        self._intervals = {label: interval / 1000 for label, interval in rate_limit.items()}
+        self._default_interval = self._intervals.pop(ANY_LABEL, None)
+        self._rate_limited = bool(rate_limit)
+        self._last_published = {}
+        self._clock = clock
+
+        self._check = {
+            "detection": self._check_detection_filter,
+            "classification": self._check_classification_filter
+        }.get(self.type, None)
+
+    def _threshold(self, label):
+        return self.labels.get(label, self._default_threshold)
+
+    def _get_detections(self, meta_data):
+        """Get detections from metadata
         :param meta_data: Meta data
         :type: Dict
-        :return: True if filter criteria met, False if not.
-        :rtype: Bool
+        :return: List of (label, score, box area or None), None if metadata has no detection results
+        :rtype: List
         """
-        #When metadata has detections results e.g 
+        #When metadata has detections results e.g
         # ...'annotations': {'objects': [{'label': 'Person', 'score': 0.6827021241188049,
         # 'bbox': [873, 484, 1045, 702], 'attributes': {'rotation': 0, 'occluded': 0}}],...
-        # ...'annotations': [{'labels_to_revisit': None,'shape': {'type': 'RECTANGLE', 'x': 196, 'height': 328, 'y': 567, 'width': 272}, 
+        # ...'annotations': [{'labels_to_revisit': None,'shape': {'type': 'RECTANGLE', 'x': 196, 'height': 328, 'y': 567, 'width': 272},
         # 'id': None 'labels': [{'id': None, 'probability': 0.527821958065033, 'source': None, 'color': '#25a18eff', 'name': 'Person'}], 'modified': None}...
-        #if any of the detected objects in the current frame doesn't meet min threshold, skip
-        #if there are no detections, skip       
         try:
             if 'objects' in meta_data.get('annotations', {}):
-                detections = meta_data['annotations']['objects']
-                for detection in detections:
-                    threshold = self.labels[detection['label']]
-                    if detection['score'] < threshold:
-                        return False
-            elif 'annotations' in meta_data.get('predictions', {}):
-                detections = meta_data['predictions']['annotations']
-                for detection in detections:
-                    threshold = self.labels[detection['labels'][0]['name']]
-                    if detection['labels'][0]['probability'] < threshold:
-                        return False
-            else:
-                return False
-        except:
+                detections = []
+                for detection in meta_data['annotations']['objects']:
+                    area = None
+                    if self.min_area:
+                        x1, y1, x2, y2 = detection['bbox']
+                        area = (x2 - x1) * (y2 - y1)
+                    detections.append((detection['label'], detection['score'], area))
+                return detections
+            if 'annotations' in meta_data.get('predictions', {}):
+                detections = []
+                for detection in meta_data['predictions']['annotations']:
+                    area = None
+                    shape = detection.get('shape')
+                    if self.min_area and shape:
+                        area = shape['width'] * shape['height']
+                    label = detection['labels'][0]
+                    detections.append((label['name'], label['probability'], area))
+                return detections
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            self.log.debug("Invalid detection metadata: {}".format(e))
+        return None
+
+    def _check_detection_filter(self, meta_data, labels=None):
+        """Check detection filter criteria
+        :param meta_data: Meta data
+        :type: Dict
+        :param labels: If set, labels of the considered detections are appended
+        :type: List
+        :return: True if filter criteria met, False if not.
+        :rtype: Bool
+        """
+        #if any of the considered detections in the current frame doesn't meet min threshold, skip
+        #if there are no detection results, or all detections are ignored, skip
+        detections = self._get_detections(meta_data)
+        if detections is None:
             return False
+        if detections and self.min_area:
+            detections = [d for d in detections if d[2] is None or d[2] >= self.min_area]
+            if not detections:
+                return False
+        if self.top_k is not None:
+            by_label = {}
+            for detection in detections:
+                by_label.setdefault(detection[0], []).append(detection)
+            detections = [d for label_detections in by_label.values()
+                          for d in heapq.nlargest(self.top_k, label_detections, key=lambda d: d[1])]
 
+        for label, score, _ in detections:
+            threshold = self._threshold(label)
+            if threshold is None or not _is_number(score) or score < threshold:
+                return False
+        if labels is not None:
+            labels.extend(label for label, _, _ in detections)
         return True
 
-    def _check_classification_filter(self, meta_data):
+    def _check_classification_filter(self, meta_data, labels=None):
         """Check classification filter criteria
         :param meta_data: Meta data
         :type: Dict
+        :param labels: If set, classes of the frame are appended
+        :type: List
         :return: True if filter criteria met, False if not.
         :rtype: Bool
         """
-        try:
-            for label in meta_data['classes']:
-                if not self.labels.get(label, None):
-                    continue
-                if meta_data[label] < self.labels.get(label):
-                    return False
-            return True
-
-        except KeyError:
+        classes = meta_data.get('classes', None)
+        if classes is None:
             return False
+        for label in classes:
+            threshold = self._threshold(label)
+            if not threshold:
+                continue
+            score = meta_data.get(label, None)
+            if not _is_number(score) or score < threshold:
+                return False
+        if labels is not None:
+            labels.extend(classes)
+        return True
+
+    def _check_rate_limit(self, labels):
+        """Check whether any label is due for publishing, and mark due labels as published
+        :param labels: Labels of the frame
+        :type: List
+        :return: True if a label is due or the frame has no labels
+        :rtype: Bool
+        """
+        if not labels:
+            return True
+        now = self._clock()
+        due = []
+        for label in set(labels):
+            interval = self._intervals.get(label, self._default_interval)
+            last = self._last_published.get(label, None)
+            if interval is None or last is None or now - last >= interval:
+                due.append(label)
+        for label in due:
+            self._last_published[label] = now
+        return bool(due)
 
     def check_filter_criteria(self, meta_data):
         """Check filter criteria
@@ -89,13 +205,18 @@ class Filter():
         #         "person": 0.5,
         #         "vehicle": 0.6
         #     },...
-        
-        filter = False
+        if self._check is None:
+            return False
+
+        if not self._rate_limited:
+            return self._check(meta_data)
+
+        labels = []
+        if not self._check(meta_data, labels):
+            return False
+        return self._check_rate_limit(labels)
 
-        if self.type == "detection":
-            filter = self._check_detection_filter(meta_data)
-        
-        if self.type == "classification":
-            filter = self._check_classification_filter(meta_data)
 
-        return filter
\ No newline at end of file
+def _is_number(value):
+    # numbers.Real includes numpy scalars, e.g. np.float32 scores
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
@@ -0,0 +1,160 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+""" Reference counted handle to a mapped frame buffer.
+"""
+import io
+import threading as th
+from contextlib import ExitStack
+
+import numpy as np
+
+
+class FrameHandle():
+    """Read-only, zero-copy view over a mapped frame buffer (e.g. of a Gst.Sample).
+
+    The owner of the buffer is kept alive and the buffer stays mapped until
+    the last consumer calls release(). Consumers must not hold on to the
+    memoryview (or numpy arrays created from it) after releasing their reference.
+    """
+
+    def __init__(self, mapping, owner=None, pts=None):
+        """Constructor
+
+        :param mapping: Context manager mapping the buffer and yielding its data,
+            e.g. gstgva.util.gst_buffer_data. It is exited on the last release.
+        :param owner: Object owning the buffer (e.g. Gst.Sample), kept alive while mapped
+        :param int pts: Presentation timestamp of the frame
+        """
+        self._owner = owner
+        self._lock = th.Lock()
+        self._refcount = 1
+        self._stack = ExitStack()
+        data = self._stack.enter_context(mapping)
+        self._view = memoryview(data).cast('B').toreadonly()
+        self.pts = pts
+
+    @property
+    def data(self):
+        """Read-only memoryview of the frame bytes
+        """
+        return self._view
+
+    def as_array(self):
+        """Read-only uint8 numpy view of the frame bytes
+        """
+        return np.frombuffer(self._view, dtype=np.uint8)
+
+    def tobytes(self):
+        """Copy of the frame bytes. Only for consumers that need to own the data.
+        """
+        return self._view.tobytes()
+
+    @property
+    def released(self):
+        return self._view is None
+
+    def acquire(self):
+        """Add a reference for an additional consumer.
+        """
+        with self._lock:
+            if self._view is None:
+                raise ValueError("Frame already released")
+            self._refcount += 1
+        return self
+
+    def release(self):
+        """Drop a reference. The buffer is unmapped when the last one is dropped.
+        """
+        with self._lock:
+            if self._view is None:
+                return
+            self._refcount -= 1
+            if self._refcount > 0:
+                return
+            self._unmap()
+
+    def _unmap(self):
+        self._view = None
+        self._stack.close()
+        self._owner = None
+
+    def __len__(self):
+        return 0 if self._view is None else self._view.nbytes
+
+    def __del__(self):
+        # Safety net for references dropped without release(), e.g. frames
+        # discarded by a full publisher queue.
+        if getattr(self, '_view', None) is not None:
+            self._unmap()
+
+
+def frame_data(frame):
+    """Get a bytes-like object for the frame handed to a publisher
+
+    :param frame: Frame handle or bytes-like frame
+    :return: Bytes-like object (memoryview for frame handles)
+    """
+    if isinstance(frame, FrameHandle):
+        return frame.data
+    return frame
+
+
+def release_frame(frame):
+    """Release a publisher's reference to the frame, if it is a frame handle
+
+    :param frame: Frame handle or bytes-like frame
+    """
+    if isinstance(frame, FrameHandle):
+        frame.release()
+
+
+def acquire_frame(frame):
+    """Take a reference to the frame on behalf of a publisher, if it is a frame handle
+
+    :param frame: Frame handle or bytes-like frame
+    :return: The same frame
+    """
+    if isinstance(frame, FrameHandle):
+        frame.acquire()
+    return frame
+
+
+class FrameReader(io.RawIOBase):
+    """Seekable file-like reader over a bytes-like frame, without copying it.
+    Used where clients only accept bytes or file objects (e.g. boto3).
+    """
+
+    def __init__(self, frame):
+        super().__init__()
+        self._view = memoryview(frame_data(frame)).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), self._view.nbytes - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self._view.nbytes + offset
+        else:
+            raise ValueError("Invalid whence ({})".format(whence))
+        return self._pos
+
+    def tell(self):
+        return self._pos
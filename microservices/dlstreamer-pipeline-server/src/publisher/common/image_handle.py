@@ -0,0 +1,79 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+""" Deterministic image handles of published frames.
+"""
+import hashlib
+import string
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+SCHEME_RANDOM = "random"
+SCHEME_CONTENT = "content"
+TEMPLATE_FIELDS = ("instance_id", "pts", "seq", "hash")
+
+
+class ImageHandleTemplate():
+    """Builds the img_handle of a frame from a template with the fields
+    {instance_id}, {pts} (presentation timestamp of the frame), {seq} (frame_id)
+    and {hash} (hash of the published frame bytes), e.g. "{instance_id}-{pts}-{seq}".
+    """
+
+    def __init__(self, template):
+        """Constructor
+
+        :param str template: Handle template
+        :raises ValueError: Invalid template
+        """
+        if not isinstance(template, str) or not template:
+            raise ValueError("Invalid img_handle_scheme: {}".format(template))
+        try:
+            fields = {field for _, field, _, _ in string.Formatter().parse(template)
+                      if field is not None}
+            template.format(**{field: 0 for field in TEMPLATE_FIELDS})
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError("Invalid img_handle_scheme {}: {}".format(template, e))
+        if not fields:
+            raise ValueError("img_handle_scheme {} has no fields".format(template))
+        self.template = template
+        self.hashed = "hash" in fields
+
+    @classmethod
+    def from_scheme(cls, scheme):
+        """Create template for an img_handle_scheme config
+
+        :param str scheme: "random", "content" (equivalent to "{hash}") or a template
+        :return: Template, None for random handles
+        :raises ValueError: Invalid scheme
+        """
+        if scheme is None or scheme == SCHEME_RANDOM:
+            return None
+        if scheme == SCHEME_CONTENT:
+            return cls("{hash}")
+        return cls(scheme)
+
+    def format(self, frame=None, instance_id=None, pts=None, seq=None):
+        """Get the handle of a frame
+
+        :param frame: Published frame, only read if the template has a hash
+        :type: bytes-like
+        :param str instance_id: Pipeline instance id
+        :param int pts: Presentation timestamp of the frame
+        :param int seq: Sequence number of the frame in the run
+        :rtype: str
+        """
+        content_hash = _hash(frame if frame is not None else b"") if self.hashed else ""
+        return self.template.format(instance_id=instance_id, pts=pts, seq=seq,
+                                    hash=content_hash)
+
+
+def _hash(data):
+    if xxhash is not None:
+        return xxhash.xxh64(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
@@ -0,0 +1,149 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+""" Per publisher sampling, downscaling and JPEG quality of published frames.
+"""
+
+
+class OutputProfile():
+    """Frames a publisher receives and how they are encoded.
+
+    The publisher receives one frame out of every frame_skip + 1. Raw frames
+    are downscaled to fit max_dimension and JPEG encoded with jpeg_quality,
+    if either is set. Profiles with equal settings compare equal, so frames
+    are encoded once per distinct profile.
+    """
+
+    CONFIG_KEYS = ("frame_skip", "max_dimension", "jpeg_quality")
+
+    def __init__(self, frame_skip=0, max_dimension=None, jpeg_quality=None):
+        """Constructor
+
+        :param int frame_skip: Frames skipped after each published frame
+        :param int max_dimension: Max width and height of published frames, not resized if None
+        :param int jpeg_quality: JPEG quality of published frames, pipeline encoding level if None
+        :raises ValueError: Invalid settings
+        """
+        if not _is_int(frame_skip) or frame_skip < 0:
+            raise ValueError("frame_skip must be a non-negative integer")
+        if max_dimension is not None and (not _is_int(max_dimension) or max_dimension < 1):
+            raise ValueError("max_dimension must be a positive integer")
+        if jpeg_quality is not None and (not _is_int(jpeg_quality) or not 0 <= jpeg_quality <= 100):
+            raise ValueError("jpeg_quality must be an integer in [0, 100]")
+        self.frame_skip = frame_skip
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+
+    @classmethod
+    def from_config(cls, config):
+        """Create profile from the output_profile key of a publisher config
+
+        :return: Profile, None if config is None
+        :raises ValueError: Invalid config
+        """
+        if config is None:
+            return None
+        if not isinstance(config, dict):
+            raise ValueError("output_profile must be an object")
+        unknown = set(config) - set(cls.CONFIG_KEYS)
+        if unknown:
+            raise ValueError("Unknown output_profile keys: {}".format(", ".join(sorted(unknown))))
+        return cls(**config)
+
+    @property
+    def key(self):
+        return (self.frame_skip, self.max_dimension, self.jpeg_quality)
+
+    @property
+    def encodes(self):
+        """Whether frames are encoded for the profile instead of shared with the full stream
+        """
+        return self.max_dimension is not None or self.jpeg_quality is not None
+
+    def selects(self, index):
+        """Whether the frame at index is published
+        """
+        return index % (self.frame_skip + 1) == 0
+
+    def __eq__(self, other):
+        return isinstance(other, OutputProfile) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return "OutputProfile(frame_skip={}, max_dimension={}, jpeg_quality={})".format(*self.key)
+
+
+class OutputStage():
+    """Output profiles of the publishers of a pipeline.
+
+    Selects the profiles each frame is published with, so a frame is encoded
+    once per distinct profile and fanned out to all publishers sharing it.
+    Publishers without a profile receive every frame of the full stream.
+    """
+
+    def __init__(self):
+        self._profiles = {}
+        self._frames = {}
+        self._index = 0
+
+    def add(self, publisher, profile=None, publish_frame=True):
+        """Register a publisher
+
+        :param publisher: Publisher
+        :param OutputProfile profile: Profile of the publisher, full stream if None
+        :param bool publish_frame: Whether the publisher sends frames, or only metadata
+        """
+        self._profiles[publisher] = profile
+        self._frames[publisher] = publish_frame
+
+    def profile(self, publisher):
+        return self._profiles.get(publisher)
+
+    @property
+    def profiled(self):
+        """Whether any publisher has a profile
+        """
+        return any(profile is not None for profile in self._profiles.values())
+
+    @property
+    def needs_full_frame(self):
+        """Whether a publisher sends frames of the full stream
+        """
+        if not self.profiled:
+            return True
+        return any(publish_frame and (profile is None or not profile.encodes)
+                   for profile, publish_frame in self._members())
+
+    def select(self):
+        """Advance to the next frame and get the profiles it is published with
+
+        :return: Distinct profiles selecting the frame
+        :rtype: List[OutputProfile]
+        """
+        index = self._index
+        self._index += 1
+        selected = []
+        for profile in self._profiles.values():
+            if profile is not None and profile.selects(index) and profile not in selected:
+                selected.append(profile)
+        return selected
+
+    def needs_encode(self, profile):
+        """Whether frames must be encoded for a profile, i.e. it encodes and
+        a publisher with the profile sends frames
+        """
+        return profile.encodes and any(publish_frame and member == profile
+                                       for member, publish_frame in self._members())
+
+    def _members(self):
+        return [(profile, self._frames[publisher])
+                for publisher, profile in self._profiles.items()]
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
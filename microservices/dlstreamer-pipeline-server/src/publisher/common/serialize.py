@@ -0,0 +1,64 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+""" JSON serialization of published metadata.
+
+Publishers select the wire format with their json_format config:
+
+- "standard" (default): output of the json module, unchanged from earlier
+  releases whether or not orjson is installed.
+- "compact": orjson output, several times faster on large metadata (e.g.
+  DCaaS results of crowded frames). It has no whitespace between tokens,
+  writes non-ASCII characters as UTF-8 and NaN/Infinity as null, and only
+  accepts str dict keys. Requires orjson.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_FORMAT_STANDARD = "standard"
+JSON_FORMAT_COMPACT = "compact"
+JSON_FORMATS = (JSON_FORMAT_STANDARD, JSON_FORMAT_COMPACT)
+
+
+def check_format(json_format):
+    """Validate a json_format config
+
+    :param str json_format: "standard" or "compact"
+    :return: json_format
+    :raises ValueError: Unknown format, or compact without orjson installed
+    """
+    if json_format not in JSON_FORMATS:
+        raise ValueError(f'Invalid json_format: {json_format}')
+    if json_format == JSON_FORMAT_COMPACT and orjson is None:
+        raise ValueError('json_format compact requires orjson')
+    return json_format
+
+
+def dumps(obj, json_format=JSON_FORMAT_STANDARD):
+    """Serialize obj to JSON
+
+    :param obj: JSON serializable object, may contain numpy arrays and scalars in compact format
+    :param str json_format: Checked format, see check_format
+    :return: UTF-8 encoded JSON
+    :rtype: bytes
+    """
+    if json_format == JSON_FORMAT_COMPACT:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj).encode('utf-8')
+
+
+def dumps_str(obj, json_format=JSON_FORMAT_STANDARD):
+    """Serialize obj to a JSON string, for clients which only take strings
+
+    :rtype: str
+    """
+    if json_format == JSON_FORMAT_COMPACT:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(obj)
@@ -4,32 +4,43 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 
-"""Publisher to return pipeline outputs to a queue.
+"""Publisher to return pipeline outputs to the requests waiting for them.
 """
 
 import os
 import queue
-import time
-from collections import deque
 import threading as th
+from concurrent.futures import Future
 from distutils.util import strtobool
 
 import numpy as np
 
 from src.common.log import get_logger
+from src.publisher.common.channel import BoundedChannel
+from src.publisher.common.frame import release_frame
 
 DEFAULT_RESP_QUEUE_SIZE = 1    # if an old item is not picked, it is discarded as soon as new one comes synchronous
+REQUEST_ID_KEY = "request_id"  # metadata key correlating pipeline outputs with requests
 
 class ImagePublisher():
     """Image Publisher.
+
+    Resolves the future of each pending request with the frame/metadata whose
+    request_id metadata matches it, so several requests can be in flight.
     """
 
     def __init__(self, qsize=DEFAULT_RESP_QUEUE_SIZE):
         """Constructor
+
+        :param int qsize: Max number of pipeline outputs queued, should be at
+            least the max number of requests in flight. Only outputs of pending
+            requests are queued.
         """
-        self.queue = deque(maxlen=qsize)
-        self.response_queue = queue.Queue(maxsize=1)  # hold item from input request
+        self.queue = _ResponseChannel(qsize, self._is_pending)
+        self._pending = {}  # request id -> Future of (frame, metadata)
+        self._pending_lock = th.Lock()
         self.stop_ev = th.Event()
+        self.th = None
         # self.topic = pub_topic
 
         self.log = get_logger(f'{__name__}')
@@ -45,11 +56,17 @@ class ImagePublisher():
     def stop(self):
         """Stop publisher.
         """
-        if self.stop_ev.set():
+        if self.stop_ev.is_set():
             return
         self.stop_ev.set()
-        self.th.join()
+        self.queue.close()
+        if self.th is not None:
+            self.th.join()
         self.th = None
+        with self._pending_lock:
+            request_ids = list(self._pending)
+        for request_id in request_ids:
+            self.fail(request_id, "Publisher stopped")
         self.log.info('ImagePublisher thread stopped')
 
     def error_handler(self, msg):
@@ -63,29 +80,89 @@ class ImagePublisher():
         try:
             while not self.stop_ev.is_set():
                 try:
-                    frame, meta_data = self.queue.popleft()
-                    self.log.info('Received data from gst queue')
-                    self._publish(frame, meta_data)
-                except IndexError:
-                    self.log.debug("No data in request publisher queue")
-                    time.sleep(0.005)
-                    
+                    frame, meta_data = self.queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                self.log.info('Received data from gst queue')
+                self._publish(frame, meta_data)
+
         except Exception as e:
             self.error_handler(e)
 
+    def register(self, request_id):
+        """Register a request waiting for its pipeline output
+
+        :param str request_id: Id attached to the request metadata
+        :return: Future resolved with (frame, metadata) of the request. The
+            frame reference is handed over to the caller, which must release it.
+        :rtype: concurrent.futures.Future
+        """
+        future = Future()
+        with self._pending_lock:
+            if request_id in self._pending:
+                raise ValueError("Duplicate request id: {}".format(request_id))
+            self._pending[request_id] = future
+        return future
+
+    def discard(self, request_id, future):
+        """Stop waiting for a request, e.g. on timeout. Its output is released
+        whenever it arrives.
+
+        :param str request_id: Id of the request
+        :param future: Future returned by register()
+        """
+        with self._pending_lock:
+            self._pending.pop(request_id, None)
+        if not future.cancel():
+            # output already being handed over
+            future.add_done_callback(_release_response)
+
+    def fail(self, request_id, error):
+        """Fail a request which could not be handed to the pipeline
+
+        :param str request_id: Id of the request
+        :param error: Error message or exception
+        """
+        with self._pending_lock:
+            future = self._pending.pop(request_id, None)
+        if future is not None:
+            future.set_exception(error if isinstance(error, Exception)
+                                 else RuntimeError(str(error)))
+
+    def _is_pending(self, meta_data):
+        """Check whether a request is waiting for the pipeline output
+
+        :param dict meta_data: Meta data of the pipeline output
+        """
+        with self._pending_lock:
+            return meta_data.get(REQUEST_ID_KEY, None) in self._pending
+
+    @property
+    def pending(self):
+        """Number of requests waiting for their output"""
+        with self._pending_lock:
+            return len(self._pending)
+
     def _publish(self, frame, meta_data):
-        """Publish frame/metadata
+        """Publish frame/metadata to the request it belongs to
 
-        :param frame: video frame
-        :type: bytes
+        :param frame: video frame. Its reference is handed over to the
+            request future, which must release it.
+        :type: FrameHandle or bytes
         :param meta_data: Meta data
         :type: Dict
         """
-        # meta_data['topic'] = self.topic
-        msg = meta_data
+        request_id = meta_data.get(REQUEST_ID_KEY, None)
+        with self._pending_lock:
+            future = self._pending.pop(request_id, None)
+        if future is None or not future.set_running_or_notify_cancel():
+            # async request, or request which timed out
+            self.log.debug('No pending request {}, dropping its output'.format(request_id))
+            release_frame(frame)
+            return
 
-        self.response_queue.put((frame, msg))
-        self.log.info('Message Sent {} to ImagePublisher: {}'.format(meta_data))
+        future.set_result((frame, meta_data))
+        self.log.debug('Response of request {} sent'.format(request_id))
 
 
     def close(self):
@@ -94,3 +171,27 @@ class ImagePublisher():
         pass
         # with self.queue.mutex:
         #     self.queue.clear()
+
+
+class _ResponseChannel(BoundedChannel):
+    """Channel queuing only outputs some request is waiting for. Outputs of
+    async requests are released before they are queued, so that they cannot
+    evict the output of a pending request from the channel.
+    """
+
+    def __init__(self, maxsize, is_pending):
+        super().__init__(maxsize, on_drop=lambda item: release_frame(item[0]),
+                         name='ImagePublisher')
+        self._is_pending = is_pending
+
+    def append(self, item):
+        frame, meta_data = item
+        if not self._is_pending(meta_data):
+            release_frame(frame)
+            return False
+        return super().append(item)
+
+
+def _release_response(future):
+    if not future.cancelled() and future.exception() is None:
+        release_frame(future.result()[0])
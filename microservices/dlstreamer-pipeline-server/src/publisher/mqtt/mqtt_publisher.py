@@ -9,19 +9,28 @@ Publishes data from a pipeline with gstreamer app destination.
 """
 
 # pylint: disable=wrong-import-position
-import json
 import os
 import base64
+import queue
+import struct
 import time
 import threading as th
-from collections import deque
 
 from src.common.log import get_logger
+from src.publisher.common.channel import BoundedChannel
 from src.publisher.common.filter import Filter
+from src.publisher.common.frame import frame_data, release_frame
+from src.publisher.common import serialize
 from utils.mqtt_client import MQTTClient
 
 
 DEFAULT_APPDEST_MQTT_QUEUE_SIZE = 1000
+DEFAULT_MAX_BATCH_DELAY_MS = 100
+
+PAYLOAD_FORMAT_JSON = "json"
+PAYLOAD_FORMAT_BINARY = "binary"
+# metadata length, frame length
+BINARY_RECORD_HEADER = struct.Struct("!II")
 
 
 class MQTTPublisher():
@@ -33,12 +42,14 @@ class MQTTPublisher():
         :param json app_cfg: Application config
             the meta-data for the frame (df: True)
         """
-        self.queue = deque(maxlen=qsize)
         self.stop_ev = th.Event()
         self.topic = config.get('topic', "dlstreamer_pipeline_results")
         assert len(self.topic) > 0, f'No specified topic'
 
         self.log = get_logger(f'{__name__} ({self.topic})')
+        self.queue = BoundedChannel.from_config(config, qsize,
+                                                on_drop=lambda item: release_frame(item[0]),
+                                                name=f'MQTT {self.topic}')
 
         self.log.info(f'Initializing publisher for topic {self.topic}')
         self.host = os.getenv("MQTT_HOST")
@@ -63,6 +74,18 @@ class MQTTPublisher():
 
         self.tls_config = config.get('tls', None)
 
+        self.max_batch_frames = config.get('max_batch_frames', 1)
+        self.max_batch_delay_ms = config.get('max_batch_delay_ms', DEFAULT_MAX_BATCH_DELAY_MS)
+        self.payload_format = config.get('payload_format', PAYLOAD_FORMAT_JSON)
+        self.json_format = serialize.check_format(
+            config.get('json_format', serialize.JSON_FORMAT_STANDARD))
+        if self.max_batch_frames < 1:
+            raise ValueError(f'Invalid max_batch_frames: {self.max_batch_frames}')
+        if self.max_batch_delay_ms < 0:
+            raise ValueError(f'Invalid max_batch_delay_ms: {self.max_batch_delay_ms}')
+        if self.payload_format not in (PAYLOAD_FORMAT_JSON, PAYLOAD_FORMAT_BINARY):
+            raise ValueError(f'Invalid payload_format: {self.payload_format}')
+
         self.client = MQTTClient(self.host, self.port, self.topic, self.qos, self.protocol, self.tls_config)
         self.initialized=True
         self.log.info("MQTT publisher initialized")
@@ -80,6 +103,7 @@ class MQTTPublisher():
         if self.stop_ev.set():
             return
         self.stop_ev.set()
+        self.queue.close()
         self.th.join()
         self.th = None
         self.log.info('MQTT publisher thread stopped')
@@ -92,23 +116,88 @@ class MQTTPublisher():
         """Run method for publisher.
         """
         self.log.info("MQTT Publish thread started")
+        batch = []
         try:
             while not self.stop_ev.is_set():
+                timeout = 0.5 if not batch else max(0, deadline - time.monotonic())
                 try:
-                    frame, meta_data = self.queue.popleft()
-                    self._publish(frame, meta_data)
-                except IndexError:
-                    self.log.debug("No data in client queue")
-                    time.sleep(0.005)
-                    
+                    frame, meta_data = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    if batch:
+                        self._flush(batch)
+                    continue
+
+                if self.max_batch_frames == 1:
+                    try:
+                        self._publish(frame, meta_data)
+                    finally:
+                        release_frame(frame)
+                    continue
+
+                if not batch:
+                    deadline = time.monotonic() + self.max_batch_delay_ms / 1000
+                batch.append((frame, meta_data))
+                if len(batch) >= self.max_batch_frames or time.monotonic() >= deadline:
+                    self._flush(batch)
+            if batch:
+                self._flush(batch)
         except Exception as e:
             self.error_handler(e)
-    
+        finally:
+            for frame, _ in batch:
+                release_frame(frame)
+
+    def _flush(self, batch):
+        """Publish the batch and release its frames
+
+        :param list batch: List of (frame, meta_data), emptied
+        """
+        try:
+            self._publish_batch(batch)
+        finally:
+            for frame, _ in batch:
+                release_frame(frame)
+            batch.clear()
+
+    def _filter(self, meta_data):
+        """Check the filter criteria, if any
+
+        :return: True if the message is to be published
+        :rtype: Bool
+        """
+        if self.filter and not self.filter.check_filter_criteria(meta_data):
+            self.log.debug("Filter criteria not met, skipping...")
+            return False
+        return True
+
+    def _json_message(self, frame, meta_data):
+        """Message with base64 encoded frame, serialized by the caller
+        """
+        msg = dict()
+        msg["metadata"]=meta_data
+        if self.publish_frame:
+            # Encode frame and convert to utf-8 string
+            msg["blob"]=base64.b64encode(frame_data(frame)).decode('utf-8')
+        else:
+            msg["blob"]=""
+        return msg
+
+    def _binary_record(self, frame, meta_data):
+        """Binary envelope of a frame: 4 bytes metadata length, 4 bytes frame length
+        (network byte order), metadata json and the encoded frame bytes.
+
+        :return: Parts of the record, to be joined by the caller
+        :rtype: list
+        """
+        meta = serialize.dumps(meta_data, self.json_format)
+        blob = frame_data(frame) if self.publish_frame else b""
+        return [BINARY_RECORD_HEADER.pack(len(meta), len(blob)), meta, blob]
+
     def _publish(self, frame, meta_data):
         """Publish frame/metadata to mqtt broker
 
         :param frame: video frame
-        :type: bytes
+        :type: FrameHandle or bytes
         :param meta_data: Meta data
         :type: Dict
         """
@@ -116,27 +205,42 @@ class MQTTPublisher():
             self.log.error(f"Client is not connected to MQTT broker. Message not published. {meta_data}")
             return
 
-        if self.filter:
-            if not self.filter.check_filter_criteria(meta_data):
-                self.log.info("Filter criteria not met, skipping...")
-                return
+        if not self._filter(meta_data):
+            return
 
-        
-        msg = dict()
-        msg["metadata"]=meta_data
-        if self.publish_frame:
-            # Encode frame and convert to utf-8 string
-            msg["blob"]=base64.b64encode(frame).decode('utf-8') 
-            self.log.info(
-                f"Publishing frames along with meta data: {meta_data}")
+        if self.payload_format == PAYLOAD_FORMAT_BINARY:
+            msg = b"".join(self._binary_record(frame, meta_data))
         else:
-            msg["blob"]=""
-            self.log.info(
-                f"Publishing meta data: {meta_data}")
-         
-        msg = json.dumps(msg)
+            msg = serialize.dumps(self._json_message(frame, meta_data), self.json_format)
+
+        self.log.debug(f'Publishing message to topic: {self.topic}, meta data: {meta_data}')
+        self.client.publish(self.topic, payload=msg)
+
+        # Discarding publish message
+        del msg
+
+    def _publish_batch(self, batch):
+        """Publish frames/metadata to mqtt broker in a single message.
+        Message is a json list of messages or the concatenation of binary records.
+
+        :param list batch: List of (frame, meta_data)
+        """
+        if not self.client.is_connected():
+            self.log.error(f"Client is not connected to MQTT broker. {len(batch)} messages not published.")
+            return
+
+        batch = [(frame, meta_data) for frame, meta_data in batch if self._filter(meta_data)]
+        if not batch:
+            return
+
+        if self.payload_format == PAYLOAD_FORMAT_BINARY:
+            msg = b"".join(part for frame, meta_data in batch
+                           for part in self._binary_record(frame, meta_data))
+        else:
+            msg = serialize.dumps([self._json_message(frame, meta_data) for frame, meta_data in batch],
+                                  self.json_format)
 
-        self.log.info(f'Publishing message to topic: {self.topic}')
+        self.log.debug(f'Publishing batch of {len(batch)} messages to topic: {self.topic}')
         self.client.publish(self.topic, payload=msg)
 
         # Discarding publish message
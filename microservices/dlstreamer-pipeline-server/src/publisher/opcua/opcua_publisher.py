@@ -9,16 +9,17 @@ Publishes data from a pipeline with gstreamer app destination.
 """
 
 # pylint: disable=wrong-import-position
-import json
 import os
 import base64
-import time
+import queue
 import threading as th
-from collections import deque
 from asyncua.sync import Client, ua
 
 from src.common.log import get_logger
+from src.publisher.common.channel import BoundedChannel
 from src.publisher.common.filter import Filter
+from src.publisher.common.frame import frame_data, release_frame
+from src.publisher.common import serialize
 
 DEFAULT_APPDEST_OPCUA_QUEUE_SIZE = 1000
 
@@ -35,8 +36,12 @@ class OPCUAPublisher():
         self.publish_frame = False
         self.initialized=False
         self.stop_ev = th.Event()
-        self.queue = deque(maxlen=qsize)
         self.log = get_logger(f'{__name__} (OPCUA)')
+        self.queue = BoundedChannel.from_config(opcua_cfg, qsize,
+                                                on_drop=lambda item: release_frame(item[0]),
+                                                name='OPCUA')
+        self.json_format = serialize.check_format(
+            opcua_cfg.get('json_format', serialize.JSON_FORMAT_STANDARD))
 
         opcua_server_ip = os.getenv("OPCUA_SERVER_IP", "").strip()
         opcua_server_port = os.getenv("OPCUA_SERVER_PORT", "").strip()
@@ -90,6 +95,7 @@ class OPCUAPublisher():
         if self.stop_ev.set():
             return
         self.stop_ev.set()
+        self.queue.close()
         self.th.join()
         self.th = None
         self.log.info('OPCUA publisher thread stopped')
@@ -105,11 +111,13 @@ class OPCUAPublisher():
         try:
             while not self.stop_ev.is_set():
                 try:
-                    frame, meta_data = self.queue.popleft()
+                    frame, meta_data = self.queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                try:
                     self._publish(frame, meta_data)
-                except IndexError:
-                    self.log.debug("No data in client queue for OPCUA")
-                    time.sleep(0.005)
+                finally:
+                    release_frame(frame)
         except Exception as e:
             self.error_handler(e)
     
@@ -117,7 +125,7 @@ class OPCUAPublisher():
         """Publish frame/metadata to opcua broker
 
         :param frame: video frame
-        :type: bytes
+        :type: FrameHandle or bytes
         :param meta_data: Meta data
         :type: Dict
         """
@@ -129,11 +137,11 @@ class OPCUAPublisher():
         msg = dict()
         msg["metadata"]=meta_data
         if self.publish_frame:
-            msg["blob"]=base64.b64encode(frame).decode('utf-8') 
+            msg["blob"]=base64.b64encode(frame_data(frame)).decode('utf-8') 
         else:
             msg["blob"]=""
             
-        msg = json.dumps(msg)
+        msg = serialize.dumps_str(msg, self.json_format)
         try:
             if self.publish_frame:
                 self.log.info(f'Publishing frames along with meta data to OPCUA variable {self.opcua_variable}')
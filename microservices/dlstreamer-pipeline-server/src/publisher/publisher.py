@@ -21,6 +21,7 @@ import cv2
 import threading as th
 import numpy as np
 import datetime
+import time
 from time import time_ns
 from gi.repository import Gst
 from distutils.util import strtobool
@@ -28,13 +29,21 @@ from gstgva.util import gst_buffer_data
 from typing import Dict, List
 
 from src.server.gstreamer_app_source import GvaFrameData
+from src.common import metrics
 from src.common.log import get_logger
 
 from utils import publisher_utils as utils
+from src.publisher.common.encode_pool import OrderedEncoder
+from src.publisher.common.frame import FrameHandle, frame_data, acquire_frame, release_frame
+from src.publisher.common.output_profile import OutputProfile, OutputStage
+from src.publisher.common.image_handle import ImageHandleTemplate
 from src.publisher.mqtt.mqtt_publisher import MQTTPublisher
 from src.publisher.opcua.opcua_publisher import OPCUAPublisher
 from src.publisher.s3.s3_writer import S3Writer
 
+# Max seconds pipeline status in metadata lags behind, e.g. avg_fps. State changes
+# are picked up on the next frame.
+PIPELINE_STATUS_REFRESH_INTERVAL = 1.0
 
 class Publisher:
     """EII Pipeline Server publisher thread.
@@ -45,7 +54,8 @@ class Publisher:
                  queue,
                  request:str=None,
                  add_timestamp:bool=True, 
-                 append_pipeline_name_to_topic=strtobool(os.getenv("APPEND_PIPELINE_NAME_TO_PUBLISHER_TOPIC","false"))):
+                 append_pipeline_name_to_topic=strtobool(os.getenv("APPEND_PIPELINE_NAME_TO_PUBLISHER_TOPIC","false")),
+                 encode_pool=None):
         """Constructor
 
         .. note:: This method immediately starts the publishing thread.
@@ -53,6 +63,7 @@ class Publisher:
         :param json app_cfg: Pipeline configuration
         :param cfg.Publisher pub_config: ConfigManager publisher configuration
         :param queue.Queue queue: Python queue of data to publish
+        :param EncodePool encode_pool: Pool to encode frames on, process wide pool by default
         """
         self.app_cfg = app_cfg
         self.pub_cfg = pub_cfg
@@ -72,6 +83,15 @@ class Publisher:
             self.log.error(msg)
             self.error_handler(msg)
 
+        # handles are random unless a deterministic scheme is set
+        self.img_handle_template = None
+        try:
+            self.img_handle_template = ImageHandleTemplate.from_scheme(
+                self.app_cfg.get('img_handle_scheme'))
+        except ValueError as e:
+            self.log.error(e)
+            self.error_handler(e)
+
         try:
             self.encoding, self.encoding_type, self.encoding_level = self._enable_encoding()
         except Exception as e:
@@ -88,6 +108,18 @@ class Publisher:
         self.image_publisher = None # specific to image_ingestor. need to track
 
         self.tracking = self._is_tracking_enabled()
+        # encoding of frames encoded by the pipeline, parsed from the launch string on first use
+        self.pipeline_encoding = None
+
+        self.get_state_version = None
+        self.pipeline_status_interval = PIPELINE_STATUS_REFRESH_INTERVAL
+        self._pipeline_status = None
+        self._pipeline_status_version = None
+        self._pipeline_status_time = None
+
+        # Encodes run on the shared pool, frames are published in arrival order
+        self.encoder = OrderedEncoder(encode_pool,
+                                      max_inflight=self.app_cfg.get('encode_max_inflight'))
 
     def start(self):
         """Start the publisher.
@@ -115,11 +147,20 @@ class Publisher:
         self.log.error('Error in publisher thread: {}'.format(msg))
         self.done = True
 
-    def set_pipeline_info(self, name, version, instance_id, get_pipeline_status):
+    def set_pipeline_info(self, name, version, instance_id, get_pipeline_status,
+                          get_state_version=None):
+        """Set pipeline added to metadata
+
+        :param get_pipeline_status: Returns status of the pipeline instance
+        :param get_state_version: Returns counter changing on each state change of the
+            pipeline instance. Status is refreshed on each frame if None.
+        """
         self.pipeline_name = name
         self.pipeline_version = version
         self.pipeline_instance_id = instance_id
         self.get_pipeline_status = get_pipeline_status
+        self.get_state_version = get_state_version
+        self._pipeline_status = None
 
     def _get_meta_publisher_config(self,meta_destination):
         """Get config for meta publishers
@@ -182,6 +223,7 @@ class Publisher:
         self.s3_config = None
         self.mqtt_config = None
         self.opcua_config = None
+        self.output_stage = OutputStage()
 
         try:
             launch_string = self.app_cfg.get("pipeline")
@@ -199,14 +241,21 @@ class Publisher:
                                 
                 # NOTE: always add S3_write first in the list of publishers, essential for blocking case
                 if self.s3_config:
-                    publishers.append(S3Writer(self.s3_config))
+                    s3_writer = S3Writer(self.s3_config)
+                    self.output_stage.add(s3_writer, OutputProfile.from_config(
+                        self.s3_config.get("output_profile")))
+                    publishers.append(s3_writer)
                 if self.mqtt_config:
                     mqtt_pub = MQTTPublisher(self.mqtt_config)
                     self.mqtt_publish_frame = mqtt_pub.publish_frame
+                    self.output_stage.add(mqtt_pub, OutputProfile.from_config(
+                        self.mqtt_config.get("output_profile")), mqtt_pub.publish_frame)
                     publishers.append(mqtt_pub)
                 if self.opcua_config:
                     opcua_pub = OPCUAPublisher(self.opcua_config)
                     self.opcua_publish_frame = opcua_pub.publish_frame
+                    self.output_stage.add(opcua_pub, OutputProfile.from_config(
+                        self.opcua_config.get("output_profile")), opcua_pub.publish_frame)
                     publishers.append(opcua_pub)            
                         
             if os.getenv('RUN_MODE') == "EII":
@@ -218,7 +267,9 @@ class Publisher:
                     pub_topic = pub.get_topics()[0]
                     if self.append_pipeline_name_to_topic:
                         pub_topic += "_"+self.app_cfg.get('name')
-                    publishers.append(EdgeGrpcPublisher(pub, pub_topic, dev_mode))
+                    grpc_pub = EdgeGrpcPublisher(pub, pub_topic, dev_mode)
+                    self.output_stage.add(grpc_pub)
+                    publishers.append(grpc_pub)
                     self.grpc_publish = True
                     self.log.info("Edge gRPC publisher initialized")
         except Exception as e:
@@ -298,16 +349,16 @@ class Publisher:
 
         :param results: Video frame and additional metadata
         :type: Gst.Sample
-        :return: Return frame
-        :rtype: bytes
+        :return: Return frame, mapped without copying. Owner must release it.
+        :rtype: FrameHandle
         :return: Return Meta data of the frame
         :rtype: Dict
         """
-        # Get buffer data
-        with gst_buffer_data(results.get_buffer(), Gst.MapFlags.READ) as data:
-            frame = bytes(data)
-            # Discarding gst buffer data
-            del data
+        # Map buffer data. The sample stays alive and mapped until the last
+        # publisher releases the frame.
+        buffer = results.get_buffer()
+        frame = FrameHandle(gst_buffer_data(buffer, Gst.MapFlags.READ),
+                            owner=results, pts=buffer.pts)
 
         caps = results.get_caps()
         # Get buffer width & height
@@ -347,17 +398,28 @@ class Publisher:
         return frame, meta_data
 
     def _add_pipeline_info_metadata(self, meta_data):
-
-        results = self.get_pipeline_status()
-        curr_state = results.state.name
-        results = results._asdict()
-        results['state'] = curr_state
+        """Add pipeline name, version, instance id and status to metadata.
+        Status is cached until the pipeline state changes or it is
+        pipeline_status_interval seconds old.
+        """
+        state_version = self.get_state_version() if self.get_state_version else None
+        now = time.monotonic()
+        if (self._pipeline_status is None or state_version is None or
+                state_version != self._pipeline_status_version or
+                now - self._pipeline_status_time >= self.pipeline_status_interval):
+            results = self.get_pipeline_status()
+            curr_state = results.state.name
+            results = results._asdict()
+            results['state'] = curr_state
+            self._pipeline_status = results
+            self._pipeline_status_version = state_version
+            self._pipeline_status_time = now
 
         meta_data['pipeline'] = {
             'name': self.pipeline_name,
             'version': self.pipeline_version,
             'instance_id': self.pipeline_instance_id,
-            'status': results
+            'status': dict(self._pipeline_status)
         }
 
     def _is_tracking_enabled(self):
@@ -373,24 +435,29 @@ class Publisher:
         return False
 
     def _add_tracking_info(self, meta_data: dict):
+        """
+        Add the object id of the tracked region matching each annotated object
+        :param meta_data: metadata with annotations and gva_meta regions
+        :type: Dict
+        :return: metadata with object ids, regions cleared
+        :type: Dict
+        """
         if 'objects' in meta_data.get('annotations', {}):
+            object_ids = {}
+            if self.tracking:
+                self.log.debug("Tracking enabled: Deduplicating detections in metadata")
+                # index regions by bbox once, the first region wins like a linear search would
+                for region in meta_data['gva_meta']:
+                    gva_bbox = (region['x'],
+                                region['y'],
+                                region['width'] + region['x'],
+                                region['height'] + region['y'])
+                    object_ids.setdefault(gva_bbox, region['object_id'])
+            else:
+                self.log.debug("Tracking disabled: Setting object id to None")
             for annotation in meta_data['annotations']['objects']:
-                id = None
-                if self.tracking:
-                    self.log.info("Tracking enabled: Deduplicating detections in metadata")
-                    bbox = annotation['bbox']
-                    for region in meta_data['gva_meta']:
-                        gva_bbox = (region['x'],
-                                    region['y'],
-                                    region['width'] + region['x'],
-                                    region['height'] + region['y'])
-                        if bbox == list(gva_bbox):
-                            id = region['object_id']
-                            break
-                    annotation.update({'object_id': id})
-                else:
-                    self.log.debug("Tracking disabled: Setting object id to None")
-                    annotation.update({'object_id': id})
+                id = object_ids.get(tuple(annotation['bbox'])) if object_ids else None
+                annotation.update({'object_id': id})
             meta_data.update({'gva_meta': []})
         return meta_data
 
@@ -402,60 +469,30 @@ class Publisher:
         :return: metadata with inference results converted to DCaaS format
         :type: Dict
         """
+        regions = meta_data['gva_meta']
+        tensors = [region['tensor'][0] for region in regions]
+        if regions:
+            # x1y1wh boxes (top left co-ordinates, width, height) of all regions at once,
+            # converted in place to x1y1x2y2 (top left and bottom right co-ordinates)
+            boxes = np.array([(region['x'], region['y'], region['width'], region['height'])
+                              for region in regions])
+            boxes[:, 2:] += boxes[:, :2]
+            boxes = boxes.tolist()
+        else:
+            boxes = []
+
+        self.log.debug("x1,y1,x2,y2 converted boxes = %s", boxes)
+        converted_result = {'objects': [{
+            'bbox': box,
+            'label': tensor['label'],
+            'score': tensor['confidence'],
+            'attributes': {
+                'occluded': False,
+                'rotation': 0.0
+            }
+        } for box, tensor in zip(boxes, tensors)]}
 
-        def convert_x1y1wh_to_x1y1x2y2(boxes: list):
-            """
-            Convert the bounding box from x1y1wh format (top left co-ordinates, width, height)
-            to x1y1x2y2 format(top left and bottom right co-ordinates)
-
-            Args:
-                boxes (list): Bounding box in x1y1wh format (top left co-ordinates, width, height).
-            """
-            boxes = np.array(boxes)
-            boxes = np.concatenate([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]],
-                                axis=-1)
-            return boxes.tolist()
-
-        boxes = []
-        labels = []
-        scores = []
-
-        for annotation in meta_data['gva_meta']:
-            box = [
-                annotation['x'], annotation['y'],
-                annotation['width'], annotation['height']
-            ]
-            label = annotation['tensor'][0]['label']
-            score = annotation['tensor'][0]['confidence']
-            boxes.append(box)
-            labels.append(label)
-            scores.append(score)
-
-        self.log.debug("boxes are = {}".format(boxes))
-        self.log.debug("labels are = {}".format(labels))
-        self.log.debug("scores are = {}".format(scores))
-
-        if len(boxes):
-            boxes = convert_x1y1wh_to_x1y1x2y2(boxes)
-
-        self.log.debug(
-            "x1,y1,w,h to x1,y1,x2,y2 converted boxes = {}".format(boxes))
-        converted_result = {'objects': []}
-
-        for box, score, label in zip(boxes, scores, labels):
-            converted_result['objects'].append({
-                'bbox': box,
-                'label': label,
-                'score': score,
-                'attributes': {
-                    'occluded': False,
-                    'rotation': 0.0
-                }
-            })
-
-        self.log.debug(
-            "DCaaS format converted inference result = {}".format(
-                converted_result))
+        self.log.debug("DCaaS format converted inference result = %s", converted_result)
 
         meta_data.update({
                 'annotations':
@@ -482,31 +519,248 @@ class Publisher:
         meta_data['frame_id'] = self.frame_id
         self.frame_id += 1
 
-    def _publish(self, frame, meta_data):
+    def _publish(self, frame, meta_data, renditions=None):
         """Publish frame/metadata to message bus
 
         :param frame: video frame
-        :type: bytes
+        :type: FrameHandle or bytes
         :param meta_data: Meta data
         :type: Dict
+        :param renditions: Output profiles selecting the frame, mapped to their
+            encoded frame and metadata updates, or None to publish the frame as is
+        :type: Dict
         """
         if self.add_timestamp:
             meta_data['time'] = int(datetime.datetime.now(datetime.timezone.utc).timestamp()*1e9)
 
-        for publisher in self.publishers:
-            # add data to S3, and block publish for others if enabled
+        deliveries = self._get_deliveries(frame, meta_data, renditions or {})
+        for i, (publisher, out_frame, out_meta_data) in enumerate(deliveries):
+            # add data to S3, and defer publish for others until it is written if block is enabled
             if isinstance(publisher,S3Writer):
-                publisher.queue.append((frame, meta_data))
-                                
+                on_complete = None
                 if publisher.s3_metadata_write_wait:
-                # we assume only one S3 writer is present in the list of publishers, and the very first publisher 
-                    if not publisher.s3write_complete.is_set():
-                        publisher.s3write_complete.wait()
-                    publisher.s3write_complete.clear()
+                    # we assume only one S3 writer is present in the list of publishers, and the very first publisher
+                    others = [(p, acquire_frame(f), m) for p, f, m in deliveries[i + 1:]]
+                    on_complete = lambda error, others=others: self._publish_deferred(others, error)
+                publisher.queue.append((acquire_frame(out_frame), out_meta_data, on_complete))
+                if on_complete is not None:
+                    return
                 continue
             
+            publisher.queue.append((acquire_frame(out_frame), out_meta_data))
+
+    def _get_deliveries(self, frame, meta_data, renditions):
+        """Get frame/metadata to hand to each publisher, according to its output profile
+
+        :param frame: video frame
+        :type: FrameHandle or bytes
+        :param meta_data: Meta data
+        :type: Dict
+        :param renditions: Output profiles selecting the frame, mapped to their
+            encoded frame and metadata updates, or None to publish the frame as is
+        :type: Dict
+        :return: List of (publisher, frame, meta data), without publishers skipping the frame
+        :rtype: List
+        """
+        outputs = {}
+        for profile, rendition in renditions.items():
+            if rendition is None:
+                outputs[profile] = (frame, meta_data)
+            else:
+                encoded, updates = rendition
+                outputs[profile] = (encoded, dict(meta_data, **updates))
+
+        deliveries = []
+        for publisher in self.publishers:
+            profile = self.output_stage.profile(publisher)
+            if profile is None:
+                deliveries.append((publisher, frame, meta_data))
+            elif profile in outputs:
+                deliveries.append((publisher,) + outputs[profile])
+        return deliveries
+
+    def _publish_deferred(self, deliveries, error=None):
+        """Hand frame/metadata to publishers once S3 writer stored the frame.
+        Called by S3 writer in frame order. Frames are handed over when the write
+        failed as well, so that they are published and released.
+
+        :param deliveries: List of (publisher, frame reference to hand over, meta data)
+        :type: List
+        :param error: Error writing the frame to S3, None on success
+        :type: Exception
+        """
+        if error is not None:
+            self.log.debug(f"Publishing metadata of frame not written to S3: {error}")
+        for publisher, frame, meta_data in deliveries:
             publisher.queue.append((frame, meta_data))
 
+    def _encode_frame(self, *args, **kwargs):
+        """Encode frame with utils.encode_frame, recording the encode time.
+        Runs in the encode pool.
+        """
+        start = time.perf_counter()
+        try:
+            return utils.encode_frame(*args, **kwargs)
+        finally:
+            metrics.instruments().encode_time.record(
+                (time.perf_counter() - start) * 1000,
+                {"encoding_type": self.encoding_type or "jpeg"})
+
+    def _add_image_handle(self, meta_data, frame, pts):
+        """Add img_handle built from the img_handle_scheme template, unless
+        the frame has a handle already. Called once frame_id is set.
+
+        :param meta_data: Meta data
+        :type: Dict
+        :param frame: Published frame
+        :type: FrameHandle or bytes
+        :param int pts: Presentation timestamp of the frame
+        """
+        if 'img_handle' in meta_data:
+            return
+        meta_data['img_handle'] = self.img_handle_template.format(
+            frame_data(frame) if self.img_handle_template.hashed else None,
+            instance_id=getattr(self, 'pipeline_instance_id', None),
+            pts=pts, seq=meta_data['frame_id'])
+
+    def _publish_completed(self, wait=False):
+        """Finalize and publish frames whose encode completed, in arrival order
+
+        :param bool wait: Wait for all in-flight encodes
+        """
+        for encode, (frame, meta_data, renditions) in self.encoder.completed(wait):
+            pts = getattr(frame, 'pts', None)
+            # profile encodes are done, they read the raw frame
+            renditions = self._get_renditions(renditions, meta_data)
+            if encode is not None:
+                frame = self._get_encoded_frame(encode, frame, meta_data)
+
+            self._add_pipeline_info_metadata(meta_data)
+            self._add_frame_id_metadata(meta_data)
+            if self.img_handle_template is not None:
+                self._add_image_handle(meta_data, frame, pts)
+            if self.tags:
+                meta_data['tags'] = self.tags
+            self._add_tracking_info(meta_data)
+            if self.convert_metadata_to_dcaas_format:
+                self._convert_inference_result(meta_data)
+            if self.s3_config and self._s3_selects(renditions):
+                s3_metadata = self._add_s3_metadata(meta_data, self.s3_config)
+                meta_data.update(s3_metadata)
+
+            # TODO: put into clients respective queues
+            self._publish(frame, meta_data, renditions=renditions)
+
+            # Drop publisher thread's reference, clients hold their own
+            release_frame(frame)
+
+    def _s3_selects(self, renditions):
+        """Whether the S3 writer stores the frame, according to its output profile
+
+        :param renditions: Output profiles selecting the frame
+        :type: Dict
+        :rtype: bool
+        """
+        for publisher in self.publishers:
+            if isinstance(publisher, S3Writer):
+                profile = self.output_stage.profile(publisher)
+                return profile is None or profile in renditions
+        return False
+
+    def _get_encoded_frame(self, encode, frame, meta_data):
+        """Get result of a completed encode
+
+        :param encode: Completed encode
+        :type: concurrent.futures.Future
+        :param frame: Raw frame
+        :type: FrameHandle or bytes
+        :param meta_data: Meta data
+        :type: Dict
+        :return: Encoded frame, raw frame if encoding failed
+        :rtype: bytes or FrameHandle
+        """
+        try:
+            encoded, meta_data['encoding_type'], meta_data[
+                'encoding_level'] = encode.result()
+            # raw buffer is no longer needed once encoded
+            release_frame(frame)
+            frame = encoded[1].tobytes()
+            ret_ov = meta_data.pop('overlayText', None)  # upon overlay, discard overlay text, if present
+            if ret_ov is not None:
+                self.log.debug("Discarded overlay text from metadata")
+        except ValueError as e:
+            self.log.error(
+                f"Value error occured when encoding the image {e}"
+            )
+            self.error_handler(e)
+        except cv2.error as e:
+            self.log.error(
+                f"CV2 error occured when encoding the image {e}"
+            )
+            self.error_handler(e)
+        return frame
+
+    def _encode_profiles(self, frame, meta_data, profiles):
+        """Encode a raw frame once per selected output profile which needs it.
+        Encodes run in the pool along with the frame's own encode.
+
+        :param frame: Raw frame
+        :type: FrameHandle or bytes
+        :param meta_data: Meta data
+        :type: Dict
+        :param profiles: Output profiles selecting the frame
+        :type: List
+        :return: Profiles mapped to their encode future, None if the frame is published as is
+        :rtype: Dict
+        """
+        renditions = {}
+        for profile in profiles:
+            if not self.output_stage.needs_encode(profile):
+                renditions[profile] = None
+                continue
+            level = profile.jpeg_quality
+            if level is None and self.encoding_type == "jpeg":
+                level = self.encoding_level
+            renditions[profile] = self.encoder.attach(
+                self._encode_frame, "jpeg", level, frame_data(frame),
+                meta_data['height'], meta_data['width'],
+                channels=meta_data['channels'], meta_data=meta_data,
+                max_dimension=profile.max_dimension)
+        return renditions
+
+    def _get_renditions(self, renditions, meta_data):
+        """Get results of completed output profile encodes
+
+        :param renditions: Profiles mapped to their encode future, None if the frame is published as is
+        :type: Dict
+        :param meta_data: Meta data of the raw frame
+        :type: Dict
+        :return: Profiles mapped to their encoded frame and metadata updates, None if
+            the frame is published as is. Profiles whose encode failed are left out.
+        :rtype: Dict
+        """
+        results = {}
+        for profile, encode in renditions.items():
+            if encode is None:
+                results[profile] = None
+                continue
+            try:
+                encoded, encoding_type, encoding_level = encode.result()
+            except (ValueError, cv2.error) as e:
+                self.log.error(
+                    f"Error occured when encoding the image for {profile}: {e}")
+                self.error_handler(e)
+                continue
+            width, height = utils.scaled_size(meta_data['width'], meta_data['height'],
+                                              profile.max_dimension)
+            results[profile] = (encoded[1].tobytes(), {
+                'width': width,
+                'height': height,
+                'encoding_type': encoding_type,
+                'encoding_level': encoding_level
+            })
+        return results
+
     def _run(self):
         """Private thread run method.
         """
@@ -515,7 +769,8 @@ class Publisher:
         try:
             while not self.stop_ev.is_set():
                 try:
-                    results = self.queue.get(timeout=0.5)
+                    results = self.queue.get(
+                        timeout=0.01 if len(self.encoder) else 0.5)
                     self.log.debug("Received results from app dest queue")
                     if not results:
                         continue
@@ -529,7 +784,7 @@ class Publisher:
                         )
                         continue
 
-                    if 'img_handle' not in meta_data.keys():
+                    if self.img_handle_template is None and 'img_handle' not in meta_data.keys():
                         meta_data['img_handle'] = self._generate_image_handle(
                             self.img_handle_length)
 
@@ -540,71 +795,63 @@ class Publisher:
                             results.video_frame)
 
 
+                    # output profiles this frame is published with
+                    profiles = self.output_stage.select()
+
                     # raw frame:
-                    #    - if encoding params set or publish raw frame is not enabled, encode frame with opencv.
+                    #    - if encoding params set or publish raw frame is not enabled, encode frame with opencv
+                    #      in the encode pool, unless all frame publishers use profiles with their own encoding.
                     #      Any issues with encoding, throw error.
                     #    - Else publish raw frame
+                    #    - Encode once per selected output profile with its own encoding
                     # (pipeline) encoded frame:
                     #    - Update metadata (encoding type/level)
-                    if meta_data['caps'].split(',')[0] == "video/x-raw":
+                    raw = meta_data['caps'].split(',')[0] == "video/x-raw"
+                    encode = False
+                    if raw:
                         self.log.debug("Processing raw frame")
                         if self.mqtt_publish_frame or self.grpc_publish or self.opcua_publish_frame or self.s3_config:
                             if (self.encoding == True) or (not self.publish_raw_frame):
                                 self.log.debug("Encoding frame of format {}".format(meta_data["img_format"]))
-                                try:
-                                    if meta_data.get("task", None) is None and self.send_overlayed_frame:
-                                        self.send_overlayed_frame = False
-                                        self.log.debug("task key is missing in metadata. overriding overlaying annotation to False")
-                                    frame, meta_data['encoding_type'], meta_data[
-                                        'encoding_level'] = utils.encode_frame(
-                                            self.encoding_type, self.encoding_level,
-                                            frame, meta_data['height'],
-                                            meta_data['width'],
-                                            channels=meta_data['channels'],
-                                            meta_data=meta_data)
-                                    frame = frame[1].tobytes()
-                                    ret_ov = meta_data.pop('overlayText', None)  # upon overlay, discard overlay text, if present
-                                    if ret_ov is not None:
-                                        self.log.debug("Discarded overlay text from metadata")
-                                except ValueError as e:
-                                    self.log.error(
-                                        f"Value error occured when encoding the image {e}"
-                                    )
-                                    self.error_handler(e)
-                                except cv2.error as e:
-                                    self.log.error(
-                                        f"CV2 error occured when encoding the image {e}"
-                                    )
-                                    self.error_handler(e)
+                                if meta_data.get("task", None) is None and self.send_overlayed_frame:
+                                    self.send_overlayed_frame = False
+                                    self.log.debug("task key is missing in metadata. overriding overlaying annotation to False")
+                                encode = self.output_stage.needs_full_frame
                         else:
                             self.log.debug("Publishing raw frame")
                     else:
                         self.log.debug(
                             "Encoded frame received, disabled opencv encoding"
                         )
+                        if self.pipeline_encoding is None:
+                            self.pipeline_encoding = self._get_pipeline_encoding_properties()
                         meta_data['encoding_type'], meta_data[
-                            'encoding_level'] = self._get_pipeline_encoding_properties(
-                            )
-
-                    self._add_pipeline_info_metadata(meta_data)
-                    self._add_frame_id_metadata(meta_data)
-                    if self.tags:
-                        meta_data['tags'] = self.tags
-                    self._add_tracking_info(meta_data)
-                    if self.convert_metadata_to_dcaas_format:
-                        self._convert_inference_result(meta_data)
-                    if self.s3_config:
-                        s3_metadata = self._add_s3_metadata(meta_data, self.s3_config)
-                        meta_data.update(s3_metadata)
-
-                    # TODO: put into clients respective queues
-                    self._publish(frame, meta_data)
-
-                    # Discarding frame
-                    del frame
+                            'encoding_level'] = self.pipeline_encoding
+
+                    # filled in once the frame is queued, profile encodes are attached to it
+                    renditions = {}
+                    if encode:
+                        # meta_data is only read by the encode until it completes
+                        self.encoder.submit((frame, meta_data, renditions), self._encode_frame,
+                                            self.encoding_type, self.encoding_level,
+                                            frame_data(frame), meta_data['height'],
+                                            meta_data['width'],
+                                            channels=meta_data['channels'],
+                                            meta_data=meta_data)
+                    else:
+                        # queue behind in-flight encodes to keep frame order
+                        self.encoder.append((frame, meta_data, renditions))
+                    if raw:
+                        renditions.update(self._encode_profiles(frame, meta_data, profiles))
+                    else:
+                        renditions.update(dict.fromkeys(profiles))
+                    self._publish_completed()
 
                 except queue.Empty:
+                    # no more input for now, flush in-flight encodes
+                    self._publish_completed(wait=True)
                     continue
+            self._publish_completed(wait=True)
         except Exception as e:
             # TODO: Check for more specific errors, attempt reconnect?
             self.log.exception(f'Error in publisher thread: {e}')
@@ -9,23 +9,42 @@ Publishes data from a pipeline with gstreamer app destination.
 """
 
 # pylint: disable=wrong-import-position
-import json
+import io
 import os
 import base64
+import queue
+import tarfile
 import time
 import threading as th
+import zipfile
 from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from src.common.log import get_logger
+from src.publisher.common.channel import BoundedChannel
 from src.publisher.common.filter import Filter
-from utils.s3_client import S3Client
+from src.publisher.common.frame import FrameReader, frame_data, release_frame
+from src.publisher.common import serialize
+from utils.s3_client import S3Client, MIN_MULTIPART_PART_SIZE
 
 
 DEFAULT_APPDEST_S3_QUEUE_SIZE = 1000
+DEFAULT_UPLOAD_CONCURRENCY = 1
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF_MS = 100
+DEFAULT_MULTIPART_THRESHOLD_MB = 16
+DEFAULT_ARCHIVE_INTERVAL_S = 10
+ARCHIVE_FORMATS = ("tar", "zip")
 
 
 class S3Writer():
     """S3 Writer.
+
+    Frames are uploaded by a pool of upload_concurrency threads, with retries
+    and exponential backoff. Upload completions are reported in the order the
+    frames were queued, outside of the upload workers' lock, with the upload error
+    or None on success. In archive mode, frames and their metadata are packed
+    into one tar/zip object per archive.frames frames or archive.interval_s seconds.
     """
 
     def __init__(self, config, qsize=DEFAULT_APPDEST_S3_QUEUE_SIZE):
@@ -33,7 +52,6 @@ class S3Writer():
         :param json config: S3 publisher config
             the meta-data for the frame (df: True)
         """
-        self.queue = deque(maxlen=qsize)
         self.stop_ev = th.Event()
 
         self.host = os.getenv("S3_STORAGE_HOST")
@@ -44,10 +62,46 @@ class S3Writer():
         self.s3_bucket_name = config.get("bucket")
         self.s3_folder_prefix = config.get("folder_prefix", "dlstreamer_pipeline_server")
         self.s3_metadata_write_wait = config.get("block", False)
-        self.s3write_complete = th.Event()
+
+        self.upload_concurrency = config.get("upload_concurrency", DEFAULT_UPLOAD_CONCURRENCY)
+        self.max_retries = config.get("max_retries", DEFAULT_MAX_RETRIES)
+        self.retry_backoff_ms = config.get("retry_backoff_ms", DEFAULT_RETRY_BACKOFF_MS)
+        self.multipart_threshold = int(config.get("multipart_threshold_mb", DEFAULT_MULTIPART_THRESHOLD_MB) * 1024 * 1024)
+        self.multipart_part_size = max(MIN_MULTIPART_PART_SIZE, int(config.get("multipart_part_size_mb", 8) * 1024 * 1024))
+        if self.upload_concurrency < 1:
+            raise ValueError(f"Invalid upload_concurrency: {self.upload_concurrency}")
+        if self.max_retries < 0:
+            raise ValueError(f"Invalid max_retries: {self.max_retries}")
+
+        self.json_format = serialize.check_format(
+            config.get("json_format", serialize.JSON_FORMAT_STANDARD))
+
+        archive = config.get("archive", None)
+        self.archive_frames = None
+        if archive:
+            self.archive_frames = archive.get("frames", 100)
+            self.archive_interval = archive.get("interval_s", DEFAULT_ARCHIVE_INTERVAL_S)
+            self.archive_format = archive.get("format", "tar")
+            if self.archive_frames < 1:
+                raise ValueError(f"Invalid archive frames: {self.archive_frames}")
+            if self.archive_format not in ARCHIVE_FORMATS:
+                raise ValueError(f"Invalid archive format: {self.archive_format}")
 
         self.th = None
+        self.executor = None
+        # uploads in queue order with their completion callbacks
+        self._inflight = deque()
+        self._inflight_lock = th.Lock()
+        # finished uploads waiting for their completion callbacks to run
+        self._completions = deque()
+        self._completing = False
+        self._upload_slots = th.BoundedSemaphore(2 * self.upload_concurrency)
+        self._archive = []
+        self.failed_uploads = 0
         self.log = get_logger(f'{__name__} ({self.s3_bucket_name})')
+        self.queue = BoundedChannel.from_config(config, qsize,
+                                                on_drop=self._on_drop,
+                                                name=f'S3 {self.s3_bucket_name}')
         if not self.host:
             self.log.error(f'Empty value given for S3_STORAGE_HOST. It cannot be blank')
             self.initialized=False
@@ -77,20 +131,40 @@ class S3Writer():
         """Start publisher.
         """
         self.log.info("Starting S3 writer thread")
+        self.executor = ThreadPoolExecutor(max_workers=self.upload_concurrency,
+                                           thread_name_prefix="s3-upload")
         self.th = th.Thread(target=self._run)
         self.th.start()
 
     def stop(self):
-        """Stop publisher.
+        """Stop publisher. Queued archive frames and in-flight uploads are completed,
+        frames left in the queue are released and completed with an error.
         """
-        self.s3write_complete.set()
-        if self.stop_ev.set():
+        if self.stop_ev.is_set():
             return
         self.stop_ev.set()
+        self.queue.close()
         if self.th:
-            self.th.join()
+            # error_handler stops the writer from its own thread
+            if self.th is not th.current_thread():
+                self.th.join()
             self.th = None
+            self.executor.shutdown(wait=True)
             self.log.info('S3 writer thread stopped')
+        self._drain_queue()
+
+    def _drain_queue(self):
+        """Release frames left in the queue and complete them with an error,
+        so that other publishers waiting on them when block is set to True are run.
+        """
+        error = RuntimeError("S3 writer stopped before the frame was written")
+        while True:
+            try:
+                item = self.queue.get(timeout=0)
+            except queue.Empty:
+                return
+            release_frame(item[0])
+            self._complete([item], error)
 
     def error_handler(self, msg):
         self.log.error('Error in S3 thread: {}'.format(msg))
@@ -102,33 +176,182 @@ class S3Writer():
         self.log.info("S3 writer thread started")
         try:
             while not self.stop_ev.is_set():
+                timeout = 0.5
+                if self._archive:
+                    timeout = max(0, self._archive_deadline - time.monotonic())
                 try:
-                    frame, meta_data = self.queue.popleft()
-                    self._publish(frame, meta_data)
-                except IndexError:
-                    self.log.debug("No data in client queue")
-                    time.sleep(0.005)
-                    
+                    frame, meta_data, on_complete = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    if self._archive:
+                        self._submit_archive()
+                    continue
+
+                if self.archive_frames is None:
+                    self._submit(self._publish, [(frame, meta_data, on_complete)])
+                    continue
+
+                if not self._archive:
+                    self._archive_deadline = time.monotonic() + self.archive_interval
+                self._archive.append((frame, meta_data, on_complete))
+                if (len(self._archive) >= self.archive_frames or
+                        time.monotonic() >= self._archive_deadline):
+                    self._submit_archive()
+            if self._archive:
+                self._submit_archive()
         except Exception as e:
             self.error_handler(e)
-    
-    def _publish(self, frame, meta_data):
-        """Write object data to s3 storage. 
-        Upon successful upload, s3write_complete event is set which is required for unblock other publisher
-        when block is set to True.
-
-        :param frame: video frame
-        :type: bytes
-        :param meta_data: Meta data
-        :type: Dict
+
+    def _on_drop(self, item):
+        """Release a frame dropped by the queue. Other publishers waiting on it
+        when block is set to True are still run.
         """
+        release_frame(item[0])
+        # complete after the uploads queued before it
+        done = Future()
+        done.set_exception(RuntimeError("Frame dropped from S3 queue"))
+        with self._inflight_lock:
+            self._inflight.append((done, [item]))
+        self._run_completions()
+
+    def _submit(self, upload, items):
+        """Run upload(items) in the upload pool. Completion callbacks of the items are
+        invoked in submission order.
+
+        :param upload: Upload function, takes the list of items
+        :param list items: List of (frame, meta_data, on_complete)
+        """
+        # bound the uploads waiting for a worker, the queue holds the rest
+        self._upload_slots.acquire()
+        with self._inflight_lock:
+            future = self.executor.submit(upload, items)
+            self._inflight.append((future, items))
+        future.add_done_callback(self._on_upload_done)
+
+    def _on_upload_done(self, future):
+        self._upload_slots.release()
+        self._run_completions()
+
+    def _run_completions(self):
+        """Run completion callbacks of finished uploads in submission order.
+        Callbacks are run by one thread at a time without holding _inflight_lock,
+        other workers only queue their completions and return.
+        """
+        with self._inflight_lock:
+            while self._inflight and self._inflight[0][0].done():
+                self._completions.append(self._inflight.popleft())
+            if self._completing:
+                return
+            self._completing = True
+        while True:
+            with self._inflight_lock:
+                if not self._completions:
+                    self._completing = False
+                    return
+                future, items = self._completions.popleft()
+            error = future.exception()
+            if error is None and not future.result():
+                error = RuntimeError("S3 upload failed")
+            self._complete(items, error)
+
+    def _complete(self, items, error=None):
+        """Invoke completion callbacks of the items
+
+        :param list items: List of (frame, meta_data, on_complete)
+        :param Exception error: Upload error, None on success
+        """
+        for _, _, on_complete in items:
+            if on_complete is None:
+                continue
+            try:
+                on_complete(error)
+            except Exception as e:
+                self.log.exception(f"Error in S3 upload completion: {e}")
+
+    def _submit_archive(self):
+        items, self._archive = self._archive, []
+        self._submit(self._publish_archive, items)
+
+    def _upload(self, object_name, data):
+        """Upload with retries and exponential backoff
+
+        :return: True on success
+        :rtype: bool
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.s3_client.upload(self.s3_bucket_name, object_name, data,
+                                      multipart_threshold=self.multipart_threshold,
+                                      part_size=self.multipart_part_size)
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed_uploads += 1
+                    self.log.error(f"Error uploading {object_name} to S3 storage after {attempt + 1} attempts: {e}")
+                    return False
+                delay = self.retry_backoff_ms * (2 ** attempt) / 1000
+                self.log.debug(f"Error uploading {object_name} to S3 storage: {e}. Retrying in {delay}s")
+                time.sleep(delay)
+
+    def _object_name(self, meta_data):
         ext = ""
-        if meta_data['caps'].split(',')[0] == "image/jpeg" or meta_data['encoding_type']=='jpeg':
+        if meta_data['caps'].split(',')[0] == "image/jpeg" or meta_data.get('encoding_type')=='jpeg':
             ext = ".jpg"
-        elif meta_data['caps'].split(',')[0] == "image/png" or meta_data['encoding_type']=='png':
+        elif meta_data['caps'].split(',')[0] == "image/png" or meta_data.get('encoding_type')=='png':
             ext = ".png"
-                
-        object_path = self.s3_folder_prefix + "/" if not self.s3_folder_prefix.endswith("/") else self.s3_folder_prefix        
-        object_name = f"{object_path}{meta_data['img_handle']}" + ext
-        self.s3_client.publish(self.s3_bucket_name, object_name, payload=frame)
-        self.s3write_complete.set()
+        return f"{meta_data['img_handle']}" + ext
+
+    def _object_path(self):
+        return self.s3_folder_prefix + "/" if not self.s3_folder_prefix.endswith("/") else self.s3_folder_prefix
+
+    def _publish(self, items):
+        """Write object data to s3 storage.
+
+        :param list items: Single (frame, meta_data, on_complete) item
+        :return: True on success
+        :rtype: bool
+        """
+        uploaded = True
+        for frame, meta_data, _ in items:
+            try:
+                uploaded &= self._upload(f"{self._object_path()}{self._object_name(meta_data)}", frame_data(frame))
+            finally:
+                release_frame(frame)
+        return uploaded
+
+    def _publish_archive(self, items):
+        """Pack frames and metadata into one tar/zip object and write it to s3 storage.
+        Members are the frame object names and <img_handle>.json for the metadata.
+
+        :param list items: List of (frame, meta_data, on_complete)
+        :return: True on success
+        :rtype: bool
+        """
+        buf = io.BytesIO()
+        try:
+            if self.archive_format == "zip":
+                with zipfile.ZipFile(buf, "w") as archive:
+                    for frame, meta_data, _ in items:
+                        archive.writestr(self._object_name(meta_data), frame_data(frame))
+                        archive.writestr(f"{meta_data['img_handle']}.json", serialize.dumps(meta_data, self.json_format))
+            else:
+                with tarfile.open(fileobj=buf, mode="w") as archive:
+                    for frame, meta_data, _ in items:
+                        self._add_tar_member(archive, self._object_name(meta_data), frame_data(frame))
+                        self._add_tar_member(archive, f"{meta_data['img_handle']}.json",
+                                             serialize.dumps(meta_data, self.json_format))
+        finally:
+            for frame, _, _ in items:
+                release_frame(frame)
+
+        object_name = f"{self._object_path()}{items[0][1]['img_handle']}.{self.archive_format}"
+        if not self._upload(object_name, buf.getbuffer()):
+            return False
+        self.log.debug(f"Uploaded archive of {len(items)} frames: {object_name}")
+        return True
+
+    @staticmethod
+    def _add_tar_member(archive, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = memoryview(data).nbytes
+        info.mtime = int(time.time())
+        archive.addfile(info, FrameReader(data))
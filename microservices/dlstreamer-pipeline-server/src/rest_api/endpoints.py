@@ -158,16 +158,31 @@ class Endpoints:
         """
         return (NOT_IMPLEMENTED, HTTPStatus.BAD_REQUEST)
 
-    def pipelines_status_get_all():  # noqa: E501
+    def pipelines_status_get_all(state=None, offset=0, limit=None):  # noqa: E501
         """pipelines_status_get_all
 
         Returns all instance status summary # noqa: E501
 
+        :param state: Only return instances in this state
+        :type state: str
+        :param offset: Number of instances to skip
+        :type offset: int
+        :param limit: Max number of instances to return
+        :type limit: int
+
         :rtype: object
         """
         try:
             logger.debug("GET on /pipelines/status")
-            results = Endpoints.pipeline_server_manager.get_all_instance_status()
+            if state is not None:
+                try:
+                    state = Pipeline.State[state.upper()]
+                except KeyError:
+                    return ('Invalid state', HTTPStatus.BAD_REQUEST)
+            if offset < 0 or (limit is not None and limit < 0):
+                return ('Invalid offset or limit', HTTPStatus.BAD_REQUEST)
+            results = Endpoints.pipeline_server_manager.get_all_instance_status(
+                state=state, offset=offset, limit=limit)
             for result in results:
                 result['state'] = result['state'].name
             return results
@@ -0,0 +1,110 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+#    dispatch of pipeline frames to an app destination on its own thread
+
+import queue
+import time
+from threading import Thread
+
+from src.publisher.common.channel import BoundedChannel, DROP_OLDEST
+from src.server.common.utils import logging
+
+DEFAULT_QUEUE_SIZE = 8
+# seconds a full queue with the block policy stalls the pipeline before the frame is dropped
+DEFAULT_BLOCK_TIMEOUT = 1.0
+
+
+class AppDestinationWorker():
+    """Hands frames to an app destination through a bounded queue served by a
+    dedicated thread, so a slow destination does not delay the others.
+
+    Queue size and policy when full are set by the destination request keys
+    queue_maxsize, queue_policy and queue_timeout, see BoundedChannel. The
+    block policy waits DEFAULT_BLOCK_TIMEOUT seconds unless queue_timeout is set.
+    """
+
+    def __init__(self, destination, name, config=None, policy=DROP_OLDEST):
+        """
+        :param AppDestination destination: Destination processing the frames
+        :param str name: Name of the destination in logs and status
+        :param dict config: Destination request
+        :param str policy: Queue policy if not set in config
+        """
+        config = config or {}
+        self.destination = destination
+        self.name = name
+        self.processed = 0
+        self.error = None
+        # seconds the latest frame waited in the queue
+        self.lag = 0.0
+        self._logger = logging.get_logger("AppDestinationWorker", is_static=True)
+        self._channel = BoundedChannel(config.get("queue_maxsize", DEFAULT_QUEUE_SIZE),
+                                       policy=config.get("queue_policy", policy),
+                                       timeout=config.get("queue_timeout", DEFAULT_BLOCK_TIMEOUT),
+                                       name="app_destination ({})".format(name))
+        self._thread = Thread(target=self._run, name="AppDestination-{}".format(name),
+                              daemon=True)
+        self._thread.start()
+
+    def process_frame(self, frame):
+        """Queue a frame for the destination
+
+        :return: False if a frame was dropped
+        :raises Exception: Error of the destination processing an earlier frame
+        """
+        if self.error:
+            raise self.error
+        return self._channel.append((time.monotonic(), frame))
+
+    def stop(self, timeout=None):
+        """Stop accepting frames and wait up to timeout seconds for queued frames
+        to be processed
+
+        :return: True if the worker finished
+        """
+        self.close()
+        return self.join(timeout)
+
+    def close(self):
+        """Stop accepting frames, queued frames are still processed
+        """
+        self._channel.close()
+
+    def join(self, timeout=None):
+        """Wait up to timeout seconds for queued frames to be processed, after close
+
+        :return: True if the worker finished
+        """
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self._logger.warning("App destination {} did not finish within {}s".format(
+                self.name, timeout))
+            return False
+        return True
+
+    def health(self):
+        return {"queued": len(self._channel),
+                "dropped": self._channel.dropped,
+                "processed": self.processed,
+                "lag": self.lag}
+
+    def _run(self):
+        while True:
+            try:
+                queued_time, frame = self._channel.get()
+            except queue.Empty:
+                break
+            if self.error:
+                # drain so producers never block on a failed destination
+                continue
+            self.lag = time.monotonic() - queued_time
+            try:
+                self.destination.process_frame(frame)
+                self.processed += 1
+            except Exception as error:
+                self._logger.error("Error in App Destination {}: {}".format(self.name, error))
+                self.error = error
@@ -58,6 +58,12 @@ class AppSource(metaclass=abc.ABCMeta):
     def finish(self):
         """Signals that the pipeline has ended."""
 
+    def status(self):
+        """Returns a dict of source statistics included in the pipeline
+           status, or None.
+        """
+        return None
+
     @classmethod
     def create_app_source(cls, request, pipeline):
         """Factory method for creating an AppSource instance based on registered subclasses"""
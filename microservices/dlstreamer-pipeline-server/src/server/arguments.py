@@ -22,12 +22,21 @@ def parse_options(args=None):
                         type=str, default=os.getenv("PIPELINE_DIR", 'pipelines'))
     parser.add_argument("--model_dir", action="store", dest="model_dir",
                         type=str, default=os.getenv("MODEL_DIR", 'models'))
+    parser.add_argument("--model_watch_interval", action="store",
+                        dest="model_watch_interval",
+                        type=float, default=float(os.getenv('MODEL_WATCH_INTERVAL', '0')))
     parser.add_argument("--network_preference", action="store",
                         dest="network_preference",
                         type=str, default=os.getenv('NETWORK_PREFERENCE', '{}'))
     parser.add_argument("--max_running_pipelines", action="store",
                         dest="max_running_pipelines",
                         type=int, default=int(os.getenv('MAX_RUNNING_PIPELINES', '-1')))
+    parser.add_argument("--max_completed_instances", action="store",
+                        dest="max_completed_instances",
+                        type=int, default=int(os.getenv('MAX_COMPLETED_INSTANCES', '-1')))
+    parser.add_argument("--completed_instance_ttl", action="store",
+                        dest="completed_instance_ttl",
+                        type=float, default=float(os.getenv('COMPLETED_INSTANCE_TTL', '0')))
     parser.add_argument("--log_level", action="store",
                         dest="log_level",
                         choices=['INFO', 'DEBUG'], default=os.getenv('LOG_LEVEL', 'INFO').upper() if os.getenv('LOG_LEVEL') else 'INFO')
@@ -0,0 +1,161 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+#    adaptive inference interval of a pipeline
+
+import time
+from collections import deque
+
+DEFAULT_MAX_INTERVAL = 8
+DEFAULT_PERIOD = 2.0
+DEFAULT_TOLERANCE = 0.1
+DEFAULT_PATIENCE = 3
+MAX_DECISIONS = 10
+
+
+class InferenceGovernor():
+    """Steps the inference interval of a pipeline to meet a latency and/or frame rate target.
+
+    Each period the frame rate and average latency measured over the period
+    are compared to the targets. When a target is missed the interval is
+    increased by half, at least by one, running inference on fewer frames. When all targets are met with
+    a margin of tolerance for patience periods in a row, the interval is
+    decreased by one. The interval stays within [min_interval, max_interval].
+    """
+
+    CONFIG_KEYS = ("target_latency", "target_fps", "min_interval", "max_interval",
+                   "period", "tolerance", "patience")
+
+    def __init__(self, target_latency=None, target_fps=None, min_interval=1,
+                 max_interval=DEFAULT_MAX_INTERVAL, period=DEFAULT_PERIOD,
+                 tolerance=DEFAULT_TOLERANCE, patience=DEFAULT_PATIENCE, clock=time.time):
+        """
+        :param float target_latency: Max average latency in seconds
+        :param float target_fps: Min frames per second
+        :param int min_interval: Lowest inference interval
+        :param int max_interval: Highest inference interval
+        :param float period: Seconds between updates
+        :param float tolerance: Relative margin to targets required to decrease the interval
+        :param int patience: Consecutive periods meeting targets before decreasing the interval
+        :param clock: Time source of decision timestamps
+        """
+        if target_latency is None and target_fps is None:
+            raise ValueError("target_latency or target_fps required")
+        for name, value in [("target_latency", target_latency), ("target_fps", target_fps)]:
+            if value is not None and (not _is_number(value) or value <= 0):
+                raise ValueError("{} must be a positive number".format(name))
+        for name, value in [("min_interval", min_interval), ("max_interval", max_interval),
+                            ("patience", patience)]:
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ValueError("{} must be a positive integer".format(name))
+        if min_interval > max_interval:
+            raise ValueError("min_interval must not exceed max_interval")
+        if not _is_number(period) or period <= 0:
+            raise ValueError("period must be a positive number")
+        if not _is_number(tolerance) or not 0 <= tolerance < 1:
+            raise ValueError("tolerance must be in [0, 1)")
+        self.target_latency = target_latency
+        self.target_fps = target_fps
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.period = period
+        self.tolerance = tolerance
+        self.patience = patience
+        self.interval = None
+        self.decisions = deque(maxlen=MAX_DECISIONS)
+        self._clock = clock
+        self._healthy_periods = 0
+        self._last = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Create governor from request section
+
+        :raises ValueError: Invalid config
+        """
+        if not isinstance(config, dict):
+            raise ValueError("inference_governor must be an object")
+        unknown = set(config) - set(cls.CONFIG_KEYS)
+        if unknown:
+            raise ValueError("Unknown inference_governor keys: {}".format(", ".join(sorted(unknown))))
+        return cls(**config)
+
+    def update(self, frames, latency_count, latency_sum, elapsed, interval):
+        """Decide the inference interval for the next period
+
+        :param int frames: Frames processed since start
+        :param int latency_count: Frames with measured latency since start
+        :param float latency_sum: Sum of measured latencies since start
+        :param float elapsed: Seconds since start
+        :param int interval: Current inference interval
+        :return: New inference interval, None if unchanged
+        """
+        last = self._last
+        self._last = (frames, latency_count, latency_sum, elapsed)
+        if self.interval is None:
+            self.interval = min(max(interval, self.min_interval), self.max_interval)
+            return self.interval if self.interval != interval else None
+        if last is None or elapsed <= last[3] or frames == last[0]:
+            return None
+        fps = (frames - last[0]) / (elapsed - last[3])
+        latency = None
+        if latency_count > last[1]:
+            latency = (latency_sum - last[2]) / (latency_count - last[1])
+        return self.step(fps, latency)
+
+    def step(self, fps, latency):
+        """Decide the inference interval from the frame rate and latency of a period
+
+        :param float fps: Frames per second over the period
+        :param float latency: Average latency over the period, None if not measured
+        :return: New inference interval, None if unchanged
+        """
+        missed = []
+        healthy = True
+        if self.target_fps is not None:
+            if fps < self.target_fps:
+                missed.append("fps")
+            healthy = healthy and fps >= self.target_fps * (1 + self.tolerance)
+        if self.target_latency is not None:
+            if latency is not None and latency > self.target_latency:
+                missed.append("latency")
+            healthy = healthy and latency is not None and \
+                latency <= self.target_latency * (1 - self.tolerance)
+
+        interval = self.interval
+        if missed:
+            self._healthy_periods = 0
+            interval = min(self.interval + max(self.interval // 2, 1), self.max_interval)
+        elif healthy:
+            self._healthy_periods += 1
+            if self._healthy_periods >= self.patience:
+                self._healthy_periods = 0
+                interval = max(self.interval - 1, self.min_interval)
+        else:
+            self._healthy_periods = 0
+        if interval == self.interval:
+            return None
+        self.decisions.append({
+            "time": self._clock(),
+            "fps": fps,
+            "latency": latency,
+            "missed": missed,
+            "inference_interval": interval
+        })
+        self.interval = interval
+        return interval
+
+    def status(self):
+        return {
+            "inference_interval": self.interval,
+            "target_latency": self.target_latency,
+            "target_fps": self.target_fps,
+            "decisions": list(self.decisions)
+        }
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -0,0 +1,134 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+#    pipeline latency tracking
+
+import math
+from collections import OrderedDict
+from threading import Lock
+
+DEFAULT_MAX_PENDING_FRAMES = 4096
+
+
+class LatencyHistogram():
+    """Streaming latency histogram with log scaled buckets (HDR histogram like).
+
+    Values are counted in buckets growing by a factor of (1 + precision), so
+    quantiles are accurate to within precision relative error, with a fixed
+    number of buckets regardless of the number of recorded values.
+    """
+
+    def __init__(self, min_value=1e-6, max_value=3600.0, precision=0.01):
+        """
+        :param float min_value: Lowest distinguishable value, smaller values are counted as min_value
+        :param float max_value: Highest trackable value, larger values are counted as max_value
+        :param float precision: Relative error of quantiles
+        """
+        self._min_value = min_value
+        self._log_min = math.log(min_value)
+        self._log_base = math.log1p(precision)
+        self._buckets = [0] * (self._bucket(max_value) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        if value <= self._min_value:
+            return 0
+        return int((math.log(value) - self._log_min) / self._log_base)
+
+    def record(self, value):
+        self._buckets[min(self._bucket(value), len(self._buckets) - 1)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Value at quantile q (0 to 1) of the recorded values, None if none were recorded
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, count in enumerate(self._buckets):
+            seen += count
+            if seen >= rank:
+                if index == len(self._buckets) - 1:
+                    # overflow bucket, values beyond max_value
+                    return self.max
+                # bucket midpoint, within the observed range
+                value = math.exp(self._log_min + (index + 0.5) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class LatencyTracker():
+    """Tracks latency of frames between two points of a pipeline, matching frames by pts.
+
+    Start times of at most max_pending frames are kept. Frames which never reach
+    the end point, e.g. dropped by a leaky queue, are evicted oldest first.
+    """
+
+    def __init__(self, max_pending=DEFAULT_MAX_PENDING_FRAMES, histogram=None):
+        self.max_pending = max_pending
+        self.histogram = histogram or LatencyHistogram()
+        self.evicted = 0
+        self._pending = OrderedDict()
+        self._lock = Lock()
+
+    def start(self, pts, timestamp):
+        """Record time a frame passed the start point
+        """
+        with self._lock:
+            if pts in self._pending:
+                self._pending.move_to_end(pts)
+            elif len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.evicted += 1
+            self._pending[pts] = timestamp
+
+    def stop(self, pts, timestamp):
+        """Record time a frame passed the end point
+
+        :return: Latency of the frame, None if its start time is unknown
+        """
+        with self._lock:
+            start_time = self._pending.pop(pts, None)
+            if start_time is None:
+                return None
+            latency = timestamp - start_time
+            self.histogram.record(latency)
+        return latency
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    @property
+    def count(self):
+        return self.histogram.count
+
+    def average(self):
+        if not self.histogram.count:
+            return None
+        return self.histogram.sum / self.histogram.count
+
+    def percentiles(self):
+        """p50/p90/p99/max latency, None if no frame completed
+        """
+        if not self.histogram.count:
+            return None
+        with self._lock:
+            return {
+                "p50": self.histogram.quantile(0.5),
+                "p90": self.histogram.quantile(0.9),
+                "p99": self.histogram.quantile(0.99),
+                "max": self.histogram.max
+            }
@@ -5,16 +5,18 @@
 #
 
 import json
-from collections import namedtuple
+import queue
+import time
+from collections import namedtuple, OrderedDict
 from enum import Enum, auto
-from threading import Event, Thread
+from threading import Event, Lock, Thread
 
 import gi
 
 gi.require_version('Gst', '1.0')
 gi.require_version('GstApp', '1.0')
 # pylint: disable=wrong-import-position
-from gi.repository import Gst
+from gi.repository import Gst, GLib
 from gstgva.util import GVAJSONMeta
 from src.server.app_source import AppSource
 from src.server.gstreamer_app_destination import GvaSample
@@ -32,6 +34,77 @@ fields = ['data',
 GvaFrameData = namedtuple('GvaFrameData', fields)
 GvaFrameData.__new__.__defaults__ = (None,) * len(fields)
 
+MAX_BUFFER_POOLS = 4    # distinct frame formats pooled per source
+
+
+class BufferPools():
+    """Gst.BufferPool per caps and frame size, so that raw frames of the same
+    format reuse memory instead of allocating a buffer per frame.
+    Buffers return to their pool once downstream elements release them.
+    """
+
+    def __init__(self, max_pools=MAX_BUFFER_POOLS):
+        """Constructor
+
+        :param int max_pools: Max number of pools, the least recently used one
+            is deactivated beyond it
+        """
+        self.max_pools = max_pools
+        self._pools = OrderedDict()
+        self._lock = Lock()   # pools are cleared by the thread finishing the source
+
+    @staticmethod
+    def poolable(caps):
+        """Whether frames of caps have a constant size, i.e. are raw
+
+        :param caps: Frame caps
+        :type: Gst.Caps
+        :rtype: bool
+        """
+        if caps is None or caps.get_size() == 0 or not caps.is_fixed():
+            return False
+        return caps.get_structure(0).get_name().endswith("/x-raw")
+
+    def acquire(self, caps, size):
+        """Get a buffer of size bytes from the pool of caps
+
+        :param caps: Frame caps
+        :type: Gst.Caps
+        :param int size: Frame size in bytes
+        :return: Buffer, None if it could not be acquired
+        :rtype: Gst.Buffer
+        """
+        key = (caps.to_string(), size)
+        with self._lock:
+            pool = self._pools.get(key, None)
+            if pool is None:
+                pool = Gst.BufferPool.new()
+                config = pool.get_config()
+                Gst.BufferPool.config_set_params(config, caps, size, 0, 0)
+                if not pool.set_config(config) or not pool.set_active(True):
+                    return None
+                self._pools[key] = pool
+                if len(self._pools) > self.max_pools:
+                    _, oldest = self._pools.popitem(last=False)
+                    oldest.set_active(False)
+            else:
+                self._pools.move_to_end(key)
+        ret, buffer = pool.acquire_buffer(None)
+        if ret != Gst.FlowReturn.OK:
+            return None
+        return buffer
+
+    def clear(self):
+        """Deactivate all pools, outstanding buffers are freed when released"""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.set_active(False)
+
+    def __len__(self):
+        return len(self._pools)
+
 class GStreamerAppSource(AppSource, Thread):
 
     class Mode(Enum):
@@ -55,6 +128,32 @@ class GStreamerAppSource(AppSource, Thread):
             raise Exception("GStreamerAppSource requires GStreamerPipeline "\
                             "appsrc element and input queue")
         self._mode = GStreamerAppSource.Mode(request_config.get("mode", "pull"))
+        # raw frames are copied to pooled buffers, unless disabled
+        self._buffer_pools = BufferPools() if request_config.get("buffer_pool", True) else None
+
+        # appsrc queue watermarks: enough-data is emitted above max_bytes or
+        # max_buffers, need-data again once below min_percent of them
+        for key, prop in (("max_bytes", "max-bytes"), ("max_buffers", "max-buffers"),
+                          ("min_percent", "min-percent")):
+            if key in request_config:
+                if request_config[key] < 0:
+                    raise ValueError("Invalid {}: {}".format(key, request_config[key]))
+                if self._src.find_property(prop) is None:
+                    raise ValueError("{} is not supported by appsrc".format(key))
+                self._src.set_property(prop, request_config[key])
+        # in PUSH mode, max seconds to wait for the pipeline to accept frames
+        # before dropping the oldest queued frame. Waits indefinitely if not set.
+        self._push_timeout = request_config.get("push_timeout", None)
+        if self._push_timeout is not None and self._push_timeout < 0:
+            raise ValueError("Invalid push_timeout: {}".format(self._push_timeout))
+
+        self._stats_lock = Lock()
+        self._pushed = 0
+        self._starved = 0           # pipeline ready for frames, none queued
+        self._starved_time = 0.0
+        self._overruns = 0          # appsrc queue reached its high watermark
+        self._blocked_time = 0.0    # PUSH mode waiting for the pipeline
+        self._dropped = 0
 
         if (self._mode == GStreamerAppSource.Mode.PUSH):
             Thread.__init__(self, daemon=True, *args, **kwargs)
@@ -62,29 +161,46 @@ class GStreamerAppSource(AppSource, Thread):
             self._push_frames = Event()
             self.start()
 
+    def _create_buffer(self, data, caps):
+        """Create buffer holding frame data
+
+        GLib.Bytes data is wrapped without copy, the buffer holds a reference
+        to it. Bytes are copied to a pooled buffer if caps are raw, else to a
+        new buffer.
+        """
+        if isinstance(data, GLib.Bytes):
+            return Gst.Buffer.new_wrapped_bytes(data)
+        if (not isinstance(data, bytes)):
+            raise Exception("GvaFrameData must contain bytes")
+        gst_buffer = None
+        if self._buffer_pools is not None and BufferPools.poolable(caps):
+            gst_buffer = self._buffer_pools.acquire(caps, len(data))
+        if gst_buffer is None:
+            gst_buffer = Gst.Buffer.new_allocate(None, len(data))
+        gst_buffer.fill(0, data)
+        return gst_buffer
+
     def _create_input_frame(self, item):
         if (isinstance(item, GvaFrameData)):
             gst_buffer = None
+            gst_caps = item.caps
+            if (item.caps) and (isinstance(item.caps, str)):
+                gst_caps = Gst.caps_from_string(item.caps)
             if (item.data):
-                if (not isinstance(item.data, bytes)):
-                    raise Exception("GvaFrameData must contain bytes")
-                gst_buffer = Gst.Buffer.new_allocate(None, len(item.data))
-                gst_buffer.fill(0, item.data)
+                gst_buffer = self._create_buffer(item.data, gst_caps)
                 if (item.pts):
                     gst_buffer.pts = item.pts
                     gst_buffer.dts = item.pts
                 if (item.duration):
                     gst_buffer.duration = item.duration
-                if (item.message) and (isinstance(item.message, str)):
+                message = item.message
+                if (message) and (isinstance(message, str)):
                     try:
-                        item.message = json.loads(item.message)
+                        message = json.loads(message)
                     except Exception:
                         pass
-                if (item.message):
-                    GVAJSONMeta.add_json_meta(gst_buffer, json.dumps(item.message))
-            gst_caps = item.caps
-            if (item.caps) and (isinstance(item.caps, str)):
-                gst_caps = Gst.caps_from_string(item.caps)
+                if (message):
+                    GVAJSONMeta.add_json_meta(gst_buffer, json.dumps(message))
             sample = Gst.Sample.new(gst_buffer, gst_caps, item.segment, item.info)
             return sample
         if isinstance(item, Gst.Sample):
@@ -95,8 +211,20 @@ class GStreamerAppSource(AppSource, Thread):
             return item.sample
         return None
 
-    def _get_and_push(self):
+    def _get_item(self):
+        try:
+            return self._input_queue.get_nowait()
+        except queue.Empty:
+            pass
+        start = time.monotonic()
         item = self._input_queue.get()
+        with self._stats_lock:
+            self._starved += 1
+            self._starved_time += time.monotonic() - start
+        return item
+
+    def _get_and_push(self):
+        item = self._get_item()
         if (not item):
             self._src.end_of_stream()
             return
@@ -105,7 +233,48 @@ class GStreamerAppSource(AppSource, Thread):
             self._src.push_buffer(frame)
         elif isinstance(frame, Gst.Sample):
             self._src.push_sample(frame)
+        with self._stats_lock:
+            self._pushed += 1
+
+    def _wait_for_pipeline(self):
+        """Wait until the pipeline accepts frames, up to push_timeout
+
+        :return: False if timed out
+        :rtype: bool
+        """
+        if self._push_frames.is_set():
+            return True
+        start = time.monotonic()
+        ready = self._push_frames.wait(self._push_timeout)
+        with self._stats_lock:
+            self._blocked_time += time.monotonic() - start
+        return ready
+
+    def _drop_item(self):
+        """Drop the oldest queued frame, so that producers do not block"""
+        try:
+            item = self._input_queue.get_nowait()
+        except queue.Empty:
+            return
+        if (not item):
+            # keep end of stream
+            self._src.end_of_stream()
+            return
+        with self._stats_lock:
+            self._dropped += 1
 
+    def status(self):
+        with self._stats_lock:
+            status = {
+                "pushed": self._pushed,
+                "starved": self._starved,
+                "starved_time": self._starved_time,
+                "overruns": self._overruns,
+                "blocked_time": self._blocked_time,
+                "dropped": self._dropped
+            }
+        status["queued_bytes"] = self._src.get_property("current-level-bytes")
+        return status
 
     def start_frames(self):
         if (self._mode == GStreamerAppSource.Mode.PUSH):
@@ -114,17 +283,24 @@ class GStreamerAppSource(AppSource, Thread):
         self._get_and_push()
 
     def pause_frames(self):
+        with self._stats_lock:
+            self._overruns += 1
         if (self._mode == GStreamerAppSource.Mode.PUSH):
             self._push_frames.clear()
 
 
     def finish(self):
         self._stop = True
+        if self._buffer_pools is not None:
+            self._buffer_pools.clear()
         if (self._mode == GStreamerAppSource.Mode.PUSH):
             self._push_frames.set()
 
     def run(self):
         while (not self._stop):
-            self._push_frames.wait()
+            if not self._wait_for_pipeline():
+                # pipeline full for push_timeout
+                self._drop_item()
+                continue
             if (not self._stop):
                 self._get_and_push()
@@ -0,0 +1,199 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from collections import namedtuple
+from threading import Lock
+
+import gi
+gi.require_version('Gst', '1.0')
+# pylint: disable=wrong-import-position
+from gi.repository import Gst
+from src.server.common.utils import logging
+# pylint: enable=wrong-import-position
+
+EncoderKey = namedtuple('EncoderKey', ['source', 'codec', 'bitrate', 'quality', 'overlay'])
+
+
+class GStreamerEncodedStream():
+    """Encodes the frames of a pipeline instance once and fans the encoded
+    samples out to every consumer.
+
+    Frames are pushed by each consumer, frames with a timestamp already
+    pushed by another consumer are skipped, so the encoder runs once per frame.
+    """
+
+    # (encoded caps, encoder launch string) by codec
+    ENCODERS = {
+        "jpeg": ("image/jpeg",
+                 "jpegenc name=encoder quality={quality}"),
+        "h264": ("video/x-h264,stream-format=byte-stream,alignment=au,profile=baseline",
+                 "x264enc name=encoder speed-preset=ultrafast tune=zerolatency "
+                 "key-int-max=30 bitrate={bitrate}")
+    }
+
+    def __init__(self, key, frame_caps):
+        self._logger = logging.get_logger('GStreamerEncodedStream', is_static=True)
+        self.key = key
+        self._frame_caps = frame_caps
+        self._consumers = []
+        # consumers and counters, push is serialized separately as it may block
+        self._lock = Lock()
+        self._push_lock = Lock()
+        self._stopped = False
+        self._last_pts = None
+        self._pipeline = None
+        self._app_src = None
+        self.caps = self._encoded_caps(key.codec, frame_caps)
+        self.frames = 0
+        self.skipped = 0
+        self.encoded = 0
+
+    @staticmethod
+    def _encoded_caps(codec, frame_caps):
+        structure = frame_caps.get_structure(0)
+        fields = [GStreamerEncodedStream.ENCODERS[codec][0]]
+        for field in ("width", "height"):
+            found, value = structure.get_int(field)
+            if found:
+                fields.append("{}={}".format(field, value))
+        found, numerator, denominator = structure.get_fraction("framerate")
+        if found:
+            fields.append("framerate={}/{}".format(numerator, denominator))
+        return Gst.Caps.from_string(",".join(fields))
+
+    def _get_launch_string(self):
+        encoded_caps, encoder = GStreamerEncodedStream.ENCODERS[self.key.codec]
+        elements = ["appsrc name=source format=time is-live=true caps=\"{}\"".format(
+            self._frame_caps.to_string())]
+        if self._frame_caps.to_string().startswith("image/jpeg"):
+            elements.append("jpegdec")
+        elements.append("videoconvert")
+        if self.key.overlay:
+            elements.append("gvawatermark")
+        elements.append(encoder.format(bitrate=self.key.bitrate, quality=self.key.quality))
+        elements.append(encoded_caps)
+        elements.append("appsink name=sink emit-signals=true sync=false")
+        return " ! ".join(elements)
+
+    def start(self):
+        launch_string = self._get_launch_string()
+        self._logger.info("Starting shared encoder {}: {}".format(self.key, launch_string))
+        self._pipeline = Gst.parse_launch(launch_string)
+        self._app_src = self._pipeline.get_by_name("source")
+        self._app_src.set_property("block", True)
+        self._app_src.set_property("max-buffers", 2)
+        sink = self._pipeline.get_by_name("sink")
+        sink.connect("new-sample", self._on_new_sample)
+        self._pipeline.set_state(Gst.State.PLAYING)
+
+    def add_consumer(self, consumer):
+        with self._lock:
+            self._consumers.append(consumer)
+
+    def remove_consumer(self, consumer):
+        """Remove consumer, returns the number of remaining consumers"""
+        with self._lock:
+            if consumer in self._consumers:
+                self._consumers.remove(consumer)
+            return len(self._consumers)
+
+    def push(self, frame):
+        """Push a raw frame to the encoder, unless it was already pushed
+
+        Returns True if the frame is encoded
+        """
+        buffer = frame.get_buffer()
+        with self._push_lock:
+            if self._stopped:
+                return False
+            if buffer.pts != Gst.CLOCK_TIME_NONE:
+                if self._last_pts is not None and buffer.pts <= self._last_pts:
+                    self.skipped += 1
+                    return False
+                self._last_pts = buffer.pts
+            self.frames += 1
+            retval = self._app_src.emit('push-buffer', buffer)
+        if retval != Gst.FlowReturn.OK:
+            self._logger.debug("Push buffer failed for shared encoder {} with {}".format(
+                self.key, retval))
+            return False
+        return True
+
+    def _on_new_sample(self, sink):
+        sample = sink.emit("pull-sample")
+        if not sample:
+            return Gst.FlowReturn.ERROR
+        with self._lock:
+            self.encoded += 1
+            consumers = list(self._consumers)
+        for consumer in consumers:
+            consumer(sample)
+        return Gst.FlowReturn.OK
+
+    def stop(self):
+        self._stopped = True
+        if self._pipeline:
+            # flushing unblocks a pending push
+            self._pipeline.set_state(Gst.State.NULL)
+        with self._push_lock:
+            self._app_src = None
+            self._pipeline = None
+        self._logger.info("Stopped shared encoder {}, encoded {} frames, skipped {}".format(
+            self.key, self.encoded, self.skipped))
+
+
+class GStreamerSharedEncoders():
+    """Encoded streams shared by the RTSP and WebRTC destinations, by key"""
+
+    def __init__(self):
+        self._logger = logging.get_logger('GStreamerSharedEncoders', is_static=True)
+        self._lock = Lock()
+        self._streams = {}
+
+    @staticmethod
+    def key(source, codec, bitrate=None, quality=None, overlay=True):
+        if codec not in GStreamerEncodedStream.ENCODERS:
+            raise ValueError("Unsupported shared encoder codec: {}".format(codec))
+        # bitrate only applies to h264, quality to jpeg
+        return EncoderKey(source, codec,
+                          bitrate if codec == "h264" else None,
+                          quality if codec == "jpeg" else None,
+                          bool(overlay))
+
+    def acquire(self, key, frame_caps, consumer):
+        """Add consumer to the encoded stream of key, started on first use
+
+        consumer is called with each encoded sample, from the encoder thread.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            if not stream:
+                stream = GStreamerEncodedStream(key, frame_caps)
+                stream.start()
+                self._streams[key] = stream
+            else:
+                self._logger.info("Sharing encoder {}".format(key))
+            stream.add_consumer(consumer)
+            return stream
+
+    def release(self, key, consumer):
+        """Remove consumer, stopping the encoded stream of key once unused"""
+        with self._lock:
+            stream = self._streams.get(key)
+            if not stream or stream.remove_consumer(consumer):
+                return
+            del self._streams[key]
+        stream.stop()
+
+    def __len__(self):
+        return len(self._streams)
+
+    def stop(self):
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+        for stream in streams:
+            stream.stop()
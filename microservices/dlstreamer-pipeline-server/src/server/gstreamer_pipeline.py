@@ -5,6 +5,8 @@
 #
 
 import copy
+import functools
+import hashlib
 import json
 import os
 import string
@@ -17,14 +19,21 @@ gi.require_version('Gst', '1.0')
 gi.require_version('GstApp', '1.0')
 # pylint: disable=wrong-import-position
 from gi.repository import GLib, Gst, GstApp
+from src.publisher.common.channel import BLOCK, DROP_OLDEST
 from src.server.app_destination import AppDestination
+from src.server.app_destination_worker import AppDestinationWorker
 from src.server.app_source import AppSource
+from src.common import metrics
 from src.server.common.utils import logging
+from src.server.common.utils.inference_governor import InferenceGovernor
+from src.server.common.utils.latency import LatencyTracker
+from src.server.common.utils.lru_cache import LRUCache
 from src.server.pipeline import Pipeline
 from src.server.rtsp.gstreamer_rtsp_destination import GStreamerRtspDestination
 from src.server.rtsp.gstreamer_rtsp_server import GStreamerRtspServer
 from src.server.webrtc.gstreamer_webrtc_destination import GStreamerWebRTCDestination
 from src.server.webrtc.gstreamer_webrtc_manager import GStreamerWebRTCManager
+from src.server.gstreamer_encoded_stream import GStreamerSharedEncoders
 # pylint: enable=wrong-import-position
 
 class GStreamerPipeline(Pipeline):
@@ -50,13 +59,28 @@ class GStreamerPipeline(Pipeline):
     SOURCE_ALIAS = "auto_source"
     GST_ELEMENTS_WITH_SOURCE_SETUP = ("GstURISourceBin")
     GST_ELEMENTS_THAT_EMIT_SOURCE = ("GstGvaMetaConvert")
+    MODEL_DEVICE_PAIRING = [("model", "device"),
+                            ("enc-model", "enc-device"),
+                            ("dec-model", "dec-device")]
+    MODEL_PROPERTIES = ["model-proc", "labels", "labels-file"]
+    MODEL_INSTANCE_ID = "model-instance-id"
+    INFERENCE_INTERVAL = "inference-interval"
+    LAUNCH_PLAN_CACHE_SIZE = 64
+    # max seconds to wait for all app destinations to process queued frames on stop
+    APP_DESTINATION_DRAIN_TIMEOUT = 5
 
     _inference_element_cache = {}
     _mainloop = None
     _mainloop_thread = None
     _rtsp_server = None
     _webrtc_manager = None
+    _shared_encoders = None
     CachedElement = namedtuple("CachedElement", ["element", "pipelines"])
+    # properties set on the inference element at index of the parsed pipeline
+    ElementPlan = namedtuple("ElementPlan", ["index", "type", "properties",
+                                             "cache_key", "set_instance_id"])
+    LaunchPlan = namedtuple("LaunchPlan", ["launch_string", "element_plans"])
+    _launch_plan_cache = LRUCache(LAUNCH_PLAN_CACHE_SIZE)
 
     @staticmethod
     def gobject_mainloop():
@@ -83,9 +107,7 @@ class GStreamerPipeline(Pipeline):
         self.stop_time = None
         self._avg_fps = 0
         self._gst_launch_string = None
-        self.latency_times = dict()
-        self.sum_pipeline_latency = 0
-        self.count_pipeline_latency = 0
+        self.latency = LatencyTracker()
         self._real_base = None
         self._stream_base = None
         self._year_base = None
@@ -100,11 +122,21 @@ class GStreamerPipeline(Pipeline):
         self._app_source = None
         self.appsink_element = None
         self._app_destinations = []
+        # (name, request, default queue policy) of each app destination
+        self._app_destination_configs = []
+        self._destination_workers = []
         self._cached_element_keys = []
+        self._inference_elements = []
+        self._governor = None
+        self._governor_source_id = None
         self._logger = logging.get_logger('GSTPipeline', is_static=True)
         self.rtsp_path = None
         self._debug_message = ""
         self._options = options
+        self._metric_attributes = {
+            "pipeline": "{}/{}".format(config.get("name"), config.get("version")),
+            "pipeline_id": str(identifier)
+        }
 
 
         if (not GStreamerPipeline._mainloop):
@@ -113,11 +145,15 @@ class GStreamerPipeline(Pipeline):
             GStreamerPipeline._mainloop_thread.daemon = True
             GStreamerPipeline._mainloop_thread.start()
         if options:
+            if (not GStreamerPipeline._shared_encoders):
+                GStreamerPipeline._shared_encoders = GStreamerSharedEncoders()
             if (options.enable_rtsp and not GStreamerPipeline._rtsp_server):
-                GStreamerPipeline._rtsp_server = GStreamerRtspServer(options.rtsp_port)
+                GStreamerPipeline._rtsp_server = GStreamerRtspServer(
+                    options.rtsp_port, GStreamerPipeline._shared_encoders)
                 GStreamerPipeline._rtsp_server.start()
             if (options.enable_webrtc and not GStreamerPipeline._webrtc_manager):
-                GStreamerPipeline._webrtc_manager = GStreamerWebRTCManager(options.webrtc_signaling_server)
+                GStreamerPipeline._webrtc_manager = GStreamerWebRTCManager(
+                    options.webrtc_signaling_server, GStreamerPipeline._shared_encoders)
         self.rtsp_server = GStreamerPipeline._rtsp_server
         self.webrtc_manager = GStreamerPipeline._webrtc_manager
 
@@ -132,6 +168,9 @@ class GStreamerPipeline(Pipeline):
         if (GStreamerPipeline._webrtc_manager):
             GStreamerPipeline._webrtc_manager.stop()
             GStreamerPipeline._webrtc_manager = None
+        if (GStreamerPipeline._shared_encoders):
+            GStreamerPipeline._shared_encoders.stop()
+            GStreamerPipeline._shared_encoders = None
         if (GStreamerPipeline._mainloop):
             GStreamerPipeline._mainloop.quit()
             GStreamerPipeline._mainloop = None
@@ -164,6 +203,8 @@ class GStreamerPipeline(Pipeline):
                 raise Exception("Unsupported Frame Destination: {}".format(
                     rtsp_destination["class"]))
             self._app_destinations.append(rtsp_app_destination)
+            self._app_destination_configs.append(
+                ("rtsp", rtsp_destination, DROP_OLDEST))
         if "webrtc" in frame_destination_dict:
             webrtc_destination = frame_destination_dict["webrtc"]
             self._logger.info("Request assigned webrtc frame destination {dest}".format(
@@ -175,8 +216,15 @@ class GStreamerPipeline(Pipeline):
             if not webrtc_app_destination:
                 raise Exception("Unsupported Frame Destination: {}".format(webrtc_destination["class"]))
             self._app_destinations.append(webrtc_app_destination)
+            self._app_destination_configs.append(
+                ("webrtc", webrtc_destination, DROP_OLDEST))
 
     def _delete_pipeline(self, new_state):
+        """Tear down the pipeline, called with _create_delete_lock held
+
+        :return: App destination workers and destinations, to finish with
+            _finish_deleted_pipeline once the lock is released
+        """
         self._cal_avg_fps()
         self.state = new_state
         self.stop_time = time.time()
@@ -193,13 +241,22 @@ class GStreamerPipeline(Pipeline):
             del self.pipeline
             self.pipeline = None
 
+        if self._governor_source_id is not None:
+            GLib.source_remove(self._governor_source_id)
+            self._governor_source_id = None
+        self._inference_elements = []
+
         if self._app_source:
             self._app_source.finish()
             del self._app_source
             self._app_source = None
 
-        for destination in self._app_destinations:
-            destination.finish()
+        # queued frames are drained without the lock, see _finish_deleted_pipeline
+        workers = self._destination_workers
+        for worker in workers:
+            worker.close()
+        self._destination_workers = []
+        destinations = list(self._app_destinations)
 
         if self.appsrc_element:
             del self.appsrc_element
@@ -210,6 +267,7 @@ class GStreamerPipeline(Pipeline):
             self.appsink_element = None
 
         self._app_destinations.clear()
+        self._app_destination_configs.clear()
 
         if (new_state == Pipeline.State.ERROR):
             for key in self._cached_element_keys:
@@ -218,11 +276,25 @@ class GStreamerPipeline(Pipeline):
                         pipeline.stop()
                 del GStreamerPipeline._inference_element_cache[key]
 
+        return workers, destinations
+
+    def _finish_deleted_pipeline(self, workers, destinations):
+        """Wait for app destinations to process their queued frames, finish them
+        and report the pipeline finished. Called without _create_delete_lock.
+        """
+        deadline = time.monotonic() + self.APP_DESTINATION_DRAIN_TIMEOUT
+        for worker in workers:
+            worker.join(max(0, deadline - time.monotonic()))
+
+        for destination in destinations:
+            destination.finish()
+
         self._finished_callback()
 
     def _delete_pipeline_with_lock(self, new_state):
         with(self._create_delete_lock):
-            self._delete_pipeline(new_state)
+            deleted = self._delete_pipeline(new_state)
+        self._finish_deleted_pipeline(*deleted)
 
     def stop(self):
         with(self._create_delete_lock):
@@ -279,9 +351,19 @@ class GStreamerPipeline(Pipeline):
             "elapsed_time": elapsed_time,
             "message": message
         }
-        if self.count_pipeline_latency != 0:
-            status_obj["avg_pipeline_latency"] = self.sum_pipeline_latency / \
-                self.count_pipeline_latency
+        if self._governor:
+            status_obj["inference_governor"] = self._governor.status()
+        if self._destination_workers:
+            status_obj["destinations"] = {worker.name: worker.health()
+                                          for worker in self._destination_workers}
+        app_source = self._app_source
+        if app_source:
+            app_source_status = app_source.status()
+            if app_source_status is not None:
+                status_obj["app_source"] = app_source_status
+        if self.latency.count != 0:
+            status_obj["avg_pipeline_latency"] = self.latency.average()
+            status_obj["pipeline_latency_percentiles"] = self.latency.percentiles()
 
         return status_obj
 
@@ -363,56 +445,95 @@ class GStreamerPipeline(Pipeline):
                                      property_name, element.__gtype__.name))
             self._unset_properties.append([element.__gtype__.name, property_name, property_value])
 
-    def _cache_inference_elements(self):
-        model_instance_id = "model-instance-id"
-        gva_elements = [(element, element.__gtype__.name + '_'
-                         + element.get_property(model_instance_id))
-                        for element in self.pipeline.iterate_elements()
-                        if (element.__gtype__.name in self.GVA_INFERENCE_ELEMENT_TYPES
-                            and model_instance_id in [x.name for x in element.list_properties()]
-                            and element.get_property(model_instance_id))]
-        for element, key in gva_elements:
+    def _launch_plan_key(self):
+        request = {key: value for key, value in self.request.items()
+                   if key not in ("models", "priority", self.SOURCE_ALIAS)}
+        try:
+            parameters = json.dumps(request, sort_keys=True, default=repr)
+        except (TypeError, ValueError):
+            return None
+        return (self.config.get("name"), self.config.get("version"), self.template,
+                hashlib.sha256(parameters.encode()).hexdigest(),
+                getattr(self.model_manager, "revision", None))
+
+    def _plan_element(self, index, element):
+        properties = {}
+
+        def get_property(name):
+            if name in properties:
+                return properties[name]
+            return element.get_property(name)
+
+        for model_name, device_name in self.MODEL_DEVICE_PAIRING:
+            if element.find_property(model_name) and \
+                    "VA_DEVICE_DEFAULT" in get_property(model_name):
+                properties[model_name] = self.model_manager.get_default_network_for_device(
+                    get_property(device_name), get_property(model_name))
+        for property_name in self.MODEL_PROPERTIES:
+            if element.find_property(property_name) and not get_property(property_name):
+                model_properties = self.model_manager.model_properties[property_name]
+                if get_property("model") in model_properties:
+                    property_value = model_properties[get_property("model")]
+                    if property_value is not None:
+                        properties[property_name] = property_value
+
+        cache_key = None
+        set_instance_id = False
+        if element.find_property(self.MODEL_INSTANCE_ID):
+            model_instance_id = get_property(self.MODEL_INSTANCE_ID)
+            if model_instance_id:
+                cache_key = element.__gtype__.name + '_' + model_instance_id
+            else:
+                set_instance_id = True
+        return GStreamerPipeline.ElementPlan(index, element.__gtype__.name,
+                                             tuple(properties.items()),
+                                             cache_key, set_instance_id)
+
+    def _apply_element_plan(self, element, element_plan):
+        for property_name, property_value in element_plan.properties:
+            self._logger.debug("Setting {} to {} for element {}".format(
+                property_name, property_value, element.get_name()))
+            element.set_property(property_name, property_value)
+        if element_plan.cache_key:
+            key = element_plan.cache_key
             if key not in GStreamerPipeline._inference_element_cache:
                 GStreamerPipeline._inference_element_cache[key] = GStreamerPipeline.CachedElement(
                     element, [])
             self._cached_element_keys.append(key)
             GStreamerPipeline._inference_element_cache[key].pipelines.append(self)
-
-    def _set_default_models(self):
-        model_device_pairing = [("model", "device"),
-                                ("enc-model", "enc-device"),
-                                ("dec-model", "dec-device")]
-
-        for model_name, device_name in model_device_pairing:
-            gva_elements = [element for element in self.pipeline.iterate_elements() if (
-                element.__gtype__.name in self.GVA_INFERENCE_ELEMENT_TYPES and
-                element.find_property(model_name) and
-                "VA_DEVICE_DEFAULT" in element.get_property(model_name))]
-
-            for element in gva_elements:
-                network = self.model_manager.get_default_network_for_device(
-                    element.get_property(device_name), element.get_property(model_name))
-                self._logger.debug("Setting {} to {} for element {}".format(
-                    model_name, network, element.get_name()))
-                element.set_property(model_name, network)
+        elif element_plan.set_instance_id:
+            instance_id = element.get_property("name") + "_" + str(self.identifier)
+            element.set_property(self.MODEL_INSTANCE_ID, instance_id)
+
+    def _set_inference_element_properties(self, element_plans=None):
+        """Set default models, model properties and model instance ids of
+        inference elements in a single walk of the pipeline elements.
+
+        :param element_plans: Plans of an earlier instance with the same launch plan key,
+                              planned from element properties if None or not matching
+        :return: Element plans applied
+        """
+        elements = list(self.pipeline.iterate_elements())
+        if element_plans is None or not all(
+                plan.index < len(elements) and elements[plan.index].__gtype__.name == plan.type
+                for plan in element_plans):
+            element_plans = [self._plan_element(index, element)
+                             for index, element in enumerate(elements)
+                             if element.__gtype__.name in self.GVA_INFERENCE_ELEMENT_TYPES]
+        for element_plan in element_plans:
+            self._apply_element_plan(elements[element_plan.index], element_plan)
+        self._inference_elements = [elements[element_plan.index] for element_plan in element_plans]
+        return element_plans
 
     @staticmethod
     def _get_elements_by_type(pipeline, type_strings):
         return [element for element in pipeline.iterate_elements()
                 if element.__gtype__.name in type_strings]
 
-    def _set_model_property(self, property_name):
-        gva_elements = [element for element in self.pipeline.iterate_elements() if (
-            element.__gtype__.name in self.GVA_INFERENCE_ELEMENT_TYPES)]
-        for element in gva_elements:
-            if element.find_property(property_name) and not element.get_property(property_name):
-                if element.get_property("model") in self.model_manager.model_properties[property_name]:
-                    property_value = self.model_manager.model_properties[property_name][element.get_property("model")]
-                    if property_value is None:
-                        continue
-                    self._logger.debug("Setting {} to {} for element {}".format(
-                        property_name, property_value, element.get_name()))
-                    element.set_property(property_name, property_value)
+    @staticmethod
+    @functools.lru_cache(maxsize=LAUNCH_PLAN_CACHE_SIZE)
+    def _template_field_names(template):
+        return frozenset(fname for _, fname, _, _ in string.Formatter().parse(template))
 
     @staticmethod
     def validate_config(config, request):
@@ -536,17 +657,6 @@ class GStreamerPipeline(Pipeline):
                 break
         return src
 
-    def _set_model_instance_id(self):
-        model_instance_id = "model-instance-id"
-        gva_elements = [element for element in self.pipeline.iterate_elements()
-                        if (element.__gtype__.name in self.GVA_INFERENCE_ELEMENT_TYPES)
-                        and model_instance_id in [x.name for x in element.list_properties()]
-                        and not element.get_property(model_instance_id)]
-        for element in gva_elements:
-            name = element.get_property("name")
-            instance_id = name + "_" + str(self.identifier)
-            element.set_property(model_instance_id, instance_id)
-
     def _set_source_and_sink(self):
         src = self._get_any_source()
         if self._auto_source and src.__gtype__.name in self.GST_ELEMENTS_WITH_SOURCE_SETUP:
@@ -569,13 +679,18 @@ class GStreamerPipeline(Pipeline):
     def start(self):
         if self.model_manager:
             self.request["models"] = self.model_manager.models
-        field_names = [fname for _, fname, _, _ in string.Formatter().parse(self.template)]
-        if self.SOURCE_ALIAS in field_names:
+        plan_key = self._launch_plan_key()
+        launch_plan = GStreamerPipeline._launch_plan_cache.get(plan_key) if plan_key else None
+        if self.SOURCE_ALIAS in self._template_field_names(self.template):
             self._set_auto_source()
             self.request[self.SOURCE_ALIAS] = self._auto_source
-        self._gst_launch_string = string.Formatter().vformat(
-            self.template, [], self.request)
+        if launch_plan:
+            self._gst_launch_string = launch_plan.launch_string
+        else:
+            self._gst_launch_string = string.Formatter().vformat(
+                self.template, [], self.request)
 
+        deleted = None
         with(self._create_delete_lock):
             if (self.start_time is not None):
                 return
@@ -588,12 +703,11 @@ class GStreamerPipeline(Pipeline):
                 self.pipeline = Gst.parse_launch(self._gst_launch_string)
                 self._set_properties()
                 self._set_bus_messages_flag()
-                self._set_default_models()
-                self._set_model_property("model-proc")
-                self._set_model_property("labels")
-                self._set_model_property("labels-file")
-                self._cache_inference_elements()
-                self._set_model_instance_id()
+                element_plans = self._set_inference_element_properties(
+                    launch_plan.element_plans if launch_plan else None)
+                if plan_key and (not launch_plan or element_plans is not launch_plan.element_plans):
+                    GStreamerPipeline._launch_plan_cache.put(
+                        plan_key, GStreamerPipeline.LaunchPlan(self._gst_launch_string, element_plans))
                 self._set_source_and_sink()
 
                 bus = self.pipeline.get_bus()
@@ -616,11 +730,46 @@ class GStreamerPipeline(Pipeline):
 
                 self.pipeline.set_state(Gst.State.PLAYING)
                 self.start_time = time.time()
+                self._start_governor()
             except Exception as error:
                 self._logger.error("Error on Pipeline {id}: {err}".format(
                     id=self.identifier, err=error))
                 # Context is already within _create_delete_lock
-                self._delete_pipeline(Pipeline.State.ERROR)
+                deleted = self._delete_pipeline(Pipeline.State.ERROR)
+        if deleted:
+            self._finish_deleted_pipeline(*deleted)
+
+    def _start_governor(self):
+        if "inference_governor" not in self.request:
+            return
+        elements = [element for element in self._inference_elements
+                    if element.find_property(self.INFERENCE_INTERVAL)]
+        if not elements:
+            self._logger.warning("Pipeline {id} has no inference elements to govern".format(
+                id=self.identifier))
+            return
+        self._governor = InferenceGovernor.from_config(self.request["inference_governor"])
+        self._inference_elements = elements
+        self._govern()
+        self._governor_source_id = GLib.timeout_add(int(self._governor.period * 1000),
+                                                    self._govern)
+
+    def _govern(self):
+        if self.state.stopped() or not self._inference_elements:
+            self._governor_source_id = None
+            return False
+        interval = self._governor.update(self.frame_count,
+                                         self.latency.count,
+                                         self.latency.histogram.sum,
+                                         time.time() - self.start_time,
+                                         self._inference_elements[0].get_property(
+                                             self.INFERENCE_INTERVAL))
+        if interval is not None:
+            self._logger.info("Pipeline {id} setting {property} to {interval}".format(
+                id=self.identifier, property=self.INFERENCE_INTERVAL, interval=interval))
+            for element in self._inference_elements:
+                element.set_property(self.INFERENCE_INTERVAL, interval)
+        return True
 
     def _log_launch_string(self):
         if not self._gst_launch_string or not logging.is_debug_level(self._logger):
@@ -683,6 +832,8 @@ class GStreamerPipeline(Pipeline):
                 raise Exception("Unsupported Metadata application Destination: {}".format(
                     destination["metadata"]["class"]))
             self._app_destinations.append(app_destination)
+            # lossless by default, like a directly called destination
+            self._app_destination_configs.append(("metadata", destination["metadata"], BLOCK))
 
         if self.appsink_element is not None:
             self.appsink_element.set_property("emit-signals", True)
@@ -690,6 +841,10 @@ class GStreamerPipeline(Pipeline):
             if not self._app_destinations:
                 self.appsink_element.connect("new-sample", self.on_sample)
             else:
+                self._destination_workers = [
+                    AppDestinationWorker(app_destination, name, config, policy)
+                    for app_destination, (name, config, policy)
+                    in zip(self._app_destinations, self._app_destination_configs)]
                 self.appsink_element.connect("new-sample", self.on_sample_app_destination)
 
 
@@ -746,7 +901,7 @@ class GStreamerPipeline(Pipeline):
     def source_probe_callback(unused_pad, info, self):
         buffer = info.get_buffer()
         pts = buffer.pts
-        self.latency_times[pts] = time.time()
+        self.latency.start(pts, time.time())
         return Gst.PadProbeReturn.OK
 
     def source_setup_callback(self, unused_bin, src_element, unused_udata):
@@ -758,10 +913,9 @@ class GStreamerPipeline(Pipeline):
     def appsink_probe_callback(unused_pad, info, self):
         buffer = info.get_buffer()
         pts = buffer.pts
-        source_time = self.latency_times.pop(pts, -1)
-        if source_time != -1:
-            self.sum_pipeline_latency += time.time() - source_time
-            self.count_pipeline_latency += 1
+        latency = self.latency.stop(pts, time.time())
+        if latency is not None:
+            metrics.instruments().latency.record(latency * 1000, self._metric_attributes)
         return Gst.PadProbeReturn.OK
 
     def on_sample_app_destination(self, sink):
@@ -770,20 +924,22 @@ class GStreamerPipeline(Pipeline):
         sample = sink.emit("pull-sample")
 
         try:
-            for destination in self._app_destinations:
-                destination.process_frame(sample)
+            for worker in self._destination_workers:
+                worker.process_frame(sample)
         except Exception as error:
             self._logger.error("Error on Pipeline {id}: Error in App Destination: {err}".format(
                 id=self.identifier, err=error))
             return Gst.FlowReturn.ERROR
 
         self.frame_count += 1
+        metrics.instruments().frames.add(1, self._metric_attributes)
         return Gst.FlowReturn.OK
 
     def on_sample(self, sink):
         _ = sink.emit("pull-sample")
 
         self.frame_count += 1
+        metrics.instruments().frames.add(1, self._metric_attributes)
         return Gst.FlowReturn.OK
 
     def bus_call(self, unused_bus, message, unused_data=None):
@@ -0,0 +1,139 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+#    registry of pipeline instances
+
+import itertools
+import time
+from threading import Lock
+
+
+class InstanceRegistry():
+    """Pipeline instances by id, in creation order.
+
+    Instances are active (queued or running) until marked completed, then
+    indexed by their final state. Completed instances are kept unless a
+    retention is set: those beyond the last max_completed, or completed
+    longer than ttl seconds ago, are evicted.
+    """
+
+    def __init__(self, max_completed=None, ttl=None,
+                 on_evict=None, clock=time.monotonic):
+        """
+        :param int max_completed: Completed instances to keep, unlimited if None or < 0
+        :param float ttl: Seconds to keep completed instances, unlimited if None or <= 0
+        :param on_evict: Called with the id of each evicted instance
+        :param clock: Time source of ttl
+        """
+        self.max_completed = max_completed if max_completed is not None and max_completed >= 0 else None
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._evict_listeners = [on_evict] if on_evict else []
+        self._clock = clock
+        self._instances = {}
+        self._active = {}
+        # instance id -> (completion time, state), in completion order
+        self._completed = {}
+        self._by_state = {}
+        self._lock = Lock()
+
+    def add_evict_listener(self, on_evict):
+        """Also call on_evict with the id of each evicted instance
+
+        :param on_evict: Callable, e.g. dropping other books of the instance
+        """
+        self._evict_listeners.append(on_evict)
+
+    def __setitem__(self, instance_id, instance):
+        with self._lock:
+            self._instances[instance_id] = instance
+            self._active[instance_id] = None
+
+    def __getitem__(self, instance_id):
+        return self._instances[instance_id]
+
+    def __contains__(self, instance_id):
+        return instance_id in self._instances
+
+    def __len__(self):
+        return len(self._instances)
+
+    def get(self, instance_id, default=None):
+        return self._instances.get(instance_id, default)
+
+    def values(self):
+        return list(self._instances.values())
+
+    def items(self):
+        return list(self._instances.items())
+
+    def completed(self, instance_id):
+        """Index an instance by its final state and evict instances beyond retention
+
+        :param str instance_id: Id of an instance in a stopped state
+        """
+        evicted = []
+        with self._lock:
+            if instance_id not in self._active:
+                return
+            del self._active[instance_id]
+            state = self._instances[instance_id].state
+            self._completed[instance_id] = (self._clock(), state)
+            self._by_state.setdefault(state, {})[instance_id] = None
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def evict_expired(self):
+        """Evict instances completed longer than ttl ago"""
+        with self._lock:
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def ids(self, state=None, offset=0, limit=None):
+        """Ids of instances, optionally filtered by state
+
+        Active instances are filtered by their current state. When filtering
+        by a stopped state, completed instances come first, in completion order.
+
+        :param state: Pipeline.State to filter by, all instances if None
+        :param int offset: Number of ids to skip
+        :param int limit: Max number of ids, unlimited if None
+        :rtype: list
+        """
+        self.evict_expired()
+        with self._lock:
+            if state is None:
+                ids = self._instances
+            else:
+                ids = (instance_id for instance_id in self._active
+                       if self._instances[instance_id].state is state)
+                if state.stopped():
+                    # instances stopping, not yet marked completed
+                    ids = itertools.chain(self._by_state.get(state, {}), ids)
+            stop = None if limit is None else offset + limit
+            return list(itertools.islice(ids, offset, stop))
+
+    def _evict(self):
+        evicted = []
+        if self.max_completed is not None:
+            excess = len(self._completed) - self.max_completed
+            evicted.extend(itertools.islice(self._completed, max(excess, 0)))
+        if self.ttl is not None:
+            expiry = self._clock() - self.ttl
+            for instance_id, (completion_time, _) in itertools.islice(
+                    self._completed.items(), len(evicted), None):
+                if completion_time > expiry:
+                    break
+                evicted.append(instance_id)
+        for instance_id in evicted:
+            _, state = self._completed.pop(instance_id)
+            del self._instances[instance_id]
+            del self._by_state[state][instance_id]
+        return evicted
+
+    def _notify(self, evicted):
+        for instance_id in evicted:
+            for on_evict in self._evict_listeners:
+                on_evict(instance_id)
@@ -8,7 +8,9 @@ from collections.abc import MutableMapping
 from collections import defaultdict
 import os
 import fnmatch
+import json
 import string
+from threading import Event, Lock, Thread
 from src.server.common.utils import logging
 
 
@@ -49,6 +51,10 @@ class ModelManager:
         self.network_preference = network_preference
         self.models = defaultdict(dict)
         self.model_properties = defaultdict(dict)
+        # incremented whenever models are (re)loaded
+        self.revision = 0
+        self._lock = Lock()
+        self._watcher = None
 
         if not self.network_preference:
             self.network_preference = {'CPU': ["FP32"],
@@ -140,11 +146,7 @@ class ModelManager:
         return version
 
     def load_models(self, model_dir, network_preference):
-        #TODO: refactor
-        #pylint: disable=too-many-nested-blocks
-
         self.log_banner("Loading Models")
-        error_occurred = False
 
         self.logger.info("Loading Models from Path {path}".format(
             path=os.path.abspath(self.model_dir)))
@@ -152,13 +154,90 @@ class ModelManager:
             self.logger.warning("Models directory is symbolic link")
         if os.path.ismount(self.model_dir):
             self.logger.warning("Models directory is mount point")
-        models = defaultdict(dict)
         if (network_preference):
             for key in network_preference:
                 if (isinstance(network_preference[key], str)):
                     network_preference[key] = network_preference[key].split(
                         ',')
             self.network_preference.update(network_preference)
+        with self._lock:
+            models, model_properties, failed = self._build_models(model_dir)
+            self._swap_models(models, model_properties)
+        self.log_banner("Completed Loading Models")
+        return not failed
+
+    def reload_models(self):
+        """Reload models from model_dir without restart
+
+        Models are validated before use. A model that fails validation keeps
+        its previously loaded versions, if any. The new model table is swapped
+        in as a whole: running pipelines keep the table they started with and
+        new pipeline instances use the new one.
+
+        :return: True if all models loaded
+        """
+        with self._lock:
+            models, model_properties, failed = self._build_models(self.model_dir,
+                                                                  validate=True)
+            for model_name in failed:
+                if model_name in self.models:
+                    models[model_name] = self.models[model_name]
+                    for versions in self.models[model_name].values():
+                        for network in versions["networks"].values():
+                            for property_name in ("model-proc", "labels"):
+                                model_properties[property_name][network["network"]] = \
+                                    self.model_properties[property_name].get(network["network"])
+            self._swap_models(models, model_properties)
+        self.logger.info("Reloaded Models from Path {path}, revision {revision}".format(
+            path=os.path.abspath(self.model_dir), revision=self.revision))
+        return not failed
+
+    def watch(self, interval):
+        """Reload models whenever the contents of model_dir change
+
+        :param float interval: Seconds between checks of model_dir, disabled if <= 0
+        """
+        self.stop_watching()
+        if interval and interval > 0:
+            self._watcher = ModelWatcher(self, interval)
+            self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _swap_models(self, models, model_properties):
+        # rebinding, never mutating, keeps tables referenced by running pipelines intact
+        self.model_properties = model_properties
+        self.models = models
+        self.revision += 1
+
+    @staticmethod
+    def _validate_model(networks, proc, labels):
+        for network in networks.values():
+            path = network["network"]
+            if path.endswith(".xml") and not os.path.isfile(os.path.splitext(path)[0] + ".bin"):
+                raise Exception("{} is missing weights file".format(path))
+        if proc:
+            with open(proc) as proc_file:
+                json.load(proc_file)
+        if labels:
+            with open(labels) as labels_file:
+                labels_file.read()
+
+    def _build_models(self, model_dir, validate=False):
+        """Load model table from model_dir without changing loaded models
+
+        :param str model_dir: Models directory
+        :param bool validate: Check network weights are present and model-proc/labels parse
+        :return: models, model properties, names of models failing to load
+        """
+        #TODO: refactor
+        #pylint: disable=too-many-nested-blocks
+        models = defaultdict(dict)
+        model_properties = defaultdict(dict)
+        failed = []
         for model_name in os.listdir(model_dir):
             try:
                 model_path = os.path.join(model_dir, model_name)
@@ -166,6 +245,8 @@ class ModelManager:
                 if (not os.path.isdir(model_path)):
                     continue
 
+                versions = {}
+                properties = defaultdict(dict)
                 for version in os.listdir(model_path):
                     version_path = os.path.join(model_path, version)
                     if (os.path.isdir(version_path)):
@@ -180,24 +261,26 @@ class ModelManager:
                         networks = self._get_model_networks(
                             version_path)
                         if (networks):
+                            if validate:
+                                self._validate_model(networks, proc, labels)
                             for key in networks:
                                 networks[key].update({"proc": proc,
                                                       "labels": labels,
                                                       "version": version,
                                                       "type": "IntelDLDT",
                                                       "description": model_name})
-                                self.model_properties["model-proc"][networks[key]["network"]] = proc
-                                self.model_properties["labels"][networks[key]["network"]] = labels
-
-                            models[model_name][version] = ModelsDict(model_name,
-                                                                     version,
-                                                                     {"networks": networks,
-                                                                      "proc": proc,
-                                                                      "labels" : labels,
-                                                                      "version": version,
-                                                                      "type": "IntelDLDT",
-                                                                      "description": model_name
-                                                                      })
+                                properties["model-proc"][networks[key]["network"]] = proc
+                                properties["labels"][networks[key]["network"]] = labels
+
+                            versions[version] = ModelsDict(model_name,
+                                                           version,
+                                                           {"networks": networks,
+                                                            "proc": proc,
+                                                            "labels" : labels,
+                                                            "version": version,
+                                                            "type": "IntelDLDT",
+                                                            "description": model_name
+                                                            })
                             network_paths = {
                                 key: value["network"] for key, value in networks.items()}
                             network_paths["model-proc"] = proc
@@ -208,15 +291,17 @@ class ModelManager:
                         else:
                             raise Exception("{model}/{ver} is missing Network"
                                             .format(model=model_name, ver=version))
+                if versions:
+                    models[model_name] = versions
+                for property_name, values in properties.items():
+                    model_properties[property_name].update(values)
 
             except Exception as error:
-                error_occurred = True
+                failed.append(model_name)
                 self.logger.error("Error Loading Model {model_name}"
                                   " from: {model_dir}: {err}".format(
                                       err=error, model_name=model_name, model_dir=model_dir))
-        self.models = models
-        self.log_banner("Completed Loading Models")
-        return not error_occurred
+        return models, model_properties, failed
 
     def log_banner(self, heading):
         banner = "="*len(heading)
@@ -262,3 +347,57 @@ class ModelManager:
                     if result:
                         results.append(result)
         return results
+
+
+class ModelWatcher():
+    """Polls a model manager's model_dir, reloading models when its contents change"""
+
+    def __init__(self, model_manager, interval):
+        """
+        :param ModelManager model_manager: Models to reload
+        :param float interval: Seconds between checks of model_dir
+        """
+        self._model_manager = model_manager
+        self._interval = interval
+        self._stop_event = Event()
+        self._snapshot = self.snapshot(model_manager.model_dir)
+        self._thread = Thread(target=self._run, name="ModelWatcher", daemon=True)
+
+    @staticmethod
+    def snapshot(model_dir):
+        """Path, size and modification time of every file under model_dir"""
+        files = []
+        for root, _, names in os.walk(model_dir, followlinks=True):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, stat.st_size, stat.st_mtime_ns))
+        return sorted(files)
+
+    def check(self):
+        """Reload models if model_dir changed since the last check
+
+        :return: True if models were reloaded
+        """
+        snapshot = self.snapshot(self._model_manager.model_dir)
+        if snapshot == self._snapshot:
+            return False
+        self._snapshot = snapshot
+        self._model_manager.reload_models()
+        return True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            try:
+                self.check()
+            except Exception as error:
+                self._model_manager.logger.error("Error Reloading Models: {}".format(error))
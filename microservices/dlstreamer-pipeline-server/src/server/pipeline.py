@@ -17,6 +17,19 @@ class Pipeline:
         def stopped(self):
             return not (self is Pipeline.State.QUEUED or self is Pipeline.State.RUNNING)
 
+    # incremented on every state change, lets observers cache state derived data
+    state_version = 0
+    _state = None
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, value):
+        self._state = value
+        self.state_version += 1
+
     def __init__(self, identifier, config, model_manager, request, finished_callback, options):
         pass
 
@@ -9,26 +9,36 @@ import json
 import string
 import traceback
 from threading import Lock
-from collections import deque
 from collections import defaultdict
 import uuid
 import jsonschema
 from src.server.common.utils import logging
+from src.server.common.utils.inference_governor import InferenceGovernor
+from src.server.instance_registry import InstanceRegistry
 from src.server.pipeline import Pipeline
+from src.server.pipeline_scheduler import PipelineScheduler
 from src.server import schema
 
 class PipelineManager:
 
     def __init__(self, model_manager, pipeline_dir, max_running_pipelines,
-                 ignore_init_errors=False):
+                 ignore_init_errors=False,
+                 max_completed_instances=None,
+                 completed_instance_ttl=None):
         self.max_running_pipelines = max_running_pipelines
         self.model_manager = model_manager
         self.running_pipelines = 0
         self.pipeline_types = {}
-        self.pipeline_instances = {}
         self.pipeline_state = {}
         self.pipelines = {}
-        self.pipeline_queue = deque()
+        # (name, version) -> request section -> compiled validator
+        self._validators = {}
+        # (name, version) -> config section -> default values of its properties
+        self._defaults = {}
+        self.pipeline_queue = PipelineScheduler()
+        self.pipeline_instances = InstanceRegistry(max_completed_instances,
+                                                   completed_instance_ttl,
+                                                   on_evict=self.pipeline_queue.forget)
         self.pipeline_dir = pipeline_dir
         self.logger = logging.get_logger('PipelineManager', is_static=True)
         self._run_counter_lock = Lock()
@@ -66,6 +76,8 @@ class PipelineManager:
         # pylint: disable=too-many-branches,too-many-nested-blocks,too-many-statements
         self.log_banner("Loading Pipelines")
         error_occurred = False
+        self._validators = {}
+        self._defaults = {}
         self.pipeline_types = self._import_pipeline_types()
         self.logger.info("Loading Pipelines from Config Path {path}".format(
             path=self.pipeline_dir))
@@ -115,6 +127,11 @@ class PipelineManager:
                                                              config['type'],
                                                              path))
                                         self._update_defaults_from_env(pipelines[pipeline][version])
+                                        self._compile_pipeline(pipelines[pipeline][version])
+                                        self.pipeline_queue.configure(
+                                            "{}/{}".format(pipeline, version),
+                                            weight=config.get("scheduling_weight"),
+                                            max_running=config.get("max_running_instances"))
                                     else:
                                         del pipelines[pipeline][version]
                                         self.logger.error("Pipeline %s with type %s not supported",
@@ -138,6 +155,48 @@ class PipelineManager:
         self.log_banner("Completed Loading Pipelines")
         return not error_occurred
 
+    def _compile_pipeline(self, config):
+        """Compile request validators and collect default values of a loaded pipeline
+        so creating instances does not repeat the work for each request
+
+        :param dict config: Pipeline config, with defaults set
+        """
+        key = (config["name"], config["version"])
+        validators = {}
+        defaults = {}
+        for section in ["parameters", "source", "tags", "destination"]:
+            if section in config:
+                validators[section] = self._create_validator(config[section])
+        destinations = {destination: destination_config for destination, destination_config
+                        in config.get("destination", {}).items()
+                        if isinstance(destination_config, dict)}
+        for destination, destination_config in destinations.items():
+            validators[("destination", destination)] = self._create_validator(destination_config)
+        sections = [("parameters", "properties"), ("tags", "properties")]
+        sections.extend(("source", source_type, "properties")
+                        for source_type, source_config in config.get("source", {}).items()
+                        if isinstance(source_config, dict))
+        sections.extend(("destination", destination, destination_type, "properties")
+                        for destination, destination_config in destinations.items()
+                        for destination_type, type_config in destination_config.items()
+                        if isinstance(type_config, dict))
+        for config_section in sections:
+            section_config = Pipeline.get_config_section(config, config_section)
+            if isinstance(section_config, dict):
+                defaults[config_section] = self._get_section_defaults(section_config)
+        self._validators[key] = validators
+        self._defaults[key] = defaults
+
+    @staticmethod
+    def _create_validator(config):
+        return jsonschema.Draft4Validator(
+            schema=config, format_checker=jsonschema.draft4_format_checker)
+
+    @staticmethod
+    def _get_section_defaults(config):
+        return {key: value["default"] for key, value in config.items()
+                if isinstance(value, dict) and "default" in value}
+
     def _update_defaults_from_env(self, config):
         config = Pipeline.get_config_section(
             config, ["parameters", "properties"])
@@ -205,12 +264,11 @@ class PipelineManager:
             params_obj["parameters"] = self.pipelines[name][version]["parameters"]
         return params_obj
 
-    def is_input_valid(self, request, pipeline_config, section):
-        config = pipeline_config.get(section, {})
+    def is_input_valid(self, request, pipeline_config, section, input_validator=None):
         try:
             if (section in request):
-                input_validator = jsonschema.Draft4Validator(
-                    schema=config, format_checker=jsonschema.draft4_format_checker)
+                if input_validator is None:
+                    input_validator = self._create_validator(pipeline_config.get(section, {}))
                 input_validator.validate(request.get(section, {}))
                 self.logger.debug(
                     "{} Validation successful".format(section))
@@ -221,11 +279,15 @@ class PipelineManager:
             return False
 
     def set_section_defaults(self, request, config, request_section, config_section):
+        defaults = self._defaults.get((config.get("name"), config.get("version")), {}).get(
+            tuple(config_section))
         section, config = Pipeline.get_section_and_config(
             request, config, request_section, config_section)
-        for key in config:
-            if key not in section and "default" in config[key]:
-                section[key] = config[key]["default"]
+        if defaults is None:
+            defaults = self._get_section_defaults(config)
+        for key, value in defaults.items():
+            if key not in section:
+                section[key] = value
 
         if (len(section) != 0):
             result = request
@@ -274,23 +336,38 @@ class PipelineManager:
         pipeline_type = self.pipelines[name][str(version)]['type']
         pipeline_config = self.pipelines[name][str(version)]
 
+        validators = self._validators.get((name, str(version)), {})
+
         request = request_original.copy()
 
         self.set_defaults(request, pipeline_config)
 
-        if not self.is_input_valid(request, pipeline_config, "parameters"):
+        if not self.is_input_valid(request, pipeline_config, "parameters",
+                                   validators.get("parameters")):
             return None, "Invalid Parameters"
         if "destination" in request:
             destination_section = request.get("destination")
             destination_config = pipeline_config.get("destination", {})
             for destination in destination_section:
-                if not self.is_input_valid(destination_section, destination_config, destination) or \
+                if not self.is_input_valid(destination_section, destination_config, destination,
+                                           validators.get(("destination", destination))) or \
                         not (isinstance(destination_section[destination], dict) or isinstance(destination_section[destination], list)):
                     return None, "Invalid Destination"
-        if not self.is_input_valid(request, pipeline_config, "source"):
+        if not self.is_input_valid(request, pipeline_config, "source",
+                                   validators.get("source")):
             return None, "Invalid Source"
-        if not self.is_input_valid(request, pipeline_config, "tags"):
+        if not self.is_input_valid(request, pipeline_config, "tags",
+                                   validators.get("tags")):
             return None, "Invalid Tags"
+        priority = request.get("priority", 0)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            return None, "Invalid Priority"
+        if "inference_governor" in request:
+            try:
+                InferenceGovernor.from_config(request["inference_governor"])
+            except (TypeError, ValueError) as error:
+                self.logger.debug("Invalid inference_governor: {}".format(error))
+                return None, "Invalid Inference Governor"
 
         instance_id = uuid.uuid1().hex
         request["pipeline"] = {
@@ -302,38 +379,53 @@ class PipelineManager:
             pipeline_config,
             self.model_manager,
             request,
-            self._pipeline_finished,
+            lambda: self._pipeline_finished(instance_id),
             options)
-        self.pipeline_queue.append(instance_id)
+        self.pipeline_queue.add(instance_id, "{}/{}".format(name, version), priority)
         self._start()
         return instance_id, None
 
     def _get_next_pipeline_identifier(self):
-        if (self.max_running_pipelines > 0):
-            if (self.running_pipelines >= self.max_running_pipelines):
-                return None
-
-        try:
-            if (self.pipeline_queue):
-                return self.pipeline_queue.popleft()
-        except Exception:
-            pass
-
-        return None
+        with self._run_counter_lock:
+            if (self.max_running_pipelines > 0):
+                if (self.running_pipelines >= self.max_running_pipelines):
+                    return None
+            pipeline_identifier = self.pipeline_queue.next()
+            if (pipeline_identifier):
+                self.running_pipelines += 1
+            return pipeline_identifier
 
     def _start(self):
+        # several instances may become startable at once, e.g. when an
+        # instance of a pipeline at its running instance cap finishes
         pipeline_identifier = self._get_next_pipeline_identifier()
-        if (pipeline_identifier):
-            pipeline_to_start = self.pipeline_instances[pipeline_identifier]
-            with self._run_counter_lock:
-                self.running_pipelines += 1
-            pipeline_to_start.start()
+        while (pipeline_identifier):
+            self.pipeline_instances[pipeline_identifier].start()
+            pipeline_identifier = self._get_next_pipeline_identifier()
 
-    def _pipeline_finished(self):
-        with self._run_counter_lock:
-            self.running_pipelines -= 1
+    def _pipeline_finished(self, instance_id):
+        if self.pipeline_queue.finished(instance_id):
+            with self._run_counter_lock:
+                self.running_pipelines -= 1
+        self.pipeline_instances.completed(instance_id)
         self._start()
 
+    def _scheduling_status(self, instance_id, status):
+        status["priority"] = self.pipeline_instances[instance_id].request.get("priority", 0)
+        status["queue_position"] = self.pipeline_queue.queue_position(instance_id)
+        status["preempted"] = self.pipeline_queue.preempted(instance_id)
+        return status
+
+    def get_instance_state_version(self, instance_id):
+        """Counter changing on each state change of an instance
+
+        :return: State version, None if the instance does not exist
+        """
+        pipeline_instance = self.pipeline_instances.get(instance_id)
+        if pipeline_instance is None:
+            return None
+        return pipeline_instance.state_version
+
     def get_instance_summary(self, instance_id):
         if self.instance_exists(instance_id):
             return self.pipeline_instances[instance_id].params()
@@ -344,25 +436,35 @@ class PipelineManager:
             return self.pipeline_instances[instance_id].params()
         return None
 
-    def get_all_instance_status(self):
+    def get_all_instance_status(self, state=None, offset=0, limit=None):
+        """Status of pipeline instances in creation order
+
+        :param state: Only instances in this Pipeline.State if not None
+        :param int offset: Number of instances to skip
+        :param int limit: Max number of instances, unlimited if None
+        """
         results = []
-        for pipeline_instance in self.pipeline_instances.values():
-            results.append(pipeline_instance.status())
+        for instance_id in self.pipeline_instances.ids(state, offset, limit):
+            pipeline_instance = self.pipeline_instances.get(instance_id)
+            if pipeline_instance is not None:
+                results.append(self._scheduling_status(
+                    instance_id, pipeline_instance.status()))
         return results
 
     def get_instance_status(self, instance_id, name=None, version=None):
         if self.instance_exists(instance_id, name, version):
             status = self.pipeline_instances[instance_id].status()
-            return status
+            return self._scheduling_status(instance_id, status)
         return None
 
     def stop_instance(self, instance_id, name=None, version=None):
         if self.instance_exists(instance_id, name, version):
-            try:
-                self.pipeline_queue.remove(instance_id)
-            except Exception:
-                pass
-            return self.pipeline_instances[instance_id].stop()
+            queued = self.pipeline_queue.remove(instance_id)
+            status = self.pipeline_instances[instance_id].stop()
+            if queued:
+                # queued instances stop without running the finished callback
+                self.pipeline_instances.completed(instance_id)
+            return status
         return None
 
     def instance_exists(self, instance_id, name=None, version=None):
@@ -0,0 +1,212 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+#    scheduling of queued pipeline instances
+
+import heapq
+import itertools
+from threading import Lock
+
+DEFAULT_PRIORITY = 0
+DEFAULT_WEIGHT = 1.0
+
+
+class _PipelineGroup():
+    """Queued and running instances of one pipeline name/version"""
+
+    def __init__(self, weight=DEFAULT_WEIGHT, max_running=0):
+        self.weight = weight
+        self.max_running = max_running
+        self.running = set()
+        # (-priority, sequence, instance id)
+        self.queue = []
+        # virtual finish time of the last dispatched instance
+        self.finish_time = 0.0
+
+    def can_run(self):
+        return self.max_running <= 0 or len(self.running) < self.max_running
+
+
+class PipelineScheduler():
+    """Orders queued pipeline instances for start.
+
+    Instances with higher priority start first. Among instances of equal
+    priority, pipelines (name/version) share start slots by weighted fair
+    queuing, each pipeline getting starts in proportion to its weight, and
+    instances of the same pipeline start in request order. Pipelines may cap
+    their number of running instances.
+
+    A queued instance counts as preempted each time an instance requested
+    after it starts first due to its higher priority.
+    """
+
+    def __init__(self):
+        self._groups = {}
+        self._queued = {}
+        self._preempted = {}
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        # queue positions, computed on first lookup after the queue changed
+        self._positions = None
+        self._lock = Lock()
+
+    def configure(self, group, weight=None, max_running=None):
+        """Set weight and running instance cap of a pipeline
+
+        :param str group: Pipeline name/version
+        :param float weight: Share of start slots relative to other pipelines, 1 if None
+        :param int max_running: Max running instances, unlimited if None or <= 0
+        """
+        if weight is not None and weight <= 0:
+            raise ValueError("weight must be positive")
+        with self._lock:
+            state = self._groups.setdefault(group, _PipelineGroup())
+            state.weight = weight or DEFAULT_WEIGHT
+            state.max_running = max_running or 0
+            self._positions = None
+
+    def add(self, instance_id, group, priority=DEFAULT_PRIORITY):
+        """Queue an instance for start
+
+        :param str instance_id: Pipeline instance id
+        :param str group: Pipeline name/version
+        :param int priority: Instances with higher priority start first
+        """
+        with self._lock:
+            state = self._groups.setdefault(group, _PipelineGroup())
+            heapq.heappush(state.queue, (-priority, next(self._sequence), instance_id))
+            self._queued[instance_id] = group
+            self._preempted[instance_id] = 0
+            self._positions = None
+
+    def remove(self, instance_id):
+        """Remove a queued instance
+
+        :return: True if the instance was queued
+        """
+        with self._lock:
+            group = self._queued.pop(instance_id, None)
+            if group is None:
+                return False
+            del self._preempted[instance_id]
+            state = self._groups[group]
+            state.queue = [entry for entry in state.queue if entry[2] != instance_id]
+            heapq.heapify(state.queue)
+            self._positions = None
+            return True
+
+    def next(self):
+        """Dequeue the next instance to start, marking it running
+
+        :return: Instance id, None if no queued instance can run
+        """
+        with self._lock:
+            selected = None
+            for state in self._groups.values():
+                if not state.queue or not state.can_run():
+                    continue
+                neg_priority, sequence, _ = state.queue[0]
+                key = (neg_priority, self._start_tag(state), sequence)
+                if selected is None or key < selected[0]:
+                    selected = (key, state)
+            if selected is None:
+                return None
+            (neg_priority, start_tag, sequence), state = selected
+            _, _, instance_id = heapq.heappop(state.queue)
+            state.finish_time = start_tag + 1.0 / state.weight
+            self._virtual_time = start_tag
+            state.running.add(instance_id)
+            del self._queued[instance_id]
+            self._positions = None
+            for other in self._groups.values():
+                for other_priority, other_sequence, other_id in other.queue:
+                    if other_sequence < sequence and other_priority > neg_priority:
+                        self._preempted[other_id] += 1
+            return instance_id
+
+    def finished(self, instance_id):
+        """Release the slot of a running instance
+
+        :return: True if the instance was running
+        """
+        with self._lock:
+            for state in self._groups.values():
+                if instance_id in state.running:
+                    state.running.discard(instance_id)
+                    return True
+            return False
+
+    def _start_tag(self, state):
+        return max(state.finish_time, self._virtual_time)
+
+    def queue_positions(self):
+        """Start order of queued instances, not accounting for running instance caps
+
+        :return: Dict of instance id to 0 based position
+        """
+        with self._lock:
+            return dict(self._get_positions())
+
+    def queue_position(self, instance_id):
+        """Start order of a queued instance, see queue_positions
+
+        :return: 0 based position, None if the instance is not queued
+        """
+        with self._lock:
+            if instance_id not in self._queued:
+                return None
+            return self._get_positions()[instance_id]
+
+    def _get_positions(self):
+        """Queue positions, replaying the queue only if it changed since the last call.
+        Called with the lock held.
+        """
+        if self._positions is None:
+            self._positions = self._compute_positions()
+        return self._positions
+
+    def _compute_positions(self):
+        virtual_time = self._virtual_time
+        finish_times = {group: state.finish_time for group, state in self._groups.items()}
+        queues = {group: sorted(state.queue) for group, state in self._groups.items()
+                  if state.queue}
+        heads = {group: 0 for group in queues}
+        positions = {}
+        while queues:
+            selected = None
+            for group, queue in queues.items():
+                neg_priority, sequence, _ = queue[heads[group]]
+                start_tag = max(finish_times[group], virtual_time)
+                key = (neg_priority, start_tag, sequence)
+                if selected is None or key < selected[0]:
+                    selected = (key, group)
+            (_, start_tag, _), group = selected
+            positions[queues[group][heads[group]][2]] = len(positions)
+            finish_times[group] = start_tag + 1.0 / self._groups[group].weight
+            virtual_time = start_tag
+            heads[group] += 1
+            if heads[group] == len(queues[group]):
+                del queues[group]
+        return positions
+
+    def preempted(self, instance_id):
+        """Number of times a later, higher priority instance started ahead of an instance
+        while it was queued
+        """
+        with self._lock:
+            return self._preempted.get(instance_id, 0)
+
+    def forget(self, instance_id):
+        """Drop preemption count of an instance no longer tracked"""
+        with self._lock:
+            if instance_id not in self._queued:
+                self._preempted.pop(instance_id, None)
+
+    def __len__(self):
+        return len(self._queued)
+
+    def __contains__(self, instance_id):
+        return instance_id in self._queued
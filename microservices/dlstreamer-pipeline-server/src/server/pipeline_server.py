@@ -71,6 +71,14 @@ class __PipelineServer:
 
                 if 'avg_pipeline_latency' not in result:
                     result['avg_pipeline_latency'] = None
+                if 'pipeline_latency_percentiles' not in result:
+                    result['pipeline_latency_percentiles'] = None
+                if 'destinations' not in result:
+                    result['destinations'] = None
+                if 'inference_governor' not in result:
+                    result['inference_governor'] = None
+                if 'app_source' not in result:
+                    result['app_source'] = None
 
                 if (not self._status_named_tuple):
                     self._status_named_tuple = namedtuple(
@@ -80,6 +88,11 @@ class __PipelineServer:
 
             return None
 
+        def state_version(self):
+            if (self._instance):
+                return self._pipeline_server.pipeline_manager.get_instance_state_version(self._instance)
+            return None
+
         def _set_or_update(self, request, section_name, section=None):
             if (section is None):
                 section = {}
@@ -134,13 +147,16 @@ class __PipelineServer:
                                  self.options.model_dir)),
                 self.options.network_preference,
                 self.options.ignore_init_errors)
+            self.model_manager.watch(self.options.model_watch_interval)
 
             self.pipeline_manager = PipelineManager(
                 self.model_manager,
                 os.path.abspath(os.path.join(self.options.config_path,
                                              self.options.pipeline_dir)),
                 max_running_pipelines=self.options.max_running_pipelines,
-                ignore_init_errors=self.options.ignore_init_errors)
+                ignore_init_errors=self.options.ignore_init_errors,
+                max_completed_instances=self.options.max_completed_instances,
+                completed_instance_ttl=self.options.completed_instance_ttl)
             self._stopped = False
 
     def __del__(self):
@@ -158,6 +174,9 @@ class __PipelineServer:
 
     def stop(self):
 
+        if self.model_manager:
+            self.model_manager.stop_watching()
+
         for instance in self.pipeline_instances():
             if (not instance.status().state.stopped()):
                 instance.stop()
@@ -10,6 +10,7 @@ gi.require_version('Gst', '1.0')
 from gi.repository import Gst
 from src.server.common.utils import logging
 from src.server.app_destination import AppDestination
+from src.server.gstreamer_encoded_stream import GStreamerSharedEncoders
 # pylint: enable=wrong-import-position
 
 class GStreamerRtspDestination(AppDestination):
@@ -28,6 +29,7 @@ class GStreamerRtspDestination(AppDestination):
         self._last_timestamp = 0
         self._frame_size = 0
         self._clock = Gst.SystemClock()
+        self._encoded_stream = None
         # caps = Gst.Caps.from_string("video/x-raw")
         # if self._pipeline.appsink_element.props.caps:
         #     caps = caps.intersect(self._pipeline.appsink_element.props.caps)
@@ -44,18 +46,43 @@ class GStreamerRtspDestination(AppDestination):
         self._sync_with_destination = request.get("sync-with-destination", True)
         self._encode_quality = request.get("encode-quality", 85)
         self.overlay = request.get("overlay", True)
+        self._codec = request.get("codec", "jpeg")
+        self._bitrate = request.get("bitrate", 2048)
+        # h264 is only encoded by shared encoders
+        self._shared_encoder = request.get("shared-encoder", False) or self._codec != "jpeg"
 
     def _init_stream(self, sample):
         self._frame_size = sample.get_buffer().get_size()
         caps = sample.get_caps()
         self._pipeline.appsink_element.props.caps = caps
         self._need_data = False
-        self._rtsp_server.add_stream(self._identifier, self._rtsp_path, caps, self,self.overlay)
+        overlay = self.overlay
+        if self._use_shared_encoder(caps):
+            key = GStreamerSharedEncoders.key(self._identifier, self._codec, self._bitrate,
+                                              self._encode_quality, self.overlay)
+            self._encoded_stream = self._rtsp_server.shared_encoders.acquire(
+                key, caps, self._on_encoded_sample)
+            # stream served as encoded by the shared encoder
+            caps = self._encoded_stream.caps
+            overlay = False
+        self._rtsp_server.add_stream(self._identifier, self._rtsp_path, caps, self, overlay)
         self._last_timestamp = self._clock.get_time()
         if self._sync_with_source is not None:
             self._pipeline.appsink_element.set_property("sync", self._sync_with_source)
             self._logger.info("Setting the appsink sync property to {}".format(self._sync_with_source))
 
+    def _use_shared_encoder(self, caps):
+        if not self._shared_encoder or not self._rtsp_server:
+            return False
+        # jpeg frames without overlay are streamed as is
+        return not (self._codec == "jpeg" and not self.overlay and
+                    caps.to_string().startswith("image/jpeg"))
+
+    def _on_encoded_sample(self, sample):
+        if self._need_data and self._app_src:
+            # encoded buffers are shared by all consumers, timestamps are set on a copy
+            self._push_buffer(sample.get_buffer().copy())
+
     def on_need_data(self, _src, _):
         self._need_data = True
 
@@ -100,7 +127,10 @@ class GStreamerRtspDestination(AppDestination):
 
     def _process_frame(self, frame):
         if self._need_data:
-            self._push_buffer(frame.get_buffer())
+            if self._encoded_stream:
+                self._encoded_stream.push(frame)
+            else:
+                self._push_buffer(frame.get_buffer())
         else:
             self._last_timestamp = self._clock.get_time()
 
@@ -113,5 +143,9 @@ class GStreamerRtspDestination(AppDestination):
 
     def finish(self):
         self._end_stream()
+        if self._encoded_stream:
+            self._rtsp_server.shared_encoders.release(self._encoded_stream.key,
+                                                      self._on_encoded_sample)
+            self._encoded_stream = None
         if self._rtsp_server:
             self._rtsp_server.remove_stream(self._rtsp_path)
\ No newline at end of file
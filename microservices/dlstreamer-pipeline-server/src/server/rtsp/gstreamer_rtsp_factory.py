@@ -24,6 +24,8 @@ class GStreamerRtspFactory(GstRtspServer.RTSPMediaFactory):
     _RtspVideoPipeline = " ! videoconvert  \
         ! gvawatermark ! jpegenc name=jpegencoder ! rtpjpegpay name=pay0" 
 
+    _RtspVideoPipeline_withh264input = " ! h264parse ! rtph264pay name=pay0 pt=96 config-interval=-1"
+
     # Decoding audio again as there is issue with audio pipeline element audiomixer
     _RtspAudioPipeline = " ! queue ! decodebin ! audioresample ! audioconvert " \
     " ! avenc_aac ! queue ! mpegtsmux ! rtpmp2tpay  name=pay0 pt=96"
@@ -40,9 +42,9 @@ class GStreamerRtspFactory(GstRtspServer.RTSPMediaFactory):
     def _select_caps(self, caps):
         split_caps = caps.split(',')
         new_caps = []
-        selected_caps = ['image/jpeg', 'video/x-raw', 'width', 'height',
+        selected_caps = ['image/jpeg', 'video/x-raw', 'video/x-h264', 'width', 'height',
                          'audio/x-raw', 'rate', 'channels', 'layout',
-                         'format']
+                         'format', 'alignment', 'profile']
         for cap in split_caps:
             for selected in selected_caps:
                 if selected in cap:
@@ -64,7 +66,9 @@ class GStreamerRtspFactory(GstRtspServer.RTSPMediaFactory):
         overlay = stream.overlay
         new_caps = self._select_caps(caps.to_string())
         s_src = "{} caps=\"{}\"".format(GStreamerRtspFactory._source, ','.join(new_caps))
-        if "image/jpeg" in new_caps:
+        if "video/x-h264" in new_caps:
+            media_pipeline = GStreamerRtspFactory._RtspVideoPipeline_withh264input
+        elif "image/jpeg" in new_caps:
             if overlay:
                 media_pipeline = GStreamerRtspFactory._RtspVideoPipeline_withjpeginput_overlay
             else:
@@ -14,13 +14,14 @@ gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GstRtspServer, GLib
 from src.server.common.utils import logging
 from src.server.rtsp.gstreamer_rtsp_factory import GStreamerRtspFactory
+from src.server.gstreamer_encoded_stream import GStreamerSharedEncoders
 # pylint: enable=wrong-import-position
 
 Stream = namedtuple('stream', ['source', 'caps','overlay'])
 Stream.__new__.__defaults__ = (None, None, True)
 
 class GStreamerRtspServer():
-    def __init__(self, port):
+    def __init__(self, port, shared_encoders=None):
         self._logger = logging.get_logger('GSTRtspServer', is_static=True)
         Gst.init(None)
         self._stopped = False
@@ -34,6 +35,8 @@ class GStreamerRtspServer():
         self._thread = None
         self._factory = GStreamerRtspFactory(self)
         self._factory.set_shared(True)
+        # encoders shared by the streams of a pipeline instance, and with WebRTC
+        self.shared_encoders = shared_encoders if shared_encoders is not None else GStreamerSharedEncoders()
 
     def check_if_path_exists(self, rtsp_path):
         if rtsp_path in self._streams:
@@ -104,6 +104,22 @@ source = {
     ]
 }
 
+# queue of application, rtsp and webrtc destinations, see AppDestinationWorker
+app_destination_queue = {
+    "queue_maxsize": {
+        "type": "integer",
+        "minimum": 1
+    },
+    "queue_policy": {
+        "type": "string",
+        "enum": ["drop_oldest", "drop_newest", "block"]
+    },
+    "queue_timeout": {
+        "type": "number",
+        "minimum": 0
+    }
+}
+
 destination = {
     "metadata": {
         "application": {
@@ -115,7 +131,8 @@ destination = {
                 },
                 "class": {
                     "type":"string"
-                }
+                },
+                **app_destination_queue
             },
             "required":["type", "class"]
         },
@@ -300,7 +317,21 @@ destination = {
               "overlay": {
                 "type": "boolean",
                 "default": True
-              }
+              },
+              "codec": {
+                "type": "string",
+                "enum": ["jpeg", "h264"],
+                "default": "jpeg"
+              },
+              "bitrate": {
+                "type": "integer",
+                "minimum": 1
+              },
+              "shared-encoder": {
+                "type": "boolean",
+                "default": False
+              },
+              **app_destination_queue
             },
             "required": [
               "type",
@@ -331,10 +362,15 @@ destination = {
               "bitrate": {
                 "type": "integer"
               },
+              "shared-encoder": {
+                "type": "boolean",
+                "default": False
+              },
               "overlay": {
                 "type": "boolean",
                 "default": True
-              }
+              },
+              **app_destination_queue
             },
             "required": [
               "type",
@@ -381,7 +417,21 @@ destination = {
                 "overlay": {
                   "type": "boolean",
                   "default": True
-                }
+                },
+                "codec": {
+                  "type": "string",
+                  "enum": ["jpeg", "h264"],
+                  "default": "jpeg"
+                },
+                "bitrate": {
+                  "type": "integer",
+                  "minimum": 1
+                },
+                "shared-encoder": {
+                  "type": "boolean",
+                  "default": False
+                },
+                **app_destination_queue
               },
               "required": [
                 "type",
@@ -412,9 +462,14 @@ destination = {
                 "bitrate": {
                   "type": "integer"
                 },
+                "shared-encoder": {
+                  "type": "boolean",
+                  "default": False
+                },
                 "overlay": {
                   "type": "boolean"
-                }
+                },
+                **app_destination_queue
               },
               "required": [
                 "type",
@@ -10,6 +10,7 @@ gi.require_version('Gst', '1.0')
 from gi.repository import Gst
 from src.server.common.utils import logging
 from src.server.app_destination import AppDestination
+from src.server.gstreamer_encoded_stream import GStreamerSharedEncoders
 # pylint: enable=wrong-import-position
 
 class GStreamerWebRTCDestination(AppDestination):
@@ -18,6 +19,7 @@ class GStreamerWebRTCDestination(AppDestination):
         AppDestination.__init__(self, request, pipeline)
         self._pipeline = pipeline
         self._webrtc_manager = pipeline.webrtc_manager
+        self._identifier = pipeline.identifier
         self._app_src = None
         self._logger = logging.get_logger('GStreamerWebRTCDestination', is_static=True)
         self._need_data = False
@@ -26,6 +28,7 @@ class GStreamerWebRTCDestination(AppDestination):
         self._frame_size = 0
         self._frame_count = 0
         self._clock = Gst.SystemClock()
+        self._encoded_stream = None
         # caps = Gst.Caps.from_string("video/x-raw")
         # if self._pipeline.appsink_element.props.caps:
         #     caps = caps.intersect(self._pipeline.appsink_element.props.caps)
@@ -41,6 +44,7 @@ class GStreamerWebRTCDestination(AppDestination):
         self._sync_with_destination = request.get("sync-with-destination", True)
         self.overlay = request.get("overlay",True)
         self.bitrate = request.get("bitrate", 2048)
+        self._shared_encoder = request.get("shared-encoder", False)
 
     def _init_stream(self, sample):
         self._frame_size = sample.get_buffer().get_size()
@@ -53,7 +57,21 @@ class GStreamerWebRTCDestination(AppDestination):
             self._logger.info("Setting the appsink sync property to {}".format(self._sync_with_source))
         self._logger.info("Adding WebRTC frame destination stream for peer_id {}.".format(self._webrtc_peerid))
         self._logger.debug("WebRTC Stream frame caps == {}".format(caps))
-        self._webrtc_manager.add_stream(self._webrtc_peerid, caps, self,self.overlay)
+        overlay = self.overlay
+        if self._shared_encoder:
+            key = GStreamerSharedEncoders.key(self._identifier, "h264", self.bitrate,
+                                              overlay=self.overlay)
+            self._encoded_stream = self._webrtc_manager.shared_encoders.acquire(
+                key, caps, self._on_encoded_sample)
+            # stream served as encoded by the shared encoder
+            caps = self._encoded_stream.caps
+            overlay = False
+        self._webrtc_manager.add_stream(self._webrtc_peerid, caps, self, overlay)
+
+    def _on_encoded_sample(self, sample):
+        if self._need_data and self._app_src:
+            # encoded buffers are shared by all consumers, timestamps are set on a copy
+            self._push_buffer(sample.get_buffer().copy())
 
     def _on_need_data(self, _unused_src, _):
         self._need_data = True
@@ -100,7 +118,10 @@ class GStreamerWebRTCDestination(AppDestination):
 
     def _process_frame(self, frame):
         if self._need_data:
-            self._push_buffer(frame.get_buffer())
+            if self._encoded_stream:
+                self._encoded_stream.push(frame)
+            else:
+                self._push_buffer(frame.get_buffer())
         else:
             self._last_timestamp = self._clock.get_time()
 
@@ -114,5 +135,9 @@ class GStreamerWebRTCDestination(AppDestination):
 
     def finish(self):
         self._end_stream()
+        if self._encoded_stream:
+            self._webrtc_manager.shared_encoders.release(self._encoded_stream.key,
+                                                         self._on_encoded_sample)
+            self._encoded_stream = None
         if self._webrtc_manager:
             self._webrtc_manager.remove_stream(self._webrtc_peerid)
\ No newline at end of file
@@ -5,6 +5,7 @@
 #
 
 from src.server.webrtc.gstreamer_webrtc_stream import GStreamerWebRTCStream
+from src.server.gstreamer_encoded_stream import GStreamerSharedEncoders
 from src.server.common.utils import logging
 class GStreamerWebRTCManager:
 
@@ -17,11 +18,14 @@ class GStreamerWebRTCManager:
                 " ! x264enc speed-preset=ultrafast name=h264enc " \
                 " ! video/x-h264,profile=baseline " \
                 " ! whipclientsink signaller::whip-endpoint="
+    _WebRTCVideoPipeline_h264 = " ! h264parse ! whipclientsink signaller::whip-endpoint="
 
-    def __init__(self, whip_endpoint):
+    def __init__(self, whip_endpoint, shared_encoders=None):
         self._logger = logging.get_logger('GStreamerWebRTCManager', is_static=True)
         self._whip_endpoint = whip_endpoint
         self._streams = {}
+        # encoders shared by the streams of a pipeline instance, and with RTSP
+        self.shared_encoders = shared_encoders if shared_encoders is not None else GStreamerSharedEncoders()
 
     def _peerid_in_use(self, peer_id):
         if not peer_id:
@@ -42,8 +46,8 @@ class GStreamerWebRTCManager:
     def _select_caps(self, caps):
         split_caps = caps.split(',')
         new_caps = []
-        selected_caps = ['image/jpeg', 'video/x-raw', 'width', 'height', 'framerate',
-                         'layout', 'format']
+        selected_caps = ['image/jpeg', 'video/x-raw', 'video/x-h264', 'width', 'height',
+                         'framerate', 'layout', 'format', 'alignment', 'profile']
         for cap in split_caps:
             for selected in selected_caps:
                 if selected in cap:
@@ -52,7 +56,9 @@ class GStreamerWebRTCManager:
 
     def _get_launch_string(self, stream_caps, peer_id,overlay):
         s_src = "{} caps=\"{}\"".format(self._source_mediamtx, ','.join(stream_caps))
-        if "image/jpeg" in stream_caps:
+        if "video/x-h264" in stream_caps:
+            video_pipeline = self._WebRTCVideoPipeline_h264
+        elif "image/jpeg" in stream_caps:
             video_pipeline = self._WebRTCVideoPipeline_jpeg
         else:
             video_pipeline = self._WebRTCVideoPipeline
@@ -12,24 +12,60 @@ import gi
 from gi.repository import Gst
 from gstgva.util import GVAJSONMeta
 import json
+import os
 import time
 
 from src.common.log import get_logger
+from src.publisher.common.encode_pool import EncodePool, OrderedEncoder
 
 gi.require_version('Gst', '1.0')
 
 MAX_REQUEST_QUEUE_SIZE = 100
+REQUEST_ID_KEY = "request_id"   # request key copied to the buffer metadata for correlating outputs
+DEFAULT_INGEST_WORKERS = min(4, os.cpu_count() or 1)
 
 class ImageIngestor:
-    def __init__(self, input_queue, pipeline_config) -> None:
+    def __init__(self, input_queue, pipeline_config, on_request_error=None) -> None:
+        """Constructor
+
+        :param input_queue: Queue of Gst samples fed to the pipeline
+        :param pipeline_config: Pipeline config
+        :param on_request_error: Callable invoked with (request_id, error) for
+            requests with a request_id which are not handed to the pipeline
+        """
         self.gst_queue = input_queue    # gst compatible items are sent to this queue
+        self.on_request_error = on_request_error
         self.request_queue = queue.Queue(maxsize=MAX_REQUEST_QUEUE_SIZE)  # hold item from input request
-        self.th = th.Thread(target=self._run, args=(self.request_queue,))
+        self.th = None
         self.stop_ev = th.Event()
         self.done = False
         self.log = get_logger(f'{__name__}')
 
+        # "image_ingestor": {"workers": 4, "max_rate": 30, "batch_size": 4, "batch_window_ms": 20}
+        ingest_cfg = pipeline_config.get("image_ingestor", {})
+        self.workers = ingest_cfg.get("workers", DEFAULT_INGEST_WORKERS)
+        self.max_rate = ingest_cfg.get("max_rate", None)
+        self.batch_size = ingest_cfg.get("batch_size", 1)
+        self.batch_window = ingest_cfg.get("batch_window_ms", 0) / 1000
+        if not isinstance(self.workers, int) or self.workers < 1:
+            raise ValueError("Invalid image_ingestor workers: {}".format(self.workers))
+        if self.max_rate is not None and self.max_rate <= 0:
+            raise ValueError("Invalid image_ingestor max_rate: {}".format(self.max_rate))
+        if not isinstance(self.batch_size, int) or self.batch_size < 1:
+            raise ValueError("Invalid image_ingestor batch_size: {}".format(self.batch_size))
+        if self.batch_window < 0:
+            raise ValueError("Invalid image_ingestor batch_window_ms: {}".format(
+                ingest_cfg["batch_window_ms"]))
+
+        # requests are read and decoded in parallel, and emitted in arrival order
+        self._pool = EncodePool(self.workers, name="image-ingest")
+        self._decoder = OrderedEncoder(self._pool)
+        self._batch = []    # decoded samples held back until the batch is complete
+        self._batch_start = None
+        self._next_emit = 0.0
+
     def start(self):
+        self.th = th.Thread(target=self._run, args=(self.request_queue,))
         self.th.start()
 
     def stop(self):
@@ -37,63 +73,140 @@ class ImageIngestor:
         if self.stop_ev.is_set():
             return
         self.stop_ev.set()
-        self.th.join()
-        self.th = None
+        if self.th is not None:
+            self.th.join()
+            self.th = None
+        self._pool.shutdown()
 
     def error_handler(self, msg):
         self.log.error('Error in ingestor thread: {}'.format(msg))
         self.log.info("clearing pending items from request queue...")
         while not self.request_queue.empty():   # so that it doesnot block the producer thread
             try:
-                self.request_queue.get_nowait()
+                item = self.request_queue.get_nowait()
             except queue.Empty:
                 break
+            self._fail_request(item, "Request dropped after ingestor error")
         self.done = True
 
-    def _run(self, request_queue: queue.Queue) -> None:
-        while not self.stop_ev.is_set():
-            try:
-                item = request_queue.get(timeout=1)
-                blob = None
-                self.log.info("Recevied request by image ingestor queue")
+    def _fail_request(self, item, error):
+        """Notify a request with a request_id that it will get no output"""
+        if self.on_request_error is None or not isinstance(item, dict):
+            return
+        request_id = item.get(REQUEST_ID_KEY, None)
+        if request_id is not None:
+            self.on_request_error(request_id, error)
 
-                # fetch any user metadata from the request
-                additional_meta = item.get("custom_meta_data", {})
+    def _read_request(self, item):
+        """Read the image of a request into a Gst sample, run in the worker pool
 
-                # TODO: If the item contains a feature_vector, add it to the additional_meta dict
+        :param dict item: Image request
+        :rtype: Gst.Sample
+        """
+        blob = None
 
-                if item["source"]["type"] == "file":
-                    fp = item["source"]["path"]
-                    additional_meta.update({"source_path": fp})
-                    with open(fp,"rb") as f:
-                        # Do something with the image and send it to gst input queue
-                        blob = f.read()
-                    additional_meta["source_path"] = fp
+        # fetch any user metadata from the request
+        additional_meta = dict(item.get("custom_meta_data", {}))
 
-                elif item["source"]["type"] == "base64_image":
-                    # Convert base64 encoded string into image blob
-                    base64_str = item["source"]["data"]
-                    additional_meta.update({"source_data": "base64_image"})
-                    blob = base64.b64decode(base64_str)
+        # correlate the pipeline output with the request
+        if item.get(REQUEST_ID_KEY, None) is not None:
+            additional_meta[REQUEST_ID_KEY] = item[REQUEST_ID_KEY]
 
-                # Creating GstSample from raw bytes blob
-                bufferLength = len(blob)
+        # TODO: If the item contains a feature_vector, add it to the additional_meta dict
 
-                # Allocate GstBuffer
-                buf = Gst.Buffer.new_allocate(None, bufferLength, None)
-                buf.fill(0, blob)
+        if item["source"]["type"] == "file":
+            fp = item["source"]["path"]
+            additional_meta.update({"source_path": fp})
+            with open(fp,"rb") as f:
+                # Do something with the image and send it to gst input queue
+                blob = f.read()
+            additional_meta["source_path"] = fp
 
-                # update any additional metadata
-                if additional_meta:
-                    GVAJSONMeta.add_json_meta(buf, json.dumps(additional_meta))
+        elif item["source"]["type"] == "base64_image":
+            # Convert base64 encoded string into image blob
+            base64_str = item["source"]["data"]
+            additional_meta.update({"source_data": "base64_image"})
+            blob = base64.b64decode(base64_str)
 
-                # Create GstSample from GstBuffer
-                gva_blob = Gst.Sample(buf, None, None, None)
+        # Creating GstSample from raw bytes blob
+        bufferLength = len(blob)
 
-                self.gst_queue.put(gva_blob)
-                self.log.info("Gst Sample sent to gst queue")
-            except queue.Empty:
-                time.sleep(0.005)
+        # Allocate GstBuffer
+        buf = Gst.Buffer.new_allocate(None, bufferLength, None)
+        buf.fill(0, blob)
+
+        # update any additional metadata
+        if additional_meta:
+            GVAJSONMeta.add_json_meta(buf, json.dumps(additional_meta))
+
+        # Create GstSample from GstBuffer
+        return Gst.Sample(buf, None, None, None)
+
+    def _collect(self, wait=False):
+        """Move decoded requests to the batch, in arrival order
+
+        :param bool wait: Wait for all requests being decoded
+        """
+        for future, item in self._decoder.completed(wait=wait):
+            try:
+                gva_blob = future.result()
+            except Exception as errmsg:
+                self._fail_request(item, errmsg)
+                self.error_handler(errmsg)
                 continue
+            if not self._batch:
+                self._batch_start = time.monotonic()
+            self._batch.append(gva_blob)
+            if len(self._batch) >= self.batch_size:
+                self._emit()
+
+    def _emit(self):
+        """Send the batch to the pipeline, paced to max_rate samples per second.
+        Samples of a batch are sent back to back, so that they fill an
+        inference batch (e.g. gvadetect batch-size) together.
+        """
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        if self.max_rate:
+            delay = self._next_emit - time.monotonic()
+            if delay > 0:
+                self.stop_ev.wait(delay)
+            self._next_emit = max(self._next_emit, time.monotonic()) + len(batch) / self.max_rate
+        for gva_blob in batch:
+            self.gst_queue.put(gva_blob)
+        self.log.debug("{} Gst Samples sent to gst queue".format(len(batch)))
+
+    def _get_timeout(self):
+        timeout = 0.005 if len(self._decoder) else 1
+        if self._batch:
+            # until the batch window expires
+            timeout = min(timeout, max(0.0, self._batch_start + self.batch_window - time.monotonic()))
+        return timeout
+
+    def _run(self, request_queue: queue.Queue) -> None:
+        while not self.stop_ev.is_set():
+            item = None
+            try:
+                try:
+                    item = request_queue.get(timeout=self._get_timeout())
+                except queue.Empty:
+                    item = None
+                if item is not None:
+                    self.log.info("Recevied request by image ingestor queue")
+                    self._decoder.submit(item, self._read_request, item)
+                    item = None
+                self._collect()
+                if self._batch and time.monotonic() - self._batch_start >= self.batch_window:
+                    # partial batch
+                    self._emit()
             except Exception as errmsg:
+                self._fail_request(item, errmsg)
                 self.error_handler(errmsg)
+
+        # hand over requests accepted before stopping
+        try:
+            self._collect(wait=True)
+            self._emit()
+        except Exception as errmsg:
+            self.error_handler(errmsg)
@@ -0,0 +1,123 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import queue
+import statistics
+import threading as th
+import time
+
+import pytest
+
+from src.publisher.common.channel import BoundedChannel, BLOCK, DROP_NEWEST, DROP_OLDEST
+
+
+class FakePublisher:
+    """Publisher consuming from a BoundedChannel, recording enqueue to dequeue latency"""
+
+    def __init__(self, channel):
+        self.queue = channel
+        self.latencies = []
+        self.received = []
+        self.stop_ev = th.Event()
+        self.th = th.Thread(target=self._run)
+        self.th.start()
+
+    def stop(self):
+        self.stop_ev.set()
+        self.queue.close()
+        self.th.join()
+
+    def _run(self):
+        while not self.stop_ev.is_set():
+            try:
+                enqueued, item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.latencies.append(time.perf_counter() - enqueued)
+            self.received.append(item)
+
+
+class TestBoundedChannel:
+
+    @pytest.mark.parametrize('kwargs', [{'maxsize': 0},
+                                        {'maxsize': 1, 'policy': 'unknown'},
+                                        {'maxsize': 1, 'timeout': -1}])
+    def test_invalid_config(self, kwargs):
+        with pytest.raises(ValueError):
+            BoundedChannel(**kwargs)
+
+    def test_from_config(self):
+        channel = BoundedChannel.from_config({'queue_maxsize': 5, 'queue_policy': 'block',
+                                              'queue_timeout': 0.1}, 1000)
+        assert (channel.maxsize, channel.policy, channel.timeout) == (5, BLOCK, 0.1)
+        channel = BoundedChannel.from_config({}, 1000)
+        assert (channel.maxsize, channel.policy, channel.timeout) == (1000, DROP_OLDEST, None)
+
+    @pytest.mark.parametrize('policy, expected, dropped', [(DROP_OLDEST, [2, 3], [0, 1]),
+                                                           (DROP_NEWEST, [0, 1], [2, 3]),
+                                                           (BLOCK, [0, 1], [2, 3])])
+    def test_drop_policy(self, policy, expected, dropped):
+        on_drop = []
+        channel = BoundedChannel(2, policy=policy, timeout=0.01, on_drop=on_drop.append)
+        accepted = [channel.append(i) for i in range(4)]
+        assert accepted == [True, True] + [policy == DROP_OLDEST] * 2
+        assert channel.dropped == 2
+        assert on_drop == dropped
+        assert [channel.get(timeout=0) for _ in range(len(channel))] == expected
+
+    def test_block_until_space(self):
+        channel = BoundedChannel(1, policy=BLOCK, timeout=5)
+        channel.append(0)
+        timer = th.Timer(0.05, channel.get)
+        timer.start()
+        start = time.monotonic()
+        assert channel.append(1)
+        assert 0.03 < time.monotonic() - start < 5
+        assert channel.dropped == 0
+        assert channel.get(timeout=0) == 1
+        timer.join()
+
+    def test_get_timeout(self):
+        channel = BoundedChannel(1)
+        start = time.monotonic()
+        with pytest.raises(queue.Empty):
+            channel.get(timeout=0.05)
+        assert time.monotonic() - start >= 0.04
+
+    def test_close_wakes_consumer(self):
+        channel = BoundedChannel(1)
+        th.Timer(0.05, channel.close).start()
+        start = time.monotonic()
+        with pytest.raises(queue.Empty):
+            channel.get(timeout=5)
+        assert time.monotonic() - start < 1
+
+    def test_latency(self):
+        publisher = FakePublisher(BoundedChannel(100))
+        try:
+            for i in range(200):
+                publisher.queue.append((time.perf_counter(), i))
+                time.sleep(0.001)
+            deadline = time.monotonic() + 5
+            while len(publisher.received) < 200 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            publisher.stop()
+        assert publisher.received == list(range(200))
+        # busy polling with a 5 ms sleep had a median latency of ~2.5 ms
+        assert statistics.median(publisher.latencies) < 0.002
+
+    def test_idle_cpu(self):
+        publishers = [FakePublisher(BoundedChannel(100)) for _ in range(8)]
+        try:
+            start = time.process_time()
+            time.sleep(1)
+            idle_cpu = time.process_time() - start
+        finally:
+            for publisher in publishers:
+                publisher.stop()
+        # idle consumers only wake up on their get() timeout
+        assert idle_cpu < 0.05
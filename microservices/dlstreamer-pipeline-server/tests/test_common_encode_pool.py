@@ -0,0 +1,128 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from src.publisher.common import encode_pool
+from src.publisher.common.encode_pool import EncodePool, OrderedEncoder, get_encode_pool
+from utils import publisher_utils as utils
+
+WIDTH = 1920
+HEIGHT = 1080
+
+
+@pytest.fixture
+def pool():
+    pool = EncodePool(2)
+    yield pool
+    pool.shutdown()
+
+
+def create_nv12_frames(count):
+    rng = np.random.default_rng(0)
+    size = WIDTH * HEIGHT * 3 // 2
+    return [rng.integers(0, 256, size, dtype=np.uint8).tobytes() for _ in range(count)]
+
+
+class TestEncodePool:
+
+    def test_invalid_workers(self):
+        with pytest.raises(ValueError):
+            EncodePool(0)
+
+    @pytest.mark.parametrize('env, expected', [(None, encode_pool.DEFAULT_ENCODE_WORKERS),
+                                               ('3', 3),
+                                               ('abc', encode_pool.DEFAULT_ENCODE_WORKERS)])
+    def test_get_encode_pool(self, mocker, env, expected):
+        mocker.patch.object(encode_pool, '_pool', None)
+        mocker.patch('os.getenv', return_value=env)
+        pool = get_encode_pool()
+        assert pool.workers == expected
+        assert get_encode_pool() is pool
+        pool.shutdown()
+
+    def test_ordered_encoder_order(self, pool):
+        encoder = OrderedEncoder(pool, max_inflight=16)
+        for i in range(8):
+            # later items finish first
+            encoder.submit(i, time.sleep, 0.002 * (8 - i))
+            if i % 3 == 0:
+                encoder.append(('raw', i))
+        completed = [context for _, context in encoder.completed(wait=True)]
+        assert completed == [0, ('raw', 0), 1, 2, 3, ('raw', 3), 4, 5, 6, ('raw', 6), 7]
+        assert len(encoder) == 0
+
+    def test_ordered_encoder_no_wait(self, pool):
+        encoder = OrderedEncoder(pool, max_inflight=4)
+        head = Future()
+        encoder._pending.append((head, 'head', []))
+        encoder.append('raw')
+        assert list(encoder.completed()) == []
+        assert len(encoder) == 2
+        head.set_result(None)
+        assert [context for _, context in encoder.completed()] == ['head', 'raw']
+
+    def test_ordered_encoder_attach(self, pool):
+        encoder = OrderedEncoder(pool, max_inflight=4)
+        encoder.append('raw')
+        attached = Future()
+        encoder.attach(attached.result)
+        encoder.submit('encoded', time.sleep, 0)
+        time.sleep(0.01)
+        # held back by the encode attached to the first item
+        assert list(encoder.completed()) == []
+        attached.set_result(None)
+        assert [context for _, context in encoder.completed(wait=True)] == ['raw', 'encoded']
+
+    def test_ordered_encoder_bounded(self, pool):
+        encoder = OrderedEncoder(pool, max_inflight=2)
+        for i in range(5):
+            encoder.submit(i, time.sleep, 0.01)
+            list(encoder.completed())
+            assert len(encoder) <= 2
+
+    def test_ordered_encoder_exception(self, pool):
+        encoder = OrderedEncoder(pool)
+        encoder.submit('frame', utils.encode_frame, None, None, b'', 1, 1, 3, meta_data=None)
+        encode, context = next(encoder.completed(wait=True))
+        assert context == 'frame'
+        with pytest.raises(ValueError):
+            encode.result()
+
+    def test_encode_benchmark(self, record_property):
+        """Encodes synthetic 1080p NV12 frames and reports frames/sec per pool size"""
+        frames = create_nv12_frames(8)
+        meta_data = {'img_format': 'NV12'}
+        num_frames = 64
+        reference = None
+        fps = {}
+        for workers in [1, 2, 4, 8]:
+            pool = EncodePool(workers)
+            encoder = OrderedEncoder(pool)
+            encoded = []
+            start = time.perf_counter()
+            for i in range(num_frames):
+                encoder.submit(i, utils.encode_frame, 'jpeg', 85,
+                               frames[i % len(frames)], HEIGHT, WIDTH,
+                               channels=3, meta_data=meta_data)
+                encoded.extend(encoder.completed())
+            encoded.extend(encoder.completed(wait=True))
+            fps[workers] = num_frames / (time.perf_counter() - start)
+            pool.shutdown()
+
+            assert [i for _, i in encoded] == list(range(num_frames))
+            images = [encode.result()[0][1].tobytes() for encode, _ in encoded[:len(frames)]]
+            if reference is None:
+                reference = images
+            assert images == reference
+
+        for workers, value in fps.items():
+            record_property("encode_1080p_nv12_jpeg_fps_{}_workers".format(workers), round(value, 1))
+        assert all(value > 0 for value in fps.values())
@@ -4,6 +4,7 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 
+import numpy as np
 import pytest
 from unittest.mock import MagicMock
 import src.common.log
@@ -69,3 +70,139 @@ class TestUtils:
         filter_obj = Filter(config)
         filter = filter_obj._check_detection_filter(metadata)
         assert filter == expected
+
+
+def dcaas(*objects):
+    """Synthetic DCaaS metadata from (label, score, width, height) tuples"""
+    return {'annotations': {'objects': [
+        {'label': label, 'score': score, 'bbox': [10, 20, 10 + width, 20 + height],
+         'attributes': {'rotation': 0, 'occluded': 0}}
+        for label, score, width, height in objects]}}
+
+
+def geti(*objects):
+    """Synthetic Geti metadata from (label, score, width, height) tuples"""
+    return {'predictions': {'annotations': [
+        {'shape': {'type': 'RECTANGLE', 'x': 10, 'y': 20, 'width': width, 'height': height},
+         'labels': [{'name': label, 'probability': score}]}
+        for label, score, width, height in objects]}}
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFilterRules:
+
+    @pytest.mark.parametrize('metadata_format', [dcaas, geti])
+    @pytest.mark.parametrize('config, objects, expected', [
+        # per-class thresholds, with a default for other labels
+        ({'label_score': {'Person': 0.5, '*': 0.8}}, [('Person', 0.6, 10, 10)], True),
+        ({'label_score': {'Person': 0.5, '*': 0.8}}, [('Person', 0.6, 10, 10), ('Car', 0.7, 10, 10)], False),
+        ({'label_score': {'Person': 0.5, '*': 0.8}}, [('Person', 0.6, 10, 10), ('Car', 0.9, 10, 10)], True),
+        ({'label_score': {'Person': 0.5}}, [('Car', 0.9, 10, 10)], False),
+        # min area ignores small detections
+        ({'label_score': {'Person': 0.5}, 'min_area': 100}, [('Person', 0.6, 10, 10), ('Person', 0.1, 5, 5)], True),
+        ({'label_score': {'Person': 0.5}, 'min_area': 100}, [('Person', 0.1, 10, 10)], False),
+        ({'label_score': {'Person': 0.5}, 'min_area': 100}, [('Person', 0.9, 9, 10)], False),
+        # top k per class ignores lower scores
+        ({'label_score': {'Person': 0.5, 'Car': 0.5}, 'top_k': 2},
+         [('Person', 0.9, 10, 10), ('Person', 0.8, 10, 10), ('Person', 0.1, 10, 10), ('Car', 0.6, 10, 10)], True),
+        ({'label_score': {'Person': 0.5, 'Car': 0.5}, 'top_k': 3},
+         [('Person', 0.9, 10, 10), ('Person', 0.8, 10, 10), ('Person', 0.1, 10, 10), ('Car', 0.6, 10, 10)], False),
+        ({'label_score': {'Person': 0.5, 'Car': 0.5}, 'top_k': 1},
+         [('Person', 0.9, 10, 10), ('Car', 0.4, 10, 10), ('Car', 0.6, 10, 10)], True),
+        # combined, top k of the detections large enough
+        ({'label_score': {'Person': 0.5}, 'min_area': 100, 'top_k': 1},
+         [('Person', 0.95, 2, 2), ('Person', 0.6, 10, 10), ('Person', 0.3, 10, 10)], True),
+        ({'label_score': {'Person': 0.5}}, [], True),
+        ({'label_score': {'Person': 0.5}}, [('Person', np.float32(0.6), 10, 10)], True),
+    ])
+    def test_detection(self, metadata_format, config, objects, expected):
+        filter_obj = Filter(dict(config, type='detection'))
+        assert filter_obj.check_filter_criteria(metadata_format(*objects)) == expected
+
+    @pytest.mark.parametrize('config, metadata, expected', [
+        ({'label_score': {'*': 0.5}}, {'classes': ['Person'], 'Person': 0.4}, False),
+        ({'label_score': {'*': 0.5}}, {'classes': ['Person'], 'Person': 0.6}, True),
+        ({'label_score': {'Car': 0.5}}, {'classes': ['Person'], 'Person': 0.1}, True),
+        ({'label_score': {'Person': 0.5}}, {'classes': ['Person']}, False),
+        ({'label_score': {'Person': 0.5}}, {}, False),
+        ({'label_score': {'Person': 0.5}}, {'classes': ['Person'], 'Person': '0.9'}, False),
+        # numpy scores
+        ({'label_score': {'Person': 0.5}}, {'classes': ['Person'], 'Person': np.float32(0.9)}, True),
+        ({'label_score': {'Person': 0.5}}, {'classes': ['Person'], 'Person': np.float64(0.4)}, False),
+        ({'label_score': {'Person': np.float32(0.5)}}, {'classes': ['Person'], 'Person': 0.9}, True),
+    ])
+    def test_classification(self, config, metadata, expected):
+        filter_obj = Filter(dict(config, type='classification'))
+        assert filter_obj.check_filter_criteria(metadata) == expected
+
+    @pytest.mark.parametrize('metadata', [
+        {'annotations': {'objects': [{'label': 'Person', 'bbox': [0, 0, 1, 1]}]}},
+        {'annotations': {'objects': [{'label': 'Person', 'score': 0.9, 'bbox': [0, 0]}]}},
+        {'predictions': {'annotations': [{'labels': []}]}},
+        {'annotations': {'objects': None}},
+        {'annotations': {'objects': [{'label': 'Person', 'score': None, 'bbox': [0, 0, 1, 1]}]}},
+        {'annotations': {'objects': [{'label': 'Person', 'score': '0.9', 'bbox': [0, 0, 1, 1]}]}},
+        {'predictions': {'annotations': [{'labels': [{'name': 'Person', 'probability': None}],
+                                          'shape': {'width': 1, 'height': 1}}]}},
+    ])
+    def test_invalid_metadata(self, metadata):
+        filter_obj = Filter({'type': 'detection', 'label_score': {'Person': 0.5}, 'min_area': 1})
+        assert filter_obj.check_filter_criteria(metadata) is False
+
+    @pytest.mark.parametrize('config', [
+        {'min_area': -1},
+        {'min_area': '10'},
+        {'top_k': 0},
+        {'top_k': 1.5},
+        {'rate_limit_ms': -5},
+        {'rate_limit_ms': {'Person': 'fast'}},
+        {'label_score': {'Person': '0.5'}},
+        {'label_score': {'*': None}},
+        {'label_score': {'Person': True}},
+        {'label_score': ['Person']},
+    ])
+    def test_invalid_config(self, config):
+        with pytest.raises(ValueError):
+            Filter(dict(config, type='detection'))
+
+    @pytest.mark.parametrize('rate_limit_ms, frames, expected', [
+        # (time in s, labels) per frame
+        (500, [(0, ['Person']), (0.2, ['Person']), (0.5, ['Person']), (0.9, ['Person'])],
+         [True, False, True, False]),
+        # limited per class, a due class lets the frame through
+        (500, [(0, ['Person']), (0.2, ['Car']), (0.3, ['Person', 'Car']), (0.6, ['Person', 'Car'])],
+         [True, True, False, True]),
+        ({'Person': 1000}, [(0, ['Person']), (0.1, ['Car']), (0.2, ['Car']), (0.5, ['Person']), (1.0, ['Person'])],
+         [True, True, True, False, True]),
+        ({'Person': 0, '*': 1000}, [(0, ['Person']), (0.1, ['Person']), (0.1, ['Car']), (0.2, ['Car'])],
+         [True, True, True, False]),
+    ])
+    def test_rate_limit(self, rate_limit_ms, frames, expected):
+        clock = FakeClock()
+        filter_obj = Filter({'type': 'detection', 'label_score': {'*': 0.5},
+                             'rate_limit_ms': rate_limit_ms}, clock=clock)
+        results = []
+        for now, labels in frames:
+            clock.now = now
+            results.append(filter_obj.check_filter_criteria(
+                dcaas(*[(label, 0.9, 10, 10) for label in labels])))
+        assert results == expected
+
+    def test_rate_limit_after_threshold(self):
+        """Frames failing the thresholds do not count as published"""
+        clock = FakeClock()
+        filter_obj = Filter({'type': 'detection', 'label_score': {'Person': 0.5},
+                             'rate_limit_ms': 1000}, clock=clock)
+        assert not filter_obj.check_filter_criteria(dcaas(('Person', 0.1, 10, 10)))
+        clock.now = 0.5
+        assert filter_obj.check_filter_criteria(dcaas(('Person', 0.9, 10, 10)))
+        clock.now = 1.0
+        assert not filter_obj.check_filter_criteria(dcaas(('Person', 0.9, 10, 10)))
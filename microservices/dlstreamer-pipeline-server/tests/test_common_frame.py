@@ -0,0 +1,131 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import io
+import queue
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from gi.repository import Gst
+
+from src.publisher.common.encode_pool import EncodePool
+from src.publisher.common.frame import FrameHandle, FrameReader, acquire_frame, frame_data, release_frame
+from src.publisher.publisher import Publisher
+
+Gst.init(None)
+
+
+class FakePublisher:
+    """Collects frames handed over by Publisher"""
+    def __init__(self):
+        self.queue = deque()
+
+    def consume(self):
+        frame, meta_data = self.queue.popleft()
+        first = bytes(frame_data(frame)[:1])
+        release_frame(frame)
+        return first, meta_data
+
+
+def create_sample(width, height):
+    size = width * height * 3
+    buf = Gst.Buffer.new_allocate(None, size, None)
+    buf.memset(0, 0x7f, size)
+    buf.pts = 1000
+    caps = Gst.Caps.from_string(
+        "video/x-raw,format=BGR,width={},height={}".format(width, height))
+    return Gst.Sample.new(buf, caps, None, None)
+
+
+@pytest.fixture
+def pub_obj(mocker):
+    app_cfg = {'pipeline': 'source ! decodebin ! appsink', 'publish_raw_frame': True}
+    mocker.patch('os.getenv', return_value='false')
+    pool = EncodePool(1)
+    pub_obj = Publisher(app_cfg, [], queue.Queue(), add_timestamp=False, encode_pool=pool)
+    pub_obj.publishers = [FakePublisher(), FakePublisher()]
+    yield pub_obj
+    pool.shutdown()
+
+
+class TestFrameHandle:
+
+    def test_refcount(self):
+        unmapped = MagicMock()
+
+        @contextmanager
+        def mapping():
+            yield bytearray(b"Test")
+            unmapped()
+
+        frame = FrameHandle(mapping(), pts=10)
+        assert frame.data == b"Test"
+        assert frame.data.readonly
+        assert frame.pts == 10
+        assert acquire_frame(frame) is frame
+        frame.release()
+        assert not frame.released
+        unmapped.assert_not_called()
+        frame.release()
+        assert frame.released
+        unmapped.assert_called_once()
+        with pytest.raises(ValueError):
+            frame.acquire()
+
+    def test_bytes_passthrough(self):
+        assert acquire_frame(b"Test") == b"Test"
+        assert frame_data(b"Test") == b"Test"
+        release_frame(b"Test")
+
+    def test_frame_reader(self):
+        reader = FrameReader(b"0123456789")
+        assert reader.read(4) == b"0123"
+        assert reader.seek(0, io.SEEK_END) == 10
+        reader.seek(2)
+        assert reader.read() == b"23456789"
+
+    def test_publisher_shares_buffer(self, pub_obj):
+        sample = create_sample(64, 48)
+        frame, meta_data = pub_obj._get_gst_buffer_info(sample)
+        assert frame.pts == 1000
+        assert meta_data['width'] == 64 and meta_data['height'] == 48
+        assert np.array_equal(frame.as_array()[:4], [0x7f] * 4)
+
+        pub_obj._publish(frame, meta_data)
+        release_frame(frame)
+        assert not frame.released
+
+        for publisher in pub_obj.publishers:
+            first, _ = publisher.consume()
+            assert first == b"\x7f"
+        assert frame.released
+
+    def test_peak_allocation_independent_of_frame_size(self, pub_obj):
+        def peak_allocation(sample):
+            tracemalloc.start()
+            frame, meta_data = pub_obj._get_gst_buffer_info(sample)
+            pub_obj._publish(frame, meta_data)
+            release_frame(frame)
+            for publisher in pub_obj.publishers:
+                publisher.consume()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return peak
+
+        small = create_sample(640, 480)
+        large = create_sample(3840, 2160)
+        # warm up lazily initialized state (caps parsing, logging)
+        peak_allocation(small)
+
+        peak_small = peak_allocation(small)
+        peak_large = peak_allocation(large)
+        large_size = 3840 * 2160 * 3
+        assert peak_large < large_size // 100
+        assert peak_large < peak_small + 64 * 1024
@@ -0,0 +1,41 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import pytest
+
+from src.publisher.common import image_handle
+from src.publisher.common.image_handle import ImageHandleTemplate
+
+
+class TestImageHandleTemplate:
+
+    @pytest.mark.parametrize('scheme', ['', 'static', '{camera}', '{0}', '{seq', 5])
+    def test_invalid_scheme(self, scheme):
+        with pytest.raises(ValueError):
+            ImageHandleTemplate.from_scheme(scheme)
+
+    def test_random(self):
+        assert ImageHandleTemplate.from_scheme(None) is None
+        assert ImageHandleTemplate.from_scheme('random') is None
+
+    def test_template(self):
+        template = ImageHandleTemplate.from_scheme('{instance_id}-{pts}-{seq:06d}')
+        assert not template.hashed
+        assert template.format(instance_id='abc', pts=40, seq=7) == 'abc-40-000007'
+
+    @pytest.mark.parametrize('xxhash', [True, False])
+    def test_content(self, mocker, xxhash):
+        if not xxhash:
+            mocker.patch.object(image_handle, 'xxhash', None)
+        elif image_handle.xxhash is None:
+            pytest.skip('xxhash not installed')
+        template = ImageHandleTemplate.from_scheme('content')
+        assert template.hashed
+        frame = bytes(range(256)) * 16
+        handle = template.format(frame)
+        assert handle == template.format(memoryview(bytearray(frame)))
+        assert handle != template.format(frame[:-1])
+        assert len(handle) == 16
@@ -0,0 +1,81 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+from src.common import metrics
+from src.publisher.common.channel import BoundedChannel
+
+
+@pytest.fixture
+def reader():
+    reader = InMemoryMetricReader()
+    metrics.configure(MeterProvider(metric_readers=[reader]))
+    yield reader
+    metrics.configure(None)
+
+
+def get_points(reader, name):
+    """Data points of metric name, keyed by their attributes"""
+    points = {}
+    data = reader.get_metrics_data()
+    if data is None:
+        return points
+    for resource_metrics in data.resource_metrics:
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                if metric.name == name:
+                    for point in metric.data.data_points:
+                        points[tuple(sorted(point.attributes.items()))] = point
+    return points
+
+
+class TestMetrics:
+
+    def test_noop_without_meter(self):
+        instruments = metrics.Instruments(None)
+        instruments.frames.add(1, {})
+        instruments.latency.record(1.0, {})
+
+    def test_instruments_recreated_on_configure(self, reader):
+        instruments = metrics.instruments()
+        assert metrics.instruments() is instruments
+        metrics.configure(MeterProvider(metric_readers=[InMemoryMetricReader()]))
+        assert metrics.instruments() is not instruments
+
+    def test_frames_and_latency(self, reader):
+        attributes = {"pipeline": "user_defined_pipelines/test", "pipeline_id": "1"}
+        for latency in [10, 20, 30]:
+            metrics.instruments().frames.add(1, attributes)
+            metrics.instruments().latency.record(latency, attributes)
+
+        key = tuple(sorted(attributes.items()))
+        assert get_points(reader, "pipeline_frames")[key].value == 3
+        latency = get_points(reader, "pipeline_latency")[key]
+        assert latency.count == 3
+        assert latency.sum == 60
+        assert (latency.min, latency.max) == (10, 30)
+
+    def test_queue_depth_and_drops(self, reader):
+        channel = BoundedChannel(2, name="MQTT test")
+        for i in range(5):
+            channel.append(i)
+
+        key = (("queue", "MQTT test"),)
+        assert get_points(reader, "publisher_dropped_frames")[key].value == 3
+        assert get_points(reader, "publisher_queue_depth")[key].value == 2
+
+        channel.get(timeout=0)
+        assert get_points(reader, "publisher_queue_depth")[key].value == 1
+
+    def test_queue_unregistered_on_delete(self, reader):
+        channel = BoundedChannel(2, name="deleted")
+        channel.append(0)
+        assert (("queue", "deleted"),) in get_points(reader, "publisher_queue_depth")
+        del channel
+        assert (("queue", "deleted"),) not in get_points(reader, "publisher_queue_depth")
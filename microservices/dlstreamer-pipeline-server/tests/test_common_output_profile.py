@@ -0,0 +1,81 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import pytest
+
+from src.publisher.common.output_profile import OutputProfile, OutputStage
+
+
+class TestOutputProfile:
+
+    @pytest.mark.parametrize('config', [
+        {'frame_skip': -1},
+        {'frame_skip': 1.5},
+        {'max_dimension': 0},
+        {'jpeg_quality': 101},
+        {'jpeg_quality': True},
+        {'fps': 2},
+        [],
+    ])
+    def test_invalid_config(self, config):
+        with pytest.raises(ValueError):
+            OutputProfile.from_config(config)
+
+    def test_from_config(self):
+        assert OutputProfile.from_config(None) is None
+        profile = OutputProfile.from_config({'frame_skip': 14, 'max_dimension': 320})
+        assert profile.key == (14, 320, None)
+        assert profile.encodes
+        assert not OutputProfile(frame_skip=2).encodes
+
+    def test_equal_profiles(self):
+        assert OutputProfile(2, 320, 70) == OutputProfile(2, 320, 70)
+        assert len({OutputProfile(2, 320, 70), OutputProfile(2, 320, 70)}) == 1
+        assert OutputProfile(2, 320, 70) != OutputProfile(2, 320, 80)
+
+    def test_selects(self):
+        profile = OutputProfile(frame_skip=2)
+        assert [index for index in range(9) if profile.selects(index)] == [0, 3, 6]
+        assert all(OutputProfile().selects(index) for index in range(5))
+
+
+class TestOutputStage:
+
+    def test_select(self):
+        stage = OutputStage()
+        thumbnail = OutputProfile(frame_skip=1, max_dimension=320)
+        stage.add('full')
+        stage.add('dashboard', thumbnail)
+        stage.add('archive', OutputProfile(frame_skip=1, max_dimension=320))
+        stage.add('sampled', OutputProfile(frame_skip=2))
+        assert stage.profile('full') is None
+        assert stage.profile('dashboard') == thumbnail
+        # equal profiles are selected once
+        assert [stage.select() for _ in range(4)] == [
+            [thumbnail, OutputProfile(frame_skip=2)], [], [thumbnail], [OutputProfile(frame_skip=2)]]
+
+    @pytest.mark.parametrize('publishers, expected', [
+        ([], True),
+        ([('full', None, True)], True),
+        ([('thumbnail', OutputProfile(max_dimension=320), True)], False),
+        ([('thumbnail', OutputProfile(max_dimension=320), True), ('meta', None, False)], False),
+        ([('thumbnail', OutputProfile(max_dimension=320), True),
+          ('sampled', OutputProfile(frame_skip=2), True)], True),
+    ])
+    def test_needs_full_frame(self, publishers, expected):
+        stage = OutputStage()
+        for publisher in publishers:
+            stage.add(*publisher)
+        assert stage.needs_full_frame == expected
+
+    def test_needs_encode(self):
+        stage = OutputStage()
+        stage.add('meta', OutputProfile(jpeg_quality=50), publish_frame=False)
+        stage.add('sampled', OutputProfile(frame_skip=2))
+        assert not stage.needs_encode(OutputProfile(jpeg_quality=50))
+        assert not stage.needs_encode(OutputProfile(frame_skip=2))
+        stage.add('frames', OutputProfile(jpeg_quality=50))
+        assert stage.needs_encode(OutputProfile(jpeg_quality=50))
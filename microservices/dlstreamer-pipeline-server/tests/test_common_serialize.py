@@ -0,0 +1,52 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import json
+
+import pytest
+
+from src.publisher.common import serialize
+
+META_DATA = {'img_handle': 'AB12CD34EF', 'height': 1080, 'width': 1920,
+             'annotations': {'objects': [{'bbox': [457, 496, 624, 910], 'label': 'Gabelstapler ä',
+                                          'score': 0.9830476641654968,
+                                          'attributes': {'occluded': False, 'rotation': 0.0}}]},
+             'tags': None}
+
+
+# json module specifics: separators, ASCII escapes, NaN, non-str keys
+EDGE_CASES = {'label': 'Gabelstapler ä', 'score': float('nan'), 1: [1e16, -0.0, 2 ** 70]}
+
+
+class TestSerialize:
+
+    @pytest.mark.parametrize('obj', [META_DATA, EDGE_CASES])
+    @pytest.mark.parametrize('has_orjson', [True, False])
+    def test_standard(self, mocker, obj, has_orjson):
+        """Standard format is the json module output, whether orjson is installed or not"""
+        if not has_orjson:
+            mocker.patch.object(serialize, 'orjson', None)
+        assert serialize.dumps(obj) == json.dumps(obj).encode('utf-8')
+        assert serialize.dumps_str(obj) == json.dumps(obj)
+        assert serialize.dumps(obj, 'standard') == json.dumps(obj).encode('utf-8')
+
+    def test_compact(self):
+        pytest.importorskip('orjson')
+        np = pytest.importorskip('numpy')
+        assert serialize.dumps(META_DATA, 'compact') == \
+            json.dumps(META_DATA, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        assert json.loads(serialize.dumps_str(META_DATA, 'compact')) == META_DATA
+        assert json.loads(serialize.dumps({'bbox': np.array([1, 2, 3, 4])}, 'compact')) == \
+            {'bbox': [1, 2, 3, 4]}
+
+    def test_check_format(self, mocker):
+        assert serialize.check_format('standard') == 'standard'
+        with pytest.raises(ValueError):
+            serialize.check_format('pretty')
+        mocker.patch.object(serialize, 'orjson', None)
+        assert serialize.check_format('standard') == 'standard'
+        with pytest.raises(ValueError):
+            serialize.check_format('compact')
@@ -57,6 +57,24 @@ class TestUtils:
             if expected == TypeError:
                 assert expected == type(e)
 
+    @pytest.mark.parametrize('width, height, max_dimension, expected',
+                             [(1920, 1080, None, (1920, 1080)),
+                              (1920, 1080, 1920, (1920, 1080)),
+                              (1920, 1080, 320, (320, 180)),
+                              (1080, 1920, 320, (180, 320)),
+                              (1000, 1, 10, (10, 1))])
+    def test_scaled_size(self, width, height, max_dimension, expected):
+        assert utils.scaled_size(width, height, max_dimension) == expected
+
+    def test_encode_frame_max_dimension(self):
+        frame = bytes(64 * 48 * 3)
+        (success, encoded), enc_type, enc_level = utils.encode_frame(
+            'jpeg', 70, frame, 48, 64, 3, meta_data={'img_format': 'BGR'},
+            max_dimension=16)
+        assert success
+        assert (enc_type, enc_level) == ('jpeg', 70)
+        assert cv2.imdecode(encoded, cv2.IMREAD_COLOR).shape == (12, 16, 3)
+
     @pytest.mark.parametrize('detection', [True, False])
     def test_gva_meta_regions(self, detection):
         mocked_result = MagicMock(spec=VideoFrame)
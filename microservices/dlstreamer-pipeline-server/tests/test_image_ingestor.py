@@ -11,6 +11,7 @@ import sys
 import src.common.log
 import json
 import base64
+import time
 from src.subscriber.image_ingestor import ImageIngestor
 
 # Mock setup for publisher object creation
@@ -18,12 +19,7 @@ from src.subscriber.image_ingestor import ImageIngestor
 def img_cfg(mocker):
     src.common.log.configure_logging('DEBUG', False)
 
-    img_cfg = MagicMock()
-    img_cfg.get_topics.return_value = ['sub_test']
-
-    mocker.patch('src.subscriber.cam_ingestor.ctypes.CDLL')
-    mocker.patch('src.subscriber.cam_ingestor.ctypes')
-    mocker.patch('src.subscriber.cam_ingestor.th.Thread')
+    img_cfg = {"source": "image_ingestor", "image_ingestor": {"workers": 2}}
 
     yield img_cfg
 
@@ -52,7 +48,7 @@ class TestImageIngestor:
             (False, True)  #Thread to be stopped
         ])
     def test_stop(self, mocker, img_ing_obj, is_set, expected):
-        mocked_event = mocker.patch('src.subscriber.image_ingestor.th.Event')
+        mocked_event = MagicMock()
         img_ing_obj.stop_ev = mocked_event
         img_ing_obj.stop_ev.is_set.return_value = is_set
         if not is_set:
@@ -74,7 +70,7 @@ class TestImageIngestor:
         assert img_ing_obj.done is True
 
     def test_run(self, mocker, img_ing_obj):
-        mocked_event = mocker.patch('src.subscriber.image_ingestor.th.Event')
+        mocked_event = MagicMock()
         img_ing_obj.stop_ev = mocked_event
         img_ing_obj.stop_ev.is_set.side_effect = [False, True]
         mock_request_queue = MagicMock()
@@ -91,7 +87,7 @@ class TestImageIngestor:
         mock_error_handler.assert_not_called()
 
     def test_run_base64_image(self, mocker, img_ing_obj):
-        mocked_event = mocker.patch('src.subscriber.image_ingestor.th.Event')
+        mocked_event = MagicMock()
         img_ing_obj.stop_ev = mocked_event
         img_ing_obj.stop_ev.is_set.side_effect = [False, True]
         base64_str = base64.b64encode(b'test_image_data').decode('utf-8')
@@ -112,7 +108,7 @@ class TestImageIngestor:
     @pytest.mark.parametrize('exception, expected',
                              [(queue.Empty(), None)])
     def test_run_errors(self, mocker, caplog, img_ing_obj, exception, expected):
-        mocked_event = mocker.patch('src.subscriber.image_ingestor.th.Event')
+        mocked_event = MagicMock()
         img_ing_obj.stop_ev = mocked_event
         img_ing_obj.stop_ev.is_set.side_effect = [False, True]
 
@@ -122,7 +118,7 @@ class TestImageIngestor:
             assert expected in caplog.text
 
     def test_run_with_exception(self, mocker, img_ing_obj):
-        mocked_event = mocker.patch('src.subscriber.image_ingestor.th.Event')
+        mocked_event = MagicMock()
         img_ing_obj.stop_ev = mocked_event
         img_ing_obj.stop_ev.is_set.side_effect = [False, True]
         mock_request_queue = MagicMock()
@@ -130,4 +126,117 @@ class TestImageIngestor:
         mock_error_handler = mocker.patch.object(img_ing_obj, 'error_handler')
         img_ing_obj.request_queue = mock_request_queue
         img_ing_obj.request_queue.empty.return_value = False
-        img_ing_obj._run(mock_request_queue)
\ No newline at end of file
+        img_ing_obj._run(mock_request_queue)
+    def test_run_request_id(self, mocker, img_ing_obj):
+        mocked_event = MagicMock()
+        img_ing_obj.stop_ev = mocked_event
+        img_ing_obj.stop_ev.is_set.side_effect = [False, True]
+        custom_meta = {"camera": "cam0"}
+        mock_request_queue = MagicMock()
+        mock_request_queue.get.return_value = {
+            "source": {"type": "base64_image", "data": base64.b64encode(b'img').decode('utf-8')},
+            "custom_meta_data": custom_meta,
+            "request_id": "req-1"}
+        mocker.patch('gi.repository.Gst.Buffer.new_allocate', return_value=MagicMock())
+        mocker.patch('gi.repository.Gst.Sample', return_value=MagicMock())
+        mock_add_json_meta = mocker.patch('src.subscriber.image_ingestor.GVAJSONMeta.add_json_meta')
+        mocker.patch.object(img_ing_obj, 'gst_queue')
+        img_ing_obj._run(mock_request_queue)
+        meta = json.loads(mock_add_json_meta.call_args[0][1])
+        assert meta == {"camera": "cam0", "source_data": "base64_image", "request_id": "req-1"}
+        # request metadata is not modified
+        assert custom_meta == {"camera": "cam0"}
+
+    def test_run_request_error(self, mocker, img_ing_obj):
+        mocked_event = MagicMock()
+        img_ing_obj.stop_ev = mocked_event
+        img_ing_obj.stop_ev.is_set.side_effect = [False, True]
+        img_ing_obj.on_request_error = MagicMock()
+        img_ing_obj.request_queue = queue.Queue()
+        img_ing_obj.request_queue.put({"source": {"type": "file", "path": "queued.jpg"},
+                                       "request_id": "req-2"})
+        mock_request_queue = MagicMock()
+        mock_request_queue.get.return_value = {"source": {"type": "file", "path": "missing.jpg"},
+                                               "request_id": "req-1"}
+        mocker.patch('builtins.open', side_effect=FileNotFoundError("missing.jpg"))
+        img_ing_obj._run(mock_request_queue)
+        failed = [c[0][0] for c in img_ing_obj.on_request_error.call_args_list]
+        # failed request, and requests dropped by the error handler
+        assert failed == ["req-1", "req-2"]
+        assert img_ing_obj.request_queue.empty()
+
+
+class StubPipeline:
+    """Records the samples fed to the pipeline, with the time they arrived"""
+
+    def __init__(self):
+        self.samples = []
+
+    def put(self, sample):
+        self.samples.append((time.monotonic(), sample))
+
+    def wait(self, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        while len(self.samples) < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return [sample for _, sample in self.samples]
+
+
+def run_ingestor(mocker, ingest_cfg, n_requests, decode_time=0.0):
+    """Ingest n_requests with a stub decode taking decode_time seconds
+
+    :return: (stub pipeline, requests/sec)
+    """
+    def read_request(item):
+        time.sleep(decode_time)
+        return item["id"]
+
+    pipeline = StubPipeline()
+    ingestor = ImageIngestor(pipeline, {"image_ingestor": ingest_cfg})
+    mocker.patch.object(ingestor, '_read_request', side_effect=read_request)
+    ingestor.start()
+    start = time.monotonic()
+    for i in range(n_requests):
+        ingestor.request_queue.put({"id": i})
+    samples = pipeline.wait(n_requests)
+    elapsed = time.monotonic() - start
+    ingestor.stop()
+    assert samples == list(range(n_requests))
+    return pipeline, n_requests / elapsed
+
+
+class TestImageIngestorPool:
+
+    def test_throughput(self, mocker, record_property):
+        _, serial_rate = run_ingestor(mocker, {"workers": 1}, 40, decode_time=0.01)
+        _, pool_rate = run_ingestor(mocker, {"workers": 4}, 40, decode_time=0.01)
+        record_property("requests_per_sec_1_worker", round(serial_rate))
+        record_property("requests_per_sec_4_workers", round(pool_rate))
+        assert pool_rate > 2 * serial_rate
+
+    def test_max_rate(self, mocker):
+        pipeline, rate = run_ingestor(mocker, {"workers": 2, "max_rate": 100}, 11)
+        times = [t for t, _ in pipeline.samples]
+        assert times[-1] - times[0] >= 0.095
+        assert rate < 120
+
+    def test_batches(self, mocker):
+        pipeline, _ = run_ingestor(mocker, {"workers": 2, "batch_size": 3,
+                                            "batch_window_ms": 100, "max_rate": 100}, 7)
+        times = [t for t, _ in pipeline.samples]
+        # full batches are sent back to back, paced as a whole
+        assert times[2] - times[0] < 0.02
+        assert times[5] - times[3] < 0.02
+        assert times[3] - times[0] >= 0.025
+        # the partial batch waits for the batch window
+        assert times[6] - times[3] >= 0.08
+
+    @pytest.mark.parametrize('ingest_cfg', [
+        {"workers": 0},
+        {"max_rate": 0},
+        {"batch_size": 0},
+        {"batch_window_ms": -1},
+    ])
+    def test_invalid_config(self, ingest_cfg):
+        with pytest.raises(ValueError):
+            ImageIngestor(queue.Queue(), {"image_ingestor": ingest_cfg})
@@ -0,0 +1,95 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.publisher.image_publisher import ImagePublisher
+
+
+@pytest.fixture
+def image_publisher(mocker):
+    mock_release = mocker.patch('src.publisher.image_publisher.release_frame')
+    image_publisher = ImagePublisher(qsize=4)
+    image_publisher.release = mock_release
+    yield image_publisher
+
+
+class TestImagePublisher:
+
+    def test_publish_out_of_order(self, image_publisher):
+        futures = {request_id: image_publisher.register(request_id)
+                   for request_id in ("a", "b", "c")}
+        for request_id in ("c", "a", "b"):
+            image_publisher._publish(request_id.encode(), {"request_id": request_id})
+        for request_id, future in futures.items():
+            frame, meta = future.result(timeout=0)
+            assert frame == request_id.encode()
+            assert meta["request_id"] == request_id
+        assert image_publisher.pending == 0
+        image_publisher.release.assert_not_called()
+
+    def test_duplicate_request_id(self, image_publisher):
+        image_publisher.register("a")
+        with pytest.raises(ValueError):
+            image_publisher.register("a")
+
+    @pytest.mark.parametrize('meta_data', [{}, {"request_id": "unknown"}])
+    def test_publish_unknown_request(self, image_publisher, meta_data):
+        frame = MagicMock()
+        image_publisher._publish(frame, meta_data)
+        image_publisher.release.assert_called_once_with(frame)
+
+    def test_discard(self, image_publisher):
+        future = image_publisher.register("a")
+        image_publisher.discard("a", future)
+        assert future.cancelled()
+        frame = MagicMock()
+        image_publisher._publish(frame, {"request_id": "a"})
+        image_publisher.release.assert_called_once_with(frame)
+
+    def test_discard_resolved(self, image_publisher):
+        """Output handed over while the request gives up on it is released"""
+        future = image_publisher.register("a")
+        frame = MagicMock()
+        image_publisher._publish(frame, {"request_id": "a"})
+        image_publisher.discard("a", future)
+        image_publisher.release.assert_called_once_with(frame)
+
+    def test_fail(self, image_publisher):
+        future = image_publisher.register("a")
+        image_publisher.fail("a", "No such file")
+        with pytest.raises(RuntimeError, match="No such file"):
+            future.result(timeout=0)
+        # unknown requests are ignored
+        image_publisher.fail("b", "No such file")
+
+    def test_stop_fails_pending(self, image_publisher):
+        future = image_publisher.register("a")
+        image_publisher.start()
+        image_publisher.stop()
+        with pytest.raises(RuntimeError, match="Publisher stopped"):
+            future.result(timeout=0)
+        assert image_publisher.pending == 0
+
+    def test_async_outputs_not_queued(self, image_publisher):
+        """Outputs of async requests cannot evict the output of a pending request"""
+        future = image_publisher.register("a")
+        assert image_publisher.queue.append((b"a", {"request_id": "a"}))
+        for i in range(8):
+            assert not image_publisher.queue.append((i, {}))
+        assert image_publisher.release.call_count == 8
+        assert image_publisher.queue.dropped == 0
+        image_publisher.start()
+        frame, meta = future.result(timeout=5)
+        image_publisher.stop()
+        assert frame == b"a"
+
+    def test_stop_twice(self, image_publisher):
+        image_publisher.start()
+        image_publisher.stop()
+        image_publisher.stop()
+        assert image_publisher.th is None
@@ -13,6 +13,8 @@ import sys
 import src.common.log
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Mocked modules - cfgmgr
 mocked_cfgmgr = MagicMock()
@@ -21,6 +23,9 @@ sys.modules['cfgmgr.config_manager'] = mocked_cfgmgr
 from src.manager import PipelineServerManager
 from src.manager import Pipeline
 from src.manager import PipelineInstance
+from src.publisher.image_publisher import ImagePublisher
+from src.server.instance_registry import InstanceRegistry
+from src.server.pipeline import Pipeline as PipelineState
 
 
 class TestPipelineInstance:
@@ -124,37 +129,95 @@ class TestPipelineInstance:
         with pytest.raises(ValueError, match="Invalid instance id"):
             pipeline_instance.execute_request(invalid_instance_id, request)
     
-    def test_execute_request_clear_response_queue(self, pipeline_instance, mocker):
+    @pytest.fixture
+    def sync_instance(self, pipeline_instance):
         pipeline_instance.source_type = "image_ingestor"
         pipeline_instance.instance_id = "valid_instance_id"
         pipeline_instance.is_async = False
         pipeline_instance.is_appdest = True
+        pipeline_instance._request_slots = threading.BoundedSemaphore(4)
         pipeline_instance.publisher = MagicMock()
-        pipeline_instance.publisher.image_publisher = MagicMock()
-        pipeline_instance.publisher.image_publisher.response_queue = MagicMock()
-        pipeline_instance.publisher.image_publisher.response_queue.empty.side_effect = [False, False, True]
-        pipeline_instance.publisher.image_publisher.response_queue.get_nowait.side_effect = [None, queue.Empty]
+        pipeline_instance.publisher.image_publisher = ImagePublisher(qsize=4)
         pipeline_instance.ingestor = MagicMock()
-        pipeline_instance.ingestor.request_queue = MagicMock()
-        request = {"timeout": 5, "publish_frame": True}
-        data, err = pipeline_instance.execute_request("valid_instance_id", request)
-        assert pipeline_instance.publisher.image_publisher.response_queue.get_nowait.call_count == 2
+        pipeline_instance.ingestor.request_queue = queue.Queue()
+        yield pipeline_instance
+
+    def test_execute_request_concurrent(self, sync_instance):
+        """Concurrent clients get the output of their own request, though the
+        pipeline completes requests out of order"""
+        image_publisher = sync_instance.publisher.image_publisher
+        request_queue = sync_instance.ingestor.request_queue
+        n_clients = 4
+
+        def identity_pipeline():
+            # pass the request metadata through, completing requests in reverse order
+            items = [request_queue.get(timeout=5) for _ in range(n_clients)]
+            for item in reversed(items):
+                meta = dict(item["custom_meta_data"], request_id=item["request_id"])
+                image_publisher._publish(item["source"]["data"].encode(), meta)
+
+        pipeline = threading.Thread(target=identity_pipeline)
+        pipeline.start()
+        with ThreadPoolExecutor(n_clients) as clients:
+            responses = list(clients.map(
+                lambda i: sync_instance.execute_request("valid_instance_id", {
+                    "source": {"type": "base64_image", "data": "image{}".format(i)},
+                    "custom_meta_data": {"client": i},
+                    "publish_frame": True, "timeout": 5}),
+                range(n_clients)))
+        pipeline.join()
+
+        for i, (data, err) in enumerate(responses):
+            assert err is None
+            response = json.loads(data)
+            assert response["metadata"]["client"] == i
+            assert base64.b64decode(response["blob"]) == "image{}".format(i).encode()
+        assert image_publisher.pending == 0
+
+    def test_execute_request_timeout(self, sync_instance):
+        image_publisher = sync_instance.publisher.image_publisher
+        data, err = sync_instance.execute_request("valid_instance_id", {"timeout": 0.01})
+        assert data is None
+        assert err == "Request execution timed out"
+        assert image_publisher.pending == 0
+        # late output is dropped
+        item = sync_instance.ingestor.request_queue.get_nowait()
+        image_publisher._publish(b"late", {"request_id": item["request_id"]})
+        assert image_publisher.pending == 0
+
+    def test_execute_request_failed(self, sync_instance):
+        image_publisher = sync_instance.publisher.image_publisher
+
+        def fail_request():
+            item = sync_instance.ingestor.request_queue.get(timeout=5)
+            image_publisher.fail(item["request_id"], "No such file")
+
+        ingestor = threading.Thread(target=fail_request)
+        ingestor.start()
+        data, err = sync_instance.execute_request("valid_instance_id", {"timeout": 5})
+        ingestor.join()
+        assert data is None
+        assert err == "Request execution failed: No such file"
 
-    def test_execute_request_queue_full(self, pipeline_instance, mocker):
-        pipeline_instance.source_type = "image_ingestor"
-        pipeline_instance.instance_id = "valid_instance_id"
-        pipeline_instance.is_async = False
-        pipeline_instance.is_appdest = True
-        pipeline_instance.publisher = MagicMock()
-        pipeline_instance.publisher.image_publisher = MagicMock()
-        pipeline_instance.publisher.image_publisher.response_queue = MagicMock()
-        pipeline_instance.ingestor = MagicMock()
-        pipeline_instance.ingestor.request_queue = MagicMock()
-        pipeline_instance.ingestor.request_queue.put.side_effect = queue.Full
+    def test_execute_request_concurrency_limit(self, sync_instance):
+        sync_instance._request_slots = threading.BoundedSemaphore(1)
+        sync_instance._request_slots.acquire()
+        data, err = sync_instance.execute_request("valid_instance_id", {},
+                                                  REQUEST_PUT_TIMEOUT=0.01)
+        assert data is None
+        assert err == "Could not execute request, too many requests in flight."
+        assert sync_instance.ingestor.request_queue.empty()
+
+    def test_execute_request_queue_full(self, sync_instance):
+        sync_instance.ingestor.request_queue = MagicMock()
+        sync_instance.ingestor.request_queue.put.side_effect = queue.Full
         request = {"timeout": 5, "publish_frame": True}
-        data, err = pipeline_instance.execute_request("valid_instance_id", request)
+        data, err = sync_instance.execute_request("valid_instance_id", request)
         assert data is None
         assert err == "Could not execute requeust due to timeout."
+        assert sync_instance.publisher.image_publisher.pending == 0
+        # slot is released
+        assert sync_instance._request_slots.acquire(blocking=False)
 
     def test_stop(self, pipeline_instance):
         mock_publisher = MagicMock()
@@ -179,6 +242,14 @@ class TestPipelineInstance:
         status = pipeline_instance.get_status()
         assert status == {"status": "running"}
 
+    def test_get_state_version(self, mocker, pipeline_instance):
+        mock_pipeline = mocker.patch.object(pipeline_instance, 'pipeline', MagicMock())
+        mock_pipeline.state_version.return_value = 3
+        pipeline_instance.instance_id = None
+        assert pipeline_instance.get_state_version() is None
+        pipeline_instance.instance_id = "mock_instance_id"
+        assert pipeline_instance.get_state_version() == 3
+
 
 
 class TestPipeline:
@@ -273,6 +344,17 @@ class TestPipeline:
     def test_pipeline_stop_nonexistent_instance(self, setup_pipeline_obj, mocker):
         pipeline_obj = setup_pipeline_obj
         pipeline_obj.stop("nonexistent_instance")
+
+    def test_pipeline_forget(self, mocker):
+        mock_instance = MagicMock()
+        mocker.patch.dict(Pipeline._INSTANCES, {"instance_1": {"obj": mock_instance, "params": {}}})
+        Pipeline.forget("instance_1")
+        assert "instance_1" not in Pipeline._INSTANCES
+        mock_instance.stop.assert_called_once()
+        # unknown or already stopped instance
+        Pipeline.forget("instance_1")
+        mock_instance.stop.assert_called_once()
+        assert "instance_1" not in Pipeline._INSTANCES
         
 
 
@@ -340,6 +422,14 @@ class TestPipelineServerManager:
         pipeline_server_manager.pserv.pipeline_manager.get_instance_summary.return_value = psummary
         pipeline_server_manager.get_pipeline_instance_summary(instance_id)
 
+    def test_get_pinstance_data(self, mocker, pipeline_server_manager):
+        mock_instance = MagicMock()
+        mocker.patch.dict(Pipeline._INSTANCES, {"instance_123": {"obj": mock_instance, "params": {"a": 1}}})
+        assert pipeline_server_manager._get_pinstance_data("instance_123") == (mock_instance, {"a": 1})
+        with pytest.raises(KeyError):
+            pipeline_server_manager._get_pinstance_data("unknown")
+        assert "unknown" not in Pipeline._INSTANCES
+
     def test_get_pipeline_instance_summary_key_error(self, pipeline_server_manager):
         mock_psummary = {"id": "instance_123", "name": "test_pipeline"}
         pipeline_server_manager.pserv = MagicMock()
@@ -418,6 +508,30 @@ class TestPipelineServerManager:
         pipeline_server_manager.start()
                     
    
+    def test_start_forgets_evicted_instances(self, mocker, pipeline_server_manager):
+        """Instances evicted by the pipeline server are dropped from the manager book"""
+        mocker.patch.object(pipeline_server_manager, '_initialize_pipelines', return_value=None)
+        mocker.patch("src.manager.PipelineServer.start", return_value=None)
+        registry = InstanceRegistry(max_completed=1)
+        mocker.patch("src.manager.PipelineServer.pipeline_manager",
+                     MagicMock(pipeline_instances=registry))
+        mocker.patch.dict(Pipeline._INSTANCES, clear=True)
+        mocker.patch.object(pipeline_server_manager, 'app_config', {'pipelines': []})
+        mocker.patch.object(pipeline_server_manager, '_PIPELINES', {})
+        pipeline_server_manager.start()
+        instances = {}
+        for instance_id in ("instance_1", "instance_2", "instance_3"):
+            instances[instance_id] = MagicMock()
+            Pipeline._INSTANCES[instance_id] = {"obj": instances[instance_id], "params": {}}
+            registry[instance_id] = MagicMock(state=PipelineState.State.COMPLETED)
+            registry.completed(instance_id)
+        assert list(Pipeline._INSTANCES) == ["instance_3"]
+        instances["instance_1"].stop.assert_called_once()
+        instances["instance_2"].stop.assert_called_once()
+        instances["instance_3"].stop.assert_not_called()
+        with pytest.raises(KeyError):
+            pipeline_server_manager._get_pinstance_data("instance_1")
+
     def test_start_instance_pipeline_not_found(self, pipeline_server_manager):
         pipeline_server_manager.log = MagicMock()
         instance_id, errmsg = pipeline_server_manager.start_instance("pipeline1", "non_existent_version")
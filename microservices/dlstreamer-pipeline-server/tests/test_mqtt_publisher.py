@@ -6,6 +6,9 @@
 
 import base64
 import json
+import struct
+import time
+import threading as th
 from unittest.mock import MagicMock
 
 import pytest
@@ -35,6 +38,26 @@ def setup(mocker):
     yield app_cfg
 
 
+class FakeClient:
+    """Stand-in for MQTTClient capturing published messages"""
+
+    def __init__(self):
+        self.messages = []
+        self.published = th.Condition()
+
+    def is_connected(self):
+        return True
+
+    def publish(self, topic, payload):
+        with self.published:
+            self.messages.append(payload)
+            self.published.notify_all()
+
+    def wait_for(self, count, timeout=5):
+        with self.published:
+            self.published.wait_for(lambda: len(self.messages) >= count, timeout)
+
+
 class TestMqttPublisher:
 
     def test_stop(self, mocker, setup):
@@ -96,6 +119,103 @@ class TestMqttPublisher:
        
         assert "Message not published" in capfd.readouterr().out
 
+    @staticmethod
+    def parse_binary(payload):
+        records = []
+        offset = 0
+        while offset < len(payload):
+            meta_len, blob_len = struct.unpack_from("!II", payload, offset)
+            offset += 8
+            meta = json.loads(payload[offset:offset + meta_len])
+            offset += meta_len
+            records.append((meta, payload[offset:offset + blob_len]))
+            offset += blob_len
+        return records
+
+    @pytest.mark.parametrize('config', [{'max_batch_frames': 0},
+                                        {'max_batch_delay_ms': -1},
+                                        {'payload_format': 'xml'},
+                                        {'json_format': 'pretty'}])
+    def test_invalid_batch_config(self, setup, config):
+        with pytest.raises(ValueError):
+            MQTTPublisher(config)
+
+    def test_publish_binary(self, setup):
+        pub_obj = MQTTPublisher({'publish_frame': True, 'payload_format': 'binary'})
+        pub_obj.client = FakeClient()
+
+        pub_obj._publish(b"Test", {'frame_id': 0})
+
+        assert len(pub_obj.client.messages) == 1
+        assert self.parse_binary(pub_obj.client.messages[0]) == [({'frame_id': 0}, b"Test")]
+
+    @pytest.mark.parametrize('json_format, expected', [
+        (None, b'{"metadata": {"label": "\\u00e4", "frame_id": 0}, "blob": ""}'),
+        ('standard', b'{"metadata": {"label": "\\u00e4", "frame_id": 0}, "blob": ""}'),
+        ('compact', '{"metadata":{"label":"\u00e4","frame_id":0},"blob":""}'.encode('utf-8')),
+    ])
+    def test_publish_json_format(self, setup, json_format, expected):
+        if json_format == 'compact':
+            pytest.importorskip('orjson')
+        config = {'json_format': json_format} if json_format else {}
+        pub_obj = MQTTPublisher(config)
+        pub_obj.client = FakeClient()
+        pub_obj._publish(b"Test", {'label': '\u00e4', 'frame_id': 0})
+        assert pub_obj.client.messages == [expected]
+
+    @pytest.mark.parametrize('payload_format', ['json', 'binary'])
+    def test_run_batch_size(self, setup, payload_format):
+        pub_obj = MQTTPublisher({'publish_frame': True, 'payload_format': payload_format,
+                                 'max_batch_frames': 4, 'max_batch_delay_ms': 10000})
+        pub_obj.client = FakeClient()
+        for i in range(10):
+            pub_obj.queue.append((bytes([i]), {'frame_id': i}))
+        pub_obj.start()
+        pub_obj.client.wait_for(2)
+        time.sleep(0.05)
+        # the incomplete third batch is not sent before the delay expires...
+        assert len(pub_obj.client.messages) == 2
+        pub_obj.stop()
+        # ...but on stop
+        assert len(pub_obj.client.messages) == 3
+
+        for batch, message in enumerate(pub_obj.client.messages):
+            if payload_format == 'binary':
+                records = self.parse_binary(message)
+            else:
+                records = [(msg['metadata'], base64.b64decode(msg['blob'])) for msg in json.loads(message)]
+            assert records == [({'frame_id': i}, bytes([i])) for i in range(batch * 4, min(batch * 4 + 4, 10))]
+
+    def test_run_batch_delay(self, setup):
+        pub_obj = MQTTPublisher({'payload_format': 'binary',
+                                 'max_batch_frames': 100, 'max_batch_delay_ms': 50})
+        pub_obj.client = FakeClient()
+        pub_obj.start()
+        for i in range(3):
+            pub_obj.queue.append((b"", {'frame_id': i}))
+        pub_obj.client.wait_for(1)
+        time.sleep(0.1)
+        pub_obj.queue.append((b"", {'frame_id': 3}))
+        pub_obj.client.wait_for(2)
+        pub_obj.stop()
+
+        assert [[meta['frame_id'] for meta, _ in self.parse_binary(message)]
+                for message in pub_obj.client.messages] == [[0, 1, 2], [3]]
+
+    def test_run_batch_filter(self, setup):
+        pub_obj = MQTTPublisher({'max_batch_frames': 3})
+        pub_obj.client = FakeClient()
+        pub_obj.filter = MagicMock()
+        pub_obj.filter.check_filter_criteria.side_effect = lambda meta: meta['frame_id'] != 1
+        for i in range(6):
+            pub_obj.queue.append((b"", {'frame_id': i}))
+        pub_obj.start()
+        pub_obj.client.wait_for(2)
+        pub_obj.stop()
+
+        assert [[msg['metadata']['frame_id'] for msg in json.loads(message)]
+                for message in pub_obj.client.messages] == [[0, 2], [3, 4, 5]]
+
     # def test_filter(self, capfd, setup):
     #     app_cfg = setup
     #     app_cfg["mqtt_publisher"]["filter"] = {"type": "classification", "label_score": {"person": 0.5}}
@@ -5,7 +5,11 @@
 #
 
 import pytest
+import contextlib
+import json
+import os
 import queue
+import time
 import numpy as np
 import cv2
 from unittest.mock import MagicMock
@@ -17,6 +21,13 @@ from src.server.gstreamer_app_source import GvaFrameData
 
 from src.publisher.publisher import Publisher
 from src.publisher.mqtt.mqtt_publisher import MQTTPublisher
+from src.publisher.s3.s3_writer import S3Writer
+from src.publisher.common.encode_pool import EncodePool
+from src.publisher.common.output_profile import OutputProfile, OutputStage
+from src.publisher.common import serialize
+from src.publisher.common.frame import FrameHandle
+from src.publisher.common.image_handle import ImageHandleTemplate
+from utils import publisher_utils as utils
 
 from collections import namedtuple
 from enum import Enum
@@ -36,11 +47,18 @@ def setup(mocker):
     mocker.patch('src.publisher.publisher.MQTTPublisher')
     yield app_cfg, pub_cfg
 
+# Encode pool of the publisher, rather than the process wide pool
+@pytest.fixture
+def encode_pool():
+    pool = EncodePool(2)
+    yield pool
+    pool.shutdown()
+
 # Publisher object for tests
 @pytest.fixture
-def pub_obj(setup):
+def pub_obj(setup, encode_pool):
     app_cfg, pub_cfg = setup
-    pub_obj = Publisher(app_cfg, pub_cfg, queue.Queue())
+    pub_obj = Publisher(app_cfg, pub_cfg, queue.Queue(), encode_pool=encode_pool)
     yield pub_obj
 
 class TestPublisher:
@@ -50,14 +68,14 @@ class TestPublisher:
         ({'img_handle_length': -20}, ValueError), 
         ({}, 10)
     ])
-    def test_init_img_handle(self, setup, mocker, capfd, test_cfg, expected):
+    def test_init_img_handle(self, setup, encode_pool, mocker, capfd, test_cfg, expected):
         mock_is_tracking_enabled=mocker.patch('src.publisher.publisher.Publisher._is_tracking_enabled')
         mock_is_tracking_enabled.return_value=True
         app_cfg, pub_cfg = setup
         app_cfg = test_cfg
         
         try:
-            pub_obj = Publisher(app_cfg, pub_cfg, queue.Queue())
+            pub_obj = Publisher(app_cfg, pub_cfg, queue.Queue(), encode_pool=encode_pool)
             pub_obj.img_handle_length = expected
         except Exception as e:
             assert type(e) == expected
@@ -67,13 +85,13 @@ class TestPublisher:
     @pytest.mark.parametrize('app_cfg_encoding, expected', [
         ({'encoding': {'level': 95,'type': 'jpeg'}}, True), 
         ({'encoding': {'type': 'jpeg'}}, KeyError), ({}, False)])
-    def test_init_encoding(self, setup, app_cfg_encoding, mocker, expected):
+    def test_init_encoding(self, setup, encode_pool, app_cfg_encoding, mocker, expected):
         mock_is_tracking_enabled=mocker.patch('src.publisher.publisher.Publisher._is_tracking_enabled')
         mock_is_tracking_enabled.return_value=True
         app_cfg, pub_cfg = setup
         app_cfg = app_cfg_encoding
         try:
-            pub_obj = Publisher(app_cfg, pub_cfg, queue.Queue())
+            pub_obj = Publisher(app_cfg, pub_cfg, queue.Queue(), encode_pool=encode_pool)
             pub_obj.encoding = expected
         except Exception as e:
             assert type(e) == expected
@@ -91,8 +109,7 @@ class TestPublisher:
             (False, True)  #Thread to be stopped
         ])
     def test_stop(self, mocker, pub_obj, is_set, expected):
-        mocked_thread_event = mocker.patch("src.publisher.publisher.th.Event")
-        pub_obj.stop_ev = mocked_thread_event
+        pub_obj.stop_ev = MagicMock()
         pub_obj.stop_ev.is_set.return_value = is_set
         
         if not is_set:
@@ -193,7 +210,10 @@ class TestPublisher:
 
         try:
             frame, meta_data = pub_obj._get_gst_buffer_info(mocked_result)
-            assert frame == b"Test"
+            assert frame.data == b"Test"
+            assert not frame.released
+            frame.release()
+            assert frame.released
             assert meta_data == {
                 'height': 180,
                 'width': 120,
@@ -217,6 +237,41 @@ class TestPublisher:
         pub_obj._publish(frame, meta_data)
         pub_obj.publishers[1].queue.append.assert_called_once_with((frame, meta_data))
 
+    def test_encode_frame_metrics(self, mocker, pub_obj):
+        mock_instruments = MagicMock()
+        mocker.patch('src.publisher.publisher.metrics.instruments', return_value=mock_instruments)
+        mock_encode = mocker.patch('src.publisher.publisher.utils.encode_frame', return_value='encoded')
+
+        assert pub_obj._encode_frame('jpeg', 95, b'Test') == 'encoded'
+
+        mock_encode.assert_called_once_with('jpeg', 95, b'Test')
+        time_ms, attributes = mock_instruments.encode_time.record.call_args.args
+        assert time_ms >= 0
+        assert attributes == {"encoding_type": "jpeg"}
+
+    @pytest.mark.parametrize('block', [True, False])
+    def test_publish_s3_block(self, pub_obj, block):
+        frame = b'sample_frame_data'
+        meta_data = {'info': 'sample_meta_data'}
+        s3_writer = MagicMock(spec=S3Writer)
+        s3_writer.s3_metadata_write_wait = block
+        s3_writer.queue = MagicMock()
+        mqtt_publisher = MagicMock()
+        pub_obj.publishers = [s3_writer, mqtt_publisher]
+
+        pub_obj._publish(frame, meta_data)
+
+        s3_frame, s3_meta_data, on_complete = s3_writer.queue.append.call_args.args[0]
+        assert (s3_frame, s3_meta_data) == (frame, meta_data)
+        if block:
+            # metadata is published once the frame is written, without blocking the publisher
+            assert on_complete is not None
+            mqtt_publisher.queue.append.assert_not_called()
+            on_complete(None)
+        else:
+            assert on_complete is None
+        mqtt_publisher.queue.append.assert_called_once_with((frame, meta_data))
+
 
     @pytest.mark.parametrize('cfg, frame, meta_data, video_frame',
                              [({'encoding': {'level': 95,'type': 'jpeg'}}, 
@@ -237,14 +292,13 @@ class TestPublisher:
                               ({}, 
                                 b'Test', {'height': 120,'width': 90,'channels': 3,'caps': 'video/x-raw,'},
                                 None)])
-    def test_run(self, mocker, setup, cfg, frame, meta_data, video_frame):
+    def test_run(self, mocker, setup, encode_pool, cfg, frame, meta_data, video_frame):
         mock_is_tracking_enabled=mocker.patch('src.publisher.publisher.Publisher._is_tracking_enabled')
         mock_is_tracking_enabled.return_value=True
         app_cfg, pub_cfg = setup
         app_cfg = cfg
-        pub_obj = Publisher(app_cfg, pub_cfg, MagicMock())
-        mocked_event = mocker.patch('src.publisher.publisher.th.Event')
-        pub_obj.stop_ev = mocked_event
+        pub_obj = Publisher(app_cfg, pub_cfg, MagicMock(), encode_pool=encode_pool)
+        pub_obj.stop_ev = MagicMock()
         pub_obj.stop_ev.is_set.side_effect = [False, True]
         pub_obj.queue.put(queue)
         mocker.patch('src.publisher.publisher.Publisher._get_gst_buffer_info',
@@ -288,8 +342,7 @@ class TestPublisher:
         #pub_obj._publish.assert_called_with(expected_frame, expected_meta_data)
 
     def test_run_empty_queue(self, mocker, caplog, pub_obj):
-        mocked_event = mocker.patch('src.publisher.publisher.th.Event')
-        pub_obj.stop_ev = mocked_event
+        pub_obj.stop_ev = MagicMock()
         pub_obj.stop_ev.is_set.side_effect = [False, True]
 
         pub_obj.queue.get = MagicMock()
@@ -298,8 +351,7 @@ class TestPublisher:
         assert "In publisher thread" not in caplog.text
 
     def test_run_empty_results(self, mocker, caplog, pub_obj):
-        mocked_event = mocker.patch('src.publisher.publisher.th.Event')
-        pub_obj.stop_ev = mocked_event
+        pub_obj.stop_ev = MagicMock()
         pub_obj.stop_ev.is_set.side_effect = [False, True]
         pub_obj.queue.get = MagicMock()
         pub_obj.queue.get.return_value = None
@@ -312,8 +364,7 @@ class TestPublisher:
          (Exception, 'Error in publisher thread')])
     def test_run_encode_errors(self, mocker, caplog, pub_obj, exception,
                                expected):
-        mocked_event = mocker.patch('src.publisher.publisher.th.Event')
-        pub_obj.stop_ev = mocked_event
+        pub_obj.stop_ev = MagicMock()
         pub_obj.stop_ev.is_set.side_effect = [False, True]
         pub_obj.queue.put(MagicMock())
 
@@ -329,14 +380,43 @@ class TestPublisher:
 
         pub_obj._run()
 
+    def test_run_encode_order(self, mocker, pub_obj):
+        num_frames = 8
+        pub_obj.stop_ev = MagicMock()
+        pub_obj.stop_ev.is_set.side_effect = [False] * num_frames + [True]
+        pub_obj.publish_raw_frame = False
+        pub_obj.grpc_publish = True
+        for i in range(num_frames):
+            pub_obj.queue.put(MagicMock(video_frame=None))
+
+        frames = iter([(bytes([i]), {'height': 1, 'width': 1, 'channels': 3,
+                                     'caps': 'video/x-raw,', 'img_format': 'BGR'})
+                       for i in range(num_frames)])
+        mocker.patch('src.publisher.publisher.Publisher._get_gst_buffer_info',
+                     side_effect=lambda sample: next(frames))
+        mocker.patch('src.publisher.publisher.Publisher._add_pipeline_info_metadata')
+
+        def encode_frame(enc_type, enc_level, frame, height, width, channels, meta_data):
+            # later frames finish first
+            time.sleep(0.002 * (num_frames - frame[0]))
+            return (True, np.array([frame[0]], dtype=np.uint8)), 'jpeg', 95
+
+        mocker.patch('src.publisher.publisher.utils.encode_frame', side_effect=encode_frame)
+        mock_publish = mocker.patch('src.publisher.publisher.Publisher._publish')
+
+        pub_obj._run()
+
+        published = [call.args for call in mock_publish.call_args_list]
+        assert [frame for frame, _ in published] == [bytes([i]) for i in range(num_frames)]
+        assert [meta['frame_id'] for _, meta in published] == list(range(num_frames))
+
     @pytest.mark.parametrize(
         'exception, expected',
         [(ValueError, 'Value error occured when getting gst buffer data'),
          (Exception, 'Error in publisher thread')])
     def test_run_gst_buffer_error(self, mocker, caplog, pub_obj, exception,
                                   expected):
-        mocked_event = mocker.patch('src.publisher.publisher.th.Event')
-        pub_obj.stop_ev = mocked_event
+        pub_obj.stop_ev = MagicMock()
         pub_obj.stop_ev.is_set.side_effect = [False, True]
         pub_obj.queue.put(MagicMock())
 
@@ -364,6 +444,63 @@ class TestPublisher:
         assert metadata['pipeline'] == {'name': 'test', 'version': 1, 'instance_id': 'abc', 'status': {'avg_fps': 19, 'state': 'QUEUED'}}
 
 
+    def test_pipeline_status_cached(self, pub_obj):
+        """Status is fetched once per state change over 10k frames"""
+        class StubPipeline:
+            def __init__(self):
+                self.state = TestPublisher.State.QUEUED
+                self.state_version = 1
+                self.status_calls = 0
+                self.version_calls = 0
+
+            def status(self):
+                self.status_calls += 1
+                return namedtuple('PipelineStatus', ['avg_fps', 'state'])(self.status_calls, self.state)
+
+            def get_state_version(self):
+                self.version_calls += 1
+                return self.state_version
+
+        pipeline = StubPipeline()
+        pub_obj.set_pipeline_info("test", 1, "abc", pipeline.status, pipeline.get_state_version)
+        pub_obj.pipeline_status_interval = float('inf')
+        num_frames = 10000
+        states = []
+        for i in range(num_frames):
+            if i in (10, 5000):
+                # state transitions
+                pipeline.state_version += 1
+            metadata = {}
+            pub_obj._add_pipeline_info_metadata(metadata)
+            states.append(metadata['pipeline']['status']['avg_fps'])
+        assert pipeline.status_calls == 3
+        assert pipeline.version_calls == num_frames
+        assert states[9] == 1 and states[10] == 2 and states[5000] == 3
+        assert metadata['pipeline'] == {'name': 'test', 'version': 1, 'instance_id': 'abc',
+                                        'status': {'avg_fps': 3, 'state': 'QUEUED'}}
+
+        # stale status is refreshed after the interval
+        pub_obj.pipeline_status_interval = 0
+        pub_obj._add_pipeline_info_metadata({})
+        assert pipeline.status_calls == 4
+
+    def test_pipeline_encoding_parsed_once(self, mocker, pub_obj):
+        pub_obj.stop_ev = MagicMock()
+        pub_obj.stop_ev.is_set.side_effect = [False] * 3 + [True]
+        pub_obj.app_cfg['pipeline'] = 'source ! jpegenc quality=70 ! appsink name=destination'
+        for _ in range(3):
+            pub_obj.queue.put(MagicMock(video_frame=None))
+        mocker.patch('src.publisher.publisher.Publisher._get_gst_buffer_info',
+                     side_effect=lambda sample: (b'Test', {'height': 1, 'width': 1, 'channels': 3,
+                                                           'caps': 'image/jpeg,'}))
+        mocker.patch('src.publisher.publisher.Publisher._add_pipeline_info_metadata')
+        get_encoding = mocker.patch.object(pub_obj, '_get_pipeline_encoding_properties',
+                                           wraps=pub_obj._get_pipeline_encoding_properties)
+        mock_publish = mocker.patch('src.publisher.publisher.Publisher._publish')
+        pub_obj._run()
+        get_encoding.assert_called_once()
+        assert [call.args[1]['encoding_level'] for call in mock_publish.call_args_list] == [70] * 3
+
     @pytest.mark.parametrize("pipeline, expected", [
         ("source ! decodebin ! gvatrack ! appsink", True),
         ("source ! decodebin ! appsink", False)
@@ -386,8 +523,286 @@ class TestPublisher:
         assert object_id == expected_id, f"Expected object ID to be {expected_id} when tracking is {'enabled' if tracking_enabled else 'disabled'}"
     
 
+    def test_add_tracking_info_first_region(self, pub_obj):
+        """Object id of the first region with a matching bbox is used"""
+        pub_obj.tracking = True
+        meta_data = {'annotations': {'objects': [{'bbox': [10, 10, 50, 50]}, {'bbox': [0, 0, 5, 5]}]},
+                     'gva_meta': [{'x': 10, 'y': 10, 'width': 40, 'height': 40, 'object_id': 1},
+                                  {'x': 10, 'y': 10, 'width': 40, 'height': 40, 'object_id': 2}]}
+        updated_meta = pub_obj._add_tracking_info(meta_data)
+        assert [o['object_id'] for o in updated_meta['annotations']['objects']] == [1, None]
+        assert updated_meta['gva_meta'] == []
+
+    def test_add_tracking_info_benchmark(self, pub_obj, record_property):
+        """Merges tracking info of frames with 500 regions and reports the per-frame cost"""
+        num_regions = 500
+        num_frames = 20
+        pub_obj.tracking = True
+        regions = [{'x': i, 'y': 2 * i, 'width': 10, 'height': 20, 'object_id': i}
+                   for i in range(num_regions)]
+        frames = [{'annotations': {'objects': [{'bbox': [r['x'], r['y'], r['x'] + 10, r['y'] + 20]}
+                                               for r in reversed(regions)]},
+                   'gva_meta': list(regions)} for _ in range(num_frames)]
+        start = time.perf_counter()
+        for meta_data in frames:
+            pub_obj._add_tracking_info(meta_data)
+        per_frame = (time.perf_counter() - start) / num_frames
+        record_property("tracking_merge_ms_per_frame_{}_regions".format(num_regions), round(per_frame * 1000, 3))
+        assert [o['object_id'] for o in frames[-1]['annotations']['objects']] == \
+            list(reversed(range(num_regions)))
+        # linear in regions, the former nested loop took tens of ms per frame
+        assert per_frame < 0.005
+
     def test_convert_inference_result(self, pub_obj):
         metadata = {'gva_meta': [{'x': 457, 'y': 496, 'height': 414, 'width': 167, 'object_id': None, 'tensor': [{'name': 'detection', 'confidence': 0.9830476641654968, 'label_id': 1, 'label':'Person'}]}]}
         expected = ['annotations', 'annotation_type', 'last_modified', 'export_code']
         pub_obj._convert_inference_result(metadata)
-        assert list(metadata.keys()) == expected
\ No newline at end of file
+        assert list(metadata.keys()) == expected
+
+class TestOutputProfiles:
+    """Frames handed to publishers with output profiles"""
+
+    WIDTH = 32
+    HEIGHT = 24
+
+    @pytest.fixture
+    def profiled_pub(self, mocker, pub_obj):
+        pub_obj.publish_raw_frame = False
+        pub_obj.grpc_publish = True
+        pub_obj.add_timestamp = False
+        pub_obj.publishers = []
+        pub_obj.output_stage = OutputStage()
+        mocker.patch('src.publisher.publisher.Publisher._add_pipeline_info_metadata')
+        return pub_obj
+
+    def add_publisher(self, pub_obj, profile=None):
+        publisher = MagicMock()
+        publisher.queue = []
+        pub_obj.publishers.append(publisher)
+        pub_obj.output_stage.add(publisher, profile)
+        return publisher
+
+    def run(self, mocker, pub_obj, num_frames):
+        pub_obj.stop_ev = MagicMock()
+        pub_obj.stop_ev.is_set.side_effect = [False] * num_frames + [True]
+        for i in range(num_frames):
+            pub_obj.queue.put(MagicMock(video_frame=None))
+        frames = iter([(bytes([i]) * (self.WIDTH * self.HEIGHT * 3),
+                        {'height': self.HEIGHT, 'width': self.WIDTH, 'channels': 3,
+                         'caps': 'video/x-raw,', 'img_format': 'BGR'})
+                       for i in range(num_frames)])
+        mocker.patch('src.publisher.publisher.Publisher._get_gst_buffer_info',
+                     side_effect=lambda sample: next(frames))
+        encode_frame = mocker.patch('src.publisher.publisher.utils.encode_frame',
+                                    wraps=utils.encode_frame)
+        pub_obj._run()
+        return encode_frame
+
+    def test_sampling_and_shared_encode(self, mocker, profiled_pub):
+        thumbnail = {'frame_skip': 2, 'max_dimension': 16, 'jpeg_quality': 60}
+        full = self.add_publisher(profiled_pub)
+        dashboards = [self.add_publisher(profiled_pub, OutputProfile.from_config(thumbnail))
+                      for _ in range(2)]
+        sampled = self.add_publisher(profiled_pub, OutputProfile(frame_skip=1))
+
+        encode_frame = self.run(mocker, profiled_pub, 6)
+
+        assert [meta['frame_id'] for _, meta in full.queue] == list(range(6))
+        assert [meta['frame_id'] for _, meta in sampled.queue] == [0, 2, 4]
+        # sampled frames without own encoding are shared with the full stream
+        assert [frame for frame, _ in sampled.queue] == [full.queue[i][0] for i in (0, 2, 4)]
+        for dashboard in dashboards:
+            assert [meta['frame_id'] for _, meta in dashboard.queue] == [0, 3]
+            for frame, meta in dashboard.queue:
+                assert (meta['width'], meta['height']) == (16, 12)
+                assert meta['encoding_level'] == 60
+                decoded = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
+                assert decoded.shape == (12, 16, 3)
+        # identical profiles share one encode and its output
+        assert [frame for frame, _ in dashboards[0].queue] == [frame for frame, _ in dashboards[1].queue]
+        assert dashboards[0].queue[0][0] is dashboards[1].queue[0][0]
+        assert full.queue[0][1]['width'] == self.WIDTH
+        # 6 full frames, 2 thumbnails
+        assert encode_frame.call_count == 8
+        assert [call.kwargs.get('max_dimension') for call in encode_frame.call_args_list].count(16) == 2
+
+    def test_no_full_frame_encode(self, mocker, profiled_pub):
+        thumbnail = self.add_publisher(profiled_pub, OutputProfile(frame_skip=3, max_dimension=8))
+        small = self.add_publisher(profiled_pub, OutputProfile(frame_skip=1, max_dimension=16))
+
+        encode_frame = self.run(mocker, profiled_pub, 8)
+
+        assert [meta['frame_id'] for _, meta in thumbnail.queue] == [0, 4]
+        assert [meta['frame_id'] for _, meta in small.queue] == [0, 2, 4, 6]
+        assert [meta['width'] for _, meta in thumbnail.queue] == [8, 8]
+        # only the frames selected by a profile are encoded
+        assert encode_frame.call_count == 6
+
+    def test_publish_without_renditions(self, profiled_pub):
+        full = self.add_publisher(profiled_pub)
+        thumbnail = self.add_publisher(profiled_pub, OutputProfile(max_dimension=16))
+        profiled_pub._publish(b'Test', {'frame_id': 0})
+        assert full.queue == [(b'Test', {'frame_id': 0})]
+        assert thumbnail.queue == []
+
+
+class TestConvertInferenceResultGolden:
+    """DCaaS conversion of recorded metadata matches the output of the former
+    per-region implementation, byte for byte"""
+
+    DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'dcaas')
+
+    def convert(self, mocker, pub_obj, sample):
+        mocker.patch('src.publisher.publisher.time_ns', return_value=1700000000000000000)
+        with open(os.path.join(self.DATA_DIR, sample + '.json')) as f:
+            meta_data = json.load(f)
+        with open(os.path.join(self.DATA_DIR, sample + '.expected.json'), 'rb') as f:
+            expected = f.read()
+        return pub_obj._convert_inference_result(meta_data), expected
+
+    @pytest.mark.parametrize('has_orjson', [True, False])
+    @pytest.mark.parametrize('sample', ['empty', 'single', 'crowd', 'mixed_types'])
+    def test_golden(self, mocker, pub_obj, sample, has_orjson):
+        converted, expected = self.convert(mocker, pub_obj, sample)
+        assert json.dumps(converted).encode('utf-8') == expected
+        if not has_orjson:
+            mocker.patch.object(serialize, 'orjson', None)
+        assert serialize.dumps(converted) == expected
+        assert serialize.dumps_str(converted).encode('utf-8') == expected
+
+    @pytest.mark.parametrize('sample', ['empty', 'single', 'crowd', 'mixed_types'])
+    def test_golden_compact(self, mocker, pub_obj, sample):
+        pytest.importorskip('orjson')
+        converted, expected = self.convert(mocker, pub_obj, sample)
+        compact = serialize.dumps(converted, 'compact')
+        assert json.loads(compact) == json.loads(expected)
+        assert compact == json.dumps(json.loads(expected), separators=(',', ':'),
+                                     ensure_ascii=False).encode('utf-8')
+
+    def test_benchmark(self, pub_obj, record_property):
+        """Converts frames with 500 regions and reports the per-frame cost"""
+        with open(os.path.join(self.DATA_DIR, 'crowd.json')) as f:
+            regions = json.load(f)['gva_meta']
+        regions = (regions * 9)[:500]
+        num_frames = 20
+        frames = [{'gva_meta': [dict(region) for region in regions]} for _ in range(num_frames)]
+        start = time.perf_counter()
+        for meta_data in frames:
+            pub_obj._convert_inference_result(meta_data)
+        per_frame = (time.perf_counter() - start) / num_frames
+        record_property("dcaas_conversion_ms_per_frame_{}_regions".format(len(regions)), round(per_frame * 1000, 3))
+        assert len(frames[-1]['annotations']['objects']) == 500
+
+
+class TestImageHandles:
+    """Deterministic handles are shared by all publishers of a frame"""
+
+    @pytest.fixture
+    def handle_pub(self, mocker, setup, encode_pool):
+        app_cfg, pub_cfg = setup
+        app_cfg['img_handle_scheme'] = '{instance_id}-{pts}-{seq}'
+        pub_obj = Publisher(app_cfg, pub_cfg, queue.Queue(), add_timestamp=False,
+                            encode_pool=encode_pool)
+        pub_obj.pipeline_instance_id = 'abc'
+        pub_obj.grpc_publish = True
+        pub_obj.publishers = []
+        pub_obj.output_stage = OutputStage()
+        mocker.patch('src.publisher.publisher.Publisher._add_pipeline_info_metadata')
+        return pub_obj
+
+    def add_publisher(self, pub_obj, profile=None, spec=None):
+        publisher = MagicMock(spec=spec)
+        publisher.queue = []
+        publisher.s3_metadata_write_wait = False
+        pub_obj.publishers.append(publisher)
+        pub_obj.output_stage.add(publisher, profile)
+        return publisher
+
+    def run(self, mocker, pub_obj, frames):
+        pub_obj.stop_ev = MagicMock()
+        pub_obj.stop_ev.is_set.side_effect = [False] * len(frames) + [True]
+        for _ in frames:
+            pub_obj.queue.put(MagicMock(video_frame=None))
+        frames = iter(frames)
+        mocker.patch('src.publisher.publisher.Publisher._get_gst_buffer_info',
+                     side_effect=lambda sample: (next(frames), {
+                         'height': 4, 'width': 4, 'channels': 3,
+                         'caps': 'video/x-raw,', 'img_format': 'BGR'}))
+        pub_obj._run()
+
+    @staticmethod
+    def handles(publisher):
+        return [item[1]['img_handle'] for item in publisher.queue]
+
+    def test_handle_shared_by_publishers(self, mocker, handle_pub):
+        handle_pub.s3_config = {'bucket': 'bucket', 'folder_prefix': 'prefix'}
+        s3_writer = self.add_publisher(handle_pub, spec=S3Writer)
+        mqtt_publisher = self.add_publisher(handle_pub)
+        thumbnail = self.add_publisher(handle_pub, OutputProfile(frame_skip=1, max_dimension=2))
+        num_frames = 6
+        frames = [FrameHandle(contextlib.nullcontext(bytearray([i]) * 48), pts=1000 * i)
+                  for i in range(num_frames)]
+
+        self.run(mocker, handle_pub, frames)
+
+        expected = ['abc-{}-{}'.format(1000 * i, i) for i in range(num_frames)]
+        assert self.handles(s3_writer) == expected
+        assert self.handles(mqtt_publisher) == expected
+        assert self.handles(thumbnail) == expected[::2]
+        # handle is the S3 object key
+        assert [item[1]['S3_meta']['key'] for item in s3_writer.queue] == \
+            ['prefix/' + handle for handle in expected]
+
+    def test_s3_meta_of_sampled_frames(self, mocker, handle_pub):
+        handle_pub.s3_config = {'bucket': 'bucket', 'folder_prefix': 'prefix'}
+        s3_writer = self.add_publisher(handle_pub, OutputProfile(frame_skip=2), spec=S3Writer)
+        mqtt_publisher = self.add_publisher(handle_pub)
+        frames = [FrameHandle(contextlib.nullcontext(bytearray([i]) * 48), pts=1000 * i)
+                  for i in range(6)]
+
+        self.run(mocker, handle_pub, frames)
+
+        assert [item[1]['frame_id'] for item in s3_writer.queue] == [0, 3]
+        assert [item[1]['S3_meta']['key'] for item in s3_writer.queue] == \
+            ['prefix/abc-0-0', 'prefix/abc-3000-3']
+        # only frames stored by the S3 writer reference an object
+        assert ['S3_meta' in item[1] for item in mqtt_publisher.queue] == \
+            [True, False, False, True, False, False]
+
+    def test_unique_handles(self, mocker, handle_pub):
+        publisher = self.add_publisher(handle_pub)
+        num_frames = 200
+        # identical frames without timestamps
+        self.run(mocker, handle_pub, [bytes(48)] * num_frames)
+        handles = self.handles(publisher)
+        assert len(handles) == num_frames
+        assert len(set(handles)) == num_frames
+
+    def test_content_handles(self, mocker, handle_pub):
+        handle_pub.img_handle_template = ImageHandleTemplate.from_scheme('content')
+        publisher = self.add_publisher(handle_pub)
+        self.run(mocker, handle_pub, [bytes(48), bytes([1]) * 48, bytes(48)])
+        handles = self.handles(publisher)
+        # retries of the same frame map to the same handle
+        assert handles[0] == handles[2] != handles[1]
+
+    def test_handle_from_ingestor_kept(self, mocker, handle_pub):
+        publisher = self.add_publisher(handle_pub)
+        mocker.patch('src.publisher.publisher.utils.get_gva_meta_messages',
+                     side_effect=lambda video_frame, meta_data: meta_data.update(img_handle='given'))
+        mocker.patch('src.publisher.publisher.utils.get_gva_meta_regions', return_value=[])
+        handle_pub.stop_ev = MagicMock()
+        handle_pub.stop_ev.is_set.side_effect = [False, True]
+        handle_pub.queue.put(MagicMock())
+        mocker.patch('src.publisher.publisher.Publisher._get_gst_buffer_info',
+                     return_value=(bytes(48), {'height': 4, 'width': 4, 'channels': 3,
+                                               'caps': 'video/x-raw,', 'img_format': 'BGR'}))
+        handle_pub._run()
+        assert self.handles(publisher) == ['given']
+
+    def test_invalid_scheme(self, setup, encode_pool):
+        app_cfg, pub_cfg = setup
+        app_cfg['img_handle_scheme'] = '{camera}-{seq}'
+        pub_obj = Publisher(app_cfg, pub_cfg, queue.Queue(), encode_pool=encode_pool)
+        assert pub_obj.done
+        assert pub_obj.img_handle_template is None
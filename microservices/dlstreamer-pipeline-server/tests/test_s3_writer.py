@@ -5,7 +5,13 @@
 #
 
 import base64
+import io
 import json
+import queue
+import tarfile
+import threading as th
+import time
+import zipfile
 from unittest.mock import MagicMock
 
 import pytest
@@ -13,6 +19,7 @@ import src
 
 import src.common
 from src.publisher.s3.s3_writer import S3Writer
+from utils.s3_client import S3Client
 
 @pytest.fixture
 def setup(mocker):
@@ -29,13 +36,83 @@ def setup(mocker):
     mocker.patch('src.publisher.s3.s3_writer.S3Client')
     yield app_cfg
 
+class FakeS3:
+    """In-process stand-in for the boto3 S3 client"""
+
+    def __init__(self):
+        self.objects = {}
+        self.attempts = {}
+        self.failures = {}
+        self.delays = {}
+        self.uploads = {}
+        self.aborted = []
+        self.lock = th.Lock()
+
+    def _attempt(self, key):
+        with self.lock:
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+            failures = self.failures.get(key, 0)
+            if failures:
+                self.failures[key] = failures - 1
+                raise ConnectionError("S3 unavailable")
+        time.sleep(self.delays.get(key, 0))
+
+    def put_object(self, Bucket, Key, Body):
+        self._attempt(Key)
+        with self.lock:
+            self.objects[Key] = Body.read()
+        return {'ResponseMetadata': {'HTTPStatusCode': 200}}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = str(len(self.uploads))
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._attempt(Key)
+        self.uploads[UploadId][PartNumber] = Body.read()
+        return {'ETag': str(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(Key)
+
+
+@pytest.fixture
+def fake_s3(mocker):
+    fake_s3 = FakeS3()
+    mocker.patch('utils.s3_client.boto3.client', return_value=fake_s3)
+    yield fake_s3
+
+
+def create_writer(config):
+    s3_obj = S3Writer(dict({"bucket": "bucket", "folder_prefix": "prefix"}, **config))
+    s3_obj.s3_client = S3Client("localhost", 9000, "user", "pass", "prefix")
+    return s3_obj
+
+
+def drain(s3_obj, timeout=5):
+    deadline = time.monotonic() + timeout
+    while len(s3_obj.queue) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    s3_obj.stop()
+
+
+def frame_meta(i):
+    return {'img_handle': f'img{i:03}', 'caps': 'image/jpeg,', 'frame_id': i}
+
+
 class TestS3Writer:
     def test_stop(self, mocker, setup):
         app_cfg = setup
         s3_obj = S3Writer(app_cfg)
         mock_log_info = mocker.patch.object(s3_obj.log, 'info')
         s3_obj.start()
-        s3_obj.stop()
+        drain(s3_obj)
         mock_log_info.assert_called_with('S3 writer thread stopped')
         assert s3_obj.th is None
 
@@ -53,10 +130,13 @@ class TestS3Writer:
         s3_obj = S3Writer(app_cfg)
         mock_stop_ev = mocker.patch.object(s3_obj, 'stop_ev')
         mock_stop_ev.is_set.side_effect = [False, False, True] 
-        mocker.patch.object(s3_obj, 'queue')
-        mocker.patch.object(s3_obj, '_publish')
+        item = (b"Test", frame_meta(0), None)
+        mock_queue = mocker.patch.object(s3_obj, 'queue')
+        mock_queue.get.side_effect = [item, queue.Empty]
+        mock_submit = mocker.patch.object(s3_obj, '_submit')
         mocker.patch('time.sleep', return_value=None)
         s3_obj._run()
+        mock_submit.assert_called_once_with(s3_obj._publish, [item])
         
     # def test_fetch_data(mocker):
     #     mock_response = {"key": "mocked value"}
@@ -65,3 +145,134 @@ class TestS3Writer:
     #         result = fetch_data()
         
     #     assert result == mock_response
+
+    def test_upload_order(self, setup, fake_s3):
+        s3_obj = create_writer({"upload_concurrency": 4, "block": True})
+        completed = []
+        for i in range(12):
+            # later frames are written first
+            fake_s3.delays[f'prefix/img{i:03}.jpg'] = 0.002 * (12 - i)
+            s3_obj.queue.append((bytes([i]), frame_meta(i), lambda error, i=i: completed.append(i)))
+        s3_obj.start()
+        drain(s3_obj)
+
+        assert completed == list(range(12))
+        assert len(fake_s3.objects) == 12
+        assert fake_s3.objects['prefix/img005.jpg'] == bytes([5])
+
+    @pytest.mark.parametrize('failures, stored', [(2, True), (4, False)])
+    def test_upload_retry(self, setup, fake_s3, failures, stored):
+        s3_obj = create_writer({"max_retries": 3, "retry_backoff_ms": 1})
+        completed = []
+        fake_s3.failures['prefix/img000.jpg'] = failures
+        s3_obj.queue.append((b"Test", frame_meta(0), completed.append))
+        s3_obj.start()
+        drain(s3_obj)
+
+        assert fake_s3.attempts['prefix/img000.jpg'] == min(failures + 1, 4)
+        assert ('prefix/img000.jpg' in fake_s3.objects) == stored
+        assert s3_obj.failed_uploads == (0 if stored else 1)
+        # other publishers are not blocked by failed uploads
+        assert len(completed) == 1
+        assert (completed[0] is None) == stored
+
+    def test_stop_completes_queued(self, setup, fake_s3, mocker):
+        s3_obj = create_writer({"block": True})
+        release_frame = mocker.patch('src.publisher.s3.s3_writer.release_frame')
+        completed = []
+        for i in range(3):
+            s3_obj.queue.append((bytes([i]), frame_meta(i), completed.append))
+        s3_obj.stop()
+
+        assert len(s3_obj.queue) == 0
+        assert release_frame.call_count == 3
+        assert len(completed) == 3
+        assert all(isinstance(error, RuntimeError) for error in completed)
+
+    def test_dropped_frame_completed(self, setup, fake_s3):
+        s3_obj = create_writer({"block": True, "queue_maxsize": 1})
+        completed = []
+        for i in range(2):
+            s3_obj.queue.append((bytes([i]), frame_meta(i), lambda error, i=i: completed.append((i, error))))
+        s3_obj.start()
+        drain(s3_obj)
+
+        assert [i for i, _ in completed] == [0, 1]
+        assert isinstance(completed[0][1], RuntimeError)
+        assert completed[1][1] is None
+
+    def test_slow_completion(self, setup, fake_s3):
+        s3_obj = create_writer({"upload_concurrency": 2, "block": True})
+        release = th.Event()
+        completed = []
+        def on_complete(error, i):
+            if i == 0:
+                release.wait(5)
+            completed.append(i)
+        for i in range(4):
+            s3_obj.queue.append((bytes([i]), frame_meta(i), lambda error, i=i: on_complete(error, i)))
+        s3_obj.start()
+        # uploads go on while the first callback blocks one worker
+        deadline = time.monotonic() + 5
+        while len(fake_s3.objects) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(fake_s3.objects) == 4
+        assert completed == []
+        release.set()
+        drain(s3_obj)
+
+        assert completed == [0, 1, 2, 3]
+
+    def test_multipart_upload(self, setup, fake_s3):
+        client = S3Client("localhost", 9000, "user", "pass", "prefix")
+        data = bytes(range(256)) * (11 * 1024 * 4)
+        client.upload("bucket", "large", data, multipart_threshold=1024)
+        assert fake_s3.attempts["large"] == 3
+        assert fake_s3.objects["large"] == data
+
+        fake_s3.failures["failed"] = 1
+        with pytest.raises(ConnectionError):
+            client.upload("bucket", "failed", data, multipart_threshold=1024)
+        assert fake_s3.aborted == ["failed"]
+        assert not fake_s3.uploads
+
+    @pytest.mark.parametrize('archive_format', ['tar', 'zip'])
+    def test_archive(self, setup, fake_s3, archive_format):
+        s3_obj = create_writer({"archive": {"frames": 3, "interval_s": 60, "format": archive_format}})
+        for i in range(7):
+            s3_obj.queue.append((bytes([i]), frame_meta(i), None))
+        s3_obj.start()
+        drain(s3_obj)
+
+        assert sorted(fake_s3.objects) == [f'prefix/img000.{archive_format}',
+                                           f'prefix/img003.{archive_format}',
+                                           f'prefix/img006.{archive_format}']
+        data = io.BytesIO(fake_s3.objects[f'prefix/img003.{archive_format}'])
+        if archive_format == 'tar':
+            with tarfile.open(fileobj=data) as archive:
+                members = {name: archive.extractfile(name).read() for name in archive.getnames()}
+        else:
+            with zipfile.ZipFile(data) as archive:
+                members = {name: archive.read(name) for name in archive.namelist()}
+        assert sorted(members) == ['img003.jpg', 'img003.json', 'img004.jpg', 'img004.json',
+                                   'img005.jpg', 'img005.json']
+        assert members['img004.jpg'] == bytes([4])
+        assert json.loads(members['img004.json']) == frame_meta(4)
+
+    def test_archive_interval(self, setup, fake_s3):
+        s3_obj = create_writer({"archive": {"frames": 100, "interval_s": 0.05}})
+        s3_obj.start()
+        for i in range(2):
+            s3_obj.queue.append((bytes([i]), frame_meta(i), None))
+        time.sleep(0.3)
+        assert list(fake_s3.objects) == ['prefix/img000.tar']
+        s3_obj.stop()
+
+    @pytest.mark.parametrize('config', [{"upload_concurrency": 0},
+                                        {"max_retries": -1},
+                                        {"archive": {"frames": 0}},
+                                        {"archive": {"format": "rar"}},
+                                        {"json_format": "pretty"}])
+    def test_invalid_config(self, setup, config):
+        with pytest.raises(ValueError):
+            S3Writer(dict({"bucket": "bucket"}, **config))
@@ -0,0 +1,113 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import threading
+import time
+
+import pytest
+
+from src.server.app_destination_worker import AppDestinationWorker, DEFAULT_BLOCK_TIMEOUT
+
+
+class FakeDestination:
+
+    def __init__(self):
+        self.frames = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def process_frame(self, frame):
+        self.release.wait()
+        if frame == "error":
+            raise ValueError("invalid frame")
+        self.frames.append(frame)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestAppDestinationWorker:
+
+    def test_stop_drains_queue(self):
+        destination = FakeDestination()
+        destination.release.clear()
+        worker = AppDestinationWorker(destination, "metadata", {"queue_maxsize": 10})
+        for frame in range(5):
+            assert worker.process_frame(frame)
+        destination.release.set()
+        assert worker.stop(timeout=5)
+        assert destination.frames == list(range(5))
+        assert worker.health() == {"queued": 0, "dropped": 0, "processed": 5,
+                                   "lag": worker.lag}
+
+    def test_drop_oldest(self):
+        destination = FakeDestination()
+        destination.release.clear()
+        worker = AppDestinationWorker(destination, "rtsp", {"queue_maxsize": 2})
+        worker.process_frame(0)
+        assert wait_for(lambda: worker.health()["queued"] == 0)
+        for frame in range(1, 5):
+            worker.process_frame(frame)
+        health = worker.health()
+        assert (health["queued"], health["dropped"]) == (2, 2)
+        destination.release.set()
+        assert worker.stop(timeout=5)
+        assert destination.frames == [0, 3, 4]
+
+    def test_block_timeout(self):
+        destination = FakeDestination()
+        destination.release.clear()
+        worker = AppDestinationWorker(destination, "metadata",
+                                      {"queue_maxsize": 1, "queue_timeout": 0.05},
+                                      policy="block")
+        worker.process_frame(0)
+        assert wait_for(lambda: worker.health()["queued"] == 0)
+        assert worker.process_frame(1)
+        start = time.monotonic()
+        assert not worker.process_frame(2)
+        assert time.monotonic() - start >= 0.05
+        destination.release.set()
+        assert worker.stop(timeout=5)
+        assert destination.frames == [0, 1]
+
+    def test_block_default_timeout(self):
+        destination = FakeDestination()
+        destination.release.clear()
+        worker = AppDestinationWorker(destination, "metadata", {"queue_maxsize": 1},
+                                      policy="block")
+        worker.process_frame(0)
+        assert wait_for(lambda: worker.health()["queued"] == 0)
+        assert worker.process_frame(1)
+        start = time.monotonic()
+        # a stalled destination does not block the pipeline indefinitely
+        assert not worker.process_frame(2)
+        assert time.monotonic() - start >= DEFAULT_BLOCK_TIMEOUT
+        destination.release.set()
+        assert worker.stop(timeout=5)
+        assert destination.frames == [0, 1]
+
+    def test_error(self):
+        destination = FakeDestination()
+        worker = AppDestinationWorker(destination, "webrtc")
+        worker.process_frame("error")
+        assert wait_for(lambda: worker.error is not None)
+        with pytest.raises(ValueError):
+            worker.process_frame(1)
+        assert worker.stop(timeout=5)
+        assert destination.frames == []
+
+    def test_stop_timeout(self):
+        destination = FakeDestination()
+        destination.release.clear()
+        worker = AppDestinationWorker(destination, "rtsp")
+        worker.process_frame(0)
+        assert not worker.stop(timeout=0.05)
+        destination.release.set()
+        assert wait_for(lambda: destination.frames == [0])
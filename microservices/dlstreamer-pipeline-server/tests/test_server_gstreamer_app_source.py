@@ -0,0 +1,227 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import queue
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock
+from gi.repository import Gst, GLib
+from src.server.gstreamer_app_source import BufferPools, GStreamerAppSource, GvaFrameData
+from src.server.gstreamer_pipeline import GStreamerPipeline
+
+Gst.init(None)
+
+FRAME_CAPS = "video/x-raw,format=BGR,width=1920,height=1080,framerate=30/1"
+FRAME_SIZE = 1920 * 1080 * 3
+
+
+@pytest.fixture
+def pipeline():
+    """appsrc ! fakesink pipeline"""
+    gst_pipeline = Gst.parse_launch("appsrc name=source format=time ! fakesink sync=false")
+    pipeline = MagicMock(spec=GStreamerPipeline)
+    pipeline.appsrc_element = gst_pipeline.get_by_name("source")
+    gst_pipeline.set_state(Gst.State.PLAYING)
+    yield pipeline
+    gst_pipeline.set_state(Gst.State.NULL)
+
+
+def push_frames(app_source, n_frames, data=b"\x80" * FRAME_SIZE):
+    """Push n_frames 1080p frames
+
+    :return: Frames per second
+    """
+    start = time.monotonic()
+    for i in range(n_frames):
+        sample = app_source._create_input_frame(
+            GvaFrameData(data=data, caps=FRAME_CAPS, pts=i * Gst.SECOND // 30))
+        app_source._src.push_sample(sample)
+        del sample
+    return n_frames / (time.monotonic() - start)
+
+
+class TestBufferPools:
+
+    @pytest.mark.parametrize('caps, expected', [
+        (FRAME_CAPS, True),
+        ("audio/x-raw,format=S16LE,rate=16000,channels=1,layout=interleaved", True),
+        ("image/jpeg,width=1920,height=1080", False),
+        ("video/x-raw,format=BGR,width=[1,1920],height=1080", False),
+    ])
+    def test_poolable(self, caps, expected):
+        assert BufferPools.poolable(Gst.caps_from_string(caps)) == expected
+        assert not BufferPools.poolable(None)
+
+    def test_acquire(self):
+        pools = BufferPools(max_pools=2)
+        caps = Gst.caps_from_string(FRAME_CAPS)
+        buffer = pools.acquire(caps, FRAME_SIZE)
+        assert buffer.get_size() == FRAME_SIZE
+        del buffer
+        assert pools.acquire(caps, FRAME_SIZE) is not None
+        assert len(pools) == 1
+        # least recently used pool is dropped
+        pools.acquire(caps, 100)
+        pools.acquire(caps, FRAME_SIZE)
+        pools.acquire(caps, 200)
+        assert list(key[1] for key in pools._pools) == [FRAME_SIZE, 200]
+        pools.clear()
+        assert len(pools) == 0
+
+
+class TestGStreamerAppSource:
+
+    def test_pooled_frames(self, mocker, pipeline):
+        app_source = GStreamerAppSource({"source": {"input": MagicMock()}}, pipeline)
+        new_allocate = mocker.spy(Gst.Buffer, "new_allocate")
+        push_frames(app_source, 30)
+        new_allocate.assert_not_called()
+        assert len(app_source._buffer_pools) == 1
+        app_source.finish()
+
+    def test_encoded_frames_not_pooled(self, pipeline):
+        app_source = GStreamerAppSource({"source": {"input": MagicMock()}}, pipeline)
+        sample = app_source._create_input_frame(
+            GvaFrameData(data=b"\xff\xd8jpeg", caps="image/jpeg", message='{"id": 1}'))
+        assert sample.get_buffer().extract_dup(0, 6) == b"\xff\xd8jpeg"
+        assert len(app_source._buffer_pools) == 0
+
+    def test_wrapped_bytes(self, mocker, pipeline):
+        app_source = GStreamerAppSource({"source": {"input": MagicMock()}}, pipeline)
+        new_allocate = mocker.spy(Gst.Buffer, "new_allocate")
+        data = GLib.Bytes.new(b"\x01" * 64)
+        sample = app_source._create_input_frame(GvaFrameData(data=data, caps=FRAME_CAPS))
+        assert sample.get_buffer().extract_dup(0, 64) == b"\x01" * 64
+        new_allocate.assert_not_called()
+        assert len(app_source._buffer_pools) == 0
+
+    def test_benchmark_1080p(self, mocker, pipeline, record_property):
+        """Frames per second and allocations pushing 1080p frames, with and without pool"""
+        n_frames = 120
+        results = {}
+        for buffer_pool in (False, True):
+            app_source = GStreamerAppSource(
+                {"source": {"input": MagicMock(), "buffer_pool": buffer_pool}}, pipeline)
+            new_allocate = mocker.spy(Gst.Buffer, "new_allocate")
+            fps = push_frames(app_source, n_frames)
+            results[buffer_pool] = (fps, new_allocate.call_count)
+            mocker.stopall()
+            app_source.finish()
+        for buffer_pool, (fps, allocations) in results.items():
+            name = "pooled" if buffer_pool else "new_buffers"
+            record_property("frames_per_sec_1080p_{}".format(name), round(fps))
+            record_property("allocations_1080p_{}".format(name), allocations)
+        assert results[False][1] == n_frames
+        assert results[True][1] == 0
+
+
+SMALL_CAPS = "video/x-raw,format=GRAY8,width=64,height=64,framerate=100/1"
+SMALL_SIZE = 64 * 64
+FRAME_DURATION = Gst.SECOND // 100
+
+
+@pytest.fixture
+def sync_pipeline():
+    """appsrc ! fakesink sync=true pipeline consuming 100 frames per second,
+    wired to its app source like GStreamerPipeline does"""
+    gst_pipeline = Gst.parse_launch("appsrc name=source ! fakesink sync=true")
+    pipeline = MagicMock(spec=GStreamerPipeline)
+    pipeline.appsrc_element = gst_pipeline.get_by_name("source")
+    appsrc = pipeline.appsrc_element
+    appsrc.set_property("format", Gst.Format.TIME)
+    appsrc.set_property("block", True)
+    appsrc.set_property("emit-signals", True)
+
+    def start(app_source):
+        appsrc.connect("need-data", lambda src, _: app_source.start_frames())
+        appsrc.connect("enough-data", lambda src: app_source.pause_frames())
+        gst_pipeline.set_state(Gst.State.PLAYING)
+
+    pipeline.start = start
+    yield pipeline
+    gst_pipeline.set_state(Gst.State.NULL)
+
+
+def produce(input_queue, n_frames, interval, put_timeout=5):
+    """Fake producer putting timestamped frames every interval seconds"""
+    for i in range(n_frames):
+        input_queue.put(GvaFrameData(data=b"\x80" * SMALL_SIZE, caps=SMALL_CAPS,
+                                     pts=i * FRAME_DURATION, duration=FRAME_DURATION),
+                        timeout=put_timeout)
+        if interval:
+            time.sleep(interval)
+
+
+class TestBackpressure:
+
+    def test_invalid_config(self, pipeline):
+        with pytest.raises(ValueError):
+            GStreamerAppSource({"source": {"input": MagicMock(), "max_bytes": -1}}, pipeline)
+        with pytest.raises(ValueError):
+            GStreamerAppSource({"source": {"input": MagicMock(), "mode": "push",
+                                           "push_timeout": -1}}, pipeline)
+
+    def test_watermarks(self, pipeline):
+        GStreamerAppSource({"source": {"input": MagicMock(), "max_bytes": 4 * SMALL_SIZE,
+                                       "min_percent": 50}}, pipeline)
+        assert pipeline.appsrc_element.get_property("max-bytes") == 4 * SMALL_SIZE
+        assert pipeline.appsrc_element.get_property("min-percent") == 50
+
+    def test_fast_producer(self, sync_pipeline):
+        """Producer faster than the pipeline: overruns, frames dropped, bounded memory"""
+        input_queue = queue.Queue(maxsize=10)
+        max_bytes = 4 * SMALL_SIZE
+        app_source = GStreamerAppSource({"source": {
+            "input": input_queue, "mode": "push", "max_bytes": max_bytes,
+            "push_timeout": 0.02}}, sync_pipeline)
+        sync_pipeline.start(app_source)
+        max_queued = 0
+        producer = threading.Thread(target=produce, args=(input_queue, 300, 0.001))
+        producer.start()
+        while producer.is_alive():
+            max_queued = max(max_queued, app_source.status()["queued_bytes"])
+            time.sleep(0.005)
+        producer.join()
+        status = app_source.status()
+        app_source.finish()
+        assert status["overruns"] > 0
+        assert status["dropped"] > 0
+        assert status["blocked_time"] > 0
+        assert status["pushed"] + status["dropped"] <= 300
+        # memory bounded by the appsrc watermark and the producer queue
+        assert max_queued <= max_bytes + SMALL_SIZE
+        assert input_queue.qsize() <= 10
+
+    def test_slow_producer(self, sync_pipeline):
+        """Producer slower than the pipeline: starved, nothing dropped"""
+        input_queue = queue.Queue(maxsize=10)
+        app_source = GStreamerAppSource({"source": {
+            "input": input_queue, "mode": "push", "max_bytes": 4 * SMALL_SIZE,
+            "push_timeout": 0.02}}, sync_pipeline)
+        sync_pipeline.start(app_source)
+        produce(input_queue, 20, 0.03)
+        time.sleep(0.1)
+        status = app_source.status()
+        app_source.finish()
+        assert status["starved"] > 0
+        assert status["starved_time"] > 0.2
+        assert status["overruns"] == 0
+        assert status["dropped"] == 0
+        assert status["pushed"] == 20
+
+    def test_pull_mode_starved(self, sync_pipeline):
+        input_queue = queue.Queue(maxsize=10)
+        app_source = GStreamerAppSource({"source": {"input": input_queue}}, sync_pipeline)
+        sync_pipeline.start(app_source)
+        produce(input_queue, 10, 0.03)
+        time.sleep(0.1)
+        status = app_source.status()
+        assert status["starved"] > 0
+        assert status["pushed"] == 10
+        # unblock the streaming thread
+        input_queue.put(None)
@@ -0,0 +1,158 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import threading
+import time
+
+import pytest
+from gi.repository import Gst
+from src.server.gstreamer_encoded_stream import EncoderKey, GStreamerSharedEncoders
+
+Gst.init(None)
+
+FRAME_CAPS = "video/x-raw,format=I420,width=320,height=240,framerate=30/1"
+FRAME_SIZE = 320 * 240 * 3 // 2
+N_FRAMES = 30
+
+
+def require_encoder(codec):
+    element = {"jpeg": "jpegenc", "h264": "x264enc"}[codec]
+    if Gst.ElementFactory.find(element) is None:
+        pytest.skip("{} not available".format(element))
+
+
+def make_frames(n_frames):
+    caps = Gst.Caps.from_string(FRAME_CAPS)
+    frames = []
+    for i in range(n_frames):
+        buffer = Gst.Buffer.new_wrapped(bytes([i % 256]) * FRAME_SIZE)
+        buffer.pts = i * Gst.SECOND // 30
+        buffer.duration = Gst.SECOND // 30
+        frames.append(Gst.Sample.new(buffer, caps, None, None))
+    return frames
+
+
+class Consumer():
+    """Destination receiving encoded samples"""
+
+    def __init__(self):
+        self.samples = []
+        self._cond = threading.Condition()
+
+    def __call__(self, sample):
+        with self._cond:
+            self.samples.append(sample)
+            self._cond.notify_all()
+
+    def wait(self, n_samples, timeout=10):
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.samples) >= n_samples, timeout)
+
+
+def count_encoder_calls(stream):
+    """Count buffers entering the encoder of stream"""
+    calls = [0]
+
+    def probe(_pad, _info):
+        calls[0] += 1
+        return Gst.PadProbeReturn.OK
+
+    encoder = stream._pipeline.get_by_name("encoder")
+    encoder.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, probe)
+    return calls
+
+
+class TestGStreamerSharedEncoders:
+
+    def test_key(self):
+        assert GStreamerSharedEncoders.key("id", "h264", 2048, 85, True) == \
+            EncoderKey("id", "h264", 2048, None, True)
+        assert GStreamerSharedEncoders.key("id", "jpeg", 2048, 85, False) == \
+            EncoderKey("id", "jpeg", None, 85, False)
+        # RTSP h264 and WebRTC destinations of an instance share a key
+        assert GStreamerSharedEncoders.key("id", "h264", 2048, 85) == \
+            GStreamerSharedEncoders.key("id", "h264", 2048, overlay=True)
+        with pytest.raises(ValueError):
+            GStreamerSharedEncoders.key("id", "vp8")
+
+    def test_encoded_caps(self):
+        require_encoder("h264")
+        encoders = GStreamerSharedEncoders()
+        key = GStreamerSharedEncoders.key("id", "h264", 1024, overlay=False)
+        stream = encoders.acquire(key, Gst.Caps.from_string(FRAME_CAPS), Consumer())
+        structure = stream.caps.get_structure(0)
+        assert structure.get_name() == "video/x-h264"
+        assert structure.get_int("width") == (True, 320)
+        assert structure.get_fraction("framerate") == (True, 30, 1)
+        encoders.stop()
+
+    @pytest.mark.parametrize("codec", ["jpeg", "h264"])
+    def test_shared_encoder(self, codec):
+        """Frames pushed by every consumer are encoded once and received by all"""
+        require_encoder(codec)
+        encoders = GStreamerSharedEncoders()
+        key = GStreamerSharedEncoders.key("id", codec, 1024, 85, overlay=False)
+        caps = Gst.Caps.from_string(FRAME_CAPS)
+        consumers = [Consumer() for _ in range(3)]
+        streams = [encoders.acquire(key, caps, consumer) for consumer in consumers]
+        assert len(encoders) == 1
+        assert all(stream is streams[0] for stream in streams)
+        encoder_calls = count_encoder_calls(streams[0])
+        for frame in make_frames(N_FRAMES):
+            # each destination pushes the frames it gets from the pipeline
+            for stream in streams:
+                stream.push(frame)
+        for consumer in consumers:
+            assert consumer.wait(N_FRAMES)
+        time.sleep(0.1)
+        assert encoder_calls[0] == N_FRAMES
+        assert streams[0].encoded == N_FRAMES
+        assert streams[0].skipped == 2 * N_FRAMES
+        for consumer in consumers:
+            assert len(consumer.samples) == N_FRAMES
+            assert consumer.samples[0].get_caps().get_structure(0).get_name() == \
+                streams[0].caps.get_structure(0).get_name()
+        encoders.stop()
+        assert len(encoders) == 0
+
+    def test_encoder_per_key(self):
+        require_encoder("jpeg")
+        require_encoder("h264")
+        encoders = GStreamerSharedEncoders()
+        caps = Gst.Caps.from_string(FRAME_CAPS)
+        keys = [GStreamerSharedEncoders.key("id", "jpeg", quality=85, overlay=False),
+                GStreamerSharedEncoders.key("id", "jpeg", quality=50, overlay=False),
+                GStreamerSharedEncoders.key("id", "h264", bitrate=1024, overlay=False)]
+        consumers = [Consumer() for _ in keys]
+        streams = [encoders.acquire(key, caps, consumer) for key, consumer in zip(keys, consumers)]
+        assert len(encoders) == 3
+        encoder_calls = [count_encoder_calls(stream) for stream in streams]
+        for frame in make_frames(N_FRAMES):
+            for stream in streams:
+                stream.push(frame)
+        for consumer in consumers:
+            assert consumer.wait(N_FRAMES)
+        assert [calls[0] for calls in encoder_calls] == [N_FRAMES] * 3
+        encoders.stop()
+
+    def test_release(self):
+        require_encoder("jpeg")
+        encoders = GStreamerSharedEncoders()
+        key = GStreamerSharedEncoders.key("id", "jpeg", quality=85, overlay=False)
+        caps = Gst.Caps.from_string(FRAME_CAPS)
+        first, second = Consumer(), Consumer()
+        stream = encoders.acquire(key, caps, first)
+        encoders.acquire(key, caps, second)
+        encoders.release(key, first)
+        assert len(encoders) == 1
+        frame = make_frames(1)[0]
+        assert stream.push(frame)
+        assert second.wait(1)
+        assert not first.samples
+        encoders.release(key, second)
+        assert len(encoders) == 0
+        # stopped stream ignores frames
+        assert not stream.push(frame)
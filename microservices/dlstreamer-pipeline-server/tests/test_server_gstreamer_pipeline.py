@@ -7,11 +7,29 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from src.server.gstreamer_pipeline import GStreamerPipeline
+from src.server.app_destination_worker import AppDestinationWorker
+import threading
 import time
 import json
 from gi.repository import Gst, GLib
 from collections import namedtuple
 import os
+from src.server.common.utils.lru_cache import LRUCache
+
+def make_element(type_name, properties):
+    """Mock element backed by a properties dict"""
+    element = MagicMock()
+    element.__gtype__ = MagicMock()
+    element.__gtype__.name = type_name
+    element.properties = properties
+    element.find_property.side_effect = lambda name: name in properties
+    element.get_property.side_effect = properties.get
+    element.set_property.side_effect = properties.__setitem__
+    element.get_name.return_value = properties.get("name")
+    return element
+
+def assert_unlocked(pipeline):
+    assert not pipeline._create_delete_lock.locked()
 
 @pytest.fixture
 def mock_model_manager():
@@ -264,8 +282,13 @@ class TestGStreamerPipeline:
         mock_app_destination1 = MagicMock()
         mock_app_destination2 = MagicMock()
         gstreamer_pipeline._app_destinations = [mock_app_destination1, mock_app_destination2]
+        gstreamer_pipeline._destination_workers = [
+            AppDestinationWorker(mock_app_destination1, "metadata"),
+            AppDestinationWorker(mock_app_destination2, "rtsp")]
         initial_frame = gstreamer_pipeline.frame_count
         result = gstreamer_pipeline.on_sample_app_destination(mock_sink)
+        for worker in gstreamer_pipeline._destination_workers:
+            assert worker.stop(timeout=5)
         mock_app_destination1.process_frame.assert_called_once_with(mock_sample)
         mock_app_destination2.process_frame.assert_called_once_with(mock_sample)
         mock_sink.emit.assert_called_once_with("pull-sample")
@@ -279,11 +302,84 @@ class TestGStreamerPipeline:
         mock_app_destination = MagicMock()
         mock_app_destination.process_frame.side_effect = Exception("Test exception")
         gstreamer_pipeline._app_destinations = [mock_app_destination]
+        worker = AppDestinationWorker(mock_app_destination, "metadata")
+        gstreamer_pipeline._destination_workers = [worker]
         initial_frame = gstreamer_pipeline.frame_count
         result = gstreamer_pipeline.on_sample_app_destination(mock_sink)
+        assert result == Gst.FlowReturn.OK
+        deadline = time.monotonic() + 5
+        while worker.error is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # error of the destination fails the next frame
+        result = gstreamer_pipeline.on_sample_app_destination(mock_sink)
         mock_app_destination.process_frame.assert_called_once_with(mock_sample)
-        assert gstreamer_pipeline.frame_count == initial_frame
+        assert gstreamer_pipeline.frame_count == initial_frame + 1
         assert result == Gst.FlowReturn.ERROR
+        worker.stop()
+
+    def test_inference_governor(self, mocker, gstreamer_pipeline):
+        mock_glib = mocker.patch('src.server.gstreamer_pipeline.GLib')
+        mock_glib.timeout_add.return_value = 7
+        mocker.patch.object(time, 'time', return_value=100)
+        detect = make_element("GstGvaDetect", {"inference-interval": 1})
+        classify = make_element("GstGvaClassify", {"inference-interval": 1})
+        gstreamer_pipeline._inference_elements = [detect, classify,
+                                                  make_element("GstGvaTrack", {})]
+        gstreamer_pipeline.request["inference_governor"] = {"target_fps": 25, "period": 0.5}
+        gstreamer_pipeline.start_time = 90
+        gstreamer_pipeline.state = GStreamerPipeline.State.RUNNING
+        gstreamer_pipeline._start_governor()
+        mock_glib.timeout_add.assert_called_once_with(500, gstreamer_pipeline._govern)
+        assert gstreamer_pipeline._inference_elements == [detect, classify]
+
+        # 10 fps over the period
+        gstreamer_pipeline.frame_count = 5
+        time.time.return_value = 100.5
+        assert gstreamer_pipeline._govern()
+        assert detect.properties["inference-interval"] == 2
+        assert classify.properties["inference-interval"] == 2
+        status = gstreamer_pipeline.status()["inference_governor"]
+        assert status["inference_interval"] == 2
+        assert status["decisions"][0]["missed"] == ["fps"]
+
+        gstreamer_pipeline._delete_pipeline(GStreamerPipeline.State.COMPLETED)
+        mock_glib.source_remove.assert_called_once_with(7)
+        assert not gstreamer_pipeline._govern()
+
+    def test_slow_app_destination(self, gstreamer_pipeline, Gst):
+        """A slow destination does not reduce the throughput of a fast one"""
+        class FakeDestination:
+            def __init__(self, delay):
+                self.delay = delay
+                self.frames = []
+
+            def process_frame(self, frame):
+                time.sleep(self.delay)
+                self.frames.append(frame)
+
+        fast = FakeDestination(0)
+        slow = FakeDestination(0.05)
+        mock_sink = MagicMock()
+        gstreamer_pipeline._destination_workers = [
+            AppDestinationWorker(fast, "fast", {"queue_policy": "block", "queue_maxsize": 100}),
+            AppDestinationWorker(slow, "slow", {"queue_maxsize": 2})]
+        start = time.perf_counter()
+        for frame in range(100):
+            mock_sink.emit.return_value = frame
+            assert gstreamer_pipeline.on_sample_app_destination(mock_sink) == Gst.FlowReturn.OK
+        # serial dispatch would take at least 100 * 50 ms
+        assert time.perf_counter() - start < 1
+        fast_worker, slow_worker = gstreamer_pipeline._destination_workers
+        assert fast_worker.stop(timeout=5)
+        assert fast.frames == list(range(100))
+        health = gstreamer_pipeline.status()["destinations"]
+        assert health["fast"]["processed"] == 100
+        assert health["fast"]["dropped"] == 0
+        assert health["slow"]["dropped"] > 90
+        assert health["slow"]["processed"] < 10
+        assert slow_worker.stop(timeout=5)
+        # latest frames are kept
+        assert slow.frames[-1] == 99
 
     @pytest.mark.parametrize(
         "pts, sum_latency, count_latency",
@@ -297,13 +393,28 @@ class TestGStreamerPipeline:
         mock_buffer = MagicMock()
         mock_buffer.pts = pts
         mock_info.get_buffer.return_value = mock_buffer
-        gstreamer_pipeline.latency_times = {1234: 10}
+        gstreamer_pipeline.latency.start(1234, 10)
         result = gstreamer_pipeline.appsink_probe_callback(None, mock_info, gstreamer_pipeline)
         mock_info.get_buffer.assert_called_once()
-        assert gstreamer_pipeline.sum_pipeline_latency == sum_latency
-        assert gstreamer_pipeline.count_pipeline_latency == count_latency
+        assert gstreamer_pipeline.latency.histogram.sum == sum_latency
+        assert gstreamer_pipeline.latency.count == count_latency
         assert result == Gst.PadProbeReturn.OK
 
+    def test_frame_and_latency_metrics(self, mocker, Gst, gstreamer_pipeline):
+        mock_instruments = MagicMock()
+        mocker.patch('src.server.gstreamer_pipeline.metrics.instruments', return_value=mock_instruments)
+        mocker.patch.object(time, 'time', return_value=30)
+        mock_info = MagicMock()
+        mock_info.get_buffer.return_value.pts = 1234
+        gstreamer_pipeline.latency.start(1234, 29.5)
+
+        gstreamer_pipeline.appsink_probe_callback(None, mock_info, gstreamer_pipeline)
+        gstreamer_pipeline.on_sample(MagicMock())
+
+        attributes = {"pipeline": "None/None", "pipeline_id": str(gstreamer_pipeline.identifier)}
+        mock_instruments.latency.record.assert_called_once_with(500, attributes)
+        mock_instruments.frames.add.assert_called_once_with(1, attributes)
+
     def test_source_setup_callback(self, mocker, gstreamer_pipeline):
         mock_src_element = MagicMock()
         gstreamer_pipeline._unset_properties = [
@@ -324,8 +435,8 @@ class TestGStreamerPipeline:
         mock_info.get_buffer.return_value = mock_buffer
         mocker.patch.object(time,'time',return_value = 50)
         result = gstreamer_pipeline.source_probe_callback(None, mock_info, gstreamer_pipeline)
-        assert 10 in gstreamer_pipeline.latency_times
-        assert gstreamer_pipeline.latency_times[10] == 50
+        assert gstreamer_pipeline.latency.pending == 1
+        assert gstreamer_pipeline.latency.stop(10, 60) == 10
         assert result == Gst.PadProbeReturn.OK
 
     def test_source_pad_added_callback(self, mocker, gstreamer_pipeline,Gst):
@@ -396,31 +507,6 @@ class TestGStreamerPipeline:
         gstreamer_pipeline._get_any_source.assert_called_once()
         mock_source.connect.assert_called_with("source_setup", gstreamer_pipeline.source_setup_callback, mock_source)
 
-    def test_set_model_instance_id(self, mocker, gstreamer_pipeline):
-        mock_element1 = MagicMock()
-        mock_element1.__gtype__ = MagicMock()
-        mock_prop1 = MagicMock()
-        mock_prop1.name = "model-instance-id"
-        mock_element1.__gtype__.name = 'GstGvaDetect'
-        mock_element1.list_properties.return_value = [mock_prop1]
-        mock_element1.get_property.side_effect = lambda x: "model1" if x== "name" else None
-        mock_element2 = MagicMock()
-        mock_element2.__gtype__ = MagicMock()
-        mock_prop2 = MagicMock()
-        mock_prop2.name = "model-instance-id"
-        mock_element2.__gtype__.name = 'GstGvaClassify'
-        mock_element2.list_properties.return_value = [mock_prop2]
-        mock_element2.get_property.side_effect = lambda x: "model2" if x== "name" else None
-        mock_element3 = MagicMock()
-        mock_element3.__gtype__ = MagicMock()
-        mock_element3.__gtype__.name = 'Error'
-        mock_pipeline = MagicMock()
-        gstreamer_pipeline.pipeline = mock_pipeline
-        mock_pipeline.iterate_elements.return_value = [mock_element1,mock_element2,mock_element3]
-        gstreamer_pipeline._set_model_instance_id()
-        mock_element1.set_property.assert_any_call("model-instance-id","model1_test_id")
-        mock_element2.set_property.assert_any_call("model-instance-id","model2_test_id")
-
     def test_get_any_source_with_src(self, gstreamer_pipeline):
         mock_source = MagicMock()
         mock_pipeline = MagicMock()
@@ -500,8 +586,10 @@ class TestGStreamerPipeline:
         mock_state = MagicMock()
         gstreamer_pipeline.state = mock_state
         mocker.patch.object(gstreamer_pipeline,'get_avg_fps',return_value = 10)
-        gstreamer_pipeline.count_pipeline_latency = 2
-        gstreamer_pipeline.sum_pipeline_latency = 50
+        gstreamer_pipeline.latency.start(1, 0)
+        gstreamer_pipeline.latency.start(2, 0)
+        gstreamer_pipeline.latency.stop(1, 20)
+        gstreamer_pipeline.latency.stop(2, 30)
         expected_status = {
             "id": "test_id",
             "state": mock_state,
@@ -511,13 +599,48 @@ class TestGStreamerPipeline:
             "message": "Debug",
             "avg_pipeline_latency": 25}
         result = gstreamer_pipeline.status()
+        percentiles = result.pop("pipeline_latency_percentiles")
         assert result == expected_status
+        assert percentiles["p50"] == pytest.approx(20, rel=0.01)
+        assert percentiles["p99"] == pytest.approx(30, rel=0.01)
+        assert percentiles["max"] == 30
 
     def test_delete_pipeline_with_lock(self,gstreamer_pipeline,mocker):
         mock_state = MagicMock()
-        mock_delete_pipeline = mocker.patch.object(gstreamer_pipeline,'_delete_pipeline')
+        mock_delete_pipeline = mocker.patch.object(gstreamer_pipeline,'_delete_pipeline',
+                                                   return_value=([], []))
+        # destinations are drained without the lock
+        mock_finish = mocker.patch.object(
+            gstreamer_pipeline, '_finish_deleted_pipeline',
+            side_effect=lambda workers, destinations: assert_unlocked(gstreamer_pipeline))
         gstreamer_pipeline._delete_pipeline_with_lock(mock_state)
         mock_delete_pipeline.assert_called_with(mock_state)
+        mock_finish.assert_called_once_with([], [])
+
+    def test_drain_app_destinations(self, gstreamer_pipeline, mocker):
+        """Destinations drain outside the lock, within one shared timeout"""
+        mocker.patch.object(GStreamerPipeline, 'APP_DESTINATION_DRAIN_TIMEOUT', 0.2)
+        release = threading.Event()
+
+        class SlowDestination:
+            def process_frame(self, frame):
+                release.wait()
+            finish = MagicMock()
+
+        destinations = [SlowDestination(), SlowDestination()]
+        gstreamer_pipeline._app_destinations = list(destinations)
+        gstreamer_pipeline._destination_workers = [
+            AppDestinationWorker(destination, str(index))
+            for index, destination in enumerate(destinations)]
+        for worker in gstreamer_pipeline._destination_workers:
+            worker.process_frame(0)
+        gstreamer_pipeline._finished_callback.side_effect = lambda: assert_unlocked(gstreamer_pipeline)
+        start = time.monotonic()
+        gstreamer_pipeline._delete_pipeline_with_lock(GStreamerPipeline.State.COMPLETED)
+        assert time.monotonic() - start < 0.4
+        assert SlowDestination.finish.call_count == 2
+        gstreamer_pipeline._finished_callback.assert_called_once()
+        release.set()
 
     def test_log_launch_string(self, mocker, gstreamer_pipeline):
         gstreamer_pipeline._gst_launch_string = "testsrc ! sink"
@@ -570,7 +693,10 @@ class TestGStreamerPipeline:
         gstreamer_pipeline._app_destinations = [mock_app_destination]
         gstreamer_pipeline.appsink_element = "appsink"
         gstreamer_pipeline.appsrc_element = "appsink"
-        gstreamer_pipeline._delete_pipeline(mock_state)
+        deleted = gstreamer_pipeline._delete_pipeline(mock_state)
+        mock_app_destination.finish.assert_not_called()
+        gstreamer_pipeline._finished_callback.assert_not_called()
+        gstreamer_pipeline._finish_deleted_pipeline(*deleted)
         assert gstreamer_pipeline.pipeline is None
         assert gstreamer_pipeline._app_source is None
         assert gstreamer_pipeline.appsrc_element is None
@@ -594,7 +720,8 @@ class TestGStreamerPipeline:
         gstreamer_pipeline._cached_element_keys = ['key1']
         GStreamerPipeline._inference_element_cache = {'key1':mock_pipeline}
         mock_pipeline.pipelines = [mock_stop_pipeline]
-        gstreamer_pipeline._delete_pipeline(mock_state.ERROR)
+        gstreamer_pipeline._finish_deleted_pipeline(
+            *gstreamer_pipeline._delete_pipeline(mock_state.ERROR))
         gstreamer_pipeline._cal_avg_fps.assert_called_once()
         mock_stop_pipeline.stop.assert_called_once()
         assert gstreamer_pipeline.pipeline is None
@@ -618,6 +745,8 @@ class TestGStreamerPipeline:
         gstreamer_pipeline.rtsp_server.check_if_path_exists.assert_called_once_with("/rtsppath")
         mock_create_app_destination.assert_called_once_with({"type":"rtsp","path":"rtsppath", 'class':mock_rtsp_dest_class.__name__},gstreamer_pipeline,"frame")
         assert gstreamer_pipeline._app_destinations == [mock_rtsp_destination]
+        # frames are dropped rather than stalling the pipeline, sync-with-destination or not
+        assert [policy for _, _, policy in gstreamer_pipeline._app_destination_configs] == ["drop_oldest"]
 
     def test_verify_and_set_frame_destinations_webrtc(self, mocker, gstreamer_pipeline):
         mock_app_sink_element = MagicMock()
@@ -663,33 +792,6 @@ class TestGStreamerPipeline:
             gstreamer_pipeline._verify_and_set_frame_destinations()
         mock_create_app_destination.assert_called_once_with({"type":"rtsp","path":"rtsppath", "class": "Class_rtsp"},gstreamer_pipeline,"frame")
 
-    def test_cache_inference_elements(self, mocker, gstreamer_pipeline):
-        mock_prop1 = MagicMock()
-        mock_prop1.name = "model-instance-id"
-        mock_element1 = MagicMock()
-        mock_element1.__gtype__ = MagicMock()
-        mock_element1.__gtype__.name = 'GstGvaDetect'
-        mock_element1.list_properties.return_value = [mock_prop1]
-        mock_element1.get_property.return_value = "model1"
-        mock_element2 = MagicMock()
-        mock_element2.__gtype__ = MagicMock()
-        mock_prop2 = MagicMock()
-        mock_prop2.name = "model-instance-id"
-        mock_element2.__gtype__.name = 'GstGvaClassify'
-        mock_element2.list_properties.return_value = [mock_prop2]
-        mock_element2.get_property.return_value = "model2"
-        mock_element3 = MagicMock()
-        mock_element3.__gtype__ = MagicMock()
-        mock_element3.__gtype__.name = 'Error'
-        mock_pipeline = MagicMock()
-        gstreamer_pipeline.pipeline = mock_pipeline
-        mock_pipeline.iterate_elements.return_value = [mock_element1,mock_element2,mock_element3]
-        Cache = namedtuple("CachedElement", ["element", "pipelines"])
-        mocker.patch.object(GStreamerPipeline,'CachedElement',side_effect= Cache)
-        gstreamer_pipeline._cache_inference_elements()
-        assert gstreamer_pipeline._inference_element_cache == {'GstGvaDetect_model1':Cache(mock_element1,[gstreamer_pipeline]),'GstGvaClassify_model2': Cache(mock_element2,[gstreamer_pipeline])}
-        assert gstreamer_pipeline._cached_element_keys == ['GstGvaDetect_model1','GstGvaClassify_model2']
-
     def test_bus_call(self, mocker, gstreamer_pipeline,Gst):
         # Testcase for Gst.MessageType.APPLICATION, Gst.MessageType.EOS and Gst.MessageType.ERROR
         mock_bus = MagicMock()
@@ -755,10 +857,8 @@ class TestGStreamerPipeline:
         mock_pipeline.get_bus.return_value = mock_bus
         mock_set_properties = mocker.patch.object(gstreamer_pipeline, '_set_properties')
         mock_set_bus_messages_flag = mocker.patch.object(gstreamer_pipeline, '_set_bus_messages_flag')
-        mock_set_default_models = mocker.patch.object(gstreamer_pipeline, '_set_default_models')
-        mock_set_model_property = mocker.patch.object(gstreamer_pipeline, '_set_model_property')
-        mock_cache_inference_elements = mocker.patch.object(gstreamer_pipeline, '_cache_inference_elements')
-        mock_set_model_instance_id = mocker.patch.object(gstreamer_pipeline, '_set_model_instance_id')
+        mock_set_inference_element_properties = mocker.patch.object(
+            gstreamer_pipeline, '_set_inference_element_properties')
         mock_set_source_and_sink = mocker.patch.object(gstreamer_pipeline, '_set_source_and_sink')
         mock_set_application_source = mocker.patch.object(gstreamer_pipeline, '_set_application_source')
         mock_set_application_destination = mocker.patch.object(gstreamer_pipeline, '_set_application_destination')
@@ -774,12 +874,7 @@ class TestGStreamerPipeline:
         Gst.parse_launch.asser_called_once_with(gstreamer_pipeline._gst_launch_string)
         mock_set_properties.assert_called_once()
         mock_set_bus_messages_flag.assert_called_once()
-        mock_set_default_models.assert_called_once()
-        mock_cache_inference_elements.assert_called_once()
-        mock_set_model_property.assert_any_call("model-proc")
-        mock_set_model_property.assert_any_call("labels")
-        mock_set_model_property.assert_any_call("labels-file")
-        mock_set_model_instance_id.assert_called_once()
+        mock_set_inference_element_properties.assert_called_once_with(None)
         mock_set_source_and_sink.assert_called_once()
         mock_pipeline.get_bus.assert_called_once()
         mock_bus.add_signal_watch.assert_called_once_with()
@@ -793,6 +888,37 @@ class TestGStreamerPipeline:
         mock_pipeline.set_state.assert_called_once_with(Gst.State.PLAYING)
         gstreamer_pipeline.config["prepare-pads"].assert_called_once_with(gstreamer_pipeline.pipeline)
 
+    def test_start_launch_plan_cache(self, mocker, gstreamer_pipeline, Gst, mock_finished_callback, mock_options):
+        mocker.patch.object(GStreamerPipeline, '_launch_plan_cache', LRUCache(4))
+        gstreamer_pipeline.config["name"] = "user_defined_pipelines"
+        gstreamer_pipeline.config["version"] = "test"
+        gstreamer_pipeline.model_manager.revision = 1
+        element_plans = [GStreamerPipeline.ElementPlan(0, 'GstGvaDetect', (), None, True)]
+        mocker.patch.object(GStreamerPipeline, '_set_inference_element_properties',
+                            return_value=element_plans)
+        mocker.patch.object(GStreamerPipeline, '_set_application_destination')
+        mocker.patch.object(GStreamerPipeline, '_set_source_and_sink')
+        gstreamer_pipeline.start()
+        GStreamerPipeline._set_inference_element_properties.assert_called_once_with(None)
+        assert len(GStreamerPipeline._launch_plan_cache) == 1
+
+        formatter = mocker.patch('src.server.gstreamer_pipeline.string.Formatter')
+        second = GStreamerPipeline("test_id2", gstreamer_pipeline.config, gstreamer_pipeline.model_manager,
+                                   {"source": {"type": "uri"}, "destination": {"metadata": {"type": "file"}}},
+                                   mock_finished_callback, mock_options)
+        second.start()
+        formatter.return_value.vformat.assert_not_called()
+        assert second._gst_launch_string == gstreamer_pipeline._gst_launch_string
+        GStreamerPipeline._set_inference_element_properties.assert_called_with(element_plans)
+
+        # reloading models invalidates the plan
+        gstreamer_pipeline.model_manager.revision = 2
+        third = GStreamerPipeline("test_id3", gstreamer_pipeline.config, gstreamer_pipeline.model_manager,
+                                  {"source": {"type": "uri"}, "destination": {"metadata": {"type": "file"}}},
+                                  mock_finished_callback, mock_options)
+        third.start()
+        GStreamerPipeline._set_inference_element_properties.assert_called_with(None)
+
     def test_start_exception(self, mocker, gstreamer_pipeline,Gst):
         gstreamer_pipeline.start_time = 10
         gstreamer_pipeline.model_manager.models = {"model1":"details"}
@@ -802,10 +928,13 @@ class TestGStreamerPipeline:
         gstreamer_pipeline.start_time = None
         mock_state = mocker.patch('src.server.gstreamer_pipeline.Pipeline.State',return_value = MagicMock())
         mock_gst_parse_launch = mocker.patch.object(Gst,'parse_launch',side_effect = Exception("Error in parsing"))
-        mock_delete_pipeline = mocker.patch.object(gstreamer_pipeline, '_delete_pipeline')
+        mock_delete_pipeline = mocker.patch.object(gstreamer_pipeline, '_delete_pipeline',
+                                                   return_value=([], []))
+        mock_finish = mocker.patch.object(gstreamer_pipeline, '_finish_deleted_pipeline')
         gstreamer_pipeline.start()
         mock_gst_parse_launch.assert_called_once()
         mock_delete_pipeline.assert_called_once_with(mock_state.ERROR)
+        mock_finish.assert_called_once_with([], [])
 
     def test_set_application_destination(self,gstreamer_pipeline,mocker):
         mock_appsink_element = MagicMock()
@@ -839,61 +968,60 @@ class TestGStreamerPipeline:
         mock_verify.assert_called_once()
         mock_get_ele_type.assert_called_once()
 
-    def test_set_default_models(self,gstreamer_pipeline,mocker):
-        mock_element1 = MagicMock()
-        mock_element1.__gtype__ = MagicMock()
-        mock_element1.__gtype__.name = 'GstGvaDetect'
-        mock_element1.find_property.return_value = False
-        mock_element1.get_property.side_effect = lambda x: ["VA_DEVICE_DEFAULT"] if x=="model" or x =="device" else None
-        mock_element2 = MagicMock()
-        mock_element2.__gtype__ = MagicMock()
-        mock_element2.__gtype__.name = 'GstGvaClassify'
-        mock_element2.find_property.return_value = True
-        mock_element2.get_property.side_effect = lambda x: ["VA_DEVICE_DEFAULT"] if x=="model" or x =="device" else []
-        mock_element3 = MagicMock()
-        mock_element3.__gtype__ = MagicMock()
-        mock_element3.__gtype__.name = 'Error'
-        mock_pipeline = MagicMock()
-        gstreamer_pipeline.pipeline = mock_pipeline
-        mock_pipeline.iterate_elements.return_value = [mock_element1,mock_element2,mock_element3]
-        mock_network = MagicMock()
-        mock_get_default_network = mocker.patch.object(gstreamer_pipeline.model_manager,'get_default_network_for_device',return_value = mock_network)
-        gstreamer_pipeline._set_default_models()
-        assert mock_pipeline.iterate_elements.call_count == 3
-        assert mock_element1.find_property.call_count == 3
-        assert mock_element2.find_property.call_count == 3
-        assert mock_element3.find_property.call_count == 0
-        assert mock_element1.get_property.call_count == 0
-        assert mock_element2.get_property.call_count == 5
-        assert mock_element3.get_property.call_count == 0
-        mock_get_default_network.assert_called_once_with(mock_element2.get_property("model"),mock_element2.get_property("device"))
-        mock_element2.set_property.assert_called_once_with("model",mock_network)
-
-    def test_set_model_property(self,gstreamer_pipeline,mocker):
-        mock_element1 = MagicMock()
-        mock_element1.__gtype__ = MagicMock()
-        mock_element1.__gtype__.name = 'GstGvaDetect'
-        mock_element1.find_property.return_value = True
-        mock_element1.get_property.side_effect = lambda  x: "property" if x=="model" else None
-        mock_element2 = MagicMock()
-        mock_element2.__gtype__ = MagicMock()
-        mock_element2.__gtype__.name = 'GstGvaClassify'
-        mock_element2.find_property.return_value = True
-        mock_element2.get_property.side_effect = lambda  x: "property" if x=="model" else None
-        mock_element3 = MagicMock()
-        mock_element3.__gtype__ = MagicMock()
-        mock_element3.__gtype__.name = 'Error'
-        mock_pipeline = MagicMock()
-        gstreamer_pipeline.pipeline = mock_pipeline
-        mock_pipeline.iterate_elements.return_value = [mock_element1,mock_element2,mock_element3]
-        gstreamer_pipeline.model_manager.model_properties = {"model-proc": {"property":None}}
-        gstreamer_pipeline._set_model_property("model-proc")
-        mock_pipeline.iterate_elements.assert_called_once()
-        mock_element1.set_property.assert_not_called()
-        gstreamer_pipeline.model_manager.model_properties = {"model-proc": {"property":"prop_value"}}
-        gstreamer_pipeline._set_model_property("model-proc")
-        mock_element1.set_property.assert_called_once()
-        mock_element2.set_property.assert_called_once()
+    def test_set_inference_element_properties(self, mocker, gstreamer_pipeline):
+        mocker.patch.object(GStreamerPipeline, '_inference_element_cache', {})
+        detect = make_element('GstGvaDetect', {"name": "detection", "model": "VA_DEVICE_DEFAULT",
+                                               "device": "CPU", "model-proc": "",
+                                               "model-instance-id": ""})
+        classify = make_element('GstGvaClassify', {"name": "classification", "model": "classify.xml",
+                                                   "labels": "", "model-instance-id": "shared"})
+        other = make_element('GstQueue', {})
+        gstreamer_pipeline.pipeline = MagicMock()
+        gstreamer_pipeline.pipeline.iterate_elements.return_value = [detect, other, classify]
+        gstreamer_pipeline.model_manager.get_default_network_for_device.return_value = "detect.xml"
+        gstreamer_pipeline.model_manager.model_properties = {
+            "model-proc": {"detect.xml": "detect.json"},
+            "labels": {"classify.xml": None},
+            "labels-file": {}}
+        element_plans = gstreamer_pipeline._set_inference_element_properties()
+        gstreamer_pipeline.pipeline.iterate_elements.assert_called_once()
+        gstreamer_pipeline.model_manager.get_default_network_for_device.assert_called_once_with(
+            "CPU", "VA_DEVICE_DEFAULT")
+        assert detect.properties == {"name": "detection", "model": "detect.xml", "device": "CPU",
+                                     "model-proc": "detect.json",
+                                     "model-instance-id": "detection_test_id"}
+        classify.set_property.assert_not_called()
+        other.find_property.assert_not_called()
+        assert [plan.index for plan in element_plans] == [0, 2]
+        assert GStreamerPipeline._inference_element_cache == {
+            'GstGvaClassify_shared': GStreamerPipeline.CachedElement(classify, [gstreamer_pipeline])}
+        assert gstreamer_pipeline._cached_element_keys == ['GstGvaClassify_shared']
+
+    def test_set_inference_element_properties_with_plans(self, gstreamer_pipeline):
+        element_props = {"name": "detection", "model": "VA_DEVICE_DEFAULT", "device": "CPU",
+                         "model-instance-id": ""}
+        gstreamer_pipeline.pipeline = MagicMock()
+        gstreamer_pipeline.pipeline.iterate_elements.return_value = [
+            make_element('GstGvaDetect', dict(element_props))]
+        gstreamer_pipeline.model_manager.get_default_network_for_device.return_value = "detect.xml"
+        gstreamer_pipeline.model_manager.model_properties = {"model-proc": {}, "labels": {},
+                                                             "labels-file": {}}
+        element_plans = gstreamer_pipeline._set_inference_element_properties()
+
+        element = make_element('GstGvaDetect', dict(element_props, name="detection1"))
+        gstreamer_pipeline.pipeline.iterate_elements.return_value = [element]
+        assert gstreamer_pipeline._set_inference_element_properties(element_plans) is element_plans
+        gstreamer_pipeline.model_manager.get_default_network_for_device.assert_called_once()
+        element.find_property.assert_not_called()
+        assert element.properties["model"] == "detect.xml"
+        assert element.properties["model-instance-id"] == "detection1_test_id"
+
+        # plans of a different pipeline are not applied
+        element = make_element('GstGvaClassify', {"model": "classify.xml"})
+        gstreamer_pipeline.pipeline.iterate_elements.return_value = [make_element('GstQueue', {}), element]
+        new_plans = gstreamer_pipeline._set_inference_element_properties(element_plans)
+        assert new_plans is not element_plans
+        assert [plan.index for plan in new_plans] == [1]
 
     def test_validate_config(self, gstreamer_pipeline, Gst,mocker):
         config = {"template": "{auto_source} name=source"}
@@ -1067,4 +1195,31 @@ class TestGStreamerPipeline:
         mock_pipeline.get_by_name.assert_any_call('element_name1')
         mock_set_property.assert_any_call(mock_element1,'property_name1',{"element": "first"},"format1")
         mock_pipeline.get_by_name.assert_any_call('element_name2')
-        mock_logger.debug.assert_called_once_with("Parameter property_name2 given for element element_name2 but no element found")
\ No newline at end of file
+        mock_logger.debug.assert_called_once_with("Parameter property_name2 given for element element_name2 but no element found")
+
+class TestStartBenchmark:
+
+    def test_start_benchmark(self, record_property):
+        """Starts and stops 200 instances and reports start latency without and with launch plan cache"""
+        options = MagicMock(enable_rtsp=False, enable_webrtc=False)
+        config = {"name": "benchmark", "version": "1", "type": "GStreamer",
+                  "template": "videotestsrc name=source num-buffers=1 ! fakesink name=sink"}
+
+        def start_latency(use_cache):
+            durations = []
+            for identifier in range(200):
+                if not use_cache:
+                    GStreamerPipeline._launch_plan_cache.clear()
+                pipeline = GStreamerPipeline(identifier, config, None, {"source": {"type": "uri"}},
+                                             MagicMock(), options)
+                start = time.perf_counter()
+                pipeline.start()
+                durations.append(time.perf_counter() - start)
+                assert pipeline.start_time is not None
+                pipeline._delete_pipeline_with_lock(GStreamerPipeline.State.ABORTED)
+            return sorted(durations)[len(durations) // 2]
+
+        latency = {"before": start_latency(False), "after": start_latency(True)}
+        for key, value in latency.items():
+            record_property("start_latency_ms_{}_cache".format(key), round(value * 1000, 3))
+        assert all(value > 0 for value in latency.values())
@@ -0,0 +1,107 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import pytest
+
+from src.server.common.utils.inference_governor import InferenceGovernor
+
+
+class SimulatedPipeline:
+    """Latency and frame rate of a pipeline whose inference cost is spread
+    over inference_interval frames"""
+
+    def __init__(self, inference_cost, other_cost=0.01, source_fps=30):
+        self.inference_cost = inference_cost
+        self.other_cost = other_cost
+        self.source_fps = source_fps
+
+    def latency(self, interval):
+        return self.other_cost + self.inference_cost / interval
+
+    def fps(self, interval):
+        return min(self.source_fps, 1 / self.latency(interval))
+
+
+def run(governor, pipeline, periods, interval=1):
+    governor.interval = interval
+    intervals = []
+    for _ in range(periods):
+        governor.step(pipeline.fps(governor.interval), pipeline.latency(governor.interval))
+        intervals.append(governor.interval)
+    return intervals
+
+
+class TestInferenceGovernor:
+
+    def test_latency_target(self):
+        governor = InferenceGovernor(target_latency=0.1, max_interval=16)
+        pipeline = SimulatedPipeline(inference_cost=0.3)
+        intervals = run(governor, pipeline, 50)
+        # 1 -> 2 -> 3 -> 4 meets the target
+        assert intervals[:4] == [2, 3, 4, 4]
+        # decreasing to 3 misses it (0.11s): settles between 3 and 4
+        assert set(intervals[10:]) <= {3, 4}
+        assert pipeline.latency(4) <= 0.1
+
+    def test_recovers_when_load_drops(self):
+        governor = InferenceGovernor(target_latency=0.1, max_interval=16, patience=2)
+        pipeline = SimulatedPipeline(inference_cost=0.3)
+        run(governor, pipeline, 10)
+        pipeline.inference_cost = 0.05
+        intervals = run(governor, pipeline, 20, governor.interval)
+        assert intervals[-1] == 1
+        assert governor.decisions[-1]["missed"] == []
+
+    def test_fps_target(self):
+        governor = InferenceGovernor(target_fps=25, max_interval=16)
+        pipeline = SimulatedPipeline(inference_cost=0.1)
+        intervals = run(governor, pipeline, 30)
+        assert intervals[0] == 2
+        assert pipeline.fps(intervals[-1]) >= 25 or pipeline.fps(intervals[-1] + 1) >= 25
+
+    def test_max_interval(self):
+        governor = InferenceGovernor(target_latency=0.001, max_interval=4)
+        intervals = run(governor, SimulatedPipeline(inference_cost=1), 5)
+        assert intervals == [2, 3, 4, 4, 4]
+        assert [decision["inference_interval"] for decision in governor.decisions] == [2, 3, 4]
+        assert governor.decisions[0]["missed"] == ["latency"]
+
+    def test_no_latency_measured(self):
+        governor = InferenceGovernor(target_latency=0.1, patience=1)
+        governor.interval = 4
+        assert governor.step(30, None) is None
+        assert governor.interval == 4
+
+    def test_update(self):
+        governor = InferenceGovernor(target_fps=25, clock=lambda: 100)
+        assert governor.update(0, 0, 0.0, 0, 0) == 1
+        assert governor.update(0, 0, 0.0, 2, 1) is None
+        # 20 fps over the last period
+        assert governor.update(40, 40, 2.0, 4, 1) == 2
+        assert governor.status() == {
+            "inference_interval": 2,
+            "target_latency": None,
+            "target_fps": 25,
+            "decisions": [{"time": 100, "fps": 20.0, "latency": 0.05,
+                           "missed": ["fps"], "inference_interval": 2}]
+        }
+        # no frames, e.g. paused source
+        assert governor.update(40, 40, 2.0, 6, 2) is None
+
+    @pytest.mark.parametrize("config", [
+        {},
+        {"target_fps": 0},
+        {"target_latency": "fast"},
+        {"target_fps": 30, "min_interval": 0},
+        {"target_fps": 30, "min_interval": 4, "max_interval": 2},
+        {"target_fps": 30, "period": 0},
+        {"target_fps": 30, "tolerance": 1},
+        {"target_fps": 30, "unknown": 1},
+        "fast"
+    ])
+    def test_invalid_config(self, config):
+        with pytest.raises(ValueError):
+            InferenceGovernor.from_config(config)
@@ -0,0 +1,126 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import random
+import time
+
+from src.server.instance_registry import InstanceRegistry
+from src.server.pipeline import Pipeline
+
+
+class FakeInstance:
+
+    def __init__(self, state=Pipeline.State.QUEUED):
+        self.state = state
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def add_completed(registry, instance_id, state=Pipeline.State.COMPLETED):
+    registry[instance_id] = FakeInstance()
+    registry[instance_id].state = state
+    registry.completed(instance_id)
+
+
+class TestInstanceRegistry:
+
+    def test_lookup(self):
+        registry = InstanceRegistry()
+        instance = FakeInstance()
+        registry["a"] = instance
+        assert "a" in registry
+        assert registry["a"] is instance
+        assert registry.get("b") is None
+        assert registry.items() == [("a", instance)]
+
+    def test_state_filter_and_pagination(self):
+        registry = InstanceRegistry()
+        for index in range(5):
+            registry["running{}".format(index)] = FakeInstance(Pipeline.State.RUNNING)
+        registry["queued"] = FakeInstance()
+        add_completed(registry, "completed")
+        add_completed(registry, "error", Pipeline.State.ERROR)
+        assert registry.ids(Pipeline.State.RUNNING, offset=1, limit=2) == ["running1", "running2"]
+        assert registry.ids(Pipeline.State.QUEUED) == ["queued"]
+        assert registry.ids(Pipeline.State.ERROR) == ["error"]
+        assert registry.ids(offset=5) == ["queued", "completed", "error"]
+        # stopped, finished callback not yet run
+        registry["queued"].state = Pipeline.State.COMPLETED
+        assert registry.ids(Pipeline.State.COMPLETED) == ["completed", "queued"]
+
+    def test_kept_by_default(self):
+        evicted = []
+        registry = InstanceRegistry(on_evict=evicted.append)
+        for index in range(2000):
+            add_completed(registry, index)
+        assert not evicted
+        assert len(registry.ids(Pipeline.State.COMPLETED)) == 2000
+
+    def test_max_completed(self):
+        evicted = []
+        registry = InstanceRegistry(max_completed=2, on_evict=evicted.append)
+        registry["running"] = FakeInstance(Pipeline.State.RUNNING)
+        for index in range(4):
+            add_completed(registry, index)
+        assert evicted == [0, 1]
+        assert registry.ids() == ["running", 2, 3]
+        assert registry.ids(Pipeline.State.COMPLETED) == [2, 3]
+
+    def test_evict_listeners(self):
+        evicted, forgotten = [], []
+        registry = InstanceRegistry(max_completed=1, on_evict=evicted.append)
+        registry.add_evict_listener(forgotten.append)
+        for index in range(3):
+            add_completed(registry, index)
+        assert evicted == forgotten == [0, 1]
+
+    def test_ttl(self):
+        clock = FakeClock()
+        registry = InstanceRegistry(max_completed=None, ttl=10, clock=clock)
+        add_completed(registry, "old")
+        clock.now = 5
+        add_completed(registry, "new")
+        clock.now = 12
+        assert registry.ids() == ["new"]
+        assert "old" not in registry
+
+    def test_completed_once(self):
+        registry = InstanceRegistry(max_completed=0)
+        add_completed(registry, "a")
+        registry.completed("a")
+        assert len(registry) == 0
+
+    def test_lookup_time(self):
+        """Lookups stay sub-millisecond with 50k instances"""
+        registry = InstanceRegistry(max_completed=None)
+        for index in range(50000):
+            if index % 500 == 0:
+                registry[index] = FakeInstance(Pipeline.State.RUNNING)
+            else:
+                add_completed(registry, index, random.choice([Pipeline.State.COMPLETED,
+                                                              Pipeline.State.ABORTED]))
+        ids = random.sample(range(50000), 1000)
+        start = time.perf_counter()
+        for instance_id in ids:
+            assert registry[instance_id] is not None
+        assert (time.perf_counter() - start) / len(ids) < 0.001
+
+        start = time.perf_counter()
+        running = registry.ids(Pipeline.State.RUNNING)
+        assert time.perf_counter() - start < 0.001
+        assert len(running) == 100
+
+        start = time.perf_counter()
+        page = registry.ids(Pipeline.State.COMPLETED, offset=100, limit=100)
+        assert time.perf_counter() - start < 0.001
+        assert len(page) == 100
@@ -0,0 +1,87 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import random
+import sys
+
+import numpy as np
+import pytest
+
+from src.server.common.utils.latency import LatencyHistogram, LatencyTracker
+
+
+class TestLatencyHistogram:
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        assert histogram.quantile(0.5) is None
+
+    @pytest.mark.parametrize('q', [0.5, 0.9, 0.99])
+    def test_quantile_accuracy(self, q):
+        rng = random.Random(0)
+        values = [rng.lognormvariate(-3, 1) for _ in range(100000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        expected = np.percentile(values, q * 100)
+        assert histogram.quantile(q) == pytest.approx(expected, rel=0.01)
+        assert histogram.max == max(values)
+
+    def test_out_of_range(self):
+        histogram = LatencyHistogram(min_value=0.001, max_value=1)
+        histogram.record(0)
+        histogram.record(10)
+        assert histogram.quantile(0) < 0.0011
+        assert histogram.quantile(1) == 10
+
+
+class TestLatencyTracker:
+
+    def test_start_stop(self):
+        tracker = LatencyTracker()
+        tracker.start(1, 10)
+        tracker.start(2, 11)
+        assert tracker.stop(1, 12) == 2
+        assert tracker.stop(1, 13) is None
+        assert tracker.stop(3, 13) is None
+        assert (tracker.pending, tracker.count, tracker.average()) == (1, 1, 2)
+        assert tracker.percentiles() == {"p50": 2, "p90": 2, "p99": 2, "max": 2}
+
+    def test_no_frames(self):
+        tracker = LatencyTracker()
+        assert tracker.average() is None
+        assert tracker.percentiles() is None
+
+    def test_evicts_oldest(self):
+        tracker = LatencyTracker(max_pending=2)
+        for pts in range(3):
+            tracker.start(pts, pts)
+        assert (tracker.pending, tracker.evicted) == (2, 1)
+        assert tracker.stop(0, 5) is None
+        assert tracker.stop(2, 5) == 3
+
+    def test_bounded_memory_with_dropped_frames(self):
+        # 1M frames, 10% never reach the appsink e.g. dropped by a leaky queue
+        tracker = LatencyTracker(max_pending=1000)
+        buckets = len(tracker.histogram._buckets)
+        rng = random.Random(0)
+        sizes = []
+
+        for pts in range(1000000):
+            tracker.start(pts, pts * 0.033)
+            if rng.random() >= 0.1:
+                tracker.stop(pts, pts * 0.033 + 0.05)
+            if pts % 100000 == 99999:
+                sizes.append((tracker.pending, sys.getsizeof(tracker._pending),
+                              sys.getsizeof(tracker.histogram._buckets)))
+
+        # previously every dropped frame stayed in the pending dict, ~100k entries
+        assert all(pending <= 1000 for pending, _, _ in sizes)
+        # containers stop growing once max_pending frames are pending
+        assert len({(pending_size, buckets_size) for _, pending_size, buckets_size in sizes}) == 1
+        assert len(tracker.histogram._buckets) == buckets
+        assert tracker.evicted > 0
+        assert tracker.average() == pytest.approx(0.05)
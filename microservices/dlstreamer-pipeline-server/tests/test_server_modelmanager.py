@@ -4,11 +4,13 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 
+import shutil
+import time
 import pytest
 from unittest import mock
 from unittest.mock import patch, MagicMock
 from collections import defaultdict
-from src.server.model_manager import ModelManager,ModelsDict
+from src.server.model_manager import ModelManager,ModelsDict,ModelWatcher
 
 @pytest.fixture
 def model_manager(mocker):
@@ -161,4 +163,83 @@ class TestModelManager:
         result = model_manager.get_network(mock_model,network)
         assert result == "{'model1': {'v1': {'networks': {'custom': {'description': 'model1', 'labels': 'models/model1/v1/labels.txt', 'network': 'models/model1/v1/model.xml', 'proc': 'models/model1/v1/model-proc.json', 'type': 'IntelDLDT'}}}}}[FP16]"
         result = model_manager.get_network("{models['temp']}[VA_DEVICE_DEFAULT]",network)
-        assert result is None
\ No newline at end of file
+        assert result is None
+
+def add_model(model_dir, name, version, precision="FP32", weights=True, proc='{"json_schema_version": "2.2.0"}'):
+    path = model_dir / name / str(version) / precision
+    path.mkdir(parents=True)
+    (path / "{}.xml".format(name)).write_text("<net/>")
+    if weights:
+        (path / "{}.bin".format(name)).write_text("weights")
+    if proc is not None:
+        (model_dir / name / str(version) / "{}.json".format(name)).write_text(proc)
+    return path
+
+
+class TestModelReload:
+
+    @pytest.fixture
+    def model_dir(self, tmp_path):
+        add_model(tmp_path, "detection", 1)
+        return tmp_path
+
+    @pytest.fixture
+    def manager(self, model_dir):
+        return ModelManager(str(model_dir))
+
+    def test_new_version(self, manager, model_dir):
+        model = "{models[detection][2][VA_DEVICE_DEFAULT][network]}"
+        models = manager.models
+        revision = manager.revision
+        assert manager.get_network(model, "FP32") is None
+
+        path = add_model(model_dir, "detection", 2)
+        assert manager.reload_models()
+        assert manager.revision == revision + 1
+        assert manager.get_network(model, "FP32") == str(path / "detection.xml")
+        assert manager.get_default_network_for_device("CPU", model) == str(path / "detection.xml")
+        assert manager.model_properties["model-proc"][str(path / "detection.xml")] == \
+            str(model_dir / "detection" / "2" / "detection.json")
+        # table referenced by running pipelines is unchanged
+        assert 2 not in models["detection"]
+
+    def test_invalid_model_rejected(self, manager, model_dir):
+        models = manager.models
+        add_model(model_dir, "detection", 2, weights=False)
+        add_model(model_dir, "classification", 1, proc="{")
+        assert not manager.reload_models()
+        assert manager.models["detection"] is models["detection"]
+        assert 2 not in manager.models["detection"]
+        assert "classification" not in manager.models
+        assert manager.model_properties["model-proc"][
+            manager.models["detection"][1]["networks"]["FP32"]["network"]]
+
+        (model_dir / "detection" / "2" / "FP32" / "detection.bin").write_text("weights")
+        assert not manager.reload_models()
+        assert 2 in manager.models["detection"]
+
+    def test_removed_model(self, manager, model_dir):
+        add_model(model_dir, "classification", 1)
+        manager.reload_models()
+        shutil.rmtree(model_dir / "classification")
+        assert manager.reload_models()
+        assert "classification" not in manager.models
+
+    def test_watcher(self, manager, model_dir):
+        watcher = ModelWatcher(manager, interval=60)
+        assert not watcher.check()
+        add_model(model_dir, "detection", 2)
+        assert watcher.check()
+        assert 2 in manager.models["detection"]
+        assert not watcher.check()
+
+    def test_watch(self, manager, model_dir):
+        manager.watch(0.01)
+        try:
+            add_model(model_dir, "detection", 2)
+            deadline = time.monotonic() + 5
+            while 2 not in manager.models["detection"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert 2 in manager.models["detection"]
+        finally:
+            manager.stop_watching()
@@ -36,6 +36,17 @@ class TestPipeline:
         assert Pipeline.State.ERROR.stopped() is True
         assert Pipeline.State.ABORTED.stopped() is True
     
+    def test_state_version(self):
+        pipeline = Pipeline(None, None, None, None, None, None)
+        assert pipeline.state is None
+        assert pipeline.state_version == 0
+        pipeline.state = Pipeline.State.QUEUED
+        pipeline.state = Pipeline.State.RUNNING
+        assert pipeline.state is Pipeline.State.RUNNING
+        assert pipeline.state_version == 2
+        # per instance
+        assert Pipeline(None, None, None, None, None, None).state_version == 0
+
     @pytest.mark.parametrize(
     "config_section, result",
     [
@@ -7,8 +7,11 @@
 import pytest
 from unittest import mock
 from unittest.mock import patch, MagicMock
-from collections import defaultdict, deque
+from collections import defaultdict
+import json
 import os
+import time
+from src.server.pipeline import Pipeline
 from src.server.pipeline_manager import PipelineManager
 
 @pytest.fixture
@@ -119,7 +122,8 @@ class TestPipelineManager:
     @pytest.mark.parametrize(
     "instance_exists_value, pipeline_instances, instance_id, expected_status",
     [
-        (True, {'instance_id': MagicMock(status=MagicMock(return_value={'status': 'running'}))}, 'instance_id', {'status': 'running'}),
+        (True, {'instance_id': MagicMock(status=MagicMock(return_value={'status': 'running'}), request={"priority": 2})}, 'instance_id',
+         {'status': 'running', 'priority': 2, 'queue_position': None, 'preempted': 0}),
         (False, {}, 'instance_id', None)
     ])
     def test_get_instance_status(self, pipeline_manager, pipeline_instances, instance_id, instance_exists_value,expected_status):
@@ -129,10 +133,18 @@ class TestPipelineManager:
         assert status == expected_status
         pipeline_manager.instance_exists.assert_called_once_with(instance_id,None,None)
 
+    def test_get_instance_state_version(self, pipeline_manager):
+        pipeline_manager.pipeline_instances['instance_id'] = MagicMock(state_version=2)
+        assert pipeline_manager.get_instance_state_version('instance_id') == 2
+        assert pipeline_manager.get_instance_state_version('unknown') is None
+
     def test_get_all_instance_status(self, pipeline_manager):
-        pipeline_manager.pipeline_instances = {'instance_id1': MagicMock(status=MagicMock(return_value={'pipeline1': 'running'})),'instance_id2': MagicMock(status=MagicMock(return_value={'pipeline2': 'running'}))}
+        pipeline_manager.pipeline_instances['instance_id1'] = MagicMock(status=MagicMock(return_value={'pipeline1': 'running'}), request={})
+        pipeline_manager.pipeline_instances['instance_id2'] = MagicMock(status=MagicMock(return_value={'pipeline2': 'queued'}), request={})
+        pipeline_manager.pipeline_queue.add('instance_id2', 'pipeline2/v1')
         status = pipeline_manager.get_all_instance_status()
-        assert status == [{'pipeline1': 'running'},{'pipeline2': 'running'}]
+        assert status == [{'pipeline1': 'running', 'priority': 0, 'queue_position': None, 'preempted': 0},
+                          {'pipeline2': 'queued', 'priority': 0, 'queue_position': 0, 'preempted': 0}]
 
     @pytest.mark.parametrize(
     "instance_exists_value, pipeline_instances, instance_id, expected_params",
@@ -151,11 +163,14 @@ class TestPipelineManager:
 
     def test_stop_instance(self, pipeline_manager):
         pipeline_manager.instance_exists = MagicMock(return_value=True)
-        pipeline_manager.pipeline_queue = deque(["instance1", "instance2"])
-        pipeline_manager.pipeline_instances = {'instance1': MagicMock(stop=MagicMock(return_value=True)),'instance3': MagicMock(stop=MagicMock(return_value=True))}
+        pipeline_manager.pipeline_queue.add("instance1", "pipeline1/v1")
+        pipeline_manager.pipeline_queue.add("instance2", "pipeline1/v1")
+        pipeline_manager.pipeline_instances['instance1'] = MagicMock(stop=MagicMock(return_value=True))
+        pipeline_manager.pipeline_instances['instance3'] = MagicMock(stop=MagicMock(return_value=True))
         result = pipeline_manager.stop_instance('instance1')
         assert result
-        assert pipeline_manager.pipeline_queue == deque(["instance2"])
+        assert "instance1" not in pipeline_manager.pipeline_queue
+        assert "instance2" in pipeline_manager.pipeline_queue
         pipeline_manager.instance_exists.assert_called_once_with("instance1",None,None)
         result = pipeline_manager.stop_instance('instance3')
         assert result 
@@ -166,18 +181,20 @@ class TestPipelineManager:
     @pytest.mark.parametrize(
     "max_running_pipelines, running_pipelines, pipeline_queue, expected_result",
     [
-        (5, 3, deque(['pipeline1', 'pipeline2']), 'pipeline1'),
-        (5, 5, deque(['pipeline1', 'pipeline2']), None),
-        (5, 6, deque(['pipeline1', 'pipeline2']), None),
-        (5, 3, deque([]), None),
-        (5, 3, "pipeline", None)
+        (5, 3, ['pipeline1', 'pipeline2'], 'pipeline1'),
+        (5, 5, ['pipeline1', 'pipeline2'], None),
+        (5, 6, ['pipeline1', 'pipeline2'], None),
+        (5, 3, [], None),
+        (-1, 6, ['pipeline1'], 'pipeline1')
     ])
     def test_get_next_pipeline_identifier(self, pipeline_manager, max_running_pipelines, running_pipelines, pipeline_queue, expected_result):
         pipeline_manager.max_running_pipelines = max_running_pipelines
         pipeline_manager.running_pipelines = running_pipelines
-        pipeline_manager.pipeline_queue = pipeline_queue
+        for instance_id in pipeline_queue:
+            pipeline_manager.pipeline_queue.add(instance_id, "pipeline/v1")
         result = pipeline_manager._get_next_pipeline_identifier()
         assert result == expected_result
+        assert pipeline_manager.running_pipelines == running_pipelines + (result is not None)
 
     @pytest.mark.parametrize(
     "value, expected_result",
@@ -203,20 +220,23 @@ class TestPipelineManager:
 
     def test_pipeline_finished(self, pipeline_manager,mocker):
         mocker.patch.object(pipeline_manager,'_start')
+        pipeline_manager.pipeline_queue.add("instance_id", "pipeline1/v1")
+        pipeline_manager.pipeline_queue.next()
         pipeline_manager.running_pipelines = 1
-        pipeline_manager._pipeline_finished()
+        pipeline_manager._pipeline_finished("instance_id")
         assert pipeline_manager.running_pipelines == 0
         pipeline_manager._start.assert_called_once()
+        # finishing again, e.g. error after end of stream, does not release another slot
+        pipeline_manager._pipeline_finished("instance_id")
+        assert pipeline_manager.running_pipelines == 0
 
     def test_start_pipeline_manager(self,pipeline_manager,mocker):
-        mocker.patch.object(pipeline_manager,'_get_next_pipeline_identifier',return_value='instance_id')
+        mocker.patch.object(pipeline_manager,'_get_next_pipeline_identifier',side_effect=['instance_id', None])
         mock_instance = MagicMock()
         pipeline_manager.pipeline_instances = {'instance_id': mock_instance}
-        pipeline_manager.running_pipelines = 0
         mocker.patch.object(mock_instance,'start')
         pipeline_manager._start()
-        assert pipeline_manager.running_pipelines == 1
-        pipeline_manager._get_next_pipeline_identifier.assert_called_once()
+        assert pipeline_manager._get_next_pipeline_identifier.call_count == 2
         mock_instance.start.assert_called_once()
     
     def test_validate_config(self,pipeline_manager,mocker):
@@ -405,4 +425,101 @@ class TestPipelineManager:
         success = pipeline_manager_for_load_pipelines._load_pipelines()
         assert success is False
         assert pipeline_manager_for_load_pipelines.pipelines == {}
-    
\ No newline at end of file
+    
+
+class FakesinkPipeline(Pipeline):
+    """Pipeline type recording its request, never started"""
+
+    def __init__(self, identifier, config, model_manager, request, finished_callback, options):
+        # pylint: disable=super-init-not-called
+        self.request = request
+        self.state = Pipeline.State.QUEUED
+
+
+@pytest.fixture
+def fakesink_pipeline_manager(mocker, tmp_path):
+    config = {
+        "type": "GStreamer",
+        "description": "Validation benchmark",
+        "template": "{auto_source} ! gvadetect name=detection ! fakesink name=sink",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "detection-device": {"element": "detection", "type": "string",
+                                     "enum": ["CPU", "GPU"], "default": "CPU"},
+                "threshold": {"element": "detection", "type": "number",
+                              "minimum": 0, "maximum": 1, "default": 0.5},
+                "inference-interval": {"element": "detection", "type": "integer",
+                                       "default": 1}
+            }
+        }
+    }
+    path = tmp_path / "fakesink" / "1"
+    path.mkdir(parents=True)
+    (path / "pipeline.json").write_text(json.dumps(config))
+    mocker.patch.object(PipelineManager, '_import_pipeline_types',
+                        return_value={"GStreamer": FakesinkPipeline})
+    manager = PipelineManager(MagicMock(), str(tmp_path), 1)
+    mocker.patch.object(manager, '_start')
+    return manager
+
+
+class TestCompiledValidation:
+
+    def test_compiled_pipeline(self, fakesink_pipeline_manager):
+        validators = fakesink_pipeline_manager._validators[("fakesink", "1")]
+        assert {"parameters", "source", "tags", "destination",
+                ("destination", "metadata"), ("destination", "frame")} <= set(validators)
+        defaults = fakesink_pipeline_manager._defaults[("fakesink", "1")]
+        assert defaults[("parameters", "properties")] == {
+            "detection-device": "CPU", "threshold": 0.5, "inference-interval": 1}
+        assert defaults[("source", "uri", "properties")] == {"element": "urisourcebin"}
+
+    def test_create_instance(self, fakesink_pipeline_manager):
+        request = {"source": {"type": "uri", "uri": "file:///video.mp4"},
+                   "parameters": {"threshold": 0.7}}
+        instance_id, error = fakesink_pipeline_manager.create_instance(
+            "fakesink", "1", request, None)
+        assert error is None
+        request = fakesink_pipeline_manager.pipeline_instances[instance_id].request
+        assert request["parameters"] == {"detection-device": "CPU", "threshold": 0.7,
+                                         "inference-interval": 1}
+        assert request["source"]["element"] == "urisourcebin"
+        for parameters, error in [({"threshold": 2}, "Invalid Parameters"),
+                                  ({"detection-device": "NPU"}, "Invalid Parameters")]:
+            assert fakesink_pipeline_manager.create_instance(
+                "fakesink", "1", {"parameters": parameters}, None) == (None, error)
+        assert fakesink_pipeline_manager.create_instance(
+            "fakesink", "1", {"source": {"type": "uri", "uri": 1}}, None) == (None, "Invalid Source")
+
+    def test_inference_governor(self, fakesink_pipeline_manager):
+        _, error = fakesink_pipeline_manager.create_instance(
+            "fakesink", "1", {"inference_governor": {"target_latency": 0.1}}, None)
+        assert error is None
+        assert fakesink_pipeline_manager.create_instance(
+            "fakesink", "1", {"inference_governor": {"max_interval": 4}}, None) == \
+            (None, "Invalid Inference Governor")
+
+    def test_validation_benchmark(self, fakesink_pipeline_manager, record_property):
+        """Submits 10k instance requests and reports validation overhead per request
+        with and without compiled validators"""
+        manager = fakesink_pipeline_manager
+        request = {"source": {"type": "uri", "uri": "file:///video.mp4"},
+                   "destination": {"metadata": {"type": "file", "path": "/tmp/results.jsonl",
+                                                "format": "json-lines"}},
+                   "parameters": {"threshold": 0.7}}
+
+        def validation_overhead(requests):
+            start = time.perf_counter()
+            for _ in range(requests):
+                _, error = manager.create_instance("fakesink", "1", request, None)
+                assert error is None
+            return (time.perf_counter() - start) / requests
+
+        overhead = {"compiled": validation_overhead(10000)}
+        manager._validators.clear()
+        manager._defaults.clear()
+        overhead["per request"] = validation_overhead(2000)
+        for key, value in overhead.items():
+            record_property("request_overhead_us_{}".format(key.replace(" ", "_")), round(value * 1e6, 1))
+        assert overhead["compiled"] < overhead["per request"]
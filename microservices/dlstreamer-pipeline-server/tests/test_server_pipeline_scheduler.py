@@ -0,0 +1,195 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import random
+import time
+
+import pytest
+
+from src.server.pipeline import Pipeline
+from src.server.pipeline_manager import PipelineManager
+from src.server.pipeline_scheduler import PipelineScheduler
+
+
+class FakePipeline(Pipeline):
+    """Pipeline started synchronously, finished by the test"""
+
+    started = []
+
+    def __init__(self, identifier, config, model_manager, request, finished_callback, options):
+        # pylint: disable=super-init-not-called
+        self.identifier = identifier
+        self.request = request
+        self.state = Pipeline.State.QUEUED
+        self._finished_callback = finished_callback
+
+    def start(self):
+        self.state = Pipeline.State.RUNNING
+        FakePipeline.started.append(self.identifier)
+
+    def finish(self):
+        self.state = Pipeline.State.COMPLETED
+        self._finished_callback()
+
+    def stop(self):
+        if self.state is Pipeline.State.QUEUED:
+            self.state = Pipeline.State.ABORTED
+
+    def status(self):
+        return {"id": self.identifier, "state": self.state}
+
+
+@pytest.fixture
+def pipeline_manager(mocker):
+    mocker.patch.object(PipelineManager, '_load_pipelines', return_value=True)
+    manager = PipelineManager(mocker.MagicMock(), "user_pipeline", 1, ignore_init_errors=True)
+    manager.pipeline_types = {"Fake": FakePipeline}
+    manager.pipelines = {name: {"1": {"type": "Fake", "name": name, "version": "1"}}
+                         for name in ["camera", "batch"]}
+    FakePipeline.started = []
+    return manager
+
+
+def create(manager, name, priority=None):
+    request = {} if priority is None else {"priority": priority}
+    instance_id, error = manager.create_instance(name, "1", request, None)
+    assert error is None
+    return instance_id
+
+
+class TestPipelineScheduler:
+
+    def test_fifo(self):
+        scheduler = PipelineScheduler()
+        for instance_id in ["a", "b", "c"]:
+            scheduler.add(instance_id, "pipeline/1")
+        assert [scheduler.next() for _ in range(4)] == ["a", "b", "c", None]
+
+    def test_priority(self):
+        scheduler = PipelineScheduler()
+        scheduler.add("low", "batch/1", -1)
+        scheduler.add("default", "batch/1")
+        scheduler.add("high", "camera/1", 10)
+        assert scheduler.queue_positions() == {"high": 0, "default": 1, "low": 2}
+        assert [scheduler.next() for _ in range(3)] == ["high", "default", "low"]
+
+    def test_max_running(self):
+        scheduler = PipelineScheduler()
+        scheduler.configure("camera/1", max_running=1)
+        scheduler.add("camera1", "camera/1")
+        scheduler.add("camera2", "camera/1")
+        scheduler.add("batch1", "batch/1")
+        assert [scheduler.next() for _ in range(3)] == ["camera1", "batch1", None]
+        assert scheduler.finished("camera1")
+        assert not scheduler.finished("camera1")
+        assert scheduler.next() == "camera2"
+
+    def test_weighted_fair_queuing(self):
+        scheduler = PipelineScheduler()
+        scheduler.configure("camera/1", weight=2)
+        for index in range(12):
+            scheduler.add("camera{}".format(index), "camera/1")
+            scheduler.add("batch{}".format(index), "batch/1")
+        order = [scheduler.next() for _ in range(12)]
+        # starts are shared 2:1 while both pipelines have queued instances
+        assert sum(instance_id.startswith("camera") for instance_id in order) == 8
+        assert order[:3].count("batch0") == 1
+
+    def test_invalid_weight(self):
+        with pytest.raises(ValueError):
+            PipelineScheduler().configure("camera/1", weight=0)
+
+    def test_remove(self):
+        scheduler = PipelineScheduler()
+        scheduler.add("a", "pipeline/1")
+        scheduler.add("b", "pipeline/1")
+        assert scheduler.remove("a")
+        assert not scheduler.remove("a")
+        assert len(scheduler) == 1
+        assert scheduler.next() == "b"
+
+    def test_queue_position(self, mocker):
+        scheduler = PipelineScheduler()
+        compute = mocker.spy(scheduler, '_compute_positions')
+        for instance_id in ["a", "b", "c"]:
+            scheduler.add(instance_id, "pipeline/1")
+        assert [scheduler.queue_position(instance_id) for instance_id in "abc"] == [0, 1, 2]
+        assert scheduler.queue_position("unknown") is None
+        assert scheduler.queue_positions() == {"a": 0, "b": 1, "c": 2}
+        # the queue is replayed once until it changes
+        assert compute.call_count == 1
+        assert scheduler.next() == "a"
+        assert scheduler.queue_position("a") is None
+        assert scheduler.queue_position("c") == 1
+        scheduler.remove("b")
+        scheduler.add("d", "pipeline/1", 1)
+        assert scheduler.queue_positions() == {"d": 0, "c": 1}
+        assert compute.call_count == 3
+
+
+class TestPipelineManagerScheduling:
+
+    def test_priority_preempts_queued(self, pipeline_manager):
+        running = create(pipeline_manager, "batch")
+        batch = create(pipeline_manager, "batch")
+        camera = create(pipeline_manager, "camera", priority=10)
+        status = pipeline_manager.get_instance_status(batch)
+        assert (status["queue_position"], status["preempted"]) == (1, 0)
+        assert pipeline_manager.get_instance_status(camera)["queue_position"] == 0
+
+        pipeline_manager.pipeline_instances[running].finish()
+        assert FakePipeline.started == [running, camera]
+        status = pipeline_manager.get_instance_status(batch)
+        assert status["state"] is Pipeline.State.QUEUED
+        assert (status["priority"], status["queue_position"], status["preempted"]) == (0, 0, 1)
+
+        pipeline_manager.pipeline_instances[camera].finish()
+        assert FakePipeline.started == [running, camera, batch]
+        assert pipeline_manager.running_pipelines == 1
+        status = pipeline_manager.get_instance_status(batch)
+        assert (status["queue_position"], status["preempted"]) == (None, 1)
+
+    def test_max_running_instances(self, pipeline_manager):
+        pipeline_manager.max_running_pipelines = -1
+        pipeline_manager.pipeline_queue.configure("camera/1", max_running=1)
+        camera1 = create(pipeline_manager, "camera")
+        camera2 = create(pipeline_manager, "camera")
+        batch = create(pipeline_manager, "batch")
+        assert FakePipeline.started == [camera1, batch]
+        pipeline_manager.pipeline_instances[camera1].finish()
+        assert FakePipeline.started == [camera1, batch, camera2]
+
+    def test_stop_queued(self, pipeline_manager):
+        running = create(pipeline_manager, "batch")
+        queued = create(pipeline_manager, "batch")
+        pipeline_manager.stop_instance(queued)
+        pipeline_manager.pipeline_instances[running].finish()
+        assert FakePipeline.started == [running]
+        assert pipeline_manager.running_pipelines == 0
+
+    def test_status_lookup_time(self, mocker, pipeline_manager):
+        """Status lookups stay sub-millisecond with 5k queued instances"""
+        instance_ids = [create(pipeline_manager, random.choice(["camera", "batch"]),
+                               priority=random.randint(0, 3)) for _ in range(5000)]
+        compute = mocker.spy(pipeline_manager.pipeline_queue, '_compute_positions')
+        sample = random.sample(instance_ids, 1000)
+        start = time.perf_counter()
+        for instance_id in sample:
+            assert pipeline_manager.get_instance_status(instance_id) is not None
+        assert (time.perf_counter() - start) / len(sample) < 0.001
+
+        start = time.perf_counter()
+        statuses = pipeline_manager.get_all_instance_status(Pipeline.State.QUEUED)
+        assert time.perf_counter() - start < 0.1
+        assert sorted(status["queue_position"] for status in statuses) == list(range(4999))
+        assert compute.call_count == 1
+
+    @pytest.mark.parametrize('priority', ["high", 1.5, True])
+    def test_invalid_priority(self, pipeline_manager, priority):
+        instance_id, error = pipeline_manager.create_instance(
+            "camera", "1", {"priority": priority}, None)
+        assert instance_id is None
+        assert error == "Invalid Priority"
@@ -67,7 +67,8 @@ class TestPipelineServer:
         mock_parse = mocker.patch('src.server.pipeline_server.parse_options', return_value = options)
         pipeline_server.start(options)
         mock_model_manager.assert_called_once_with("/path/to/config/models",pipeline_server.options.network_preference,pipeline_server.options.ignore_init_errors)
-        mock_pipeline_manager.assert_called_once_with(pipeline_server.model_manager,"/path/to/config/pipelines",max_running_pipelines=pipeline_server.options.max_running_pipelines,ignore_init_errors=pipeline_server.options.ignore_init_errors)
+        mock_pipeline_manager.assert_called_once_with(pipeline_server.model_manager,"/path/to/config/pipelines",max_running_pipelines=pipeline_server.options.max_running_pipelines,ignore_init_errors=pipeline_server.options.ignore_init_errors,
+                                                       max_completed_instances=pipeline_server.options.max_completed_instances,completed_instance_ttl=pipeline_server.options.completed_instance_ttl)
         mock_parse.assert_called_once()
         assert not pipeline_server._stopped
 
@@ -63,6 +63,67 @@ class TestGStreamerRtspDestination:
         assert gstreamer_rtsp_destination._last_timestamp == 500
         mock_pipeline.appsink_element.set_property.assert_called_once_with("sync", True)
 
+    @pytest.mark.parametrize("request_update, caps, shared", [
+        ({}, "video/x-raw", False),
+        ({"shared-encoder": True}, "video/x-raw", True),
+        ({"codec": "h264"}, "video/x-raw", True),
+        ({"shared-encoder": True, "overlay": False}, "image/jpeg", False),
+        ({"shared-encoder": True, "overlay": True}, "image/jpeg", True),
+    ])
+    def test_use_shared_encoder(self, mock_request, mock_pipeline, request_update, caps, shared):
+        mock_request.update(request_update)
+        destination = GStreamerRtspDestination(mock_request, mock_pipeline)
+        mock_caps = MagicMock()
+        mock_caps.to_string.return_value = caps
+        assert destination._use_shared_encoder(mock_caps) is shared
+
+    def test_init_stream_shared_encoder(self, mock_request, mock_pipeline):
+        mock_request.update({"codec": "h264", "bitrate": 1024})
+        destination = GStreamerRtspDestination(mock_request, mock_pipeline)
+        mock_sample = MagicMock()
+        mock_sample.get_caps.return_value.to_string.return_value = "video/x-raw"
+        shared_encoders = mock_pipeline.rtsp_server.shared_encoders
+        destination._init_stream(mock_sample)
+        shared_encoders.acquire.assert_called_once()
+        key, caps, consumer = shared_encoders.acquire.call_args[0]
+        assert caps == mock_sample.get_caps()
+        assert consumer == destination._on_encoded_sample
+        assert (key.source, key.codec, key.bitrate, key.quality, key.overlay) == \
+            (mock_pipeline.identifier, "h264", 1024, None, True)
+        assert destination._encoded_stream == shared_encoders.acquire.return_value
+        mock_pipeline.rtsp_server.add_stream.assert_called_once_with(
+            mock_pipeline.identifier, mock_pipeline.rtsp_path,
+            shared_encoders.acquire.return_value.caps, destination, False)
+
+    def test_on_encoded_sample(self, gstreamer_rtsp_destination):
+        mock_sample = MagicMock()
+        gstreamer_rtsp_destination._push_buffer = MagicMock()
+        gstreamer_rtsp_destination._on_encoded_sample(mock_sample)
+        gstreamer_rtsp_destination._push_buffer.assert_not_called()
+        gstreamer_rtsp_destination._app_src = MagicMock()
+        gstreamer_rtsp_destination._need_data = True
+        gstreamer_rtsp_destination._on_encoded_sample(mock_sample)
+        gstreamer_rtsp_destination._push_buffer.assert_called_once_with(
+            mock_sample.get_buffer().copy())
+
+    def test_process_frame_shared_encoder(self, gstreamer_rtsp_destination):
+        mock_frame = MagicMock()
+        mock_stream = MagicMock()
+        gstreamer_rtsp_destination._encoded_stream = mock_stream
+        gstreamer_rtsp_destination._push_buffer = MagicMock()
+        gstreamer_rtsp_destination._need_data = True
+        gstreamer_rtsp_destination._process_frame(mock_frame)
+        mock_stream.push.assert_called_once_with(mock_frame)
+        gstreamer_rtsp_destination._push_buffer.assert_not_called()
+
+    def test_finish_shared_encoder(self, gstreamer_rtsp_destination, mock_pipeline):
+        mock_stream = MagicMock()
+        gstreamer_rtsp_destination._encoded_stream = mock_stream
+        gstreamer_rtsp_destination.finish()
+        mock_pipeline.rtsp_server.shared_encoders.release.assert_called_once_with(
+            mock_stream.key, gstreamer_rtsp_destination._on_encoded_sample)
+        assert gstreamer_rtsp_destination._encoded_stream is None
+
     def test_on_need_data(self, gstreamer_rtsp_destination):
         gstreamer_rtsp_destination.on_need_data(None, None)
         assert gstreamer_rtsp_destination._need_data is True
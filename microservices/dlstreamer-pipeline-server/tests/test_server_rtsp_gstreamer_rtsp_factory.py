@@ -46,7 +46,8 @@ class TestGStreamerRtspFactory:
         ("audio Pipeline", True, " ! queue ! decodebin ! audioresample ! audioconvert  ! avenc_aac ! queue ! mpegtsmux ! rtpmp2tpay  name=pay0 pt=96",True,["video/x-raw","width=1920","height=1080","framerate=30","layout=temp_layout","format=temp_format"],'appsrc name=source format=GST_FORMAT_TIME caps="video/x-raw,width=1920,height=1080,framerate=30,layout=temp_layout,format=temp_format"'),
         ("Video Pipeline", False, " ! videoconvert          ! jpegenc name=jpegencoder ! rtpjpegpay name=pay0",False,["video/x-raw","width=1920","height=1080","framerate=30","layout=temp_layout","format=temp_format"],'appsrc name=source format=GST_FORMAT_TIME caps="video/x-raw,width=1920,height=1080,framerate=30,layout=temp_layout,format=temp_format"'),
         ("Video Pipeline", False, " ! rtpjpegpay name=pay0",False,["image/jpeg","width=1920","height=1080","framerate=30","layout=temp_layout","format=temp_format"],'appsrc name=source format=GST_FORMAT_TIME caps="image/jpeg,width=1920,height=1080,framerate=30,layout=temp_layout,format=temp_format"'),
-        ("Video Pipeline", False, " ! jpegdec ! videoconvert          ! gvawatermark ! jpegenc name=jpegencoder ! rtpjpegpay name=pay0",True,["image/jpeg","width=1920","height=1080","framerate=30","layout=temp_layout","format=temp_format"],'appsrc name=source format=GST_FORMAT_TIME caps="image/jpeg,width=1920,height=1080,framerate=30,layout=temp_layout,format=temp_format"')
+        ("Video Pipeline", False, " ! jpegdec ! videoconvert          ! gvawatermark ! jpegenc name=jpegencoder ! rtpjpegpay name=pay0",True,["image/jpeg","width=1920","height=1080","framerate=30","layout=temp_layout","format=temp_format"],'appsrc name=source format=GST_FORMAT_TIME caps="image/jpeg,width=1920,height=1080,framerate=30,layout=temp_layout,format=temp_format"'),
+        ("Video Pipeline", False, " ! h264parse ! rtph264pay name=pay0 pt=96 config-interval=-1",False,["video/x-h264","stream-format=byte-stream","width=1920","height=1080"],'appsrc name=source format=GST_FORMAT_TIME caps="video/x-h264,stream-format=byte-stream,width=1920,height=1080"')
     ])
     def test_do_create_element_audio_and_video(self, gstreamer_rtsp_factory, mock_rtsp_server,mocker,mock_gst,to_string, is_audio, expected_launch_string,overlay,caps,launch_string):
         mock_url = MagicMock()
@@ -65,6 +65,50 @@ class TestGStreamerWebRTCDestination:
         mock_pipeline.appsink_element.set_property.assert_called_once_with("sync", True)
         gstreamer_webrtc_destination._webrtc_manager.add_stream.assert_called_once_with("peer1", mock_caps, gstreamer_webrtc_destination,True)
 
+    def test_init_stream_shared_encoder(self, mock_request, mock_pipeline):
+        mock_request.update({"shared-encoder": True, "bitrate": 1024})
+        destination = GStreamerWebRTCDestination(mock_request, mock_pipeline)
+        mock_sample = MagicMock()
+        shared_encoders = mock_pipeline.webrtc_manager.shared_encoders
+        destination._init_stream(mock_sample)
+        shared_encoders.acquire.assert_called_once()
+        key, caps, consumer = shared_encoders.acquire.call_args[0]
+        assert (key.source, key.codec, key.bitrate, key.quality, key.overlay) == \
+            (mock_pipeline.identifier, "h264", 1024, None, True)
+        assert caps == mock_sample.get_caps()
+        assert consumer == destination._on_encoded_sample
+        mock_pipeline.webrtc_manager.add_stream.assert_called_once_with(
+            "peer1", shared_encoders.acquire.return_value.caps, destination, False)
+
+    def test_on_encoded_sample(self, gstreamer_webrtc_destination):
+        mock_sample = MagicMock()
+        gstreamer_webrtc_destination._push_buffer = MagicMock()
+        gstreamer_webrtc_destination._on_encoded_sample(mock_sample)
+        gstreamer_webrtc_destination._push_buffer.assert_not_called()
+        gstreamer_webrtc_destination._app_src = MagicMock()
+        gstreamer_webrtc_destination._need_data = True
+        gstreamer_webrtc_destination._on_encoded_sample(mock_sample)
+        gstreamer_webrtc_destination._push_buffer.assert_called_once_with(
+            mock_sample.get_buffer().copy())
+
+    def test_process_frame_shared_encoder(self, gstreamer_webrtc_destination):
+        mock_frame = MagicMock()
+        mock_stream = MagicMock()
+        gstreamer_webrtc_destination._encoded_stream = mock_stream
+        gstreamer_webrtc_destination._push_buffer = MagicMock()
+        gstreamer_webrtc_destination._need_data = True
+        gstreamer_webrtc_destination._process_frame(mock_frame)
+        mock_stream.push.assert_called_once_with(mock_frame)
+        gstreamer_webrtc_destination._push_buffer.assert_not_called()
+
+    def test_finish_shared_encoder(self, gstreamer_webrtc_destination, mock_pipeline):
+        mock_stream = MagicMock()
+        gstreamer_webrtc_destination._encoded_stream = mock_stream
+        gstreamer_webrtc_destination.finish()
+        mock_pipeline.webrtc_manager.shared_encoders.release.assert_called_once_with(
+            mock_stream.key, gstreamer_webrtc_destination._on_encoded_sample)
+        assert gstreamer_webrtc_destination._encoded_stream is None
+
     def test_on_need_data(self, gstreamer_webrtc_destination):
         gstreamer_webrtc_destination._on_need_data(None, None)
         assert gstreamer_webrtc_destination._need_data is True
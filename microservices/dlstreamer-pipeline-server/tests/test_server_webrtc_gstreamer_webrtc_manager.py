@@ -58,6 +58,19 @@ class TestGStreamerWebRTCManager:
         result_jpeg = gstreamer_webrtc_manager._get_launch_string(mock_caps, "peer1",True)
         assert result_jpeg == ' appsrc name=webrtc_source format=GST_FORMAT_TIME  caps="image/jpeg,width=1920,height=1080"  ! jpegdec ! videoconvert ! gvawatermark  ! x264enc speed-preset=ultrafast name=h264enc  ! video/x-h264,profile=baseline  ! whipclientsink signaller::whip-endpoint= http://10.10.10.10:8889/peer1/whip'
     
+    def test_get_launch_string_h264(self, gstreamer_webrtc_manager):
+        stream_caps = gstreamer_webrtc_manager._select_caps(
+            "video/x-h264, stream-format=(string)byte-stream, alignment=(string)au, profile=(string)baseline, width=(int)1920, height=(int)1080")
+        result = gstreamer_webrtc_manager._get_launch_string(stream_caps, "peer1", False)
+        assert result == ' appsrc name=webrtc_source format=GST_FORMAT_TIME  caps="video/x-h264, stream-format=(string)byte-stream, alignment=(string)au, profile=(string)baseline, width=(int)1920, height=(int)1080"  ! h264parse ! whipclientsink signaller::whip-endpoint= http://10.10.10.10:8889/peer1/whip'
+
+    def test_shared_encoders(self, mock_stream):
+        from src.server.webrtc.gstreamer_webrtc_manager import GStreamerWebRTCManager
+        shared_encoders = MagicMock()
+        manager = GStreamerWebRTCManager("http://10.10.10.10:8889", shared_encoders)
+        assert manager.shared_encoders is shared_encoders
+        assert GStreamerWebRTCManager("http://10.10.10.10:8889").shared_encoders is not None
+
     def test_remove_stream(self, gstreamer_webrtc_manager):
         mock_stream = MagicMock()
         gstreamer_webrtc_manager._streams = {'peer1': mock_stream}
@@ -0,0 +1,82 @@
+#
+# Apache v2 license
+# Copyright (C) 2025 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+#
+
+""" Load generator sending concurrent image requests to a queued image
+ingestor pipeline instance, reporting requests/sec and latency.
+"""
+
+import argparse
+import base64
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def send_request(url, payload, timeout):
+    """POST an image request
+
+    :return: (latency in seconds, error or None)
+    """
+    req = urllib.request.Request(url, data=payload, method="POST",
+                                 headers={"Content-Type": "application/json"})
+    start = time.monotonic()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+        return time.monotonic() - start, None
+    except (urllib.error.URLError, OSError) as e:
+        return time.monotonic() - start, str(e)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", required=True,
+                        help="Instance URL, e.g. http://localhost:8080/pipelines/user_defined_pipelines/"
+                             "pallet_defect_detection/<instance_id>")
+    parser.add_argument("--image", required=True, help="Image file sent with each request")
+    parser.add_argument("--requests", type=int, default=100, help="Number of requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent clients")
+    parser.add_argument("--path", action="store_true",
+                        help="Send the image path instead of its base64 data, the path must be "
+                             "readable by the server")
+    parser.add_argument("--timeout", type=float, default=10, help="Request timeout in seconds")
+    args = parser.parse_args()
+
+    if args.path:
+        source = {"type": "file", "path": args.image}
+    else:
+        with open(args.image, "rb") as f:
+            source = {"type": "base64_image", "data": base64.b64encode(f.read()).decode("utf-8")}
+    payload = json.dumps({"source": source, "timeout": args.timeout}).encode("utf-8")
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(args.concurrency) as clients:
+        results = list(clients.map(lambda _: send_request(args.url, payload, args.timeout),
+                                   range(args.requests)))
+    elapsed = time.monotonic() - start
+
+    latencies = [latency for latency, error in results if error is None]
+    errors = [error for _, error in results if error is not None]
+    print("requests: {} ok, {} failed in {:.2f}s".format(len(latencies), len(errors), elapsed))
+    print("throughput: {:.1f} requests/sec".format(len(latencies) / elapsed))
+    print("latency: p50 {:.1f} ms, p95 {:.1f} ms, max {:.1f} ms".format(
+        percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000,
+        max(latencies, default=0) * 1000))
+    if errors:
+        print("first error: {}".format(errors[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,25 @@ import pickle
 
 from geti_sdk.utils import show_image_with_annotation_scene
 
-def encode_frame(enc_type, enc_level, frame, height, width, channels, meta_data=None):
+def scaled_size(width, height, max_dimension=None):
+    """Helper method to get the size of a frame downscaled to fit max_dimension
+
+    :param width: width of the frame
+    :type: int
+    :param height: height of the frame
+    :type: int
+    :param max_dimension: max width and height, frame size if None
+    :type: int
+    :return: Return scaled width and height
+    :rtype: tuple
+    """
+    if max_dimension is None or max(width, height) <= max_dimension:
+        return width, height
+    scale = max_dimension / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def encode_frame(enc_type, enc_level, frame, height, width, channels, meta_data=None,
+                 max_dimension=None):
     """Helper method to encode given frame
 
     :param frame: input frame
@@ -24,6 +42,8 @@ def encode_frame(enc_type, enc_level, frame, height, width, channels, meta_data=
     :type: int
     :param width: width of the input frame
     :type: int
+    :param max_dimension: downscale frame to fit max width and height, if set
+    :type: int
     :return: Return encoded frame
     :rtype: tuple where the first item is (bool, numpy frame) followed by encoding type and level
     """
@@ -64,6 +84,11 @@ def encode_frame(enc_type, enc_level, frame, height, width, channels, meta_data=
         bgr_data = cv2.cvtColor(data, cv2.COLOR_YUV2BGR_I420)
     else:
         bgr_data = data.copy()     # assuming data is already BGR, remove read-only property
+
+    scaled_width, scaled_height = scaled_size(width, height, max_dimension)
+    if (scaled_width, scaled_height) != (width, height):
+        bgr_data = cv2.resize(bgr_data, (scaled_width, scaled_height),
+                              interpolation=cv2.INTER_AREA)
     
     channel_order = "bgr"
     if enc_type == 'jpeg':
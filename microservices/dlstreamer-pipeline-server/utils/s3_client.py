@@ -10,6 +10,10 @@
 import boto3
 import botocore
 from src.common.log import get_logger
+from src.publisher.common.frame import FrameReader
+
+# S3 requires parts of at least 5 MiB, except for the last one
+MIN_MULTIPART_PART_SIZE = 5 * 1024 * 1024
 
 class S3Client():
     """S3 Client.
@@ -71,6 +75,66 @@ class S3Client():
         except botocore.exceptions.ClientError as e:
             self.log.info(f"Error uploading frame data: {e}")
 
+    def upload(self, s3_bucket_name, object_name, data, multipart_threshold=None,
+               part_size=MIN_MULTIPART_PART_SIZE):
+        """Uploads data to S3 storage, as multipart upload if it is large.
+        Unlike upload_image_data, errors are raised to the caller.
+
+        :param s3_bucket_name: bucket name
+        :type: string
+        :param object_name: name/ path of object
+        :type: string
+        :param data: object data
+        :type: bytes-like
+        :param multipart_threshold: min size in bytes for a multipart upload, never if None
+        :type: int
+        :param part_size: multipart upload part size in bytes
+        :type: int
+        """
+        size = memoryview(data).nbytes
+        if multipart_threshold is None or size < multipart_threshold:
+            resp = self.client.put_object(Bucket=s3_bucket_name, Key=object_name,
+                                          Body=FrameReader(data))
+            if resp['ResponseMetadata']['HTTPStatusCode'] != 200:
+                raise RuntimeError(f"Error uploading {object_name} to S3 storage: {resp['ResponseMetadata']}")
+        else:
+            self.upload_multipart(s3_bucket_name, object_name, data, part_size)
+        self.log.debug(f"Uploaded data at uri: s3://{s3_bucket_name}/{object_name} to S3 storage")
+
+    def upload_multipart(self, s3_bucket_name, object_name, data, part_size=MIN_MULTIPART_PART_SIZE):
+        """Uploads data to S3 storage in parts. The upload is aborted on error.
+
+        :param s3_bucket_name: bucket name
+        :type: string
+        :param object_name: name/ path of object
+        :type: string
+        :param data: object data
+        :type: bytes-like
+        :param part_size: part size in bytes
+        :type: int
+        """
+        part_size = max(part_size, MIN_MULTIPART_PART_SIZE)
+        view = memoryview(data).cast('B')
+        upload_id = self.client.create_multipart_upload(Bucket=s3_bucket_name,
+                                                        Key=object_name)['UploadId']
+        try:
+            parts = []
+            for number, offset in enumerate(range(0, view.nbytes, part_size), start=1):
+                resp = self.client.upload_part(Bucket=s3_bucket_name, Key=object_name,
+                                               UploadId=upload_id, PartNumber=number,
+                                               Body=FrameReader(view[offset:offset + part_size]))
+                parts.append({'ETag': resp['ETag'], 'PartNumber': number})
+            self.client.complete_multipart_upload(Bucket=s3_bucket_name, Key=object_name,
+                                                  UploadId=upload_id,
+                                                  MultipartUpload={'Parts': parts})
+        except Exception:
+            try:
+                self.client.abort_multipart_upload(Bucket=s3_bucket_name, Key=object_name,
+                                                   UploadId=upload_id)
+            except Exception as e:
+                self.log.error(f"Error aborting multipart upload of {object_name}: {e}")
+            raise
+
     def publish(self, s3_bucket_name, object_name, payload):
         """Store frame in S3 storage
 